@@ -0,0 +1,286 @@
+"""
+Tạo file Excel (.xlsx) giả lập bảng ảnh thẻ để đo hiệu năng
+
+Bố cục giống file thật:
+    - Hàng 1: tiêu đề "Mã NV", "Họ tên", "Ảnh"
+    - Từ hàng 2: cột A mã NV (số), cột B họ tên (shared string),
+      ảnh đặt trong ô cột C
+
+Các tham số:
+    - rows: số hàng nhân viên
+    - image_size / image_format: kích thước (px) và định dạng ảnh ('jpeg' hoặc 'png')
+    - duplicate_ratio: tỷ lệ hàng dùng lại bytes ảnh của hàng trước (ảnh trùng nội dung)
+    - misaligned_ratio: tỷ lệ ảnh lệch hàng (anchor bắt đầu ở cuối hàng phía trên)
+    - floating_ratio: tỷ lệ ảnh dùng anchor tuyệt đối (ánh xạ theo vị trí)
+
+Ví dụ:
+    python bench/generate_workbook.py bench_10k.xlsx --rows 10000 --duplicate-ratio 0.1
+
+Cần Pillow để tạo ảnh.
+"""
+
+import argparse
+import collections
+import hashlib
+import io
+import random
+import sys
+import zipfile
+from xml.sax.saxutils import escape
+
+# Kích thước hàng/cột (point) của bảng giả lập
+HEADER_HEIGHT = 15.0
+ROW_HEIGHT = 90.0
+COL_WIDTHS = {1: 12, 2: 30, 3: 20}
+MAX_DIGIT_WIDTH = 7
+EMU_PER_POINT = 12700
+
+# Số ảnh gần nhất được giữ lại để tạo ảnh trùng nội dung
+DUPLICATE_POOL = 64
+
+# Mã hóa chỉ số ảnh: 32 bit, mỗi bit một ô đen/trắng 16x16 px (trùng lưới khối 16x16 của JPEG
+# nên nén mất dữ liệu không làm hai ảnh khác chỉ số trở thành giống nhau)
+INDEX_BITS = 32
+INDEX_COLUMNS = 8
+INDEX_BLOCK = 16
+
+HO = ['Nguyễn', 'Trần', 'Lê', 'Phạm', 'Hoàng', 'Huỳnh', 'Phan', 'Vũ', 'Võ', 'Đặng', 'Bùi', 'Đỗ']
+DEM = ['Văn', 'Thị', 'Hữu', 'Đức', 'Ngọc', 'Minh', 'Thanh', 'Quốc']
+TEN = ['An', 'Bình', 'Châu', 'Dũng', 'Giang', 'Hà', 'Khánh', 'Linh', 'Nam', 'Phương', 'Quân', 'Thảo', 'Trí', 'Yến']
+
+NS_MAIN = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+NS_R = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+NS_PKG_REL = 'http://schemas.openxmlformats.org/package/2006/relationships'
+REL_BASE = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+
+
+def _col_points(width):
+    """Độ rộng cột (số ký tự) sang point theo công thức của Excel"""
+    pixels = int((256 * width + int(128 / MAX_DIGIT_WIDTH)) / 256 * MAX_DIGIT_WIDTH)
+    return pixels * 0.75
+
+
+class _ImageFactory:
+    """Tạo bytes ảnh không trùng nhau từ một ảnh nền"""
+
+    def __init__(self, size, image_format):
+        from PIL import Image, ImageDraw, ImageFilter
+
+        self._draw = ImageDraw.Draw
+        # Nhiễu làm mờ: dung lượng JPEG ~15 KB ở 300x400, gần với ảnh thẻ thật
+        noise = Image.effect_noise(size, 48).filter(ImageFilter.GaussianBlur(2))
+        self.base = Image.merge('RGB', (noise, noise.rotate(90, expand=False), noise.transpose(Image.FLIP_LEFT_RIGHT)))
+        self.pil_format = 'JPEG' if image_format == 'jpeg' else 'PNG'
+        self.ext = 'jpeg' if image_format == 'jpeg' else 'png'
+
+    def make(self, index):
+        """Ảnh thứ index: vẽ các bit của chỉ số thành ô đen/trắng để nội dung khác nhau"""
+        image = self.base.copy()
+        draw = self._draw(image)
+        for bit in range(INDEX_BITS):
+            left = (bit % INDEX_COLUMNS) * INDEX_BLOCK
+            top = (bit // INDEX_COLUMNS) * INDEX_BLOCK
+            color = (255, 255, 255) if (index >> bit) & 1 else (0, 0, 0)
+            draw.rectangle((left, top, left + INDEX_BLOCK - 1, top + INDEX_BLOCK - 1), fill=color)
+        buffer = io.BytesIO()
+        if self.pil_format == 'JPEG':
+            image.save(buffer, 'JPEG', quality=85)
+        else:
+            image.save(buffer, 'PNG')
+        return buffer.getvalue()
+
+
+def _name(rng):
+    return f"{rng.choice(HO)} {rng.choice(DEM)} {rng.choice(TEN)}"
+
+
+def _picture_xml(index, rid):
+    return (f'<xdr:pic><xdr:nvPicPr><xdr:cNvPr id="{index + 1}" name="Picture {index}"/><xdr:cNvPicPr/></xdr:nvPicPr>'
+            f'<xdr:blipFill><a:blip r:embed="{rid}"/><a:stretch><a:fillRect/></a:stretch></xdr:blipFill>'
+            f'<xdr:spPr/></xdr:pic><xdr:clientData/>')
+
+
+def _marker(tag, col, col_off, row, row_off):
+    """xdr:from / xdr:to (cột, hàng đánh số từ 0; offset theo EMU)"""
+    return (f'<xdr:{tag}><xdr:col>{col}</xdr:col><xdr:colOff>{col_off}</xdr:colOff>'
+            f'<xdr:row>{row}</xdr:row><xdr:rowOff>{row_off}</xdr:rowOff></xdr:{tag}>')
+
+
+def _anchor_xml(kind, row, index, rid, picture_left, cell_top):
+    """
+    Anchor của ảnh tại hàng row (đánh số từ 1)
+
+    kind: 'aligned' (twoCellAnchor trong ô), 'misaligned' (bắt đầu ở cuối hàng
+    phía trên, phần lớn ảnh nằm trong ô của hàng) hoặc 'floating' (absoluteAnchor)
+    """
+    pic = _picture_xml(index, rid)
+    margin = int(5 * EMU_PER_POINT)
+    if kind == 'floating':
+        width = int((_col_points(COL_WIDTHS[3]) - 10) * EMU_PER_POINT)
+        height = int((ROW_HEIGHT - 10) * EMU_PER_POINT)
+        x = int(picture_left * EMU_PER_POINT) + margin
+        y = int(cell_top * EMU_PER_POINT) + margin
+        return (f'<xdr:absoluteAnchor><xdr:pos x="{x}" y="{y}"/><xdr:ext cx="{width}" cy="{height}"/>'
+                f'{pic}</xdr:absoluteAnchor>')
+    if kind == 'misaligned':
+        start = _marker('from', 2, margin, row - 2, int((ROW_HEIGHT - 8) * EMU_PER_POINT))
+        end = _marker('to', 3, 0, row - 1, int((ROW_HEIGHT - 12) * EMU_PER_POINT))
+    else:
+        start = _marker('from', 2, margin, row - 1, margin)
+        end = _marker('to', 3, 0, row, 0)
+    return f'<xdr:twoCellAnchor editAs="oneCell">{start}{end}{pic}</xdr:twoCellAnchor>'
+
+
+def build_workbook(path, rows, image_size=(300, 400), image_format='jpeg', duplicate_ratio=0.0,
+                   misaligned_ratio=0.0, floating_ratio=0.0, seed=0):
+    """
+    Tạo file .xlsx giả lập
+
+    Args:
+        path (str): Đường dẫn file đầu ra
+        rows (int): Số hàng nhân viên
+        image_size (tuple): (rộng, cao) ảnh theo pixel
+        image_format (str): 'jpeg' hoặc 'png'
+        duplicate_ratio (float): Tỷ lệ hàng có ảnh trùng nội dung với hàng trước
+        misaligned_ratio (float): Tỷ lệ ảnh lệch hàng
+        floating_ratio (float): Tỷ lệ ảnh dùng anchor tuyệt đối
+        seed (int): Hạt giống ngẫu nhiên (cùng tham số cho cùng file)
+
+    Returns:
+        dict: Thống kê file đã tạo ('rows', 'unique_images', 'misaligned', 'floating')
+    """
+    rng = random.Random(seed)
+    factory = _ImageFactory(image_size, image_format)
+    last_row = rows + 1
+    picture_left = _col_points(COL_WIDTHS[1]) + _col_points(COL_WIDTHS[2])
+    stats = {'rows': rows, 'unique_images': 0, 'misaligned': 0, 'floating': 0}
+    names = []
+    recent = collections.deque(maxlen=DUPLICATE_POOL)
+    # Số ảnh khác nhau tính theo bytes đã mã hóa (đúng bằng số lần mã hóa khi xuất)
+    digests = set()
+
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr('[Content_Types].xml',
+                    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+                    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+                    '<Default Extension="xml" ContentType="application/xml"/>'
+                    f'<Default Extension="{factory.ext}" ContentType="image/{factory.ext}"/>'
+                    '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+                    '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+                    '<Override PartName="/xl/sharedStrings.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sharedStrings+xml"/>'
+                    '<Override PartName="/xl/drawings/drawing1.xml" ContentType="application/vnd.openxmlformats-officedocument.drawing+xml"/>'
+                    '</Types>')
+        zf.writestr('_rels/.rels',
+                    f'<Relationships xmlns="{NS_PKG_REL}"><Relationship Id="rId1" '
+                    f'Type="{REL_BASE}/officeDocument" Target="xl/workbook.xml"/></Relationships>')
+        zf.writestr('xl/workbook.xml',
+                    f'<workbook xmlns="{NS_MAIN}" xmlns:r="{NS_R}"><bookViews><workbookView activeTab="0"/></bookViews>'
+                    '<sheets><sheet name="Sheet1" sheetId="1" r:id="rId1"/></sheets></workbook>')
+        zf.writestr('xl/_rels/workbook.xml.rels',
+                    f'<Relationships xmlns="{NS_PKG_REL}">'
+                    f'<Relationship Id="rId1" Type="{REL_BASE}/worksheet" Target="worksheets/sheet1.xml"/>'
+                    f'<Relationship Id="rId2" Type="{REL_BASE}/sharedStrings" Target="sharedStrings.xml"/>'
+                    '</Relationships>')
+
+        # Sheet: ghi theo luồng từng hàng
+        with zf.open('xl/worksheets/sheet1.xml', 'w') as sheet:
+            cols = ''.join(f'<col min="{c}" max="{c}" width="{w}" customWidth="1"/>' for c, w in COL_WIDTHS.items())
+            sheet.write((f'<worksheet xmlns="{NS_MAIN}" xmlns:r="{NS_R}"><dimension ref="A1:C{last_row}"/>'
+                         f'<sheetFormatPr defaultRowHeight="{HEADER_HEIGHT}"/><cols>{cols}</cols><sheetData>'
+                         '<row r="1"><c r="A1" t="inlineStr"><is><t>Mã NV</t></is></c>'
+                         '<c r="B1" t="inlineStr"><is><t>Họ tên</t></is></c>'
+                         '<c r="C1" t="inlineStr"><is><t>Ảnh</t></is></c></row>').encode('utf-8'))
+            for row in range(2, last_row + 1):
+                names.append(_name(rng))
+                sheet.write((f'<row r="{row}" ht="{ROW_HEIGHT}" customHeight="1">'
+                             f'<c r="A{row}"><v>{100000 + row - 1}</v></c>'
+                             f'<c r="B{row}" t="s"><v>{row - 2}</v></c></row>').encode('utf-8'))
+            sheet.write(b'</sheetData><drawing r:id="rId1"/></worksheet>')
+
+        with zf.open('xl/sharedStrings.xml', 'w') as sst:
+            sst.write(f'<sst xmlns="{NS_MAIN}" count="{len(names)}" uniqueCount="{len(names)}">'.encode('utf-8'))
+            for name in names:
+                sst.write(f'<si><t>{escape(name)}</t></si>'.encode('utf-8'))
+            sst.write(b'</sst>')
+        names = None
+
+        zf.writestr('xl/worksheets/_rels/sheet1.xml.rels',
+                    f'<Relationships xmlns="{NS_PKG_REL}"><Relationship Id="rId1" '
+                    f'Type="{REL_BASE}/drawing" Target="../drawings/drawing1.xml"/></Relationships>')
+
+        # Ảnh: mỗi hàng một phần media (ảnh trùng vẫn là phần riêng như khi dán lại).
+        # zipfile chỉ cho mở một handle ghi, nên drawing/rels được gom rồi ghi sau.
+        anchors = []
+        relationships = []
+        for index, row in enumerate(range(2, last_row + 1), start=1):
+            rid = f'rId{index}'
+            draw = rng.random()
+            if draw < floating_ratio:
+                kind = 'floating'
+            elif draw < floating_ratio + misaligned_ratio:
+                kind = 'misaligned'
+            else:
+                kind = 'aligned'
+            if kind != 'aligned':
+                stats[kind] += 1
+            cell_top = HEADER_HEIGHT + (row - 2) * ROW_HEIGHT
+            anchors.append(_anchor_xml(kind, row, index, rid, picture_left, cell_top))
+
+            if recent and rng.random() < duplicate_ratio:
+                data = rng.choice(recent)
+            else:
+                data = factory.make(index)
+                recent.append(data)
+            digests.add(hashlib.sha1(data).digest())
+            media_name = f'image{index}.{factory.ext}'
+            # Ảnh đã nén: lưu STORED như Excel thường làm
+            zf.writestr(f'xl/media/{media_name}', data, compress_type=zipfile.ZIP_STORED)
+            relationships.append(f'<Relationship Id="{rid}" Type="{REL_BASE}/image" Target="../media/{media_name}"/>')
+
+        zf.writestr('xl/drawings/drawing1.xml',
+                    '<xdr:wsDr xmlns:xdr="http://schemas.openxmlformats.org/drawingml/2006/spreadsheetDrawing" '
+                    f'xmlns:a="http://schemas.openxmlformats.org/drawingml/2006/main" xmlns:r="{NS_R}">'
+                    + ''.join(anchors) + '</xdr:wsDr>')
+        zf.writestr('xl/drawings/_rels/drawing1.xml.rels',
+                    f'<Relationships xmlns="{NS_PKG_REL}">' + ''.join(relationships) + '</Relationships>')
+    stats['unique_images'] = len(digests)
+    return stats
+
+
+def build_parser():
+    """Tạo bộ phân tích tham số dòng lệnh"""
+    parser = argparse.ArgumentParser(description="Tạo file Excel ảnh thẻ giả lập để đo hiệu năng")
+    parser.add_argument('output', help="Đường dẫn file .xlsx cần tạo")
+    parser.add_argument('--rows', type=int, default=1000, help="Số hàng nhân viên")
+    add_workbook_arguments(parser)
+    return parser
+
+
+def add_workbook_arguments(parser):
+    """Thêm các tham số mô tả file giả lập trừ số hàng (dùng chung với run_bench.py)"""
+    parser.add_argument('--image-size', default='300x400', help="Kích thước ảnh, dạng RỘNGxCAO (px)")
+    parser.add_argument('--image-format', choices=('jpeg', 'png'), default='jpeg', help="Định dạng ảnh nhúng")
+    parser.add_argument('--duplicate-ratio', type=float, default=0.0, help="Tỷ lệ ảnh trùng nội dung (0-1)")
+    parser.add_argument('--misaligned-ratio', type=float, default=0.0, help="Tỷ lệ ảnh lệch hàng (0-1)")
+    parser.add_argument('--floating-ratio', type=float, default=0.0, help="Tỷ lệ ảnh dùng anchor tuyệt đối (0-1)")
+    parser.add_argument('--seed', type=int, default=0, help="Hạt giống ngẫu nhiên")
+
+
+def parse_size(text):
+    """'300x400' -> (300, 400)"""
+    width, height = text.lower().split('x')
+    return int(width), int(height)
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    stats = build_workbook(args.output, args.rows, parse_size(args.image_size), args.image_format,
+                           args.duplicate_ratio, args.misaligned_ratio, args.floating_ratio, args.seed)
+    print(f"✅ Đã tạo {args.output}: {stats['rows']} hàng, {stats['unique_images']} ảnh khác nhau, "
+          f"{stats['misaligned']} ảnh lệch hàng, {stats['floating']} ảnh anchor tuyệt đối")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
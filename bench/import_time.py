@@ -0,0 +1,179 @@
+"""
+Đo thời gian khởi động ứng dụng giao diện
+
+Các phép đo:
+    - import: thời gian nạp module (python -X importtime), liệt kê các module
+      tốn thời gian nhất và kiểm tra các module nặng không bị nạp khi mở ứng dụng
+      (van, server, pywin32, Pillow, concurrent.futures.process chỉ được nạp khi bắt đầu xuất)
+    - window: thời gian từ lúc chạy đến khi cửa sổ hiện ra, đo với mã nguồn
+      (python ui.py) hoặc file thực thi đã đóng gói (--exe)
+
+Ví dụ:
+    python bench/import_time.py
+    python bench/import_time.py --module ui van --top 20 --repeat 5
+    python bench/import_time.py --window --exe dist/ui/ui.exe --repeat 5
+
+Mã thoát khác 0 nếu một module trong LAZY_MODULES bị nạp khi import ui.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+# Thư mục gốc của dự án (chứa ui.py, van.py, ...)
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Các module chỉ được nạp khi bắt đầu xuất, không được nạp khi mở giao diện
+LAZY_MODULES = ('van', 'server', 'win32com', 'pythoncom', 'PIL', 'concurrent.futures.process')
+
+# Biến môi trường để ui.py ghi file báo hiệu khi cửa sổ đã hiện ra rồi thoát (xem ui.main)
+STARTUP_PROBE_ENV = 'ANHTHE_STARTUP_PROBE'
+
+# Thời gian chờ tối đa cho một lần mở cửa sổ (giây)
+WINDOW_TIMEOUT = 60
+
+
+def parse_importtime(output):
+    """
+    Đọc kết quả của python -X importtime
+
+    Args:
+        output (str): Nội dung stderr
+
+    Returns:
+        list: (module, self_us, cumulative_us) theo thứ tự nạp
+    """
+    modules = []
+    for line in output.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        fields = line[len('import time:'):].split('|')
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue
+        modules.append((fields[2].strip(), int(fields[0]), int(fields[1])))
+    return modules
+
+
+def measure_import(module):
+    """
+    Nạp module trong một tiến trình mới và đo thời gian
+
+    Returns:
+        dict: {'module', 'seconds' (cả tiến trình), 'import_seconds', 'modules'}
+    """
+    start = time.perf_counter()
+    completed = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                               cwd=ROOT, capture_output=True, text=True)
+    seconds = time.perf_counter() - start
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip().splitlines()[-1])
+    modules = parse_importtime(completed.stderr)
+    top = next((cumulative for name, _, cumulative in modules if name == module), 0)
+    return {'module': module, 'seconds': seconds, 'import_seconds': top / 1e6, 'modules': modules}
+
+
+def lazy_violations(modules):
+    """Các module trong LAZY_MODULES (kể cả module con) đã bị nạp"""
+    loaded = {name for name, _, _ in modules}
+    return sorted(name for name in loaded
+                  if any(name == lazy or name.startswith(lazy + '.') for lazy in LAZY_MODULES))
+
+
+def measure_window(exe=None):
+    """
+    Đo thời gian từ lúc chạy đến khi cửa sổ giao diện hiện ra
+
+    Args:
+        exe (str): File thực thi đã đóng gói (None: chạy python ui.py)
+
+    Returns:
+        float: Số giây, None nếu không mở được cửa sổ (vd: không có màn hình)
+    """
+    command = [exe] if exe else [sys.executable, os.path.join(ROOT, 'ui.py')]
+    with tempfile.TemporaryDirectory() as work_dir:
+        probe = os.path.join(work_dir, 'startup.txt')
+        env = dict(os.environ, **{STARTUP_PROBE_ENV: probe})
+        start = time.perf_counter()
+        process = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            # ui.py ghi file báo hiệu khi cửa sổ đã hiện ra rồi tự thoát
+            while not os.path.exists(probe):
+                if process.poll() is not None or time.perf_counter() - start > WINDOW_TIMEOUT:
+                    return time.perf_counter() - start if os.path.exists(probe) else None
+                time.sleep(0.01)
+            return time.perf_counter() - start
+        finally:
+            try:
+                process.wait(timeout=WINDOW_TIMEOUT)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+def build_parser():
+    """Tạo bộ phân tích tham số dòng lệnh"""
+    parser = argparse.ArgumentParser(description="Đo thời gian khởi động ứng dụng xuất ảnh thẻ")
+    parser.add_argument('--module', nargs='+', default=['ui'],
+                        help="Các module cần đo thời gian nạp (mặc định: ui)")
+    parser.add_argument('--top', type=int, default=15,
+                        help="Số module tốn thời gian nhất được liệt kê")
+    parser.add_argument('--repeat', type=int, default=3,
+                        help="Số lần lặp mỗi phép đo (lấy lần nhanh nhất)")
+    parser.add_argument('--window', action='store_true',
+                        help="Đo cả thời gian đến khi cửa sổ hiện ra (cần màn hình)")
+    parser.add_argument('--exe', default=None,
+                        help="File thực thi đã đóng gói để đo thời gian mở cửa sổ (vd: dist/ui/ui.exe)")
+    parser.add_argument('--json', dest='json_path', metavar='FILE', default=None,
+                        help="Lưu kết quả ra file JSON")
+    return parser
+
+
+def main(argv=None):
+    """
+    Điểm vào dòng lệnh
+
+    Returns:
+        int: Mã thoát (0: thành công, 1: module nặng bị nạp khi mở giao diện)
+    """
+    args = build_parser().parse_args(argv)
+    results = {'imports': [], 'window': None}
+    violations = []
+
+    for module in args.module:
+        runs = [measure_import(module) for _ in range(max(1, args.repeat))]
+        best = min(runs, key=lambda run: run['import_seconds'])
+        print(f"\n📦 import {module}: {best['import_seconds'] * 1000:.1f} ms "
+              f"(cả tiến trình python: {best['seconds'] * 1000:.1f} ms, {len(best['modules'])} module)")
+        print(f"  {'tự thân ms':>10} {'tích lũy ms':>11}  module")
+        for name, self_us, cumulative_us in sorted(best['modules'], key=lambda m: m[1], reverse=True)[:args.top]:
+            print(f"  {self_us / 1000:>10.1f} {cumulative_us / 1000:>11.1f}  {name}")
+        if module == 'ui':
+            violations = lazy_violations(best['modules'])
+            for name in violations:
+                print(f"  ❌ {name} được nạp khi mở giao diện (chỉ nên nạp khi bắt đầu xuất)")
+            if not violations:
+                print(f"  ✅ Không nạp module nặng khi mở giao diện ({', '.join(LAZY_MODULES)})")
+        results['imports'].append({key: best[key] for key in ('module', 'seconds', 'import_seconds')})
+
+    if args.window or args.exe:
+        timings = [measure_window(args.exe) for _ in range(max(1, args.repeat))]
+        timings = [seconds for seconds in timings if seconds is not None]
+        target = args.exe or 'python ui.py'
+        if timings:
+            results['window'] = min(timings)
+            print(f"\n🪟 Mở cửa sổ ({target}): {min(timings):.2f} giây "
+                  f"(chậm nhất {max(timings):.2f} giây, {len(timings)} lần)")
+        else:
+            print(f"\n⚠️ Không mở được cửa sổ ({target}): không có màn hình hoặc ứng dụng bị lỗi")
+
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+    return 1 if violations else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,346 @@
+"""
+Đo hiệu năng xuất ảnh thẻ trên file Excel giả lập
+
+Các phép đo:
+    - parse: đọc mã NV/họ tên theo luồng và liệt kê ảnh trong drawing
+    - mapping: ánh xạ toàn bộ ảnh theo vị trí (Pass 1 / Pass 2 như backend COM)
+    - export: xuất ảnh từ thư mục rỗng bằng export_images
+    - export-warm: chạy lại export_images trên thư mục đã xuất (manifest, bỏ qua hàng không đổi)
+
+Mỗi phép đo chạy trong một tiến trình riêng để đo bộ nhớ đỉnh (peak RSS)
+độc lập; kết quả gồm số hàng/giây, peak RSS và thời gian từng giai đoạn.
+
+Ví dụ:
+    python bench/run_bench.py --rows 100 1000 10000 50000 --json bench_v1.json
+    python bench/run_bench.py --formats original jpeg --workers 1 8 --compare bench_v1.json
+
+File giả lập được tạo một lần trong --work-dir và dùng lại giữa các lần chạy.
+Với --compare, mã thoát khác 0 nếu tốc độ giảm hoặc bộ nhớ tăng quá --tolerance.
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import zipfile
+
+import generate_workbook
+
+# Thư mục gốc của dự án (chứa van.py, ooxml.py, ...)
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+DEFAULT_ROWS = (100, 1000, 10000, 50000)
+CASES = ('parse', 'mapping', 'export', 'export-warm')
+DEFAULT_TOLERANCE = 0.15
+# Phép đo ngắn hơn mức này dao động quá nhiều, không dùng để phát hiện chậm đi
+MIN_COMPARE_SECONDS = 0.5
+
+
+def _peak_rss_mb(who):
+    """Bộ nhớ đỉnh (MB) của tiến trình hiện tại hoặc các tiến trình con đã kết thúc"""
+    # Linux trả về KB
+    return resource.getrusage(who).ru_maxrss / 1024
+
+
+def _case_parse(spec):
+    """Đọc toàn bộ hàng dữ liệu và danh sách ảnh"""
+    import ooxml
+
+    with zipfile.ZipFile(spec['workbook']) as zf:
+        _, sheet_part = ooxml.resolve_sheet(zf)
+        rows = sum(1 for _ in ooxml.iter_data_rows(zf, sheet_part, columns=(1, 2)))
+        pictures = sum(1 for _ in ooxml.iter_pictures(zf, sheet_part))
+    return {'rows': rows, 'pictures': pictures}
+
+
+def _case_mapping(spec):
+    """Ánh xạ mọi ảnh theo vị trí trên cột C, như backend COM"""
+    import mapping
+    import ooxml
+
+    with zipfile.ZipFile(spec['workbook']) as zf:
+        _, sheet_part = ooxml.resolve_sheet(zf)
+        last_row = ooxml.read_dimension(zf, sheet_part)
+        cell_positions = ooxml.read_sheet_geometry(zf, sheet_part, 2, last_row, 3)
+        shapes_info = []
+        for picture in ooxml.iter_pictures(zf, sheet_part):
+            if picture['anchor'] != 'absolute':
+                # Vị trí của ảnh neo theo ô: lấy theo ô bắt đầu của anchor
+                cell = cell_positions.get(picture['from'][0])
+                if cell is None:
+                    continue
+                picture.update(cell)
+            shapes_info.append(picture)
+    image_mapping, unmatched = mapping.map_shapes(shapes_info, cell_positions, lambda message: None)
+    return {'rows': len(shapes_info), 'mapped': len(image_mapping), 'unmatched': len(unmatched)}
+
+
+def _case_export(spec):
+    """Xuất ảnh bằng export_images; export-warm đo lần chạy thứ hai trên cùng thư mục"""
+    import events
+    import postprocess
+    import van
+
+    output_folder = tempfile.mkdtemp(prefix='export_', dir=spec['work_dir'])
+    options = dict(
+        backend=spec['backend'],
+        output_format=spec['format'],
+        workers=spec['workers'],
+        incremental=spec['case'] == 'export-warm',
+        log_callback=None,
+        processing=postprocess.make_options(postprocess.parse_size(spec.get('resize'))),
+    )
+    try:
+        # Nhật ký của export_images không in ra màn hình khi đo
+        with open(os.devnull, 'w', encoding='utf-8') as devnull, contextlib.redirect_stdout(devnull):
+            if spec['case'] == 'export-warm':
+                van.export_images(spec['workbook'], output_folder, **options)
+            stats = events.PhaseStatsSink()
+            start = time.perf_counter()
+            ok = van.export_images(spec['workbook'], output_folder, event_sinks=[stats], **options)
+            seconds = time.perf_counter() - start
+    finally:
+        shutil.rmtree(output_folder, ignore_errors=True)
+    return {
+        'ok': ok,
+        'seconds': seconds,
+        'written': stats.rows_processed,
+        'skipped': dict(stats.rows_skipped),
+        'phases': dict(stats.phase_times),
+    }
+
+
+CASE_FUNCTIONS = {
+    'parse': _case_parse,
+    'mapping': _case_mapping,
+    'export': _case_export,
+    'export-warm': _case_export,
+}
+
+
+def run_case(spec):
+    """
+    Chạy một phép đo trong tiến trình hiện tại
+
+    Args:
+        spec (dict): 'case', 'workbook', 'rows', 'work_dir' và với export:
+            'backend', 'format', 'workers'
+
+    Returns:
+        dict: spec kèm 'seconds', 'rows_per_s', 'peak_rss_mb', 'children_peak_rss_mb'
+    """
+    start = time.perf_counter()
+    result = CASE_FUNCTIONS[spec['case']](spec)
+    seconds = result.pop('seconds', time.perf_counter() - start)
+    record = {key: value for key, value in spec.items() if key not in ('workbook', 'work_dir')}
+    record.update(result)
+    record['seconds'] = seconds
+    record['rows_per_s'] = spec['rows'] / seconds if seconds else None
+    record['peak_rss_mb'] = _peak_rss_mb(resource.RUSAGE_SELF)
+    record['children_peak_rss_mb'] = _peak_rss_mb(resource.RUSAGE_CHILDREN)
+    return record
+
+
+def _run_isolated(spec):
+    """Chạy phép đo trong tiến trình Python mới và đọc kết quả JSON"""
+    completed = subprocess.run([sys.executable, os.path.abspath(__file__), '--run-case', json.dumps(spec)],
+                               capture_output=True, text=True, encoding='utf-8')
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip().splitlines()[-1] if completed.stderr.strip()
+                           else f"mã thoát {completed.returncode}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def _workbook_path(work_dir, rows, args):
+    """Đường dẫn file giả lập theo tham số; tạo mới nếu chưa có"""
+    name = (f"bench_{rows}_{args.image_size}_{args.image_format}_d{args.duplicate_ratio}"
+            f"_m{args.misaligned_ratio}_f{args.floating_ratio}_s{args.seed}.xlsx")
+    path = os.path.join(work_dir, name)
+    if not os.path.exists(path):
+        print(f"🛠️ Đang tạo file giả lập {rows} hàng: {name}")
+        tmp_path = path + '.tmp'
+        generate_workbook.build_workbook(tmp_path, rows, generate_workbook.parse_size(args.image_size),
+                                         args.image_format, args.duplicate_ratio, args.misaligned_ratio,
+                                         args.floating_ratio, args.seed)
+        os.replace(tmp_path, path)
+    return path
+
+
+def _case_key(record):
+    """Khóa để so sánh cùng một phép đo giữa hai lần chạy"""
+    return (record['case'], record['rows'], record.get('backend'), record.get('format'), record.get('workers'),
+            record.get('resize'))
+
+
+def _format_config(record):
+    """Cấu hình của phép đo export, vd: 'ooxml/jpeg/w8/600x800'"""
+    if not record.get('backend'):
+        return ''
+    config = f"{record['backend']}/{record['format']}/w{record['workers']}"
+    if record.get('resize'):
+        config += f"/{record['resize']}"
+    return config
+
+
+def _format_key(record):
+    return f"{record['case']:<12} {record['rows']:>6}  {_format_config(record)}"
+
+
+def compare(results, baseline, tolerance):
+    """
+    So sánh với kết quả lần đo trước
+
+    Args:
+        results (list): Kết quả lần này
+        baseline (list): Kết quả lần trước
+        tolerance (float): Mức thay đổi cho phép (vd: 0.15 = 15%)
+
+    Returns:
+        list: Các dòng mô tả phép đo bị chậm đi hoặc tốn bộ nhớ hơn
+    """
+    previous = {_case_key(record): record for record in baseline}
+    regressions = []
+    print("\n📈 SO SÁNH VỚI LẦN ĐO TRƯỚC:")
+    for record in results:
+        old = previous.get(_case_key(record))
+        if old is None or not old.get('rows_per_s') or not record.get('rows_per_s'):
+            continue
+        if max(record['seconds'], old['seconds']) < MIN_COMPARE_SECONDS:
+            continue
+        speed = record['rows_per_s'] / old['rows_per_s'] - 1
+        memory = record['peak_rss_mb'] / old['peak_rss_mb'] - 1 if old.get('peak_rss_mb') else 0.0
+        flag = ''
+        if speed < -tolerance or memory > tolerance:
+            flag = '  ❌'
+            regressions.append(f"{_format_key(record)}: tốc độ {speed:+.1%}, bộ nhớ {memory:+.1%}")
+        print(f"  {_format_key(record)}  tốc độ {speed:+7.1%}  bộ nhớ {memory:+7.1%}{flag}")
+    return regressions
+
+
+def build_parser():
+    """Tạo bộ phân tích tham số dòng lệnh"""
+    parser = argparse.ArgumentParser(description="Đo hiệu năng xuất ảnh thẻ trên file Excel giả lập")
+    parser.add_argument('--rows', type=int, nargs='+', default=list(DEFAULT_ROWS),
+                        help="Các kích thước file cần đo (số hàng)")
+    generate_workbook.add_workbook_arguments(parser)
+    parser.add_argument('--cases', nargs='+', choices=CASES, default=list(CASES),
+                        help="Các phép đo cần chạy")
+    parser.add_argument('--backends', nargs='+', choices=('ooxml', 'com'), default=['ooxml'],
+                        help="Backend cần đo (com chỉ chạy trên Windows có Excel)")
+    parser.add_argument('--formats', nargs='+', default=['original'],
+                        help="Định dạng đầu ra cần đo (original, png, jpeg)")
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, os.cpu_count() or 1],
+                        help="Số tiến trình cần đo")
+    parser.add_argument('--resize', default=None, metavar='RỘNGxCAO',
+                        help="Đo cả bước hậu xử lý: đưa ảnh về kích thước này (chế độ crop)")
+    parser.add_argument('--repeat', type=int, default=1,
+                        help="Số lần lặp mỗi phép đo (lấy lần nhanh nhất)")
+    parser.add_argument('--work-dir', default=os.path.join(tempfile.gettempdir(), 'anhthe_bench'),
+                        help="Thư mục chứa file giả lập và ảnh xuất tạm")
+    parser.add_argument('--json', dest='json_path', metavar='FILE', default=None,
+                        help="Lưu kết quả ra file JSON")
+    parser.add_argument('--compare', metavar='FILE', default=None,
+                        help="So sánh với file JSON của lần đo trước")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help="Mức chậm đi / tăng bộ nhớ cho phép khi so sánh (mặc định 0.15)")
+    return parser
+
+
+def _specs(args, rows, workbook):
+    """Danh sách phép đo cho một file giả lập"""
+    import van
+
+    base = {'rows': rows, 'workbook': workbook, 'work_dir': args.work_dir}
+    for case in args.cases:
+        if case in ('parse', 'mapping'):
+            yield dict(base, case=case)
+            continue
+        for backend in args.backends:
+            if backend == 'com' and not van.com_available():
+                continue
+            for output_format in args.formats:
+                for workers in sorted(set(args.workers)):
+                    if backend == 'com' and workers != 1:
+                        continue
+                    yield dict(base, case=case, backend=backend, format=output_format, workers=workers,
+                               resize=args.resize)
+
+
+def main(argv=None):
+    """
+    Điểm vào dòng lệnh
+
+    Returns:
+        int: Mã thoát (0: thành công, 1: có phép đo lỗi hoặc chậm đi so với --compare)
+    """
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ['--run-case']:
+        print(json.dumps(run_case(json.loads(argv[1])), ensure_ascii=False))
+        return 0
+
+    args = build_parser().parse_args(argv)
+    os.makedirs(args.work_dir, exist_ok=True)
+    if 'com' in args.backends:
+        import van
+
+        if not van.com_available():
+            print("⚠️ Bỏ qua backend com: cần pywin32 và Microsoft Excel")
+
+    results = []
+    failures = 0
+    print(f"{'phép đo':<12} {'hàng':>6}  {'cấu hình':<24} {'giây':>8} {'hàng/giây':>10} {'RSS MB':>8} {'con MB':>8}")
+    for rows in args.rows:
+        workbook = _workbook_path(args.work_dir, rows, args)
+        for spec in _specs(args, rows, workbook):
+            best = None
+            for _ in range(max(args.repeat, 1)):
+                try:
+                    record = _run_isolated(spec)
+                except Exception as e:
+                    print(f"❌ {spec['case']} {rows}: {str(e)}")
+                    failures += 1
+                    break
+                if best is None or record['seconds'] < best['seconds']:
+                    best = record
+            if best is None:
+                continue
+            results.append(best)
+            print(f"{best['case']:<12} {rows:>6}  {_format_config(best):<24} {best['seconds']:8.2f} "
+                  f"{best['rows_per_s']:10.1f} {best['peak_rss_mb']:8.1f} {best['children_peak_rss_mb']:8.1f}")
+
+    if args.json_path:
+        report = {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'workbook': {key: getattr(args, key) for key in
+                         ('image_size', 'image_format', 'duplicate_ratio', 'misaligned_ratio',
+                          'floating_ratio', 'seed')},
+            'results': results,
+        }
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=1)
+        print(f"\n💾 Đã lưu kết quả: {args.json_path}")
+
+    regressions = []
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)['results']
+        regressions = compare(results, baseline, args.tolerance)
+        for line in regressions:
+            print(f"  ⚠️ Chậm đi hoặc tốn bộ nhớ hơn: {line}")
+
+    return 1 if failures or regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,140 @@
+"""
+Module điểm khôi phục (checkpoint) cho xuất ảnh có thể tiếp tục
+
+Mục đích:
+    - Ghi lại định kỳ trạng thái từng hàng đã xong (đã lưu, bỏ qua, lỗi...)
+      trong lúc xuất, kể cả khi bị lỗi giữa chừng hoặc người dùng bấm Dừng
+    - Lần chạy với tùy chọn "Tiếp tục" bỏ qua các hàng đã xong, chỉ làm lại
+      các hàng lỗi và các hàng chưa tới
+    - Bỏ qua checkpoint không khớp với workbook / tùy chọn xuất hiện tại
+
+Checkpoint được lưu dưới dạng JSON tại <thư mục đầu ra>/.checkpoint.json và
+được xóa khi lần xuất hoàn tất. Đối tượng Checkpoint là một sink sự kiện
+(xem events.py): trạng thái hàng lấy từ các sự kiện row_processed / row_skipped.
+"""
+
+import json
+import os
+import time
+
+CHECKPOINT_NAME = '.checkpoint.json'
+CHECKPOINT_VERSION = 1
+
+# Khoảng thời gian tối thiểu giữa hai lần ghi checkpoint (giây)
+DEFAULT_INTERVAL = 2.0
+
+# Trạng thái hàng cần làm lại khi tiếp tục
+RETRY_STATUSES = ('error',)
+
+
+def checkpoint_path(output_folder):
+    """Đường dẫn file checkpoint trong thư mục đầu ra"""
+    return os.path.join(output_folder, CHECKPOINT_NAME)
+
+
+def make_signature(excel_file_path, **options):
+    """
+    Tạo chữ ký của lần xuất: checkpoint chỉ được dùng lại khi chữ ký khớp
+
+    Args:
+        excel_file_path (str): Đường dẫn workbook (kích thước và thời gian sửa đổi được ghi lại)
+        options: Các tùy chọn ảnh hưởng tới kết quả từng hàng (sheet, định dạng, mẫu tên file...)
+
+    Returns:
+        dict: Chữ ký có thể ghi ra JSON
+    """
+    try:
+        stat = os.stat(excel_file_path)
+        size, mtime = stat.st_size, stat.st_mtime
+    except OSError:
+        size = mtime = None
+    signature = {'source': os.path.basename(excel_file_path), 'size': size, 'mtime': mtime}
+    # Chuẩn hóa qua JSON để so sánh được với chữ ký đọc lại từ file (tuple -> list...)
+    signature.update(json.loads(json.dumps(options, sort_keys=True, default=str)))
+    return signature
+
+
+class Checkpoint:
+    """Trạng thái từng hàng của một lần xuất, ghi định kỳ ra thư mục đầu ra"""
+
+    def __init__(self, output_folder, signature, interval=DEFAULT_INTERVAL):
+        """
+        Args:
+            output_folder (str): Thư mục đầu ra
+            signature (dict): Chữ ký lần xuất (xem make_signature)
+            interval (float): Khoảng thời gian tối thiểu giữa hai lần ghi (giây)
+        """
+        self.path = checkpoint_path(output_folder)
+        self.signature = signature
+        self.interval = interval
+        self.rows = {}
+        self.resumed = {}
+        self._dirty = False
+        self._last_save = time.monotonic()
+
+    def load(self):
+        """
+        Đọc checkpoint của lần chạy trước để tiếp tục
+
+        Returns:
+            str: None nếu đã nạp, ngược lại là lý do không dùng được ('missing', 'mismatch')
+        """
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return 'missing'
+        if data.get('version') != CHECKPOINT_VERSION or data.get('signature') != self.signature:
+            return 'mismatch'
+        self.resumed = {int(row): status for row, status in data.get('rows', {}).items()
+                        if status not in RETRY_STATUSES}
+        self.rows = dict(self.resumed)
+        return None
+
+    def is_done(self, row):
+        """True nếu hàng đã xong ở lần chạy trước (không cần làm lại)"""
+        return row in self.resumed
+
+    def last_row(self):
+        """Hàng cuối của đoạn liên tục các hàng đã xong tính từ hàng nhỏ nhất (None nếu chưa có)"""
+        if not self.rows:
+            return None
+        row = min(self.rows)
+        while row + 1 in self.rows:
+            row += 1
+        return row
+
+    def emit(self, event):
+        """Ghi nhận trạng thái hàng từ sự kiện; ghi file nếu đã quá khoảng thời gian"""
+        if event['type'] == 'row_processed':
+            status = 'processed'
+        elif event['type'] == 'row_skipped' and event.get('reason') != 'resumed':
+            status = event.get('reason')
+        else:
+            return
+        self.rows[event['row']] = status
+        self._dirty = True
+        if time.monotonic() - self._last_save >= self.interval:
+            self.save()
+
+    def save(self):
+        """Ghi checkpoint (ghi file tạm rồi đổi tên để không bị hỏng giữa chừng)"""
+        self._last_save = time.monotonic()
+        if not self._dirty or not os.path.isdir(os.path.dirname(self.path) or '.'):
+            return
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': CHECKPOINT_VERSION, 'signature': self.signature,
+                       'last_row': self.last_row(), 'rows': self.rows}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+        self._dirty = False
+
+    def remove(self):
+        """Xóa checkpoint khi lần xuất đã hoàn tất"""
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+    def close(self):
+        self.save()
@@ -0,0 +1,331 @@
+"""
+Chế độ dòng lệnh: xuất ảnh thẻ hàng loạt từ nhiều file Excel
+
+Ví dụ:
+    python cli.py "\\\\hr-share\\ANHTHE\\**\\*.xlsx" -o D:\\XUAT --all-sheets
+    python cli.py "B23N OKE.xlsx" thu_muc_excel/ -o ANHTHE --sheet "Sheet1" --workers 8
+    python cli.py "B23N OKE.xlsx" -o ANHTHE --output-kind zip
+    python cli.py thu_muc_excel/ --dry-run --report kiem_tra.csv
+
+Mỗi workbook được xuất vào thư mục con riêng <thư mục đầu ra>/<tên file>
+(thêm /<tên sheet> khi xuất nhiều sheet); với --output-kind zip/tar là file
+nén cùng tên (<tên file>.zip). Mã thoát khác 0 nếu có lỗi.
+"""
+
+import argparse
+import collections
+import glob
+import os
+import sys
+import time
+
+import events
+import layout
+import media
+import naming
+import output
+import pipeline
+import postprocess
+import preflight
+import van
+from session import ExportSession
+
+# Phần mở rộng file Excel được tìm khi đầu vào là thư mục
+EXCEL_EXTENSIONS = ('.xlsx', '.xlsm', '.xls')
+
+# Mã thoát
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_NO_INPUT = 2
+EXIT_CHECK_FAILED = 3
+
+
+def find_workbooks(inputs, recursive=False):
+    """
+    Tìm các file Excel từ danh sách đường dẫn, thư mục hoặc mẫu glob
+
+    Args:
+        inputs (list): Đường dẫn file, thư mục hoặc mẫu glob
+        recursive (bool): Tìm cả trong thư mục con khi đầu vào là thư mục
+
+    Returns:
+        list: Đường dẫn tuyệt đối các workbook (không trùng, đã sắp xếp)
+    """
+    found = []
+    for pattern in inputs:
+        if os.path.isdir(pattern):
+            pattern = os.path.join(pattern, '**', '*') if recursive else os.path.join(pattern, '*')
+        matches = glob.glob(pattern, recursive=True) if glob.has_magic(pattern) else [pattern]
+        for path in matches:
+            name = os.path.basename(path)
+            # Bỏ qua file khóa tạm của Excel (~$...)
+            if name.startswith('~$') or not os.path.isfile(path):
+                continue
+            if os.path.splitext(name)[1].lower() in EXCEL_EXTENSIONS:
+                found.append(os.path.abspath(path))
+    return sorted(set(found))
+
+
+def build_parser():
+    """Tạo bộ phân tích tham số dòng lệnh"""
+    parser = argparse.ArgumentParser(description="Xuất ảnh thẻ từ nhiều file Excel")
+    parser.add_argument('inputs', nargs='+',
+                        help="File Excel, thư mục hoặc mẫu glob (vd: \"HR/**/*.xlsx\")")
+    parser.add_argument('-o', '--output', default='ANHTHE',
+                        help="Thư mục đầu ra gốc (mặc định: ANHTHE)")
+    parser.add_argument('-r', '--recursive', action='store_true',
+                        help="Tìm file Excel trong cả thư mục con")
+
+    sheets = parser.add_mutually_exclusive_group()
+    sheets.add_argument('--sheet', action='append', dest='sheets', metavar='TÊN',
+                        help="Tên sheet cần xuất (có thể lặp lại; mặc định: sheet đang hoạt động)")
+    sheets.add_argument('--all-sheets', action='store_true',
+                        help="Xuất tất cả các sheet")
+
+    parser.add_argument('--backend', choices=('auto', 'ooxml', 'com'), default='auto',
+                        help="Phương thức trích xuất ảnh")
+    parser.add_argument('--format', dest='output_format', choices=media.OUTPUT_FORMATS, default='original',
+                        help="Định dạng ảnh đầu ra")
+    parser.add_argument('--jpeg-quality', type=int, default=90,
+                        help="Chất lượng JPEG khi --format jpeg")
+    parser.add_argument('--scale-factor', type=float, default=3.0,
+                        help="Hệ số phóng to ảnh (backend COM)")
+    parser.add_argument('--wait-time', type=float, default=0.5,
+                        help="Thời gian chờ clipboard, giây (backend COM)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help="Số tiến trình mã hóa/ghi ảnh song song (mặc định: số lõi CPU)")
+    parser.add_argument('--queue-size', type=int, default=pipeline.DEFAULT_QUEUE_SIZE,
+                        help="Số ảnh tối đa đang chờ giữa bước đọc và bước ghi")
+    parser.add_argument('--batch-size', type=int, default=pipeline.DEFAULT_BATCH_SIZE,
+                        help="Số ảnh gửi sang tiến trình con trong một lô")
+
+    processing = parser.add_argument_group("hậu xử lý ảnh")
+    processing.add_argument('--resize', metavar='RỘNGxCAO', default=None,
+                            help="Đưa ảnh về kích thước cố định (vd: 600x800)")
+    processing.add_argument('--fit', dest='fit_mode', choices=postprocess.FIT_MODES, default='crop',
+                            help="crop: lấp đầy rồi cắt giữ khuôn mặt; fit: thu vào khung; pad: thêm nền trắng")
+    processing.add_argument('--dpi', type=int, default=None,
+                            help="Ghi DPI vào file ảnh (vd: 300)")
+    processing.add_argument('--color-mode', choices=postprocess.COLOR_MODES, default=None,
+                            help="Đổi hệ màu ảnh đầu ra")
+    processing.add_argument('--strip-exif', action='store_true',
+                            help="Xóa EXIF khỏi ảnh đầu ra")
+
+    columns = parser.add_argument_group("bố cục sheet (mặc định: tự nhận diện theo tiêu đề, không thấy thì A/B/C)")
+    columns.add_argument('--ma-nv-column', metavar='CỘT', default=None,
+                         help="Cột mã NV (chữ cái hoặc số, vd: A hoặc 1)")
+    columns.add_argument('--ho-ten-column', metavar='CỘT', default=None,
+                         help="Cột họ tên")
+    columns.add_argument('--photo-column', metavar='CỘT', default=None,
+                         help="Cột chứa ảnh thẻ; ảnh nằm ngoài cột này bị bỏ qua")
+    columns.add_argument('--header-row', type=int, default=None,
+                         help="Hàng tiêu đề (dữ liệu bắt đầu từ hàng kế tiếp)")
+    columns.add_argument('--first-row', type=int, default=None,
+                         help="Hàng dữ liệu đầu tiên")
+    columns.add_argument('--no-detect-header', action='store_true',
+                         help="Không tự nhận diện tiêu đề, chỉ dùng cột đã cấu hình hoặc mặc định")
+    parser.add_argument('--filename-template', default=naming.DEFAULT_TEMPLATE, metavar='MẪU',
+                        help="Mẫu tên file ảnh, vd: '{ma_nv}_{ho_ten_slug}.{ext}' "
+                             f"(trường: {', '.join(naming.TEMPLATE_FIELDS)})")
+    parser.add_argument('--on-collision', choices=naming.COLLISION_POLICIES, default='suffix',
+                        help="Khi tên file trùng: suffix (thêm -2, -3...) hoặc skip (giữ hàng đầu tiên)")
+    parser.add_argument('--output-kind', choices=output.OUTPUT_KINDS, default='folder',
+                        help="Nơi ghi ảnh: folder (từng file), zip hoặc tar (một file nén kèm index.csv)")
+    parser.add_argument('--full', action='store_true',
+                        help="Xuất lại toàn bộ, không dùng manifest")
+    parser.add_argument('--resume', action='store_true',
+                        help="Tiếp tục từ checkpoint của lần chạy bị lỗi/dừng trước, bỏ qua các hàng đã xong")
+    parser.add_argument('--remove-stale', action='store_true',
+                        help="Xóa ảnh của mã NV không còn trong file")
+    parser.add_argument('--link-mode', choices=('hardlink', 'copy'), default='hardlink',
+                        help="Cách tạo file cho ảnh trùng nội dung")
+    parser.add_argument('--cache-dir', default=None,
+                        help="Thư mục lưu ảnh đã chuyển đổi để dùng lại giữa các lần chạy")
+    parser.add_argument('--dry-run', action='store_true',
+                        help="Chỉ kiểm tra: đọc bảng dữ liệu và ánh xạ ảnh, báo cáo từng hàng, không xuất ảnh")
+    parser.add_argument('--report', metavar='FILE', default=None,
+                        help="Ghi báo cáo ánh xạ từng hàng ra file .csv hoặc .json")
+    parser.add_argument('--events', metavar='FILE', default=None,
+                        help="Ghi sự kiện có cấu trúc ra file JSON Lines")
+    parser.add_argument('--stats', action='store_true',
+                        help="In thống kê thời gian theo giai đoạn khi kết thúc")
+    return parser
+
+
+def _workbook_folders(output_root, workbooks):
+    """
+    Thư mục con riêng cho từng workbook (mỗi thư mục có manifest / checkpoint riêng)
+
+    Tên thư mục là tên file bỏ phần mở rộng; khi trùng (không phân biệt hoa thường như
+    trên Windows) thì thêm thư mục cha, vẫn trùng thì thêm phần mở rộng
+    (vd: dir/a.xls và dir/a.xlsx -> dir_a_xls, dir_a_xlsx), cuối cùng thêm số thứ tự
+
+    Args:
+        output_root (str): Thư mục đầu ra gốc
+        workbooks (list): Các file Excel theo thứ tự xử lý
+
+    Returns:
+        dict: {đường dẫn workbook: thư mục đầu ra}
+    """
+    def key(name):
+        return name.lower()
+
+    def clashes(names):
+        counts = collections.Counter(key(name) for name in names.values())
+        return {path for path, name in names.items() if counts[key(name)] > 1}
+
+    names = {}
+    for path in workbooks:
+        names[path] = van.clean_filename(os.path.splitext(os.path.basename(path))[0])
+    for path in clashes(names):
+        parent = os.path.basename(os.path.dirname(os.path.abspath(path)))
+        names[path] = van.clean_filename(f"{parent}_{names[path]}")
+    for path in clashes(names):
+        ext = os.path.splitext(path)[1].lstrip('.')
+        names[path] = van.clean_filename(f"{names[path]}_{ext}")
+
+    used = set()
+    folders = {}
+    for path in workbooks:
+        name = names[path]
+        counter = 2
+        while key(name) in used:
+            name = f"{names[path]}-{counter}"
+            counter += 1
+        used.add(key(name))
+        folders[path] = os.path.join(output_root, name)
+    return folders
+
+
+def main(argv=None):
+    """
+    Điểm vào dòng lệnh
+
+    Args:
+        argv (list): Tham số dòng lệnh (None: dùng sys.argv)
+
+    Returns:
+        int: Mã thoát (0: thành công, 1: có lỗi, 2: không tìm thấy file,
+            3: chế độ kiểm tra phát hiện hàng / ảnh có vấn đề)
+    """
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    try:
+        processing = postprocess.make_options(postprocess.parse_size(args.resize), args.fit_mode,
+                                              args.dpi, args.color_mode, args.strip_exif)
+        layout_config = layout.make_layout(args.ma_nv_column, args.ho_ten_column, args.photo_column,
+                                           args.header_row, args.first_row,
+                                           auto_detect=not args.no_detect_header)
+        naming.validate_template(args.filename_template)
+        if args.report:
+            preflight.report_format(args.report)
+    except ValueError as e:
+        parser.error(str(e))
+
+    workbooks = find_workbooks(args.inputs, args.recursive)
+    if not workbooks:
+        print("❌ Không tìm thấy file Excel nào phù hợp")
+        return EXIT_NO_INPUT
+
+    print("=" * 50)
+    if args.dry_run:
+        print(f"KIỂM TRA ÁNH XẠ ẢNH TRONG {len(workbooks)} FILE EXCEL (KHÔNG XUẤT ẢNH)")
+    else:
+        print(f"BẮT ĐẦU XUẤT ẢNH TỪ {len(workbooks)} FILE EXCEL")
+    print("=" * 50)
+
+    start_time = time.time()
+    failures = []
+    succeeded = 0
+
+    # Sink nhận sự kiện có cấu trúc
+    stats = events.PhaseStatsSink() if args.stats else None
+    events_sink = events.JsonLinesSink(args.events) if args.events else None
+    report = preflight.PreflightReport() if args.dry_run or args.report else None
+    event_sinks = [sink for sink in (stats, events_sink, report) if sink is not None]
+
+    folders = _workbook_folders(args.output, workbooks)
+    with ExportSession(workers=args.workers) as session:
+        for workbook_path in workbooks:
+            folder = folders[workbook_path]
+            try:
+                if args.all_sheets:
+                    sheet_names = van.list_sheets(workbook_path, args.backend, session)
+                else:
+                    sheet_names = args.sheets or [None]
+            except Exception as e:
+                print(f"❌ Không đọc được danh sách sheet của {workbook_path}: {str(e)}")
+                failures.append((workbook_path, None))
+                continue
+
+            for sheet_name in sheet_names:
+                output_folder = folder
+                if sheet_name is not None and len(sheet_names) > 1:
+                    output_folder = os.path.join(folder, van.clean_filename(sheet_name))
+                print("\n" + "-" * 50)
+                print(f"📄 {workbook_path}" + (f" [{sheet_name}]" if sheet_name else ""))
+
+                ok = van.export_images(
+                    excel_file_path=workbook_path,
+                    output_folder=output_folder,
+                    scale_factor=args.scale_factor,
+                    wait_time=args.wait_time,
+                    backend=args.backend,
+                    output_format=args.output_format,
+                    jpeg_quality=args.jpeg_quality,
+                    workers=args.workers,
+                    queue_size=args.queue_size,
+                    incremental=not args.full,
+                    remove_stale=args.remove_stale,
+                    link_mode=args.link_mode,
+                    cache_dir=args.cache_dir,
+                    sheet_name=sheet_name,
+                    session=session,
+                    event_sinks=event_sinks,
+                    processing=processing,
+                    batch_size=args.batch_size,
+                    layout_config=layout_config,
+                    filename_template=args.filename_template,
+                    on_collision=args.on_collision,
+                    resume=args.resume,
+                    output_kind=args.output_kind,
+                    dry_run=args.dry_run
+                )
+                if ok:
+                    succeeded += 1
+                else:
+                    failures.append((workbook_path, sheet_name))
+
+    if events_sink is not None:
+        events_sink.close()
+
+    # Tính thời gian thực thi
+    elapsed_time = time.time() - start_time
+    print("\n" + "=" * 50)
+    print(f"HOÀN TẤT SAU {elapsed_time:.2f} GIÂY")
+    print(f"- Thành công: {succeeded}")
+    print(f"- Lỗi: {len(failures)}")
+    for workbook_path, sheet_name in failures:
+        print(f"  ❌ {workbook_path}" + (f" [{sheet_name}]" if sheet_name else ""))
+    if stats is not None:
+        print()
+        for line in stats.report():
+            print(line)
+    if report is not None:
+        print()
+        for line in report.report():
+            print(line)
+        if args.report:
+            report.write(args.report)
+            print(f"📝 Đã ghi báo cáo: {os.path.abspath(args.report)}")
+    print("=" * 50)
+
+    if failures:
+        return EXIT_FAILED
+    if args.dry_run and report.summary()['problems']:
+        return EXIT_CHECK_FAILED
+    return EXIT_OK
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,180 @@
+"""
+Module sự kiện có cấu trúc cho quá trình xuất ảnh
+
+Mục đích:
+    - Phát sự kiện dạng dict thay cho chuỗi log: bắt đầu/kết thúc giai đoạn,
+      hàng đã xuất, hàng bị bỏ qua, kết quả ánh xạ
+    - Đo thời gian từng giai đoạn (open, geometry, mapping, export, teardown)
+    - Cung cấp các sink nhận sự kiện: file JSON Lines, bộ tổng hợp thời gian
+      trong bộ nhớ, hàm callback (vd: thanh tiến trình giao diện)
+
+Mỗi sự kiện có các khóa chung 'type', 'time' (epoch giây), 'source' (tên
+workbook) và các khóa riêng theo loại:
+    - phase_start: 'phase', ('total' với giai đoạn export)
+    - phase_end: 'phase', 'duration'
+    - row_processed: 'row', 'ma_nv', 'filename', 'bytes', 'method', ('duration')
+    - row_skipped: 'row', 'ma_nv', 'reason' ('resumed' nếu hàng đã xong ở lần chạy trước)
+    - row_checked: 'row', 'ma_nv', 'ho_ten', 'filename' (chế độ kiểm tra: hàng sẽ được xuất)
+    - mapping: 'row', 'picture', 'method' ('anchor', 'cell' với ảnh đặt trong ô, 'position'),
+      'status', ('condition', 'distance', 'pass_no')
+    - collision: 'filename', 'rows', 'policy'
+    - run_end: 'ok', 'phases' ({phase: duration})
+"""
+
+import json
+import threading
+import time
+
+# Các giai đoạn chuẩn của một lần xuất
+PHASES = ('open', 'geometry', 'mapping', 'export', 'teardown')
+
+
+class EventStream:
+    """Phát sự kiện tới một hoặc nhiều sink"""
+
+    def __init__(self, sinks=None, source=None):
+        """
+        Args:
+            sinks (list): Danh sách sink (đối tượng có phương thức emit(event))
+            source (str): Tên workbook gắn vào mọi sự kiện
+        """
+        self.sinks = [sink for sink in (sinks or []) if sink is not None]
+        self.source = source
+        self.durations = {}
+        self._phase = None
+        self._phase_start = None
+
+    def emit(self, event_type, **fields):
+        """Phát một sự kiện"""
+        if not self.sinks:
+            return
+        event = {'type': event_type, 'time': time.time(), 'source': self.source}
+        event.update(fields)
+        for sink in self.sinks:
+            sink.emit(event)
+
+    def enter(self, name, **fields):
+        """
+        Kết thúc giai đoạn hiện tại (nếu có) và bắt đầu giai đoạn mới
+
+        Args:
+            name (str): Tên giai đoạn
+            fields: Thông tin bổ sung cho phase_start (vd: total)
+        """
+        self._end_phase()
+        self._phase = name
+        self._phase_start = time.perf_counter()
+        self.emit('phase_start', phase=name, **fields)
+
+    def _end_phase(self):
+        """Ghi nhận thời gian và phát phase_end cho giai đoạn hiện tại"""
+        if self._phase is None:
+            return
+        duration = time.perf_counter() - self._phase_start
+        self.durations[self._phase] = self.durations.get(self._phase, 0.0) + duration
+        self.emit('phase_end', phase=self._phase, duration=duration)
+        self._phase = None
+
+    def finish(self, ok):
+        """Kết thúc giai đoạn cuối và phát sự kiện run_end kèm thời gian các giai đoạn"""
+        self._end_phase()
+        self.emit('run_end', ok=ok, phases=dict(self.durations))
+
+
+class JsonLinesSink:
+    """Ghi mỗi sự kiện thành một dòng JSON"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'a', encoding='utf-8')
+        self._lock = threading.Lock()
+
+    def emit(self, event):
+        line = json.dumps(event, ensure_ascii=False, default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+
+    def close(self):
+        self._file.close()
+
+
+class CallbackSink:
+    """Chuyển sự kiện tới một hàm (vd: cập nhật thanh tiến trình)"""
+
+    def __init__(self, callback):
+        self.callback = callback
+
+    def emit(self, event):
+        self.callback(event)
+
+    def close(self):
+        pass
+
+
+class PhaseStatsSink:
+    """Tổng hợp thời gian theo giai đoạn và thống kê hàng trong bộ nhớ"""
+
+    def __init__(self):
+        self.phase_times = {}
+        self.row_times = []
+        self.rows_processed = 0
+        self.rows_skipped = {}
+        self.bytes_written = 0
+        self.runs = 0
+        self._lock = threading.Lock()
+
+    def emit(self, event):
+        with self._lock:
+            event_type = event['type']
+            if event_type == 'phase_end':
+                phase = event['phase']
+                self.phase_times[phase] = self.phase_times.get(phase, 0.0) + event['duration']
+            elif event_type == 'row_processed':
+                self.rows_processed += 1
+                self.bytes_written += event.get('bytes') or 0
+                if event.get('duration') is not None:
+                    self.row_times.append(event['duration'])
+            elif event_type == 'row_skipped':
+                reason = event.get('reason')
+                self.rows_skipped[reason] = self.rows_skipped.get(reason, 0) + 1
+            elif event_type == 'run_end':
+                self.runs += 1
+
+    def close(self):
+        pass
+
+    def report(self, width=30):
+        """
+        Tạo báo cáo thời gian dạng biểu đồ cột
+
+        Args:
+            width (int): Độ dài tối đa của cột
+
+        Returns:
+            list: Các dòng báo cáo
+        """
+        lines = ["⏱️ THỜI GIAN THEO GIAI ĐOẠN:"]
+        total = sum(self.phase_times.values())
+        longest = max(self.phase_times.values(), default=0.0)
+        phases = [p for p in PHASES if p in self.phase_times]
+        phases += [p for p in self.phase_times if p not in PHASES]
+        for phase in phases:
+            seconds = self.phase_times[phase]
+            bar = '█' * (int(round(seconds / longest * width)) if longest else 0)
+            share = seconds / total * 100 if total else 0.0
+            lines.append(f"  {phase:<10} {seconds:8.2f}s {share:5.1f}%  {bar}")
+        lines.append(f"  {'tổng':<10} {total:8.2f}s")
+
+        lines.append(f"- Số workbook: {self.runs}")
+        lines.append(f"- Số ảnh đã ghi: {self.rows_processed} ({self.bytes_written} bytes)")
+        for reason, count in sorted(self.rows_skipped.items(), key=lambda item: str(item[0])):
+            lines.append(f"- Số hàng bỏ qua ({reason}): {count}")
+        if self.row_times:
+            row_times = sorted(self.row_times)
+            p95 = row_times[min(len(row_times) - 1, int(len(row_times) * 0.95))]
+            average = sum(row_times) / len(row_times)
+            lines.append(f"- Thời gian ghi mỗi ảnh: trung bình {average * 1000:.1f} ms, "
+                         f"p95 {p95 * 1000:.1f} ms, tối đa {row_times[-1] * 1000:.1f} ms")
+        if total and self.rows_processed:
+            lines.append(f"- Tốc độ: {self.rows_processed / total:.1f} ảnh/giây")
+        return lines
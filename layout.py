@@ -0,0 +1,216 @@
+"""
+Module bố cục sheet ảnh thẻ: cột mã NV, họ tên, ảnh và hàng dữ liệu đầu tiên
+
+Mục đích:
+    - Cho phép cấu hình cột (số hoặc chữ cái, vd: 5 hoặc 'E') và hàng tiêu đề
+    - Tự nhận diện hàng tiêu đề theo tên cột ("Mã NV", "Họ tên", "Ảnh"...),
+      kể cả khi có nhiều hàng tiêu đề hoặc thêm cột khác
+    - Giữ bố cục mặc định (A: mã NV, B: họ tên, C: ảnh, dữ liệu từ hàng 2)
+      khi không nhận diện được
+
+Bố cục được xác định một lần cho mỗi sheet, trả về dict:
+    'ma_nv', 'ho_ten', 'photo' (số cột), 'header_row', 'first_row',
+    'detected' (True nếu cột ảnh được nhận diện hoặc cấu hình rõ ràng),
+    'sources' ({trường: 'config' | 'header' | 'default'})
+"""
+
+import re
+import unicodedata
+
+# Bố cục mặc định (file mẫu ban đầu)
+DEFAULT_COLUMNS = {'ma_nv': 1, 'ho_ten': 2, 'photo': 3}
+DEFAULT_FIRST_ROW = 2
+
+# Số hàng / cột đầu sheet được quét để tìm tiêu đề
+HEADER_SCAN_ROWS = 10
+HEADER_SCAN_COLUMNS = 52
+
+# Ô dài hơn mức này (sau khi bỏ dấu) được coi là tiêu đề trang, không phải tên cột
+MAX_HEADER_LENGTH = 40
+
+# Tên tiêu đề được nhận diện (so khớp sau khi bỏ dấu, không phân biệt hoa thường)
+HEADER_ALIASES = {
+    'ma_nv': ('ma nv', 'ma nhan vien', 'ma so nhan vien', 'msnv', 'mnv', 'employee id', 'emp id', 'id'),
+    'ho_ten': ('ho ten', 'ho va ten', 'ten nhan vien', 'ho ten nhan vien', 'full name', 'name'),
+    'photo': ('anh', 'anh the', 'hinh', 'hinh anh', 'anh nhan vien', 'photo', 'picture', 'image'),
+}
+
+# Tên hiển thị trong nhật ký
+FIELD_LABELS = {'ma_nv': 'Mã NV', 'ho_ten': 'Họ tên', 'photo': 'Ảnh'}
+
+
+def strip_diacritics(text):
+    """
+    Bỏ dấu tiếng Việt, giữ nguyên chữ hoa/thường
+
+    Args:
+        text (str): Chuỗi gốc (vd: 'Nguyễn Văn Đức')
+
+    Returns:
+        str: Chuỗi không dấu (vd: 'Nguyen Van Duc')
+    """
+    text = str(text).replace('đ', 'd').replace('Đ', 'D')
+    text = unicodedata.normalize('NFD', text)
+    return ''.join(ch for ch in text if not unicodedata.combining(ch))
+
+
+def fold_text(text):
+    """
+    Bỏ dấu tiếng Việt, chuyển chữ thường và gộp khoảng trắng
+
+    Args:
+        text (str): Chuỗi gốc (vd: 'Họ và Tên')
+
+    Returns:
+        str: Chuỗi đã chuẩn hóa (vd: 'ho va ten')
+    """
+    return re.sub(r'\s+', ' ', strip_diacritics(text).casefold()).strip()
+
+
+def column_number(column):
+    """
+    Chuyển cột dạng chữ cái hoặc số sang số cột
+
+    Args:
+        column (int|str): Vd: 5, '5' hoặc 'E'
+
+    Returns:
+        int: Số cột (đánh số từ 1), None nếu column rỗng
+    """
+    if column is None or column == '':
+        return None
+    if isinstance(column, int):
+        number = column
+    elif str(column).strip().isdigit():
+        number = int(str(column).strip())
+    elif re.fullmatch(r'[A-Za-z]{1,3}', str(column).strip()):
+        number = 0
+        for ch in str(column).strip().upper():
+            number = number * 26 + (ord(ch) - ord('A') + 1)
+    else:
+        raise ValueError(f"Cột không hợp lệ: {column}")
+    if number < 1:
+        raise ValueError(f"Cột không hợp lệ: {column}")
+    return number
+
+
+def column_letter(number):
+    """Số cột sang chữ cái (vd: 5 -> 'E')"""
+    letters = ''
+    while number > 0:
+        number, remainder = divmod(number - 1, 26)
+        letters = chr(ord('A') + remainder) + letters
+    return letters
+
+
+def make_layout(ma_nv=None, ho_ten=None, photo=None, header_row=None, first_row=None, auto_detect=True):
+    """
+    Tạo cấu hình bố cục
+
+    Args:
+        ma_nv (int|str): Cột mã NV (None: tự nhận diện hoặc mặc định A)
+        ho_ten (int|str): Cột họ tên (None: tự nhận diện hoặc mặc định B)
+        photo (int|str): Cột ảnh (None: tự nhận diện hoặc mặc định C)
+        header_row (int): Hàng tiêu đề (None: tự nhận diện)
+        first_row (int): Hàng dữ liệu đầu tiên (None: ngay sau hàng tiêu đề)
+        auto_detect (bool): Tìm tiêu đề cho các cột chưa cấu hình
+
+    Returns:
+        dict: Cấu hình bố cục
+    """
+    return {
+        'ma_nv': column_number(ma_nv),
+        'ho_ten': column_number(ho_ten),
+        'photo': column_number(photo),
+        'header_row': int(header_row) if header_row else None,
+        'first_row': int(first_row) if first_row else None,
+        'auto_detect': auto_detect,
+    }
+
+
+def _match_field(text):
+    """Trường tương ứng với nội dung ô tiêu đề (None nếu không khớp)"""
+    folded = fold_text(text)
+    if not folded or len(folded) > MAX_HEADER_LENGTH:
+        return None
+    best = None
+    for field, aliases in HEADER_ALIASES.items():
+        for alias in aliases:
+            # Khớp trọn cụm từ (vd: "Mã NV (*)" khớp "ma nv")
+            if re.search(rf'(^|[^a-z0-9]){re.escape(alias)}($|[^a-z0-9])', folded):
+                # Ưu tiên tên dài hơn (vd: "ma nhan vien" hơn "id")
+                if best is None or len(alias) > best[1]:
+                    best = (field, len(alias))
+    return best[0] if best else None
+
+
+def detect_headers(rows):
+    """
+    Tìm cột của các trường theo tiêu đề trong các hàng đầu sheet
+
+    Hàng tiêu đề là hàng đầu tiên có cột mã NV và (tính cả các hàng phía trên)
+    ít nhất một trường khác; việc quét dừng ở hàng đó nên tên nhân viên trong
+    các hàng dữ liệu không bị nhầm là tiêu đề. Với nhiều hàng tiêu đề, trường
+    nằm trong hàng tiêu đề được ưu tiên, trường còn thiếu lấy từ các hàng trên.
+
+    Args:
+        rows (iterable): (row, {col: value}) của các hàng đầu sheet
+
+    Returns:
+        tuple: ({field: col}, header_row hoặc None)
+    """
+    found = {}
+    for row, values in rows:
+        if row > HEADER_SCAN_ROWS:
+            break
+        in_row = {}
+        for col in sorted(values):
+            value = values[col]
+            if not isinstance(value, str):
+                continue
+            field = _match_field(value)
+            if field is not None and field not in in_row:
+                in_row[field] = col
+        for field, col in in_row.items():
+            found.setdefault(field, col)
+        if 'ma_nv' in in_row and len(found) >= 2:
+            found.update(in_row)
+            return found, row
+    return {}, None
+
+
+def resolve(config, header_rows=None):
+    """
+    Xác định bố cục cuối cùng của một sheet
+
+    Args:
+        config (dict): Cấu hình từ make_layout (None: tự nhận diện hoàn toàn)
+        header_rows (iterable): (row, {col: value}) các hàng đầu sheet để tự nhận diện
+
+    Returns:
+        dict: Bố cục đã xác định (xem đầu module)
+    """
+    config = config or make_layout()
+    found, header_row = {}, None
+    if config['auto_detect'] and header_rows is not None:
+        found, header_row = detect_headers(header_rows)
+    if config['header_row']:
+        header_row = config['header_row']
+
+    result = {}
+    for field, default in DEFAULT_COLUMNS.items():
+        result[field] = config[field] or found.get(field) or default
+    result['header_row'] = header_row
+    result['first_row'] = config['first_row'] or ((header_row + 1) if header_row else DEFAULT_FIRST_ROW)
+    result['detected'] = bool(config['photo'] or 'photo' in found)
+    result['sources'] = {field: 'config' if config[field] else 'header' if field in found else 'default'
+                         for field in DEFAULT_COLUMNS}
+    return result
+
+
+def describe(resolved):
+    """Mô tả bố cục cho nhật ký, vd: 'Mã NV: A, Họ tên: B, Ảnh: E (tiêu đề hàng 3, dữ liệu từ hàng 4)'"""
+    columns = ', '.join(f"{FIELD_LABELS[field]}: {column_letter(resolved[field])}" for field in DEFAULT_COLUMNS)
+    if resolved['header_row']:
+        return f"{columns} (tiêu đề hàng {resolved['header_row']}, dữ liệu từ hàng {resolved['first_row']})"
+    return f"{columns} (dữ liệu từ hàng {resolved['first_row']})"
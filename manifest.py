@@ -0,0 +1,160 @@
+"""
+Module quản lý manifest cho xuất ảnh tăng dần (incremental)
+
+Mục đích:
+    - Ghi lại cho từng mã NV: phần media nguồn, mã băm nội dung, tên file,
+      kích thước và thời gian sửa đổi của file đầu ra
+    - Lần chạy sau bỏ qua các hàng có ảnh nguồn và file đầu ra không đổi
+    - Phát hiện file của nhân viên không còn trong workbook
+
+Manifest được lưu dưới dạng JSON tại <thư mục đầu ra>/.manifest.json
+"""
+
+import hashlib
+import json
+import os
+
+MANIFEST_NAME = '.manifest.json'
+MANIFEST_VERSION = 1
+
+
+def manifest_path(output_folder):
+    """Đường dẫn file manifest trong thư mục đầu ra"""
+    return os.path.join(output_folder, MANIFEST_NAME)
+
+
+def content_hash(data):
+    """
+    Tính mã băm nội dung ảnh nguồn
+
+    Args:
+        data (bytes): Bytes ảnh gốc
+
+    Returns:
+        str: Mã SHA-1 dạng hex
+    """
+    return hashlib.sha1(data).hexdigest()
+
+
+def load(output_folder):
+    """
+    Đọc manifest của thư mục đầu ra
+
+    Returns:
+        dict: {ma_nv: entry}; rỗng nếu chưa có hoặc file hỏng
+    """
+    try:
+        with open(manifest_path(output_folder), 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if data.get('version') != MANIFEST_VERSION:
+        return {}
+    return data.get('entries', {})
+
+
+def save(output_folder, entries, source=None):
+    """
+    Ghi manifest (ghi file tạm rồi đổi tên để không bị hỏng giữa chừng)
+
+    Args:
+        output_folder (str): Thư mục đầu ra
+        entries (dict): {ma_nv: entry}
+        source (str): Tên workbook nguồn
+    """
+    path = manifest_path(output_folder)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'version': MANIFEST_VERSION, 'source': source, 'entries': entries},
+                  f, ensure_ascii=False, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def make_entry(media_part, digest, options, filepath):
+    """
+    Tạo bản ghi manifest cho một file đã xuất
+
+    Args:
+        media_part (str): Tên phần media trong gói (vd: xl/media/image1.jpeg)
+        digest (str): Mã băm nội dung ảnh nguồn
+        options (str): Chuỗi mô tả tùy chọn xuất ảnh hưởng tới file đầu ra
+        filepath (str): Đường dẫn file đầu ra
+
+    Returns:
+        dict: Bản ghi manifest
+    """
+    stat = os.stat(filepath)
+    return {
+        'media': media_part,
+        'hash': digest,
+        'options': options,
+        'filename': os.path.basename(filepath),
+        'size': stat.st_size,
+        'mtime': stat.st_mtime,
+    }
+
+
+def is_current(entry, digest, options, filepath):
+    """
+    Kiểm tra file đầu ra còn khớp với manifest hay không
+
+    Args:
+        entry (dict): Bản ghi manifest cũ (có thể None)
+        digest (str): Mã băm nội dung ảnh nguồn hiện tại
+        options (str): Tùy chọn xuất hiện tại
+        filepath (str): Đường dẫn file đầu ra dự kiến
+
+    Returns:
+        bool: True nếu có thể bỏ qua hàng này
+    """
+    if not entry:
+        return False
+    if entry.get('hash') != digest or entry.get('options') != options:
+        return False
+    if entry.get('filename') != os.path.basename(filepath):
+        return False
+    try:
+        stat = os.stat(filepath)
+    except OSError:
+        return False
+    return stat.st_size == entry.get('size') and stat.st_mtime == entry.get('mtime')
+
+
+def is_safe_filename(filename):
+    """
+    Tên file trong manifest có phải một file nằm ngay trong thư mục đầu ra không
+
+    Manifest là file JSON có thể bị sửa tay: tên file tuyệt đối, có dấu phân cách thư mục,
+    ổ đĩa hoặc '..' không bao giờ do export_images ghi ra nên không được dùng để xóa file
+    """
+    if not isinstance(filename, str) or filename in ('', '.', '..'):
+        return False
+    if os.path.isabs(filename) or os.path.splitdrive(filename)[0]:
+        return False
+    return not any(sep in filename for sep in ('/', '\\', ':', os.sep, os.altsep) if sep)
+
+
+def remove_stale(output_folder, entries, seen, remove_files=False):
+    """
+    Xử lý các mã NV có trong manifest nhưng không còn trong workbook
+
+    Args:
+        output_folder (str): Thư mục đầu ra
+        entries (dict): Manifest (sẽ bị xóa các bản ghi cũ nếu remove_files)
+        seen (set): Các mã NV có trong lần chạy này
+        remove_files (bool): True để xóa file đầu ra, False chỉ đánh dấu
+            (bản ghi có tên file không hợp lệ, xem is_safe_filename, chỉ bị xóa khỏi manifest)
+
+    Returns:
+        list: Danh sách (ma_nv, filename) không còn trong workbook
+    """
+    stale = [(key, entry.get('filename')) for key, entry in sorted(entries.items()) if key not in seen]
+    if remove_files:
+        for key, filename in stale:
+            if filename and is_safe_filename(filename):
+                try:
+                    os.remove(os.path.join(output_folder, filename))
+                except FileNotFoundError:
+                    pass
+            del entries[key]
+    return stale
@@ -0,0 +1,267 @@
+"""
+Module ánh xạ ảnh vào hàng dữ liệu theo vị trí hình học
+
+Mục đích:
+    - Tìm hàng gần nhất với tâm ảnh bằng tìm kiếm nhị phân trên mảng
+      vị trí tích lũy của các hàng (thay cho quét tuyến tính mọi ô)
+    - Giữ nguyên quy tắc Pass 1 / Pass 2 và các thông báo chẩn đoán
+      "trong ô / gần trung tâm ô / trong ranh giới ô"
+    - Nhiều ảnh cùng đủ điều kiện cho một hàng: giữ ảnh phủ ô nhiều nhất, rồi ảnh có
+      tâm gần tâm ô nhất, rồi ảnh vẽ trước; các ảnh còn lại được báo 'duplicate'
+      (không phụ thuộc thứ tự vẽ trừ khi hai ảnh trùng khít nhau)
+
+Dữ liệu vào:
+    - shapes_info: danh sách dict có 'left', 'top', 'width', 'height' (point)
+    - cell_positions: {row: {'left', 'top', 'width', 'height'}} của cột ảnh
+"""
+
+from bisect import bisect_left
+
+# Dung sai (point) của Pass 1 và Pass 2
+PASS1_TOLERANCE = 20
+PASS2_TOLERANCE = 30
+
+# Số hàng tối đa xét cho một ảnh neo theo ô (chặn ảnh quá lớn hoặc nhiều hàng ẩn liên tiếp)
+MAX_ANCHOR_ROWS = 1000
+
+
+def anchor_spans_rows(from_row, to_row, bottom):
+    """Ảnh neo từ hàng from_row tới (to_row, bottom) có phủ hơn một hàng không"""
+    return to_row > from_row + 1 or (to_row == from_row + 1 and bottom > 0)
+
+
+def anchor_row(from_row, top, to_row, bottom, row_height):
+    """
+    Hàng chứa phần lớn chiều cao của ảnh neo theo ô
+
+    Ảnh lệch hàng thường bắt đầu ở cuối hàng phía trên (xdr:from) nhưng nằm chủ yếu
+    trong hàng bên dưới; lấy hàng của xdr:from sẽ ánh xạ ảnh vào sai hàng.
+
+    Args:
+        from_row (int): Hàng của điểm neo trên
+        top (float): Khoảng cách từ đầu hàng from_row tới cạnh trên ảnh
+        to_row (int): Hàng của điểm neo dưới (ảnh oneCell: bằng from_row)
+        bottom (float): Khoảng cách từ đầu hàng to_row tới cạnh dưới ảnh
+            (có thể lớn hơn chiều cao hàng với ảnh oneCell)
+        row_height (function): row -> chiều cao hàng, cùng đơn vị với top / bottom
+
+    Returns:
+        int: Hàng có phần giao với ảnh lớn nhất (bằng nhau: hàng trên)
+    """
+    end = sum(row_height(row) for row in range(from_row, to_row)) + bottom
+    best_row, best = from_row, 0.0
+    row, row_top = from_row, 0.0
+    while row_top < end and row < from_row + MAX_ANCHOR_ROWS:
+        height = row_height(row)
+        covered = min(end, row_top + height) - max(top, row_top)
+        if covered > best:
+            best_row, best = row, covered
+        row_top += height
+        row += 1
+    return best_row
+
+
+def build_row_index(cell_positions):
+    """
+    Tạo chỉ mục tìm kiếm nhị phân từ vị trí các ô
+
+    Args:
+        cell_positions (dict): {row: {'left', 'top', 'width', 'height'}}
+
+    Returns:
+        tuple: (danh sách hàng, danh sách tọa độ y tâm ô) đã sắp xếp theo y
+    """
+    rows = sorted(cell_positions, key=lambda r: (cell_positions[r]['top'], r))
+    centers = [cell_positions[r]['top'] + cell_positions[r]['height'] / 2 for r in rows]
+    return rows, centers
+
+
+def closest_row(row_index, cell_positions, center_x, center_y):
+    """
+    Tìm hàng có tâm ô gần tâm ảnh nhất (khoảng cách Euclid)
+
+    Các ô cùng nằm trong một cột nên tâm ô tăng dần theo hàng; chỉ cần
+    so sánh hai ô kề vị trí tìm được bằng bisect.
+
+    Args:
+        row_index (tuple): Kết quả của build_row_index
+        cell_positions (dict): Vị trí các ô
+        center_x (float): Tọa độ x tâm ảnh
+        center_y (float): Tọa độ y tâm ảnh
+
+    Returns:
+        tuple: (row, khoảng cách) hoặc (None, inf) nếu không có ô nào
+    """
+    rows, centers = row_index
+    if not rows:
+        return None, float('inf')
+
+    idx = bisect_left(centers, center_y)
+    best_row = None
+    min_distance = float('inf')
+    for i in (idx - 1, idx):
+        if 0 <= i < len(rows):
+            cell_info = cell_positions[rows[i]]
+            cell_center_x = cell_info['left'] + cell_info['width'] / 2
+            distance = ((center_x - cell_center_x) ** 2 + (center_y - centers[i]) ** 2) ** 0.5
+            if distance < min_distance or (distance == min_distance and rows[i] < best_row):
+                min_distance = distance
+                best_row = rows[i]
+    return best_row, min_distance
+
+
+def _within_boundary(shape_info, cell_info, tolerance):
+    """Kiểm tra ảnh nằm trong ranh giới ô (có dung sai)"""
+    return (
+        shape_info['left'] >= cell_info['left'] - tolerance and
+        shape_info['top'] >= cell_info['top'] - tolerance and
+        shape_info['left'] + shape_info['width'] <= cell_info['left'] + cell_info['width'] + tolerance and
+        shape_info['top'] + shape_info['height'] <= cell_info['top'] + cell_info['height'] + tolerance
+    )
+
+
+def overlap_area(shape_info, cell_info):
+    """Diện tích phần ảnh nằm trong ô (point²)"""
+    width = (min(shape_info['left'] + shape_info['width'], cell_info['left'] + cell_info['width']) -
+             max(shape_info['left'], cell_info['left']))
+    height = (min(shape_info['top'] + shape_info['height'], cell_info['top'] + cell_info['height']) -
+              max(shape_info['top'], cell_info['top']))
+    return max(width, 0) * max(height, 0)
+
+
+def rank_candidates(candidates, cell_info):
+    """
+    Sắp xếp các ảnh cùng đủ điều kiện cho một ô, ảnh được giữ đứng đầu
+
+    Args:
+        candidates (list): Các tuple (shape_info, khoảng cách tâm, ...) theo thứ tự vẽ
+        cell_info (dict): Vị trí ô
+
+    Returns:
+        list: Các tuple theo thứ tự: phủ ô nhiều nhất, gần tâm ô nhất, vẽ trước
+    """
+    return sorted(candidates, key=lambda c: (-overlap_area(c[0], cell_info), c[1]))
+
+
+def column_span(cell_positions):
+    """Khoảng ngang (trái, phải) của cột ảnh theo vị trí các ô"""
+    left = min(cell['left'] for cell in cell_positions.values())
+    right = max(cell['left'] + cell['width'] for cell in cell_positions.values())
+    return left, right
+
+
+def map_shapes(shapes_info, cell_positions, log, image_mapping=None, stream=None, restrict_to_column=False):
+    """
+    Ánh xạ ảnh vào hàng theo vị trí (Pass 1: tâm ảnh, Pass 2: dung sai rộng hơn)
+
+    Args:
+        shapes_info (list): Danh sách thông tin ảnh
+        cell_positions (dict): Vị trí các ô của cột ảnh
+        log (function): Hàm ghi log
+        image_mapping (dict): Ánh xạ đã có sẵn (vd: từ anchor), sẽ được bổ sung
+        stream (EventStream): Luồng sự kiện nhận kết quả ánh xạ từng ảnh
+        restrict_to_column (bool): Bỏ qua ảnh có tâm nằm ngoài cột ảnh (logo, chữ ký...)
+
+    Returns:
+        tuple: (image_mapping {row: shape_info}, danh sách ảnh không ánh xạ được
+            dạng (shape_info, closest_row, distance))
+    """
+    if image_mapping is None:
+        image_mapping = {}
+
+    def emit(shape_info, row, status, **fields):
+        """Phát sự kiện kết quả ánh xạ nếu có luồng sự kiện"""
+        if stream is not None:
+            stream.emit('mapping', row=row, picture=shape_info.get('name'), method='position',
+                        status=status, **fields)
+
+    if restrict_to_column and cell_positions:
+        # Chỉ giữ ảnh có tâm nằm trong khoảng ngang của cột ảnh (dung sai Pass 2)
+        span_left, span_right = column_span(cell_positions)
+        in_column = []
+        for shape_info in shapes_info:
+            center_x = shape_info['left'] + shape_info['width'] / 2
+            if span_left - PASS2_TOLERANCE <= center_x <= span_right + PASS2_TOLERANCE:
+                in_column.append(shape_info)
+            else:
+                log(f"  ℹ️ Bỏ qua ảnh nằm ngoài cột ảnh: {shape_info.get('name')}")
+                emit(shape_info, None, 'outside_column')
+        shapes_info = in_column
+
+    row_index = build_row_index(cell_positions)
+    unmatched_shapes = []
+
+    def resolve(row, candidates, pass_no, prefix=""):
+        """Ánh xạ ảnh được giữ vào hàng, báo các ảnh còn lại là ảnh thứ hai"""
+        if row in image_mapping:
+            # Hàng đã có ảnh (vd: ảnh ánh xạ theo anchor)
+            ranked, kept = candidates, image_mapping[row]
+        else:
+            ranked = rank_candidates(candidates, cell_positions[row])
+            kept, min_distance, condition = ranked[0]
+            image_mapping[row] = kept
+            if pass_no == 1:
+                log(f"  ✅ Ánh xạ ảnh vào hàng {row} (khoảng cách: {min_distance:.2f}, điều kiện: {condition})")
+            else:
+                log(f"  ✅ [Pass 2] Ánh xạ ảnh vào hàng {row} (điều kiện: {condition})")
+            emit(kept, row, 'mapped', condition=condition, distance=min_distance, pass_no=pass_no)
+            ranked = ranked[1:]
+        for shape_info, min_distance, _ in ranked:
+            log(f"  ⚠️ {prefix}Hàng {row} đã có ảnh {kept.get('name')}, bỏ qua ảnh {shape_info.get('name')}")
+            emit(shape_info, row, 'duplicate', distance=min_distance, pass_no=pass_no)
+        return ranked
+
+    # Bước 1: Ánh xạ dựa trên trung tâm
+    log("\n🔍 Bắt đầu ánh xạ ảnh vào các ô (Pass 1: Dựa trên trung tâm)...")
+    candidates = {}
+    for shape_info in shapes_info:
+        center_x = shape_info['left'] + shape_info['width'] / 2
+        center_y = shape_info['top'] + shape_info['height'] / 2
+        row, min_distance = closest_row(row_index, cell_positions, center_x, center_y)
+        if row is None:
+            log(f"  ❌ Không có ô nào trong cột ảnh để ánh xạ ảnh {shape_info.get('name')}")
+            emit(shape_info, None, 'unmatched', pass_no=1)
+            continue
+
+        cell_info = cell_positions[row]
+        cell_center_x = cell_info['left'] + cell_info['width'] / 2
+        cell_center_y = cell_info['top'] + cell_info['height'] / 2
+
+        # Kiểm tra các điều kiện ánh xạ
+        center_in_cell = (
+            cell_info['left'] <= center_x <= cell_info['left'] + cell_info['width'] and
+            cell_info['top'] <= center_y <= cell_info['top'] + cell_info['height']
+        )
+        near_center = (
+            abs(center_x - cell_center_x) < PASS1_TOLERANCE and
+            abs(center_y - cell_center_y) < PASS1_TOLERANCE
+        )
+        within_boundary = _within_boundary(shape_info, cell_info, PASS1_TOLERANCE)
+
+        if center_in_cell or near_center or within_boundary:
+            condition = "trong ô" if center_in_cell else "gần trung tâm ô" if near_center else "trong ranh giới ô"
+            candidates.setdefault(row, []).append((shape_info, min_distance, condition))
+        else:
+            unmatched_shapes.append((shape_info, row, min_distance))
+            log(f"  ⚠️ Ảnh gần hàng {row} nhưng không đủ điều kiện (khoảng cách: {min_distance:.2f})")
+
+    # Chọn ảnh cho từng hàng sau khi đã xét mọi ảnh (không phụ thuộc thứ tự vẽ)
+    for row, row_candidates in candidates.items():
+        resolve(row, row_candidates, 1)
+
+    # Bước 2: Ánh xạ cho các ảnh chưa được xử lý (dùng dung sai lớn hơn)
+    log("\n🔍 Bắt đầu ánh xạ bổ sung (Pass 2: Dùng dung sai rộng hơn)...")
+    still_unmatched = []
+    candidates = {}
+    for shape_info, row, min_distance in unmatched_shapes:
+        if _within_boundary(shape_info, cell_positions[row], PASS2_TOLERANCE):
+            candidates.setdefault(row, []).append((shape_info, min_distance, "trong ranh giới ô mở rộng"))
+        else:
+            log(f"  ❌ [Pass 2] Không ánh xạ được ảnh cho hàng {row}")
+            still_unmatched.append((shape_info, row, min_distance))
+            emit(shape_info, row, 'unmatched', distance=min_distance, pass_no=2)
+    for row, row_candidates in candidates.items():
+        for shape_info, min_distance, _ in resolve(row, row_candidates, 2, prefix="[Pass 2] "):
+            still_unmatched.append((shape_info, row, min_distance))
+
+    return image_mapping, still_unmatched
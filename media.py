@@ -0,0 +1,239 @@
+"""
+Module ghi ảnh đầu ra theo chính sách định dạng
+
+Mục đích:
+    - Sao chép nguyên bytes nén của ảnh gốc (JPEG/PNG) ra file mà không giải mã
+    - Chỉ dùng Pillow khi người dùng ép định dạng khác với định dạng gốc
+      hoặc bật hậu xử lý (xem postprocess.py)
+    - Ghi vào file tạm cùng thư mục rồi đổi tên (os.replace) để lỗi giữa chừng
+      hoặc nhiều lần chạy song song không để lại file ảnh ghi dở
+
+Chính sách định dạng (output_format):
+    - 'original': giữ nguyên định dạng và phần mở rộng gốc
+    - 'png': ép lưu PNG
+    - 'jpeg': ép lưu JPEG với chất lượng jpeg_quality
+"""
+
+import hashlib
+import io
+import os
+import shutil
+import uuid
+from contextlib import contextmanager
+
+import postprocess
+
+# Các chính sách định dạng đầu ra được hỗ trợ
+OUTPUT_FORMATS = ('original', 'png', 'jpeg')
+
+# Định dạng Pillow tương ứng với phần mở rộng của ảnh gốc
+PIL_FORMATS = {
+    '.png': 'PNG',
+    '.jpg': 'JPEG',
+    '.jpeg': 'JPEG',
+}
+
+# Phần mở rộng file khi ép định dạng
+FORMAT_EXTENSIONS = {
+    'png': '.png',
+    'jpeg': '.jpg',
+}
+
+# Thư mục bộ nhớ đệm mặc định cho ảnh đã chuyển đổi (dùng chung giữa các lần chạy)
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.anhthe_cache')
+
+
+def temp_path(filepath):
+    """Tên file tạm duy nhất cùng thư mục với filepath (vd: '.1001_.jpeg.<uuid>.tmp')"""
+    folder, name = os.path.split(filepath)
+    return os.path.join(folder, f".{name}.{uuid.uuid4().hex}.tmp")
+
+
+@contextmanager
+def atomic_path(filepath):
+    """
+    Cấp đường dẫn file tạm cùng thư mục; khi ghi xong thì đổi tên thành filepath,
+    khi lỗi thì xóa file tạm
+
+    Args:
+        filepath (str): Đường dẫn file đích
+
+    Yields:
+        str: Đường dẫn file tạm (chưa tồn tại, tên duy nhất)
+    """
+    tmp_path = temp_path(filepath)
+    try:
+        yield tmp_path
+        os.replace(tmp_path, filepath)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def output_extension(media_ext, output_format='original', processing=None):
+    """
+    Xác định phần mở rộng file đầu ra
+
+    Args:
+        media_ext (str): Phần mở rộng của ảnh gốc (vd: '.jpeg')
+        output_format (str): Chính sách định dạng
+        processing (dict): Tùy chọn hậu xử lý (xem postprocess.make_options)
+
+    Returns:
+        str: Phần mở rộng file đầu ra
+    """
+    if output_format == 'original':
+        ext = media_ext.lower() or '.png'
+        if processing and ext not in PIL_FORMATS:
+            # Ảnh hậu xử lý từ định dạng khác JPEG/PNG được lưu PNG
+            return '.png'
+        return ext
+    return FORMAT_EXTENSIONS[output_format]
+
+
+def needs_transcode(media_ext, output_format='original', processing=None):
+    """
+    Kiểm tra ảnh có cần giải mã/mã hóa lại hay không
+
+    Args:
+        media_ext (str): Phần mở rộng của ảnh gốc
+        output_format (str): Chính sách định dạng
+        processing (dict): Tùy chọn hậu xử lý
+
+    Returns:
+        bool: True nếu phải đi qua Pillow
+    """
+    if processing:
+        return True
+    if output_format == 'original':
+        return False
+    return PIL_FORMATS.get(media_ext.lower()) != output_format.upper()
+
+
+def save_image(image, filepath, output_format='png', jpeg_quality=90, processing=None):
+    """
+    Lưu một ảnh Pillow đã giải mã theo định dạng yêu cầu
+
+    Args:
+        image (PIL.Image.Image): Ảnh cần lưu
+        filepath (str|file): Đường dẫn file đầu ra hoặc luồng ghi (vd: io.BytesIO)
+        output_format (str): 'png' hoặc 'jpeg' ('original' được coi là 'png')
+        jpeg_quality (int): Chất lượng JPEG (1-95)
+        processing (dict): Tùy chọn hậu xử lý (DPI, EXIF) áp dụng khi lưu
+    """
+    extra = postprocess.save_options(image, processing)
+    if output_format == 'jpeg':
+        # JPEG không hỗ trợ kênh alpha / bảng màu
+        if image.mode not in ('RGB', 'L', 'CMYK'):
+            image = image.convert('RGB')
+        params = dict(format='JPEG', quality=jpeg_quality, optimize=True, **extra)
+    else:
+        if image.mode == 'CMYK':
+            # PNG không hỗ trợ CMYK
+            image = image.convert('RGB')
+        params = dict(format='PNG', **extra)
+    if hasattr(filepath, 'write'):
+        image.save(filepath, **params)
+        return
+    with atomic_path(filepath) as tmp_path:
+        image.save(tmp_path, **params)
+
+
+def encode_media(data, media_ext, output_format='original', jpeg_quality=90, processing=None):
+    """
+    Tạo bytes ảnh đầu ra: giữ nguyên bytes gốc nếu không cần chuyển đổi hay hậu xử lý
+
+    Args:
+        data (bytes): Bytes ảnh gốc
+        media_ext (str): Phần mở rộng của ảnh gốc
+        output_format (str): Chính sách định dạng
+        jpeg_quality (int): Chất lượng JPEG khi ép định dạng JPEG
+        processing (dict): Tùy chọn hậu xử lý (xem postprocess.make_options)
+
+    Returns:
+        tuple: (bytes đầu ra, True nếu đã chuyển đổi qua Pillow)
+    """
+    if not needs_transcode(media_ext, output_format, processing):
+        # Dùng thẳng luồng nén gốc, không giải mã
+        return data, False
+
+    if output_format == 'original':
+        # Hậu xử lý nhưng giữ định dạng gốc
+        output_format = 'jpeg' if PIL_FORMATS.get(media_ext.lower()) == 'JPEG' else 'png'
+
+    # Chỉ nạp Pillow khi thực sự cần chuyển đổi
+    with io.BytesIO(data) as src, postprocess.open_image(src, processing) as image:
+        with io.BytesIO() as dst:
+            save_image(postprocess.apply(image, processing), dst, output_format, jpeg_quality, processing)
+            return dst.getvalue(), True
+
+
+def write_bytes(data, filepath):
+    """Ghi bytes ra file (qua file tạm, xem atomic_path)"""
+    with atomic_path(filepath) as tmp_path:
+        with open(tmp_path, 'wb') as dst:
+            dst.write(data)
+
+
+def describe_bytes(data):
+    """
+    Thông tin của ảnh đầu ra cho báo cáo / file chỉ mục
+
+    Args:
+        data (bytes): Bytes ảnh đầu ra
+
+    Returns:
+        dict: {'size', 'width', 'height', 'sha1'}; width/height là None nếu Pillow
+            không đọc được phần đầu ảnh (chỉ đọc phần đầu, không giải mã)
+    """
+    width = height = None
+    try:
+        from PIL import Image
+
+        with Image.open(io.BytesIO(data)) as image:
+            width, height = image.size
+    except Exception:
+        pass
+    return {'size': len(data), 'width': width, 'height': height, 'sha1': hashlib.sha1(data).hexdigest()}
+
+
+def link_or_copy(src, dst, link_mode='hardlink'):
+    """
+    Tạo file dst có cùng nội dung với src mà không mã hóa lại
+
+    Args:
+        src (str): File nguồn đã xuất
+        dst (str): File đích
+        link_mode (str): 'hardlink' (thử tạo liên kết cứng, lỗi thì sao chép) hoặc 'copy'
+    """
+    if os.path.exists(dst) and os.path.samefile(src, dst):
+        return
+    # Tạo file tạm rồi đổi tên để không để lại file dở dang
+    with atomic_path(dst) as tmp_path:
+        if link_mode == 'hardlink':
+            try:
+                os.link(src, tmp_path)
+            except OSError:
+                shutil.copyfile(src, tmp_path)
+        else:
+            shutil.copyfile(src, tmp_path)
+
+
+def cache_path(cache_dir, digest, options, ext):
+    """
+    Đường dẫn ảnh đã mã hóa trong bộ nhớ đệm trên đĩa
+
+    Args:
+        cache_dir (str): Thư mục bộ nhớ đệm
+        digest (str): Mã băm nội dung ảnh nguồn
+        options (str): Chuỗi mô tả tùy chọn xuất (vd: 'jpeg:90')
+        ext (str): Phần mở rộng file đầu ra
+
+    Returns:
+        str: Đường dẫn file trong bộ nhớ đệm
+    """
+    safe_options = options.replace(':', '_')
+    return os.path.join(cache_dir, digest[:2], f"{digest}_{safe_options}{ext}")
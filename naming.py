@@ -0,0 +1,146 @@
+"""
+Module đặt tên file ảnh đầu ra theo mẫu
+
+Mục đích:
+    - Tạo tên file theo mẫu, vd: '{ma_nv}_{ho_ten_slug}.{ext}' -> '1001_Nguyen_Van_An.jpg'
+    - Bỏ dấu tiếng Việt cho tên file (ho_ten_slug)
+    - Phát hiện tên file trùng trước khi xuất (so sánh không phân biệt hoa thường
+      như Windows/SMB) và xử lý theo chính sách: thêm hậu tố hoặc bỏ qua
+
+Các trường dùng được trong mẫu:
+    'ma_nv', 'ho_ten', 'ho_ten_slug', 'row', 'ext'
+"""
+
+import re
+import string
+
+import layout
+
+# Mẫu mặc định (tên file của các phiên bản trước: '[Mã NV]_.png')
+DEFAULT_TEMPLATE = '{ma_nv}_.{ext}'
+
+# Các trường được hỗ trợ trong mẫu
+TEMPLATE_FIELDS = ('ma_nv', 'ho_ten', 'ho_ten_slug', 'row', 'ext')
+
+# Chính sách khi tên file trùng: 'suffix' (thêm -2, -3...) hoặc 'skip' (giữ hàng đầu tiên)
+COLLISION_POLICIES = ('suffix', 'skip')
+
+
+def clean_filename(name):
+    """
+    Làm sạch chuỗi để tạo tên file an toàn
+
+    Args:
+        name (str/int): Giá trị đầu vào có thể là chuỗi hoặc số
+
+    Returns:
+        str: Tên file đã được làm sạch
+    """
+    # Loại bỏ các ký tự đặc biệt không hợp lệ trong tên file
+    cleaned = re.sub(r'[\\/*?:"<>|]', '', str(name)).strip()
+    return cleaned if cleaned else "Unknown"
+
+
+def slugify(text):
+    """
+    Chuỗi không dấu, chỉ gồm chữ, số và '_' (vd: 'Nguyễn Văn An' -> 'Nguyen_Van_An')
+    """
+    slug = re.sub(r'[^A-Za-z0-9]+', '_', layout.strip_diacritics(text)).strip('_')
+    return slug if slug else "Unknown"
+
+
+def validate_template(template):
+    """
+    Kiểm tra mẫu tên file
+
+    Args:
+        template (str): Mẫu tên file
+
+    Raises:
+        ValueError: Mẫu có trường không hỗ trợ, thiếu {ext} hoặc chứa thư mục
+    """
+    if not template or '/' in template or '\\' in template:
+        raise ValueError(f"Mẫu tên file không hợp lệ: {template}")
+    try:
+        fields = [field for _, field, _, _ in string.Formatter().parse(template) if field is not None]
+    except ValueError as e:
+        raise ValueError(f"Mẫu tên file không hợp lệ: {template} ({str(e)})")
+    for field in fields:
+        if field not in TEMPLATE_FIELDS:
+            raise ValueError(f"Trường không hỗ trợ trong mẫu tên file: {{{field}}} "
+                             f"(dùng được: {', '.join(TEMPLATE_FIELDS)})")
+    if 'ext' not in fields:
+        raise ValueError(f"Mẫu tên file phải có {{ext}}: {template}")
+
+
+def render(template, ma_nv, ho_ten, row, ext):
+    """
+    Tạo tên file từ mẫu
+
+    Args:
+        template (str): Mẫu tên file (đã kiểm tra bằng validate_template)
+        ma_nv (str|int): Mã nhân viên
+        ho_ten (str): Họ tên
+        row (int): Số hàng
+        ext (str): Phần mở rộng, có hoặc không có dấu chấm (vd: '.jpeg')
+
+    Returns:
+        str: Tên file
+    """
+    return template.format(
+        ma_nv=clean_filename(ma_nv),
+        ho_ten=clean_filename(ho_ten),
+        ho_ten_slug=slugify(ho_ten),
+        row=row,
+        ext=ext.lstrip('.'),
+    )
+
+
+def _with_suffix(filename, number):
+    """Thêm hậu tố trước phần mở rộng (vd: 'a.jpg', 2 -> 'a-2.jpg')"""
+    stem, dot, ext = filename.rpartition('.')
+    return f"{stem}-{number}{dot}{ext}" if stem else f"{filename}-{number}"
+
+
+def plan_filenames(rows, template=DEFAULT_TEMPLATE, on_collision='suffix'):
+    """
+    Đặt tên file cho tất cả các hàng trước khi xuất và phát hiện tên trùng
+
+    Args:
+        rows (iterable): (row, ma_nv, ho_ten, ext) của các hàng sẽ xuất ảnh
+        template (str): Mẫu tên file
+        on_collision (str): 'suffix' hoặc 'skip'
+
+    Returns:
+        tuple: ({row: (key, filename hoặc None nếu bỏ qua)},
+            danh sách tên trùng dạng (filename, [các hàng]))
+            key là khóa manifest: mã NV, thêm '~n' cho lần xuất hiện thứ n của cùng mã NV
+    """
+    planned = {}
+    groups = {}
+    key_counts = {}
+    for row, ma_nv, ho_ten, ext in rows:
+        filename = render(template, ma_nv, ho_ten, row, ext)
+        count = key_counts[str(ma_nv)] = key_counts.get(str(ma_nv), 0) + 1
+        key = str(ma_nv) if count == 1 else f"{ma_nv}~{count}"
+        planned[row] = (key, filename)
+        groups.setdefault(filename.casefold(), []).append(row)
+
+    collisions = []
+    used = set(groups)
+    for folded, group in groups.items():
+        if len(group) < 2:
+            continue
+        collisions.append((planned[group[0]][1], group))
+        for row in group[1:]:
+            key, filename = planned[row]
+            if on_collision == 'skip':
+                planned[row] = (key, None)
+                continue
+            number = 2
+            while _with_suffix(filename, number).casefold() in used:
+                number += 1
+            renamed = _with_suffix(filename, number)
+            used.add(renamed.casefold())
+            planned[row] = (key, renamed)
+    return planned, collisions
@@ -0,0 +1,710 @@
+"""
+Module đọc trực tiếp gói OOXML (.xlsx) để trích xuất ảnh thẻ
+
+Mục đích:
+    - Mở file .xlsx như một file zip, không cần Excel hay COM
+    - Đọc giá trị các ô mã nhân viên / họ tên từ XML của sheet
+    - Phân tích các anchor trong xl/drawings/drawingN.xml và file _rels
+    - Trả về đúng phần dữ liệu ảnh gốc trong xl/media/* để ghi thẳng ra file
+
+Các chức năng chính:
+    1. Xác định sheet đang hoạt động và file drawing tương ứng
+    2. Đọc bảng giá trị ô (shared strings, inline string, số) theo luồng bằng
+       iterparse, giải phóng từng hàng sau khi đọc để bộ nhớ không phụ thuộc số hàng
+    3. Liệt kê ảnh cùng vị trí anchor (hàng, cột) và phần media
+    4. Liệt kê ảnh đặt trong ô ("Place in Cell"): ảnh được lưu dưới dạng giá trị
+       rich value (xl/metadata.xml, xl/richData/*) thay vì hình trong drawing,
+       ô chứa ảnh cho biết luôn hàng của ảnh
+"""
+
+import posixpath
+import re
+import zipfile
+import xml.etree.ElementTree as ET
+
+# Namespace dùng trong các phần XML của gói
+NS = {
+    'main': 'http://schemas.openxmlformats.org/spreadsheetml/2006/main',
+    'r': 'http://schemas.openxmlformats.org/officeDocument/2006/relationships',
+    'rel': 'http://schemas.openxmlformats.org/package/2006/relationships',
+    'xdr': 'http://schemas.openxmlformats.org/drawingml/2006/spreadsheetDrawing',
+    'a': 'http://schemas.openxmlformats.org/drawingml/2006/main',
+    'xlrd': 'http://schemas.microsoft.com/office/spreadsheetml/2017/richdata',
+    'rvrel': 'http://schemas.microsoft.com/office/spreadsheetml/2022/richvaluerel',
+}
+
+REL_DRAWING = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/drawing'
+
+# Khối mc:AlternateContent (Markup Compatibility): chỉ đọc một nhánh, mc:Choice khi mọi
+# namespace trong thuộc tính Requires đều được hỗ trợ (các namespace trong NS), nếu không
+# thì mc:Fallback
+NS_MC = 'http://schemas.openxmlformats.org/markup-compatibility/2006'
+ALTERNATE_CONTENT = f'{{{NS_MC}}}AlternateContent'
+SUPPORTED_NAMESPACES = frozenset(NS.values())
+
+# Các phần của ảnh đặt trong ô: tìm theo quan hệ của workbook (đuôi của kiểu quan hệ),
+# không có quan hệ thì dùng đường dẫn mặc định của Excel
+RICH_VALUE_PARTS = {
+    'metadata': ('/sheetMetadata', 'xl/metadata.xml'),
+    'values': ('/rdRichValue', 'xl/richData/rdrichvalue.xml'),
+    'structures': ('/rdRichValueStructure', 'xl/richData/rdrichvaluestructure.xml'),
+    'rels': ('/richValueRel', 'xl/richData/richValueRel.xml'),
+}
+
+# Loại metadata và khóa của rich value chứa ảnh trong ô
+RICH_VALUE_TYPE = 'XLRICHVALUE'
+RICH_IMAGE_KEY = '_rvRel:LocalImageIdentifier'
+RICH_TEXT_KEY = 'Text'
+
+# Đơn vị EMU trên mỗi point
+EMU_PER_POINT = 12700
+
+# Giá trị mặc định của Excel khi sheet không khai báo
+DEFAULT_ROW_HEIGHT = 15.0
+DEFAULT_COL_WIDTH = 9.140625  # 8.43 ký tự hiển thị + phần đệm = 64 pixel
+MAX_DIGIT_WIDTH = 7  # pixel, font Calibri 11
+
+# Kiểu anchor trong drawing
+ANCHOR_TAGS = {
+    f"{{{NS['xdr']}}}twoCellAnchor": 'twoCell',
+    f"{{{NS['xdr']}}}oneCellAnchor": 'oneCell',
+    f"{{{NS['xdr']}}}absoluteAnchor": 'absolute',
+}
+
+
+def open_package(file_path):
+    """Mở gói .xlsx để đọc (dùng với with, đối tượng trả về có read(part))"""
+    return zipfile.ZipFile(file_path)
+
+
+def is_package(file_path):
+    """
+    Kiểm tra file có phải gói OOXML (zip) hay không
+
+    Args:
+        file_path (str): Đường dẫn file Excel
+
+    Returns:
+        bool: True nếu file là gói zip (.xlsx/.xlsm)
+    """
+    return zipfile.is_zipfile(file_path)
+
+
+def _rels_path(part):
+    """Trả về đường dẫn file _rels của một phần trong gói"""
+    folder, name = posixpath.split(part)
+    return posixpath.join(folder, '_rels', name + '.rels')
+
+
+def _read_rels(zf, part):
+    """
+    Đọc quan hệ của một phần trong gói
+
+    Returns:
+        dict: {rId: (type, đường dẫn đích đã chuẩn hóa)}
+    """
+    rels = {}
+    try:
+        root = ET.fromstring(zf.read(_rels_path(part)))
+    except KeyError:
+        return rels
+    folder = posixpath.dirname(part)
+    for rel in root.findall('rel:Relationship', NS):
+        if rel.get('TargetMode') == 'External':
+            continue
+        target = rel.get('Target', '')
+        if target.startswith('/'):
+            target = target.lstrip('/')
+        else:
+            target = posixpath.normpath(posixpath.join(folder, target))
+        rels[rel.get('Id')] = (rel.get('Type'), target)
+    return rels
+
+
+def column_index(ref):
+    """
+    Chuyển tham chiếu ô (vd: "C12") thành (hàng, cột) đánh số từ 1
+
+    Args:
+        ref (str): Tham chiếu ô dạng A1
+
+    Returns:
+        tuple: (row, col)
+    """
+    match = re.match(r'([A-Z]+)(\d+)', ref)
+    letters, digits = match.groups()
+    col = 0
+    for ch in letters:
+        col = col * 26 + (ord(ch) - 64)
+    return int(digits), col
+
+
+def sheet_names(zf):
+    """
+    Liệt kê tên các sheet theo thứ tự trong workbook
+
+    Args:
+        zf (ZipFile): Gói đã mở
+
+    Returns:
+        list: Danh sách tên sheet
+    """
+    root = ET.fromstring(zf.read('xl/workbook.xml'))
+    return [sheet.get('name') for sheet in root.findall('main:sheets/main:sheet', NS)]
+
+
+def resolve_sheet(zf, sheet_name=None):
+    """
+    Xác định phần XML của sheet cần xử lý
+
+    Args:
+        zf (ZipFile): Gói đã mở
+        sheet_name (str): Tên sheet, None để lấy sheet đang hoạt động
+
+    Returns:
+        tuple: (tên sheet, đường dẫn phần XML của sheet)
+    """
+    workbook_part = 'xl/workbook.xml'
+    root = ET.fromstring(zf.read(workbook_part))
+    rels = _read_rels(zf, workbook_part)
+
+    sheets = root.findall('main:sheets/main:sheet', NS)
+    if not sheets:
+        raise ValueError("Workbook không có sheet nào")
+
+    if sheet_name is None:
+        # Giống wb.ActiveSheet: lấy sheet theo activeTab của workbookView
+        view = root.find('main:bookViews/main:workbookView', NS)
+        active = int(view.get('activeTab', 0)) if view is not None else 0
+        sheet = sheets[min(active, len(sheets) - 1)]
+    else:
+        matches = [s for s in sheets if s.get('name') == sheet_name]
+        if not matches:
+            raise ValueError(f"Không tìm thấy sheet '{sheet_name}'")
+        sheet = matches[0]
+
+    rid = sheet.get(f"{{{NS['r']}}}id")
+    return sheet.get('name'), rels[rid][1]
+
+
+def _tag(prefix, name):
+    """Tên thẻ đầy đủ kèm namespace (dùng cho iterparse)"""
+    return f"{{{NS[prefix]}}}{name}"
+
+
+def read_shared_strings(zf):
+    """
+    Đọc bảng chuỗi dùng chung (xl/sharedStrings.xml) theo kiểu luồng
+
+    Returns:
+        list: Danh sách chuỗi theo chỉ số
+    """
+    try:
+        src = zf.open('xl/sharedStrings.xml')
+    except KeyError:
+        return []
+    strings = []
+    si_tag = _tag('main', 'si')
+    t_tag = _tag('main', 't')
+    with src:
+        root = None
+        for event, elem in ET.iterparse(src, events=('start', 'end')):
+            if event == 'start':
+                if root is None:
+                    root = elem
+                continue
+            if elem.tag == si_tag:
+                # Ghép các đoạn text (kể cả rich text)
+                strings.append(''.join(t.text or '' for t in elem.iter(t_tag)))
+                root.remove(elem)
+    return strings
+
+
+def _cell_value(cell, shared_strings):
+    """Chuyển phần tử <c> thành giá trị Python giống Range.Value của COM"""
+    cell_type = cell.get('t', 'n')
+    if cell_type == 'inlineStr':
+        return ''.join(t.text or '' for t in cell.iter(f"{{{NS['main']}}}t"))
+    v = cell.find('main:v', NS)
+    if v is None or v.text is None:
+        return None
+    if cell_type == 's':
+        return shared_strings[int(v.text)]
+    if cell_type in ('str', 'e'):
+        return v.text
+    if cell_type == 'b':
+        return v.text == '1'
+    # Số: COM luôn trả về float
+    try:
+        return float(v.text)
+    except ValueError:
+        return v.text
+
+
+def read_dimension(zf, sheet_part):
+    """
+    Đọc hàng cuối theo thẻ <dimension> ở đầu sheet (không đọc phần dữ liệu)
+
+    Returns:
+        int: Hàng cuối khai báo trong dimension, None nếu không có
+    """
+    dimension_tag = _tag('main', 'dimension')
+    sheet_data_tag = _tag('main', 'sheetData')
+    with zf.open(sheet_part) as src:
+        for event, elem in ET.iterparse(src, events=('start',)):
+            if elem.tag == dimension_tag:
+                ref = elem.get('ref', '').split(':')[-1]
+                if re.match(r'[A-Z]+\d+$', ref):
+                    return column_index(ref)[0]
+                return None
+            if elem.tag == sheet_data_tag:
+                return None
+    return None
+
+
+def iter_rows(zf, sheet_part, columns=None, shared_strings=None):
+    """
+    Duyệt các hàng của sheet theo kiểu luồng (iterparse), giải phóng từng hàng sau khi đọc
+
+    Args:
+        zf (ZipFile): Gói đã mở
+        sheet_part (str): Đường dẫn phần XML của sheet
+        columns (tuple): Các cột cần đọc giá trị (None: không đọc giá trị ô)
+        shared_strings (list): Bảng chuỗi dùng chung (None: tự đọc)
+
+    Yields:
+        tuple: (row, {col: value}, thuộc tính của thẻ <row>)
+    """
+    if columns and shared_strings is None:
+        shared_strings = read_shared_strings(zf)
+    row_tag = _tag('main', 'row')
+    cell_tag = _tag('main', 'c')
+    sheet_data_tag = _tag('main', 'sheetData')
+    with zf.open(sheet_part) as src:
+        sheet_data = None
+        row_number = 0
+        for event, elem in ET.iterparse(src, events=('start', 'end')):
+            if event == 'start':
+                if elem.tag == sheet_data_tag:
+                    sheet_data = elem
+                continue
+            if elem.tag == row_tag:
+                row_number = int(elem.get('r')) if elem.get('r') else row_number + 1
+                values = {}
+                if columns:
+                    col = 0
+                    for cell in elem.iter(cell_tag):
+                        ref = cell.get('r')
+                        col = column_index(ref)[1] if ref else col + 1
+                        if col not in columns:
+                            continue
+                        value = _cell_value(cell, shared_strings)
+                        if value is not None and value != '':
+                            values[col] = value
+                yield row_number, values, dict(elem.attrib)
+                # Giải phóng hàng đã đọc để bộ nhớ không tăng theo số hàng
+                elem.clear()
+                if sheet_data is not None:
+                    sheet_data.remove(elem)
+            elif elem.tag == sheet_data_tag:
+                break
+
+
+def read_header_rows(zf, sheet_part, last_row, last_column, shared_strings=None):
+    """
+    Đọc giá trị các hàng đầu sheet (dùng để tự nhận diện tiêu đề)
+
+    Args:
+        zf (ZipFile): Gói đã mở
+        sheet_part (str): Đường dẫn phần XML của sheet
+        last_row (int): Hàng cuối cần đọc
+        last_column (int): Cột cuối cần đọc
+        shared_strings (list): Bảng chuỗi dùng chung (None: tự đọc)
+
+    Returns:
+        list: (row, {col: value}) của các hàng từ 1 đến last_row
+    """
+    rows = []
+    for row, values, _ in iter_rows(zf, sheet_part, set(range(1, last_column + 1)), shared_strings):
+        if row > last_row:
+            break
+        rows.append((row, values))
+    return rows
+
+
+def iter_data_rows(zf, sheet_part, columns=(1, 2), first_row=2, key_column=1, shared_strings=None):
+    """
+    Duyệt các hàng dữ liệu từ first_row đến hàng cuối có giá trị ở key_column
+
+    Tương đương vòng range(first_row, last_row + 1) với last_row = End(xlUp) của cột mã NV,
+    nhưng không cần đọc hết sheet trước: hàng không có trong XML được trả về
+    với giá trị rỗng, các hàng sau hàng cuối có mã NV bị bỏ qua.
+
+    Yields:
+        tuple: (row, {col: value})
+    """
+    next_row = first_row
+    for row, values, _ in iter_rows(zf, sheet_part, columns, shared_strings):
+        if row < first_row or key_column not in values:
+            continue
+        # Các hàng trống phía trước (chỉ trả về khi chắc chắn còn dữ liệu phía sau)
+        for gap in range(next_row, row):
+            yield gap, {}
+        yield row, values
+        next_row = row + 1
+
+
+def _anchor_marker(anchor, tag):
+    """Đọc xdr:from / xdr:to thành (hàng, cột) đánh số từ 1"""
+    marker = anchor.find(f'xdr:{tag}', NS)
+    if marker is None:
+        return None
+    return (int(marker.findtext('xdr:row', '0', NS)) + 1,
+            int(marker.findtext('xdr:col', '0', NS)) + 1)
+
+
+def _alternate_branch(alternate, namespaces):
+    """
+    Chọn nhánh của một khối mc:AlternateContent
+
+    Args:
+        alternate (Element): Thẻ mc:AlternateContent
+        namespaces (dict): Tiền tố -> namespace đã khai báo trong phần XML
+
+    Returns:
+        Element: mc:Choice đầu tiên được hỗ trợ, nếu không có thì mc:Fallback (không có
+            Fallback thì dùng mc:Choice đầu tiên), None nếu khối rỗng
+    """
+    choices = alternate.findall(f'{{{NS_MC}}}Choice')
+    for choice in choices:
+        required = choice.get('Requires', '').split()
+        if all(namespaces.get(prefix) in SUPPORTED_NAMESPACES for prefix in required):
+            return choice
+    fallback = alternate.find(f'{{{NS_MC}}}Fallback')
+    if fallback is not None:
+        return fallback
+    return choices[0] if choices else None
+
+
+def _resolve_alternates(elem, namespaces):
+    """Thay các khối mc:AlternateContent bên trong elem bằng nội dung nhánh được chọn"""
+    children = []
+    pending = list(elem)
+    while pending:
+        child = pending.pop(0)
+        if child.tag == ALTERNATE_CONTENT:
+            branch = _alternate_branch(child, namespaces)
+            pending[:0] = list(branch) if branch is not None else []
+        else:
+            children.append(child)
+    elem[:] = children
+    for child in children:
+        _resolve_alternates(child, namespaces)
+
+
+def _anchor_pictures(anchor, anchor_type, drawing_rels, namespaces=None):
+    """Lấy các ảnh trong một anchor (ảnh có thể nằm trực tiếp hoặc trong nhóm grpSp)"""
+    _resolve_alternates(anchor, namespaces or {})
+    pictures = []
+    for pic in anchor.iter(_tag('xdr', 'pic')):
+        blip = pic.find('xdr:blipFill/a:blip', NS)
+        if blip is None:
+            continue
+        rid = blip.get(f"{{{NS['r']}}}embed")
+        if rid not in drawing_rels:
+            continue
+        c_nv_pr = pic.find('xdr:nvPicPr/xdr:cNvPr', NS)
+        picture = {
+            'name': c_nv_pr.get('name') if c_nv_pr is not None else rid,
+            'media': drawing_rels[rid][1],
+            'anchor': anchor_type,
+            'from': _anchor_marker(anchor, 'from'),
+            'to': _anchor_marker(anchor, 'to'),
+        }
+        if anchor_type == 'absolute':
+            picture.update(_absolute_geometry(anchor))
+        else:
+            picture['offsets'] = _anchor_offsets(anchor, anchor_type)
+            picture['offset_unit'] = 'point'
+        pictures.append(picture)
+    return pictures
+
+
+def iter_pictures(zf, sheet_part):
+    """
+    Duyệt các ảnh trong drawing của sheet theo kiểu luồng, sau đó là các ảnh đặt trong ô
+
+    Args:
+        zf (ZipFile): Gói đã mở
+        sheet_part (str): Đường dẫn phần XML của sheet
+
+    Yields:
+        dict: 'name', 'media', 'anchor', 'from', 'to'; ảnh neo theo ô có thêm 'offsets'
+            (xem _anchor_offsets) và 'offset_unit' ('point'); ảnh dùng anchor tuyệt đối
+            có thêm 'left', 'top', 'width', 'height' (point); ảnh đặt trong ô có
+            anchor 'cell' và 'from' = 'to' = ô chứa ảnh
+    """
+    for rel_type, drawing_part in _read_rels(zf, sheet_part).values():
+        if rel_type != REL_DRAWING:
+            continue
+        drawing_rels = _read_rels(zf, drawing_part)
+        with zf.open(drawing_part) as src:
+            root = None
+            namespaces = {}
+            depth = 0
+            # Số khối mc:AlternateContent đang mở: anchor bên trong được đọc khi khối đóng
+            alternate_depth = 0
+            for event, elem in ET.iterparse(src, events=('start-ns', 'start', 'end')):
+                if event == 'start-ns':
+                    prefix, uri = elem
+                    namespaces[prefix] = uri
+                    continue
+                if event == 'start':
+                    depth += 1
+                    if root is None:
+                        root = elem
+                    elif elem.tag == ALTERNATE_CONTENT:
+                        alternate_depth += 1
+                    continue
+                depth -= 1
+                if elem.tag == ALTERNATE_CONTENT:
+                    alternate_depth -= 1
+                    if alternate_depth == 0:
+                        # Chỉ đọc anchor trong nhánh được chọn để mỗi ảnh được lấy một lần
+                        holder = ET.Element('holder')
+                        holder.append(elem)
+                        _resolve_alternates(holder, namespaces)
+                        for anchor in holder:
+                            anchor_type = ANCHOR_TAGS.get(anchor.tag)
+                            if anchor_type is not None:
+                                yield from _anchor_pictures(anchor, anchor_type, drawing_rels, namespaces)
+                elif alternate_depth == 0:
+                    anchor_type = ANCHOR_TAGS.get(elem.tag)
+                    if anchor_type is not None:
+                        yield from _anchor_pictures(elem, anchor_type, drawing_rels, namespaces)
+                # Giải phóng thẻ con trực tiếp của gốc đã đọc xong (anchor hoặc khối AlternateContent)
+                if depth == 1:
+                    root.remove(elem)
+    yield from iter_cell_pictures(zf, sheet_part)
+
+
+def read_pictures(zf, sheet_part):
+    """
+    Liệt kê các ảnh trong drawing của sheet
+
+    Returns:
+        list: Danh sách dict như iter_pictures
+    """
+    return list(iter_pictures(zf, sheet_part))
+
+
+def _rich_value_parts(zf):
+    """Đường dẫn các phần rich value của workbook (None nếu gói không có phần đó)"""
+    names = set(zf.namelist())
+    rels = _read_rels(zf, 'xl/workbook.xml')
+    parts = {}
+    for key, (rel_suffix, default) in RICH_VALUE_PARTS.items():
+        part = next((target for rel_type, target in rels.values() if rel_type.endswith(rel_suffix)), default)
+        parts[key] = part if part in names else None
+    return parts
+
+
+def read_rich_images(zf):
+    """
+    Đọc bảng ảnh đặt trong ô của workbook
+
+    Chuỗi tham chiếu: thuộc tính vm của ô -> valueMetadata (xl/metadata.xml)
+    -> futureMetadata XLRICHVALUE (xlrd:rvb) -> rich value (rdrichvalue.xml,
+    khóa theo cấu trúc trong rdrichvaluestructure.xml) -> richValueRel.xml -> xl/media/*
+
+    Returns:
+        dict: {vm (đánh số từ 1): (phần media, tên ảnh)}; rỗng nếu workbook không có ảnh trong ô
+    """
+    parts = _rich_value_parts(zf)
+    if None in parts.values():
+        return {}
+
+    # Ảnh theo chỉ số quan hệ trong richValueRel.xml
+    rel_targets = _read_rels(zf, parts['rels'])
+    rel_root = ET.fromstring(zf.read(parts['rels']))
+    images = [rel_targets.get(rel.get(f"{{{NS['r']}}}id"), (None, None))[1]
+              for rel in rel_root.findall('rvrel:rel', NS)]
+
+    # Tên các khóa của từng cấu trúc rich value
+    structure_root = ET.fromstring(zf.read(parts['structures']))
+    structures = [[key.get('n') for key in structure.findall('xlrd:k', NS)]
+                  for structure in structure_root.findall('xlrd:s', NS)]
+
+    # Rich value: (phần media, tên ảnh) nếu là ảnh cục bộ, None nếu là loại khác
+    values = []
+    value_root = ET.fromstring(zf.read(parts['values']))
+    for rv in value_root.findall('xlrd:rv', NS):
+        keys = structures[int(rv.get('s', 0))]
+        fields = dict(zip(keys, (v.text for v in rv.findall('xlrd:v', NS))))
+        image = fields.get(RICH_IMAGE_KEY)
+        media = images[int(image)] if image is not None and int(image) < len(images) else None
+        values.append((media, fields.get(RICH_TEXT_KEY) or posixpath.basename(media)) if media else None)
+
+    # metadata.xml: vm -> (loại metadata, chỉ số trong futureMetadata) -> rich value
+    metadata_root = ET.fromstring(zf.read(parts['metadata']))
+    types = [t.get('name') for t in metadata_root.findall('main:metadataTypes/main:metadataType', NS)]
+    future = {}
+    for block in metadata_root.findall('main:futureMetadata', NS):
+        future[block.get('name')] = [bk.find('.//xlrd:rvb', NS) for bk in block.findall('main:bk', NS)]
+    rich_blocks = future.get(RICH_VALUE_TYPE, [])
+
+    cell_images = {}
+    for vm, bk in enumerate(metadata_root.findall('main:valueMetadata/main:bk', NS), start=1):
+        rc = bk.find('main:rc', NS)
+        if rc is None or types[int(rc.get('t')) - 1] != RICH_VALUE_TYPE:
+            continue
+        index = int(rc.get('v'))
+        rvb = rich_blocks[index] if index < len(rich_blocks) else None
+        if rvb is None or int(rvb.get('i')) >= len(values):
+            continue
+        if values[int(rvb.get('i'))] is not None:
+            cell_images[vm] = values[int(rvb.get('i'))]
+    return cell_images
+
+
+def iter_cell_pictures(zf, sheet_part, cell_images=None):
+    """
+    Duyệt các ảnh đặt trong ô của sheet (ô có thuộc tính vm trỏ tới ảnh)
+
+    Args:
+        zf (ZipFile): Gói đã mở
+        sheet_part (str): Đường dẫn phần XML của sheet
+        cell_images (dict): Bảng ảnh trong ô (None: tự đọc bằng read_rich_images)
+
+    Yields:
+        dict: 'name', 'media', 'anchor' ('cell'), 'from' và 'to' (hàng, cột của ô)
+    """
+    if cell_images is None:
+        cell_images = read_rich_images(zf)
+    if not cell_images:
+        # Workbook không có ảnh trong ô: không phải duyệt lại sheet
+        return
+    row_tag = _tag('main', 'row')
+    cell_tag = _tag('main', 'c')
+    sheet_data_tag = _tag('main', 'sheetData')
+    with zf.open(sheet_part) as src:
+        sheet_data = None
+        for event, elem in ET.iterparse(src, events=('start', 'end')):
+            if event == 'start':
+                if elem.tag == sheet_data_tag:
+                    sheet_data = elem
+                continue
+            if elem.tag == cell_tag:
+                vm = elem.get('vm')
+                if vm is not None and int(vm) in cell_images and elem.get('r'):
+                    media, name = cell_images[int(vm)]
+                    cell = column_index(elem.get('r'))
+                    yield {'name': f"{name} ({elem.get('r')})", 'media': media, 'anchor': 'cell',
+                           'from': cell, 'to': cell}
+            elif elem.tag == row_tag:
+                # Giải phóng hàng đã đọc
+                elem.clear()
+                if sheet_data is not None:
+                    sheet_data.remove(elem)
+            elif elem.tag == sheet_data_tag:
+                break
+
+
+def _anchor_offsets(anchor, anchor_type):
+    """
+    Vị trí dọc (point) của ảnh neo theo ô: (từ đầu hàng from tới cạnh trên ảnh,
+    từ đầu hàng to tới cạnh dưới ảnh); ảnh oneCell tính cạnh dưới từ đầu hàng from
+    """
+    top = int(anchor.findtext('xdr:from/xdr:rowOff', '0', NS)) / EMU_PER_POINT
+    if anchor_type == 'twoCell':
+        return top, int(anchor.findtext('xdr:to/xdr:rowOff', '0', NS)) / EMU_PER_POINT
+    ext = anchor.find('xdr:ext', NS)
+    return top, top + (int(ext.get('cy', 0)) / EMU_PER_POINT if ext is not None else 0.0)
+
+
+def _absolute_geometry(anchor):
+    """Đọc vị trí/kích thước (point) của anchor tuyệt đối"""
+    pos = anchor.find('xdr:pos', NS)
+    ext = anchor.find('xdr:ext', NS)
+    return {
+        'left': int(pos.get('x', 0)) / EMU_PER_POINT if pos is not None else 0.0,
+        'top': int(pos.get('y', 0)) / EMU_PER_POINT if pos is not None else 0.0,
+        'width': int(ext.get('cx', 0)) / EMU_PER_POINT if ext is not None else 0.0,
+        'height': int(ext.get('cy', 0)) / EMU_PER_POINT if ext is not None else 0.0,
+    }
+
+
+def _col_width_points(width):
+    """Chuyển độ rộng cột (số ký tự) sang point theo công thức của Excel"""
+    pixels = int((256 * width + int(128 / MAX_DIGIT_WIDTH)) / 256 * MAX_DIGIT_WIDTH)
+    return pixels * 0.75
+
+
+def read_sheet_geometry(zf, sheet_part, first_row, last_row, column):
+    """
+    Tính vị trí (point) các ô của một cột, tương đương Cells(row, col).Top/Left/...
+
+    Args:
+        zf (ZipFile): Gói đã mở
+        sheet_part (str): Đường dẫn phần XML của sheet
+        first_row (int): Hàng đầu tiên cần tính
+        last_row (int): Hàng cuối cùng cần tính (None: hàng cuối có khai báo chiều cao)
+        column (int): Cột cần tính (đánh số từ 1)
+
+    Returns:
+        dict: {row: {'top', 'left', 'height', 'width'}}
+    """
+    format_pr_tag = _tag('main', 'sheetFormatPr')
+    col_tag = _tag('main', 'col')
+    sheet_data_tag = _tag('main', 'sheetData')
+
+    # Phần đầu sheet: kích thước mặc định và độ rộng cột (trước sheetData)
+    default_height = DEFAULT_ROW_HEIGHT
+    default_width = DEFAULT_COL_WIDTH
+    col_defs = []
+    with zf.open(sheet_part) as src:
+        for event, elem in ET.iterparse(src, events=('start', 'end')):
+            if event == 'start':
+                if elem.tag == sheet_data_tag:
+                    break
+                continue
+            if elem.tag == format_pr_tag:
+                default_height = float(elem.get('defaultRowHeight', DEFAULT_ROW_HEIGHT))
+                default_width = float(elem.get('defaultColWidth', DEFAULT_COL_WIDTH))
+            elif elem.tag == col_tag:
+                col_defs.append(dict(elem.attrib))
+
+    # Độ rộng các cột từ 1 đến column
+    widths = [default_width] * (column + 1)
+    hidden_cols = set()
+    for col in col_defs:
+        lo, hi = int(col.get('min')), int(col.get('max'))
+        for c in range(lo, min(hi, column) + 1):
+            widths[c] = float(col.get('width', default_width))
+            if col.get('hidden') in ('1', 'true'):
+                hidden_cols.add(c)
+    col_points = [0.0 if c in hidden_cols else _col_width_points(widths[c]) for c in range(column + 1)]
+    left = sum(col_points[1:column])
+    width = col_points[column]
+
+    # Chiều cao các hàng khai báo riêng
+    heights = {}
+    for r, _, attrs in iter_rows(zf, sheet_part):
+        if last_row is not None and r > last_row:
+            break
+        if attrs.get('hidden') in ('1', 'true'):
+            heights[r] = 0.0
+        elif attrs.get('ht') is not None:
+            heights[r] = float(attrs['ht'])
+    if last_row is None:
+        last_row = max(heights, default=first_row)
+
+    # Mảng vị trí tích lũy theo hàng
+    positions = {}
+    top = 0.0
+    for r in range(1, last_row + 1):
+        height = heights.get(r, default_height)
+        if r >= first_row:
+            positions[r] = {'top': top, 'left': left, 'height': height, 'width': width}
+        top += height
+    return positions
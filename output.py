@@ -0,0 +1,225 @@
+"""
+Module nơi ghi ảnh đầu ra (thư mục, file .zip hoặc .tar)
+
+Mục đích:
+    - 'folder': ghi từng file ảnh vào thư mục đầu ra (như trước đây)
+    - 'zip': ghi tuần tự vào một file .zip; ảnh đã nén (JPEG/PNG...) được lưu
+      STORED, không nén lại
+    - 'tar': ghi tuần tự vào một file .tar; ảnh trùng nội dung là liên kết cứng
+    - File nén kèm file chỉ mục index.csv: ma_nv, ho_ten, filename, width, height, sha1
+
+Ghi một file nén tuần tự thay cho hàng nghìn file nhỏ giúp giảm mạnh thời gian
+ghi lên ổ mạng (SMB). File nén được ghi vào file tạm và chỉ đổi tên thành tên
+chính thức khi xuất xong.
+
+Mỗi nơi ghi có các phương thức:
+    open(), path(name), add(name, data), add_file(name, src_path),
+    copy(src_name, name), close(keep)
+"""
+
+import csv
+import io
+import os
+import struct
+import tarfile
+import time
+import zipfile
+import zlib
+
+import media
+
+# Các loại đầu ra được hỗ trợ
+OUTPUT_KINDS = ('folder', 'zip', 'tar')
+
+# Tên file chỉ mục trong file nén
+INDEX_NAME = 'index.csv'
+INDEX_FIELDS = ('ma_nv', 'ho_ten', 'filename', 'width', 'height', 'sha1')
+
+# Định dạng đã nén sẵn: lưu STORED trong file .zip
+COMPRESSED_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.webp', '.tif', '.tiff')
+
+
+def archive_path(output_folder, kind):
+    """Đường dẫn file nén tương ứng với thư mục đầu ra (vd: ANHTHE -> ANHTHE.zip)"""
+    return os.path.normpath(output_folder) + '.' + kind
+
+
+def open_output(kind, output_folder, link_mode='hardlink'):
+    """
+    Tạo nơi ghi ảnh đầu ra
+
+    Args:
+        kind (str): 'folder', 'zip' hoặc 'tar'
+        output_folder (str): Thư mục đầu ra (với file nén: tên file nén không kèm phần mở rộng)
+        link_mode (str): Cách tạo file cho ảnh trùng nội dung trong thư mục: 'hardlink' hoặc 'copy'
+
+    Returns:
+        FolderOutput | ZipOutput | TarOutput
+    """
+    if kind == 'folder':
+        return FolderOutput(output_folder, link_mode)
+    if kind == 'zip':
+        return ZipOutput(archive_path(output_folder, kind))
+    if kind == 'tar':
+        return TarOutput(archive_path(output_folder, kind))
+    raise ValueError(f"Loại đầu ra không hợp lệ: {kind}")
+
+
+def build_index(rows):
+    """
+    Tạo nội dung file chỉ mục CSV (UTF-8 có BOM để Excel hiển thị đúng tiếng Việt)
+
+    Args:
+        rows (list): Các dict có khóa INDEX_FIELDS
+
+    Returns:
+        bytes: Nội dung index.csv
+    """
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=INDEX_FIELDS, extrasaction='ignore', lineterminator='\r\n')
+    writer.writeheader()
+    writer.writerows(rows)
+    return buffer.getvalue().encode('utf-8-sig')
+
+
+class FolderOutput:
+    """Ghi từng file ảnh vào thư mục đầu ra"""
+
+    archive = False
+
+    def __init__(self, folder, link_mode='hardlink'):
+        self.location = folder
+        self.link_mode = link_mode
+
+    def open(self):
+        os.makedirs(self.location, exist_ok=True)
+
+    def path(self, name):
+        """Đường dẫn file để tiến trình con ghi trực tiếp"""
+        return os.path.join(self.location, name)
+
+    def add(self, name, data):
+        media.write_bytes(data, self.path(name))
+
+    def add_file(self, name, src_path):
+        media.link_or_copy(src_path, self.path(name), self.link_mode)
+
+    def copy(self, src_name, name):
+        media.link_or_copy(self.path(src_name), self.path(name), self.link_mode)
+
+    def close(self, keep=True):
+        pass
+
+
+class _ArchiveOutput:
+    """
+    Phần chung của các file nén: ghi vào file tạm, đổi tên khi xong
+
+    Lớp con mở đối tượng file nén (ZipFile / TarFile) trên self._file trong open()
+    và gán vào self._archive; close() đóng nó trước khi đổi tên file tạm
+    """
+
+    archive = True
+
+    def __init__(self, archive_file):
+        self.location = archive_file
+        self._file = None
+        self._tmp_path = None
+        self._archive = None
+
+    def open(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.location)), exist_ok=True)
+        self._tmp_path = media.temp_path(self.location)
+        self._file = open(self._tmp_path, 'w+b')
+
+    def path(self, name):
+        """File nén không có đường dẫn riêng cho từng ảnh: tiến trình con trả bytes về"""
+        return None
+
+    def add_file(self, name, src_path):
+        with open(src_path, 'rb') as f:
+            self.add(name, f.read())
+
+    def close(self, keep=True):
+        """
+        Đóng file nén
+
+        Args:
+            keep (bool): True để giữ file nén (đổi tên file tạm), False để xóa (xuất lỗi / bị dừng)
+        """
+        if self._file is None:
+            return
+        try:
+            # Ghi thư mục trung tâm (.zip) / khối kết thúc (.tar)
+            self._archive.close()
+        except Exception:
+            keep = False
+            raise
+        finally:
+            self._file.close()
+            self._file = None
+            self._archive = None
+            if not keep:
+                os.remove(self._tmp_path)
+        if keep:
+            os.replace(self._tmp_path, self.location)
+
+
+class ZipOutput(_ArchiveOutput):
+    """Ghi ảnh tuần tự vào một file .zip"""
+
+    def open(self):
+        super().open()
+        self._archive = zipfile.ZipFile(self._file, 'w', allowZip64=True)
+
+    def add(self, name, data):
+        info = zipfile.ZipInfo(name, date_time=time.localtime()[:6])
+        if os.path.splitext(name)[1].lower() in COMPRESSED_EXTENSIONS:
+            info.compress_type = zipfile.ZIP_STORED
+        else:
+            info.compress_type = zipfile.ZIP_DEFLATED
+        self._archive.writestr(info, data)
+
+    def read(self, name):
+        """
+        Đọc lại một mục đã ghi (file .zip đang ghi chưa có thư mục trung tâm nên
+        phải đọc trực tiếp theo vị trí header của mục)
+        """
+        info = self._archive.getinfo(name)
+        position = self._file.tell()
+        try:
+            self._file.seek(info.header_offset)
+            header = self._file.read(zipfile.sizeFileHeader)
+            name_length, extra_length = struct.unpack('<HH', header[26:30])
+            self._file.seek(name_length + extra_length, os.SEEK_CUR)
+            data = self._file.read(info.compress_size)
+        finally:
+            self._file.seek(position)
+        if info.compress_type == zipfile.ZIP_DEFLATED:
+            data = zlib.decompress(data, -15)
+        return data
+
+    def copy(self, src_name, name):
+        self.add(name, self.read(src_name))
+
+
+class TarOutput(_ArchiveOutput):
+    """Ghi ảnh tuần tự vào một file .tar (không nén: ảnh đã được nén sẵn)"""
+
+    def open(self):
+        super().open()
+        self._archive = tarfile.open(fileobj=self._file, mode='w', format=tarfile.PAX_FORMAT)
+
+    def add(self, name, data):
+        info = tarfile.TarInfo(name)
+        info.size = len(data)
+        info.mtime = time.time()
+        self._archive.addfile(info, io.BytesIO(data))
+
+    def copy(self, src_name, name):
+        # Ảnh trùng nội dung: liên kết cứng tới mục đã ghi, không ghi lại dữ liệu
+        info = tarfile.TarInfo(name)
+        info.type = tarfile.LNKTYPE
+        info.linkname = src_name
+        info.mtime = time.time()
+        self._archive.addfile(info)
@@ -0,0 +1,153 @@
+"""
+Module xuất ảnh song song theo dạng đường ống (pipeline)
+
+Mục đích:
+    - Tách bước đọc ảnh từ gói Excel (luồng chính) khỏi bước mã hóa/ghi file
+    - Chạy bước mã hóa/ghi file trên nhiều tiến trình (ProcessPoolExecutor)
+    - Giới hạn số công việc đang chờ để bộ nhớ không tăng theo số hàng
+    - Gửi công việc sang tiến trình con theo lô để giảm chi phí truyền dữ liệu
+
+Mỗi công việc (job) là một dict gồm:
+    'row', 'ma_nv', 'filename', 'filepath' (None: trả bytes về luồng chính),
+    'media_ext', 'data', 'output_format', 'jpeg_quality', ('processing')
+"""
+
+import time
+from concurrent.futures import FIRST_COMPLETED, ALL_COMPLETED, wait
+
+import media
+
+# Số công việc tối đa đang chờ trong hàng đợi (mặc định)
+DEFAULT_QUEUE_SIZE = 64
+
+# Số công việc trong một lô gửi sang tiến trình con (mặc định)
+DEFAULT_BATCH_SIZE = 8
+
+
+def export_job(job):
+    """
+    Tạo ảnh đầu ra của một công việc (chạy trong tiến trình con hoặc luồng chính)
+
+    Nếu job có 'filepath' thì ghi ra file; nếu 'filepath' là None (đầu ra là
+    file nén) thì trả bytes về luồng chính để ghi tuần tự vào file nén.
+
+    Args:
+        job (dict): Công việc cần xử lý
+
+    Returns:
+        dict: {'size': số bytes, 'transcoded': True nếu đã chuyển đổi,
+            'width', 'height', 'sha1': thông tin ảnh đầu ra,
+            'duration': thời gian xử lý (giây), ('data': bytes khi không ghi ra file)}
+    """
+    start = time.perf_counter()
+    data, transcoded = media.encode_media(job['data'], job['media_ext'], job['output_format'],
+                                          job['jpeg_quality'], job.get('processing'))
+    result = media.describe_bytes(data)
+    result['transcoded'] = transcoded
+    if job['filepath'] is None:
+        result['data'] = data
+    else:
+        media.write_bytes(data, job['filepath'])
+    result['duration'] = time.perf_counter() - start
+    return result
+
+
+def export_batch(jobs):
+    """
+    Ghi một lô ảnh (chạy trong tiến trình con)
+
+    Args:
+        jobs (list): Các công việc cần xử lý
+
+    Returns:
+        list: (kết quả, lỗi) theo thứ tự công việc; lỗi của một ảnh không làm hỏng cả lô
+    """
+    results = []
+    for job in jobs:
+        try:
+            results.append((export_job(job), None))
+        except Exception as e:
+            results.append((None, e))
+    return results
+
+
+def without_data(job):
+    """Bản sao job không có bytes ảnh, dùng để giữ lại sau khi đã gửi đi"""
+    return {key: value for key, value in job.items() if key != 'data'}
+
+
+def _drain(pending, handle_result, return_when):
+    """Chờ các lô hoàn thành và gọi handle_result cho từng công việc trong lô"""
+    done, _ = wait(pending, return_when=return_when)
+    for future in done:
+        batch = pending.pop(future)
+        try:
+            results = future.result()
+        except Exception as e:
+            # Lỗi của cả lô (vd: tiến trình con bị dừng)
+            results = [(None, e)] * len(batch)
+        for job, (result, error) in zip(batch, results):
+            handle_result(job, result, error)
+
+
+def run(jobs, handle_result, workers=1, queue_size=DEFAULT_QUEUE_SIZE, executor=None,
+        batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Chạy các công việc xuất ảnh
+
+    Luồng chính đóng vai trò bước đọc: lấy lần lượt từng job từ `jobs`
+    (thường là generator đọc ảnh từ zip) và đưa vào hàng đợi có giới hạn
+    `queue_size`; khi hàng đợi đầy thì chờ ít nhất một job hoàn thành.
+
+    Args:
+        jobs (iterable): Nguồn công việc
+        handle_result (function): Hàm (job, result, error) gọi ở luồng chính
+        workers (int): Số tiến trình; <= 1 để chạy tuần tự trong tiến trình hiện tại
+        queue_size (int): Số công việc tối đa đang chờ
+        executor (ProcessPoolExecutor): Nhóm tiến trình dùng chung (vd: của ExportSession);
+            None để tự tạo và đóng sau khi chạy xong
+        batch_size (int): Số công việc gửi sang tiến trình con trong một lần
+    """
+    if workers <= 1:
+        for job in jobs:
+            try:
+                result = export_job(job)
+            except Exception as e:
+                handle_result(without_data(job), None, e)
+            else:
+                handle_result(without_data(job), result, None)
+        return
+
+    batch_size = max(1, batch_size)
+    # Số lô đang chờ: đủ cho mọi tiến trình, tổng số ảnh không vượt quá hàng đợi
+    max_batches = max(queue_size // batch_size, workers)
+    if executor is None:
+        # Nạp khi cần: concurrent.futures.process kéo theo multiprocessing, làm chậm lúc khởi động
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            _run_pool(jobs, handle_result, executor, max_batches, batch_size)
+    else:
+        _run_pool(jobs, handle_result, executor, max_batches, batch_size)
+
+
+def _run_pool(jobs, handle_result, executor, max_batches, batch_size):
+    """Gom công việc thành lô và đưa vào nhóm tiến trình, giữ tối đa max_batches lô đang chờ"""
+    pending = {}
+    batch = []
+
+    def submit():
+        if len(pending) >= max_batches:
+            _drain(pending, handle_result, FIRST_COMPLETED)
+        future = executor.submit(export_batch, batch)
+        pending[future] = [without_data(job) for job in batch]
+
+    for job in jobs:
+        batch.append(job)
+        if len(batch) >= batch_size:
+            submit()
+            batch = []
+    if batch:
+        submit()
+    if pending:
+        _drain(pending, handle_result, ALL_COMPLETED)
@@ -0,0 +1,219 @@
+"""
+Module hậu xử lý ảnh thẻ sau khi trích xuất
+
+Mục đích:
+    - Đưa ảnh về kích thước cố định cho máy in thẻ (vd: 600x800)
+    - Chế độ đổi cỡ: 'crop' (lấp đầy rồi cắt, lệch lên trên để giữ khuôn mặt),
+      'fit' (thu vào khung, giữ tỷ lệ) hoặc 'pad' (thu vào khung, thêm nền trắng)
+    - Ghi DPI, đổi hệ màu, giữ hoặc xóa EXIF
+    - Dùng đường nhanh của Pillow: draft() giải mã JPEG ở tỷ lệ 1/2, 1/4, 1/8
+      và reduce() (qua reducing_gap) trước khi lọc LANCZOS
+
+Tùy chọn hậu xử lý là một dict (tạo bằng make_options), None nếu không hậu xử lý:
+    'size', 'fit_mode', 'dpi', 'color_mode', 'strip_exif', 'crop_center'
+"""
+
+# Các chế độ đổi cỡ
+FIT_MODES = ('crop', 'fit', 'pad')
+
+# Các hệ màu được hỗ trợ khi đổi hệ màu
+COLOR_MODES = ('RGB', 'L', 'CMYK')
+
+# Tâm vùng cắt (tỷ lệ theo chiều ngang, chiều dọc): khuôn mặt thường nằm ở nửa trên ảnh thẻ
+DEFAULT_CROP_CENTER = (0.5, 0.4)
+
+# Thu nhỏ bằng reduce() khi ảnh lớn hơn kích thước đích quá số lần này
+REDUCING_GAP = 2.0
+
+# Màu nền khi thêm viền (chế độ 'pad') hoặc bỏ kênh alpha
+BACKGROUND = 'white'
+
+# Thẻ EXIF Orientation
+EXIF_ORIENTATION = 0x0112
+
+
+def parse_size(text):
+    """
+    Đọc kích thước dạng 'RỘNGxCAO'
+
+    Args:
+        text (str): Vd: '600x800'
+
+    Returns:
+        tuple: (rộng, cao) hoặc None nếu chuỗi rỗng
+    """
+    if not text or not text.strip():
+        return None
+    try:
+        width, height = text.lower().replace('×', 'x').split('x')
+        size = (int(width), int(height))
+    except ValueError:
+        size = None
+    if size is None or size[0] <= 0 or size[1] <= 0:
+        raise ValueError(f"Kích thước không hợp lệ: {text}")
+    return size
+
+
+def make_options(size=None, fit_mode='crop', dpi=None, color_mode=None, strip_exif=False,
+                 crop_center=DEFAULT_CROP_CENTER):
+    """
+    Tạo tùy chọn hậu xử lý
+
+    Args:
+        size (tuple): (rộng, cao) theo pixel; None để giữ kích thước gốc
+        fit_mode (str): 'crop', 'fit' hoặc 'pad'
+        dpi (int): DPI ghi vào file; None để giữ nguyên
+        color_mode (str): 'RGB', 'L' (xám) hoặc 'CMYK'; None để giữ nguyên
+        strip_exif (bool): Xóa EXIF khỏi file đầu ra
+        crop_center (tuple): Tâm vùng cắt khi fit_mode='crop'
+
+    Returns:
+        dict: Tùy chọn hậu xử lý, None nếu không có bước nào cần làm
+    """
+    if fit_mode not in FIT_MODES:
+        raise ValueError(f"Chế độ đổi cỡ không hợp lệ: {fit_mode}")
+    if color_mode is not None and color_mode not in COLOR_MODES:
+        raise ValueError(f"Hệ màu không hợp lệ: {color_mode}")
+    if size is None and not dpi and color_mode is None and not strip_exif:
+        return None
+    return {
+        'size': tuple(size) if size else None,
+        'fit_mode': fit_mode,
+        'dpi': int(dpi) if dpi else None,
+        'color_mode': color_mode,
+        'strip_exif': bool(strip_exif),
+        'crop_center': tuple(crop_center),
+    }
+
+
+def describe(options):
+    """
+    Chuỗi mô tả tùy chọn (dùng cho manifest, tên file bộ nhớ đệm và nhật ký)
+
+    Returns:
+        str: Vd: '600x800-crop-300dpi-RGB-noexif'; rỗng nếu không hậu xử lý
+    """
+    if not options:
+        return ''
+    parts = []
+    if options['size']:
+        parts.append(f"{options['size'][0]}x{options['size'][1]}-{options['fit_mode']}")
+        if options['fit_mode'] == 'crop' and options['crop_center'] != DEFAULT_CROP_CENTER:
+            parts.append(f"c{options['crop_center'][0]}_{options['crop_center'][1]}")
+    if options['dpi']:
+        parts.append(f"{options['dpi']}dpi")
+    if options['color_mode']:
+        parts.append(options['color_mode'])
+    if options['strip_exif']:
+        parts.append('noexif')
+    return '-'.join(parts)
+
+
+def open_image(src, options=None):
+    """
+    Mở ảnh, với JPEG lớn thì chỉ giải mã ở tỷ lệ đủ cho kích thước đích (draft)
+
+    Args:
+        src (file): Luồng đọc bytes ảnh
+        options (dict): Tùy chọn hậu xử lý
+
+    Returns:
+        PIL.Image.Image
+    """
+    from PIL import Image
+
+    image = Image.open(src)
+    size = options['size'] if options else None
+    if size and image.format == 'JPEG':
+        requested = size
+        # Ảnh sẽ được xoay theo EXIF: yêu cầu kích thước theo chiều trước khi xoay
+        if image.getexif().get(EXIF_ORIENTATION) in (5, 6, 7, 8):
+            requested = (size[1], size[0])
+        mode = 'L' if options['color_mode'] == 'L' else image.mode
+        image.draft(mode, requested)
+    return image
+
+
+def _resize(image, size, fit_mode, crop_center):
+    """Đổi cỡ ảnh theo chế độ; reducing_gap cho phép Pillow dùng reduce() trước"""
+    from PIL import Image
+
+    target_width, target_height = size
+    width, height = image.size
+    if fit_mode == 'crop':
+        scale = max(target_width / width, target_height / height)
+        crop_width, crop_height = target_width / scale, target_height / scale
+        left = (width - crop_width) * crop_center[0]
+        top = (height - crop_height) * crop_center[1]
+        return image.resize(size, Image.LANCZOS, box=(left, top, left + crop_width, top + crop_height),
+                            reducing_gap=REDUCING_GAP)
+
+    scale = min(target_width / width, target_height / height)
+    new_size = (max(1, round(width * scale)), max(1, round(height * scale)))
+    resized = image.resize(new_size, Image.LANCZOS, reducing_gap=REDUCING_GAP)
+    if fit_mode == 'fit':
+        return resized
+
+    # 'pad': đặt ảnh vào giữa nền trắng đúng kích thước đích
+    if resized.mode not in ('RGB', 'L', 'CMYK'):
+        resized = resized.convert('RGB')
+    canvas = Image.new(resized.mode, size, BACKGROUND)
+    canvas.paste(resized, ((target_width - new_size[0]) // 2, (target_height - new_size[1]) // 2))
+    canvas.info = resized.info
+    return canvas
+
+
+def apply(image, options):
+    """
+    Áp dụng các bước hậu xử lý lên ảnh đã mở
+
+    Args:
+        image (PIL.Image.Image): Ảnh nguồn
+        options (dict): Tùy chọn hậu xử lý (None: trả về ảnh gốc)
+
+    Returns:
+        PIL.Image.Image: Ảnh đã xử lý
+    """
+    if not options:
+        return image
+    from PIL import Image, ImageOps
+
+    # Xoay theo EXIF trước khi cắt để không cắt nhầm chiều
+    image = ImageOps.exif_transpose(image)
+
+    color_mode = options['color_mode']
+    if color_mode and image.mode != color_mode:
+        if 'A' in image.getbands() or image.mode == 'P':
+            # Bỏ kênh alpha bằng cách đặt lên nền trắng
+            rgba = image.convert('RGBA')
+            background = Image.new('RGBA', rgba.size, BACKGROUND)
+            image = Image.alpha_composite(background, rgba)
+        image = image.convert(color_mode)
+
+    if options['size']:
+        if image.mode in ('1', 'P'):
+            # Ảnh bảng màu chỉ đổi cỡ được bằng NEAREST: chuyển sang RGB(A) trước
+            image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+        image = _resize(image, options['size'], options['fit_mode'], options['crop_center'])
+    return image
+
+
+def save_options(image, options):
+    """
+    Tham số bổ sung cho Image.save theo tùy chọn hậu xử lý
+
+    Returns:
+        dict: Vd: {'dpi': (300, 300), 'exif': ..., 'icc_profile': ...}
+    """
+    if not options:
+        return {}
+    kwargs = {}
+    if options['dpi']:
+        kwargs['dpi'] = (options['dpi'], options['dpi'])
+    exif = image.info.get('exif')
+    if exif and not options['strip_exif']:
+        kwargs['exif'] = exif
+    icc_profile = image.info.get('icc_profile')
+    if icc_profile and not options['color_mode']:
+        kwargs['icc_profile'] = icc_profile
+    return kwargs
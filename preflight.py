@@ -0,0 +1,167 @@
+"""
+Module báo cáo kiểm tra trước khi xuất (dry-run)
+
+Mục đích:
+    - Gom kết quả ánh xạ Pass 1 / Pass 2 và kết quả từng hàng từ các sự kiện
+      (xem events.py) của một lần chạy export_images(dry_run=True)
+    - Liệt kê các hàng không có ảnh, thiếu thông tin, trùng tên file, các ảnh
+      rơi vào hàng đã có ảnh và các ảnh không ánh xạ được kèm khoảng cách
+    - Ghi báo cáo ra file CSV hoặc JSON (theo phần mở rộng)
+
+Báo cáo gồm hai loại dòng:
+    - 'row': một dòng cho mỗi hàng dữ liệu (trạng thái 'ok' hoặc lý do bỏ qua)
+    - 'shape': một dòng cho mỗi ảnh có vấn đề ('duplicate', 'unmatched', 'outside_column')
+"""
+
+import csv
+import json
+import os
+import threading
+
+# Định dạng file báo cáo (theo phần mở rộng)
+REPORT_FORMATS = ('csv', 'json')
+
+# Các cột của báo cáo CSV
+REPORT_FIELDS = ('source', 'kind', 'row', 'ma_nv', 'ho_ten', 'status', 'picture', 'method',
+                 'pass_no', 'condition', 'distance', 'filename', 'error')
+
+# Trạng thái hàng / ảnh được coi là có vấn đề (ảnh ngoài cột ảnh như logo, chữ ký chỉ được liệt kê)
+ROW_PROBLEMS = ('no_image', 'missing_info', 'collision', 'error')
+SHAPE_PROBLEMS = ('duplicate', 'unmatched')
+
+# Tên hiển thị trong nhật ký
+STATUS_LABELS = {
+    'ok': "Hàng có ảnh",
+    'no_image': "Hàng không có ảnh",
+    'missing_info': "Hàng thiếu mã NV hoặc họ tên",
+    'collision': "Hàng trùng tên file (bỏ qua)",
+    'error': "Hàng bị lỗi",
+    'duplicate': "Ảnh rơi vào hàng đã có ảnh",
+    'unmatched': "Ảnh không ánh xạ được",
+    'outside_column': "Ảnh nằm ngoài cột ảnh",
+}
+
+
+def report_format(path):
+    """
+    Định dạng báo cáo theo phần mở rộng file
+
+    Raises:
+        ValueError: Phần mở rộng không phải .csv hoặc .json
+    """
+    ext = os.path.splitext(path)[1].lower().lstrip('.')
+    if ext not in REPORT_FORMATS:
+        raise ValueError(f"File báo cáo phải có đuôi .csv hoặc .json: {path}")
+    return ext
+
+
+class PreflightReport:
+    """Sink sự kiện gom kết quả ánh xạ và kết quả từng hàng thành báo cáo"""
+
+    def __init__(self):
+        # Khóa (số thứ tự lần chạy, hàng): nhiều sheet của cùng workbook không bị trộn lẫn
+        self.rows = {}
+        self.shapes = []
+        self._mapped = {}
+        self._run = 0
+        self._lock = threading.Lock()
+
+    def emit(self, event):
+        with self._lock:
+            event_type = event['type']
+            if event_type == 'mapping':
+                details = {
+                    'picture': event.get('picture'),
+                    'method': event.get('method'),
+                    'pass_no': event.get('pass_no'),
+                    'condition': event.get('condition'),
+                    'distance': round(event['distance'], 2) if event.get('distance') is not None else None,
+                }
+                if event.get('status') == 'mapped':
+                    self._mapped[(self._run, event['row'])] = details
+                else:
+                    self.shapes.append(((self._run, event.get('row') or 0),
+                                        dict(details, source=event.get('source'), kind='shape',
+                                             row=event.get('row'), status=event.get('status'))))
+            elif event_type in ('row_checked', 'row_processed'):
+                self._add_row(event, 'ok')
+            elif event_type == 'row_skipped':
+                self._add_row(event, event.get('reason'))
+            elif event_type == 'run_end':
+                self._run += 1
+
+    def _add_row(self, event, status):
+        """Ghi nhận kết quả một hàng (kèm thông tin ánh xạ nếu có)"""
+        key = (self._run, event['row'])
+        entry = {'source': event.get('source'), 'kind': 'row', 'row': event['row'], 'ma_nv': event.get('ma_nv'),
+                 'ho_ten': event.get('ho_ten'), 'status': status, 'filename': event.get('filename'),
+                 'error': event.get('error')}
+        entry.update(self._mapped.get(key, {}))
+        self.rows[key] = entry
+
+    def close(self):
+        pass
+
+    def summary(self):
+        """
+        Số hàng / ảnh theo trạng thái
+
+        Returns:
+            dict: {'rows': {status: số hàng}, 'shapes': {status: số ảnh}, 'problems': tổng số vấn đề}
+        """
+        with self._lock:
+            rows, shapes = {}, {}
+            for entry in self.rows.values():
+                rows[entry['status']] = rows.get(entry['status'], 0) + 1
+            for _, entry in self.shapes:
+                shapes[entry['status']] = shapes.get(entry['status'], 0) + 1
+        problems = sum(rows.get(status, 0) for status in ROW_PROBLEMS)
+        problems += sum(shapes.get(status, 0) for status in SHAPE_PROBLEMS)
+        return {'rows': rows, 'shapes': shapes, 'problems': problems}
+
+    def report(self):
+        """
+        Tạo báo cáo tóm tắt cho nhật ký
+
+        Returns:
+            list: Các dòng báo cáo
+        """
+        summary = self.summary()
+        lines = ["📋 KẾT QUẢ KIỂM TRA ÁNH XẠ:"]
+        for status, count in list(summary['rows'].items()) + list(summary['shapes'].items()):
+            lines.append(f"- {STATUS_LABELS.get(status, status)}: {count}")
+        if summary['problems']:
+            lines.append(f"⚠️ Có {summary['problems']} vấn đề cần kiểm tra trước khi xuất")
+        else:
+            lines.append("✅ Không phát hiện vấn đề")
+        return lines
+
+    def entries(self):
+        """
+        Các dòng báo cáo
+
+        Returns:
+            tuple: (các hàng theo thứ tự lần chạy / số hàng, các ảnh có vấn đề)
+        """
+        with self._lock:
+            rows = [self.rows[key] for key in sorted(self.rows)]
+            shapes = [entry for _, entry in sorted(self.shapes, key=lambda item: item[0])]
+        return rows, shapes
+
+    def write(self, path):
+        """
+        Ghi báo cáo ra file CSV (UTF-8 có BOM để mở bằng Excel) hoặc JSON
+
+        Args:
+            path (str): Đường dẫn file .csv hoặc .json
+        """
+        rows, shapes = self.entries()
+        if report_format(path) == 'json':
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump({'summary': self.summary(), 'rows': rows, 'shapes': shapes}, f,
+                          ensure_ascii=False, indent=2, default=str)
+            return
+        with open(path, 'w', encoding='utf-8-sig', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=REPORT_FIELDS, extrasaction='ignore')
+            writer.writeheader()
+            writer.writerows(rows + shapes)
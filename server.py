@@ -0,0 +1,730 @@
+"""
+Dịch vụ xuất ảnh cục bộ: máy chủ HTTP trên localhost với hàng đợi công việc
+
+Mục đích:
+    - Nhiều người dùng trên cùng một máy gửi công việc tới một dịch vụ duy nhất thay vì
+      mỗi người tự mở Excel và tranh nhau clipboard hệ thống (backend COM)
+    - Hàng đợi bền vững: mỗi công việc là một file JSON kèm file nhật ký trong thư mục
+      trạng thái; khi dịch vụ khởi động lại, công việc đang chờ được chạy tiếp và công việc
+      đang chạy dở được xếp lại để tiếp tục từ checkpoint
+    - Nhóm luồng xử lý: công việc backend 'ooxml' chạy song song trên --job-workers luồng,
+      dùng chung một nhóm tiến trình mã hóa; công việc backend COM chạy tuần tự trên một
+      luồng riêng với một Excel dùng lại giữa các công việc (một clipboard, không tranh chấp)
+    - Hai công việc ghi vào cùng một đầu ra không bao giờ chạy cùng lúc
+    - Mọi đường dẫn trong công việc phải nằm trong các thư mục gốc được cho phép (--allow-root)
+
+API (JSON, chỉ nhận kết nối từ localhost):
+    GET  /health                    trạng thái dịch vụ và số công việc theo trạng thái
+    GET  /jobs                      danh sách công việc
+    POST /jobs                      gửi công việc: {"excel_file_path", "output_folder", ...tùy chọn}
+    GET  /jobs/<id>                 trạng thái và tiến trình của công việc
+    GET  /jobs/<id>/log?offset=N    nhật ký từ vị trí N (byte), trả về vị trí kế tiếp
+    POST /jobs/<id>/cancel          hủy công việc đang chờ hoặc dừng công việc đang chạy
+
+Các hàm submit_job, get_job, read_log, cancel_job, is_available là phía client (chỉ
+dùng urllib), được giao diện dùng để gửi công việc thay vì xuất trực tiếp.
+
+Ví dụ:
+    python server.py
+    python server.py --port 8765 --job-workers 2 --workers 4 --state-dir D:\\ANHTHE_SERVICE
+    python server.py --allow-root D:\\HR --allow-root \\\\hr-share\\ANHTHE
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import events
+import layout
+import naming
+import output
+import postprocess
+import preflight
+
+# Địa chỉ mặc định (chỉ lắng nghe trên máy cục bộ)
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+DEFAULT_URL = f"http://{DEFAULT_HOST}:{DEFAULT_PORT}"
+
+# Biến môi trường chỉ địa chỉ dịch vụ cho phía client (giao diện)
+SERVICE_URL_ENV = 'ANHTHE_SERVICE_URL'
+
+# Thư mục lưu hàng đợi công việc và nhật ký
+DEFAULT_STATE_DIR = os.path.join(os.path.expanduser('~'), '.anhthe_service')
+
+# Số công việc đã kết thúc được giữ lại trong thư mục trạng thái
+DEFAULT_KEEP_JOBS = 200
+
+# Trạng thái công việc
+JOB_STATES = ('queued', 'running', 'succeeded', 'failed', 'cancelled')
+FINISHED_STATES = ('succeeded', 'failed', 'cancelled')
+
+# Luồng xử lý: 'package' (backend 'ooxml', song song) và 'com' (Excel, tuần tự)
+LANES = ('package', 'com')
+
+# Tham số export_images mà client được gửi (workers, session... do dịch vụ quyết định)
+JOB_OPTIONS = ('excel_file_path', 'output_folder', 'scale_factor', 'wait_time', 'backend', 'output_format',
+               'jpeg_quality', 'queue_size', 'incremental', 'remove_stale', 'link_mode', 'cache_dir',
+               'sheet_name', 'processing', 'batch_size', 'layout_config', 'filename_template',
+               'on_collision', 'resume', 'output_kind', 'dry_run')
+
+# Trường thêm của công việc: file báo cáo kiểm tra (chế độ dry-run) và tên người gửi
+JOB_EXTRAS = ('report_path', 'user')
+
+# Các trường là đường dẫn: phải là đường dẫn tuyệt đối (client và dịch vụ có thư mục làm việc khác nhau)
+PATH_OPTIONS = ('excel_file_path', 'output_folder', 'cache_dir', 'report_path')
+
+# Thư mục gốc mặc định được phép đọc/ghi: dịch vụ ghi và xóa file bằng quyền của tài khoản chạy dịch vụ,
+# nên mọi đường dẫn trong công việc phải nằm trong một thư mục gốc được cho phép (--allow-root)
+DEFAULT_ALLOWED_ROOTS = (os.path.expanduser('~'),)
+
+BACKENDS = ('auto', 'ooxml', 'com')
+
+# Thời gian chờ một yêu cầu HTTP phía client (giây)
+REQUEST_TIMEOUT = 10
+
+# Số byte nhật ký tối đa trả về trong một yêu cầu
+MAX_LOG_BYTES = 256 * 1024
+
+# Tên máy được chấp nhận trong header Host (chống DNS rebinding từ trình duyệt)
+LOCAL_HOSTS = ('localhost', '127.0.0.1', '::1')
+
+
+def _within_roots(path, roots):
+    """Đường dẫn (đã giải symlink và '..') có nằm trong một trong các thư mục gốc không"""
+    real = os.path.normcase(os.path.realpath(path))
+    for root in roots:
+        root = os.path.normcase(os.path.realpath(root))
+        try:
+            if os.path.commonpath([real, root]) == root:
+                return True
+        except ValueError:
+            # Khác ổ đĩa trên Windows
+            continue
+    return False
+
+
+def validate_job(params, allowed_roots=DEFAULT_ALLOWED_ROOTS):
+    """
+    Kiểm tra và chuẩn hóa tham số công việc
+
+    Args:
+        params (dict): Tham số từ client (JOB_OPTIONS và JOB_EXTRAS)
+        allowed_roots (tuple): Các thư mục gốc chứa được file Excel, thư mục / file nén đầu ra,
+            thư mục bộ nhớ đệm và file báo cáo
+
+    Returns:
+        dict: Tham số đã chuẩn hóa (processing / layout_config được tạo lại qua make_options / make_layout)
+
+    Raises:
+        ValueError: Thiếu trường bắt buộc, trường không hỗ trợ, giá trị không hợp lệ hoặc
+            đường dẫn nằm ngoài các thư mục gốc được cho phép
+    """
+    if not isinstance(params, dict):
+        raise ValueError("Công việc phải là một đối tượng JSON")
+    unknown = sorted(set(params) - set(JOB_OPTIONS) - set(JOB_EXTRAS))
+    if unknown:
+        raise ValueError(f"Trường không được hỗ trợ: {', '.join(unknown)}")
+    params = {key: value for key, value in params.items() if value is not None}
+    for key in ('excel_file_path', 'output_folder'):
+        if not isinstance(params.get(key), str) or not params[key]:
+            raise ValueError(f"Thiếu trường bắt buộc: {key}")
+    for key in PATH_OPTIONS:
+        if key in params and (not isinstance(params[key], str) or not os.path.isabs(params[key])):
+            raise ValueError(f"{key} phải là đường dẫn tuyệt đối: {params[key]}")
+    if params.get('backend', 'auto') not in BACKENDS:
+        raise ValueError(f"Backend không hợp lệ: {params['backend']}")
+    if params.get('output_kind', 'folder') not in output.OUTPUT_KINDS:
+        raise ValueError(f"Loại đầu ra không hợp lệ: {params['output_kind']}")
+    if params.get('on_collision', 'suffix') not in naming.COLLISION_POLICIES:
+        raise ValueError(f"Chính sách tên file trùng không hợp lệ: {params['on_collision']}")
+    paths = [params[key] for key in PATH_OPTIONS if key in params]
+    if params.get('output_kind', 'folder') != 'folder':
+        # File nén được ghi cạnh thư mục đầu ra
+        paths.append(output.archive_path(params['output_folder'], params['output_kind']))
+    for path in paths:
+        if not _within_roots(path, allowed_roots):
+            raise ValueError(f"Đường dẫn nằm ngoài các thư mục được phép của dịch vụ: {path}")
+    if 'filename_template' in params:
+        naming.validate_template(params['filename_template'])
+    if 'report_path' in params:
+        preflight.report_format(params['report_path'])
+    try:
+        if 'processing' in params:
+            params['processing'] = postprocess.make_options(**params['processing'])
+        if 'layout_config' in params:
+            params['layout_config'] = layout.make_layout(**params['layout_config'])
+    except TypeError as e:
+        raise ValueError(f"Tùy chọn không hợp lệ: {str(e)}") from None
+    return params
+
+
+def _output_target(params):
+    """Đầu ra của công việc (None với chế độ kiểm tra): hai công việc cùng đầu ra không chạy cùng lúc"""
+    if params.get('dry_run') or params.get('report_path'):
+        return None
+    target = params['output_folder']
+    if params.get('output_kind', 'folder') != 'folder':
+        target = output.archive_path(target, params['output_kind'])
+    return os.path.normcase(os.path.abspath(target))
+
+
+class JobQueue:
+    """Hàng đợi công việc bền vững: mỗi công việc là <id>.json và nhật ký <id>.log trong thư mục trạng thái"""
+
+    def __init__(self, state_dir=DEFAULT_STATE_DIR, keep_jobs=DEFAULT_KEEP_JOBS):
+        """
+        Args:
+            state_dir (str): Thư mục lưu công việc và nhật ký
+            keep_jobs (int): Số công việc đã kết thúc được giữ lại khi khởi động
+        """
+        self.state_dir = state_dir
+        self.keep_jobs = keep_jobs
+        self.jobs = {}
+        self._cancel_events = {}
+        self._condition = threading.Condition()
+        self._stopping = False
+        os.makedirs(state_dir, exist_ok=True)
+        self._load()
+
+    def _path(self, job_id, ext):
+        return os.path.join(self.state_dir, job_id + ext)
+
+    def _save(self, job):
+        """Ghi công việc (ghi file tạm rồi đổi tên để không bị hỏng giữa chừng)"""
+        path = self._path(job['id'], '.json')
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(job, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+
+    def log(self, job_id, message):
+        """Ghi một dòng vào nhật ký của công việc"""
+        with open(self._path(job_id, '.log'), 'a', encoding='utf-8') as f:
+            f.write(message + "\n")
+
+    def _load(self):
+        """Đọc các công việc của lần chạy trước; công việc đang chạy dở được xếp lại hàng đợi"""
+        for name in os.listdir(self.state_dir):
+            if not name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.state_dir, name), 'r', encoding='utf-8') as f:
+                    job = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if job.get('state') == 'running':
+                self._requeue(job, "🔁 Dịch vụ đã khởi động lại khi công việc đang chạy, xếp lại hàng đợi")
+                self._save(job)
+            self.jobs[job['id']] = job
+
+        # Chỉ giữ keep_jobs công việc đã kết thúc gần nhất
+        finished = sorted((job for job in self.jobs.values() if job['state'] in FINISHED_STATES),
+                          key=lambda job: job['submitted'])
+        for job in finished[:max(len(finished) - self.keep_jobs, 0)]:
+            del self.jobs[job['id']]
+            for ext in ('.json', '.log'):
+                try:
+                    os.remove(self._path(job['id'], ext))
+                except FileNotFoundError:
+                    pass
+
+    def _requeue(self, job, message):
+        """Đưa công việc bị gián đoạn về hàng đợi; đầu ra thư mục tiếp tục từ checkpoint"""
+        job['state'] = 'queued'
+        job['started'] = None
+        params = job['params']
+        if params.get('output_kind', 'folder') == 'folder' and _output_target(params) is not None:
+            params['resume'] = True
+        self.log(job['id'], message)
+
+    def submit(self, params, lane):
+        """
+        Thêm công việc vào hàng đợi
+
+        Args:
+            params (dict): Tham số đã kiểm tra (xem validate_job)
+            lane (str): 'package' hoặc 'com'
+
+        Returns:
+            dict: Bản sao công việc
+        """
+        job = {
+            'id': f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}",
+            'state': 'queued',
+            'lane': lane,
+            'user': params.pop('user', None),
+            'params': params,
+            'submitted': time.time(),
+            'started': None,
+            'finished': None,
+            'ok': None,
+            'error': None,
+            'attempts': 0,
+            'progress': {'total': None, 'done': 0, 'processed': 0, 'skipped': 0},
+        }
+        with self._condition:
+            self.jobs[job['id']] = job
+            self._save(job)
+            self.log(job['id'], f"📥 Đã nhận công việc: {os.path.basename(params['excel_file_path'])}"
+                                + (f" (người gửi: {job['user']})" if job['user'] else ""))
+            self._condition.notify_all()
+            return json.loads(json.dumps(job))
+
+    def get(self, job_id):
+        """
+        Bản sao công việc kèm vị trí trong hàng đợi
+
+        Raises:
+            KeyError: Không có công việc
+        """
+        with self._condition:
+            job = json.loads(json.dumps(self.jobs[job_id]))
+            if job['state'] == 'queued':
+                job['position'] = sum(1 for other in self.jobs.values()
+                                      if other['state'] == 'queued' and other['submitted'] <= job['submitted'])
+            return job
+
+    def list(self):
+        """Danh sách công việc theo thứ tự gửi (không kèm tham số)"""
+        with self._condition:
+            jobs = sorted(self.jobs.values(), key=lambda job: job['submitted'])
+            return [{key: value for key, value in job.items() if key != 'params'} for job in jobs]
+
+    def counts(self):
+        """Số công việc theo trạng thái"""
+        with self._condition:
+            counts = dict.fromkeys(JOB_STATES, 0)
+            for job in self.jobs.values():
+                counts[job['state']] += 1
+            return counts
+
+    def read_log(self, job_id, offset=0):
+        """
+        Đọc nhật ký của công việc từ vị trí offset (chỉ trả về các dòng đã ghi trọn)
+
+        Returns:
+            dict: {'lines': [...], 'offset': vị trí kế tiếp, 'state': trạng thái công việc}
+        """
+        state = self.get(job_id)['state']
+        try:
+            with open(self._path(job_id, '.log'), 'rb') as f:
+                f.seek(offset)
+                data = f.read(MAX_LOG_BYTES)
+        except FileNotFoundError:
+            data = b''
+        end = data.rfind(b'\n') + 1
+        return {'lines': data[:end].decode('utf-8', 'replace').splitlines(), 'offset': offset + end,
+                'state': state}
+
+    def cancel(self, job_id):
+        """
+        Hủy công việc đang chờ, hoặc yêu cầu công việc đang chạy dừng ở ranh giới hàng
+
+        Raises:
+            KeyError: Không có công việc
+            ValueError: Công việc đã kết thúc
+        """
+        with self._condition:
+            job = self.jobs[job_id]
+            if job['state'] in FINISHED_STATES:
+                raise ValueError(f"Công việc đã kết thúc ({job['state']})")
+            if job['state'] == 'queued':
+                job['state'] = 'cancelled'
+                job['finished'] = time.time()
+                self._save(job)
+                self.log(job_id, "⏹️ Đã hủy công việc trước khi chạy")
+            else:
+                job['cancel_requested'] = True
+                self._cancel_events[job_id].set()
+                self.log(job_id, "⏹️ Đã yêu cầu dừng, công việc dừng sau hàng hiện tại")
+        return self.get(job_id)
+
+    def next_job(self, lane):
+        """
+        Chờ và lấy công việc kế tiếp của một luồng xử lý (theo thứ tự gửi, bỏ qua công việc
+        có đầu ra đang được công việc khác ghi)
+
+        Returns:
+            tuple: (bản sao công việc, threading.Event yêu cầu dừng), None khi dịch vụ dừng
+        """
+        with self._condition:
+            while not self._stopping:
+                busy = {_output_target(job['params']) for job in self.jobs.values() if job['state'] == 'running'}
+                queued = sorted((job for job in self.jobs.values() if job['state'] == 'queued'
+                                 and job['lane'] == lane), key=lambda job: job['submitted'])
+                for job in queued:
+                    target = _output_target(job['params'])
+                    if target is not None and target in busy:
+                        continue
+                    job['state'] = 'running'
+                    job['started'] = time.time()
+                    job['attempts'] += 1
+                    job['progress'] = {'total': None, 'done': 0, 'processed': 0, 'skipped': 0}
+                    job.pop('cancel_requested', None)
+                    self._save(job)
+                    cancel_event = threading.Event()
+                    self._cancel_events[job['id']] = cancel_event
+                    return json.loads(json.dumps(job)), cancel_event
+                self._condition.wait()
+        return None
+
+    def update_progress(self, job_id, event):
+        """Cập nhật tiến trình từ sự kiện xuất ảnh (chỉ trong bộ nhớ)"""
+        with self._condition:
+            progress = self.jobs[job_id]['progress']
+            if event['type'] == 'phase_start' and event['phase'] == 'export':
+                progress['total'] = event.get('total')
+            elif event['type'] == 'row_processed':
+                progress['done'] += 1
+                progress['processed'] += 1
+            elif event['type'] == 'row_skipped':
+                progress['done'] += 1
+                progress['skipped'] += 1
+
+    def finish(self, job_id, ok, error=None):
+        """Ghi nhận kết quả công việc; công việc bị dừng do dịch vụ dừng được xếp lại hàng đợi"""
+        with self._condition:
+            job = self.jobs[job_id]
+            cancel_event = self._cancel_events.pop(job_id)
+            if self._stopping and cancel_event.is_set() and not job.get('cancel_requested'):
+                self._requeue(job, "⏸️ Dịch vụ dừng, công việc sẽ chạy tiếp khi dịch vụ khởi động lại")
+            else:
+                job['state'] = 'succeeded' if ok else ('cancelled' if cancel_event.is_set() else 'failed')
+                job['finished'] = time.time()
+                job['ok'] = ok
+                job['error'] = error
+            self._save(job)
+            self._condition.notify_all()
+
+    def stop(self):
+        """Ngừng phát công việc mới và yêu cầu các công việc đang chạy dừng ở ranh giới hàng"""
+        with self._condition:
+            self._stopping = True
+            for cancel_event in self._cancel_events.values():
+                cancel_event.set()
+            self._condition.notify_all()
+
+
+class ExportService:
+    """Nhóm luồng xử lý công việc trong hàng đợi, dùng lại phiên backend giữa các công việc"""
+
+    def __init__(self, jobs, job_workers=2, workers=1):
+        """
+        Args:
+            jobs (JobQueue): Hàng đợi công việc
+            job_workers (int): Số công việc backend 'ooxml' chạy song song
+            workers (int): Số tiến trình mã hóa/ghi ảnh của nhóm tiến trình dùng chung
+        """
+        self.jobs = jobs
+        self.job_workers = max(1, job_workers)
+        self.workers = max(1, workers)
+        self._session = None
+        self._threads = []
+
+    def start(self):
+        """Tạo nhóm tiến trình dùng chung và khởi động các luồng xử lý"""
+        from session import ExportSession
+
+        self._session = ExportSession(workers=self.workers)
+        # Tạo trước để các luồng không cùng lúc tạo nhiều nhóm tiến trình
+        self._session.executor()
+        lanes = ['package'] * self.job_workers + ['com']
+        for index, lane in enumerate(lanes):
+            thread = threading.Thread(target=self._work, args=(lane,), name=f"{lane}-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        """Dừng các luồng xử lý (công việc đang chạy dừng ở ranh giới hàng) và đóng phiên"""
+        self.jobs.stop()
+        for thread in self._threads:
+            thread.join()
+        if self._session is not None:
+            self._session.close()
+
+    def _work(self, lane):
+        """Vòng xử lý của một luồng: luồng COM dùng Excel riêng, khởi động trong chính luồng đó"""
+        from session import ExportSession
+
+        session = self._session if lane == 'package' else ExportSession(workers=1)
+        try:
+            while True:
+                item = self.jobs.next_job(lane)
+                if item is None:
+                    break
+                job, cancel_event = item
+                self._run(job, cancel_event, session)
+        finally:
+            if session is not self._session:
+                session.close()
+
+    def _run(self, job, cancel_event, session):
+        """Chạy một công việc: nhật ký ghi vào <id>.log, tiến trình lấy từ sự kiện"""
+        import van
+
+        job_id = job['id']
+        params = dict(job['params'])
+        report_path = params.pop('report_path', None)
+        report = preflight.PreflightReport() if report_path else None
+        progress = events.CallbackSink(lambda event: self.jobs.update_progress(job_id, event))
+        ok = False
+        error = None
+        with open(os.path.join(self.jobs.state_dir, job_id + '.log'), 'a', encoding='utf-8', buffering=1) as log_file:
+            def log_callback(message):
+                log_file.write(message + "\n")
+
+            log_callback(f"🚀 Bắt đầu công việc (lần chạy {job['attempts']}, luồng {job['lane']})")
+            try:
+                ok = van.export_images(log_callback=log_callback,
+                                       workers=self.workers if job['lane'] == 'package' else 1,
+                                       session=session, cancel_event=cancel_event,
+                                       event_sinks=[progress, report],
+                                       **dict(params, dry_run=params.get('dry_run', False) or report is not None))
+                if report is not None:
+                    for line in report.report():
+                        log_callback(line)
+                    report.write(report_path)
+                    log_callback(f"📝 Đã ghi báo cáo: {report_path}")
+            except Exception as e:
+                error = str(e)
+                log_callback(f"❌ LỖI: {error}")
+            if not ok and error is None and not cancel_event.is_set():
+                error = "Xuất ảnh không thành công, xem nhật ký"
+        self.jobs.finish(job_id, ok, error)
+
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    """Xử lý yêu cầu HTTP của API công việc"""
+
+    server_version = 'AnhTheService/1.0'
+
+    def log_message(self, format, *args):
+        # Không in nhật ký truy cập (client hỏi trạng thái liên tục)
+        pass
+
+    def do_GET(self):
+        self._dispatch('GET')
+
+    def do_POST(self):
+        self._dispatch('POST')
+
+    def _send(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if not length:
+            return {}
+        try:
+            return json.loads(self.rfile.read(length).decode('utf-8'))
+        except ValueError:
+            raise ValueError("Nội dung yêu cầu không phải JSON hợp lệ") from None
+
+    def _host_allowed(self):
+        """Chỉ nhận header Host là máy cục bộ hoặc đúng địa chỉ đang lắng nghe"""
+        host = urllib.parse.urlsplit('//' + (self.headers.get('Host') or '')).hostname or ''
+        return host in LOCAL_HOSTS or host == self.server.server_address[0]
+
+    def _dispatch(self, method):
+        jobs = self.server.jobs
+        url = urllib.parse.urlsplit(self.path)
+        parts = [part for part in url.path.split('/') if part]
+        try:
+            if not self._host_allowed():
+                return self._send(403, {'error': "Chỉ nhận yêu cầu tới localhost"})
+            # POST phải là JSON: trình duyệt không gửi được loại này tới localhost mà không qua CORS
+            if method == 'POST' and self.headers.get('Content-Type', '').split(';')[0].strip() != 'application/json':
+                return self._send(415, {'error': "Yêu cầu POST phải có Content-Type: application/json"})
+
+            if method == 'GET' and parts == ['health']:
+                return self._send(200, {'ok': True, 'jobs': jobs.counts(), 'job_workers': self.server.job_workers,
+                                        'workers': self.server.workers})
+            if method == 'GET' and parts == ['jobs']:
+                return self._send(200, {'jobs': jobs.list()})
+            if method == 'POST' and parts == ['jobs']:
+                import van
+
+                params = validate_job(self._read_json(), self.server.allowed_roots)
+                backend = van.resolve_backend(params['excel_file_path'], params.get('backend', 'auto'))
+                return self._send(201, jobs.submit(params, 'com' if backend == 'com' else 'package'))
+            if method == 'GET' and len(parts) == 2 and parts[0] == 'jobs':
+                return self._send(200, jobs.get(parts[1]))
+            if method == 'GET' and len(parts) == 3 and parts[0] == 'jobs' and parts[2] == 'log':
+                query = urllib.parse.parse_qs(url.query)
+                offset = int(query.get('offset', ['0'])[0])
+                return self._send(200, jobs.read_log(parts[1], max(offset, 0)))
+            if method == 'POST' and len(parts) == 3 and parts[0] == 'jobs' and parts[2] == 'cancel':
+                return self._send(200, jobs.cancel(parts[1]))
+            return self._send(404, {'error': f"Không có đường dẫn {method} {url.path}"})
+        except KeyError:
+            return self._send(404, {'error': "Không tìm thấy công việc"})
+        except ValueError as e:
+            return self._send(400, {'error': str(e)})
+        except Exception as e:
+            return self._send(500, {'error': str(e)})
+
+
+def make_server(jobs, host=DEFAULT_HOST, port=DEFAULT_PORT, job_workers=2, workers=1,
+                allowed_roots=DEFAULT_ALLOWED_ROOTS):
+    """
+    Tạo máy chủ HTTP cho hàng đợi công việc (chưa chạy serve_forever)
+
+    Args:
+        jobs (JobQueue): Hàng đợi công việc
+        host (str): Địa chỉ lắng nghe (mặc định chỉ máy cục bộ)
+        port (int): Cổng (0: chọn cổng trống)
+        job_workers (int), workers (int): Chỉ để báo cáo ở /health
+        allowed_roots (tuple): Các thư mục gốc được phép đọc/ghi (xem validate_job)
+
+    Returns:
+        ThreadingHTTPServer
+    """
+    server = ThreadingHTTPServer((host, port), _RequestHandler)
+    server.daemon_threads = True
+    server.jobs = jobs
+    server.job_workers = job_workers
+    server.workers = workers
+    server.allowed_roots = tuple(os.path.abspath(root) for root in allowed_roots)
+    return server
+
+
+def service_url():
+    """Địa chỉ dịch vụ cho phía client (biến môi trường ANHTHE_SERVICE_URL hoặc mặc định)"""
+    return os.environ.get(SERVICE_URL_ENV) or DEFAULT_URL
+
+
+def _request(method, path, payload=None, url=None, timeout=REQUEST_TIMEOUT):
+    """
+    Gửi yêu cầu tới dịch vụ
+
+    Raises:
+        OSError: Không kết nối được dịch vụ
+        ValueError: Dịch vụ từ chối yêu cầu (thông báo lỗi của dịch vụ)
+    """
+    data = json.dumps(payload, ensure_ascii=False).encode('utf-8') if payload is not None else None
+    request = urllib.request.Request((url or service_url()).rstrip('/') + path, data=data, method=method,
+                                     headers={'Content-Type': 'application/json'})
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return json.loads(response.read().decode('utf-8'))
+    except urllib.error.HTTPError as e:
+        try:
+            message = json.loads(e.read().decode('utf-8')).get('error')
+        except ValueError:
+            message = None
+        raise ValueError(message or f"Dịch vụ trả về lỗi HTTP {e.code}") from None
+
+
+def is_available(url=None):
+    """True nếu dịch vụ đang chạy và trả lời được"""
+    try:
+        return bool(_request('GET', '/health', url=url, timeout=2).get('ok'))
+    except (OSError, ValueError):
+        return False
+
+
+def submit_job(params, url=None):
+    """
+    Gửi công việc xuất ảnh tới dịch vụ
+
+    Args:
+        params (dict): Tham số export_images (JOB_OPTIONS) và report_path / user;
+            đường dẫn tương đối được chuyển thành tuyệt đối theo thư mục hiện tại
+        url (str): Địa chỉ dịch vụ (None: service_url())
+
+    Returns:
+        dict: Công việc đã xếp hàng ('id', 'state', ...)
+    """
+    params = {key: value for key, value in params.items() if value is not None}
+    for key in PATH_OPTIONS:
+        if key in params:
+            params[key] = os.path.abspath(params[key])
+    return _request('POST', '/jobs', params, url=url)
+
+
+def get_job(job_id, url=None):
+    """Trạng thái và tiến trình của công việc"""
+    return _request('GET', f"/jobs/{urllib.parse.quote(job_id)}", url=url)
+
+
+def read_log(job_id, offset=0, url=None):
+    """Các dòng nhật ký mới của công việc: {'lines', 'offset' (vị trí kế tiếp), 'state'}"""
+    return _request('GET', f"/jobs/{urllib.parse.quote(job_id)}/log?offset={int(offset)}", url=url)
+
+
+def cancel_job(job_id, url=None):
+    """Hủy công việc đang chờ hoặc dừng công việc đang chạy"""
+    return _request('POST', f"/jobs/{urllib.parse.quote(job_id)}/cancel", {}, url=url)
+
+
+def build_parser():
+    """Tạo bộ phân tích tham số dòng lệnh"""
+    parser = argparse.ArgumentParser(description="Dịch vụ xuất ảnh thẻ cục bộ (HTTP trên localhost)")
+    parser.add_argument('--host', default=DEFAULT_HOST,
+                        help="Địa chỉ lắng nghe (mặc định: chỉ máy cục bộ)")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT,
+                        help=f"Cổng (mặc định: {DEFAULT_PORT})")
+    parser.add_argument('--job-workers', type=int, default=2,
+                        help="Số công việc backend ooxml chạy song song (công việc COM luôn chạy tuần tự)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help="Số tiến trình mã hóa/ghi ảnh dùng chung (mặc định: số lõi CPU)")
+    parser.add_argument('--state-dir', default=DEFAULT_STATE_DIR,
+                        help="Thư mục lưu hàng đợi công việc và nhật ký")
+    parser.add_argument('--allow-root', dest='allowed_roots', metavar='DIR', action='append', default=None,
+                        help="Thư mục gốc được phép đọc/ghi, dùng nhiều lần cho nhiều thư mục "
+                             "(mặc định: thư mục người dùng chạy dịch vụ)")
+    return parser
+
+
+def main(argv=None):
+    """
+    Điểm vào dòng lệnh: chạy dịch vụ đến khi nhấn Ctrl+C
+
+    Returns:
+        int: Mã thoát
+    """
+    args = build_parser().parse_args(argv)
+    jobs = JobQueue(args.state_dir)
+    counts = jobs.counts()
+    service = ExportService(jobs, job_workers=args.job_workers, workers=args.workers)
+    try:
+        server = make_server(jobs, args.host, args.port, service.job_workers, service.workers,
+                             args.allowed_roots or DEFAULT_ALLOWED_ROOTS)
+    except OSError as e:
+        print(f"❌ Không mở được cổng {args.host}:{args.port}: {str(e)}")
+        return 1
+    service.start()
+    host, port = server.server_address[:2]
+    print(f"🌐 Dịch vụ xuất ảnh: http://{host}:{port}")
+    print(f"⚙️ {service.job_workers} công việc ooxml song song, 1 công việc COM, {service.workers} tiến trình mã hóa")
+    print(f"📂 Thư mục hàng đợi: {os.path.abspath(args.state_dir)} ({counts['queued']} công việc đang chờ)")
+    print(f"🔒 Thư mục được phép: {', '.join(server.allowed_roots)}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n⏹️ Đang dừng dịch vụ (công việc đang chạy dừng sau hàng hiện tại)...")
+    finally:
+        server.server_close()
+        service.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    # Cần cho ProcessPoolExecutor khi đóng gói bằng PyInstaller trên Windows
+    multiprocessing.freeze_support()
+    sys.exit(main())
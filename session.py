@@ -0,0 +1,76 @@
+"""
+Module phiên xuất ảnh dùng chung tài nguyên backend
+
+Mục đích:
+    - Khởi động Excel (backend COM) một lần cho nhiều workbook
+    - Dùng chung nhóm tiến trình mã hóa/ghi ảnh (backend OOXML) giữa các workbook
+    - Giải phóng toàn bộ tài nguyên khi kết thúc phiên
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+
+
+class ExportSession:
+    """Tài nguyên backend dùng chung cho nhiều lần gọi export_images"""
+
+    def __init__(self, workers=1):
+        """
+        Args:
+            workers (int): Số tiến trình của nhóm tiến trình dùng chung
+        """
+        self.workers = workers
+        self._excel = None
+        self._executor = None
+        self._com_initialized = False
+
+    def excel(self):
+        """
+        Lấy ứng dụng Excel của phiên, khởi động ở chế độ ẩn nếu chưa có
+
+        Returns:
+            Excel.Application (COM)
+        """
+        if self._excel is None:
+            import win32com.client as win32
+            import pythoncom
+
+            pythoncom.CoInitialize()
+            self._com_initialized = True
+            self._excel = win32.Dispatch('Excel.Application')
+            self._excel.Visible = False
+            self._excel.DisplayAlerts = False
+        return self._excel
+
+    def executor(self):
+        """
+        Lấy nhóm tiến trình dùng chung
+
+        Returns:
+            ProcessPoolExecutor hoặc None nếu chạy tuần tự (workers <= 1)
+        """
+        if self._executor is None and self.workers > 1:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor
+
+    def close(self):
+        """Đóng Excel, nhóm tiến trình và giải phóng COM"""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        if self._excel is not None:
+            try:
+                self._excel.Quit()
+            except Exception:
+                pass
+            self._excel = None
+        if self._com_initialized:
+            import pythoncom
+
+            pythoncom.CoUninitialize()
+            self._com_initialized = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.close()
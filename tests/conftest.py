@@ -0,0 +1,12 @@
+"""
+Cấu hình pytest: các module của dự án nằm ở thư mục gốc (không phải package)
+"""
+
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# bench/: bộ tạo file Excel giả lập (generate_workbook) dùng làm dữ liệu kiểm thử
+for path in (ROOT, os.path.join(ROOT, 'bench')):
+    if path not in sys.path:
+        sys.path.insert(0, path)
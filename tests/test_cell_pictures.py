@@ -0,0 +1,110 @@
+"""
+Kiểm tra ảnh đặt trong ô (Place in Cell): chuỗi vm -> metadata.xml -> rich value ->
+richValueRel.xml -> xl/media/*
+
+Gói .xlsx được tạo trực tiếp bằng zipfile, ảnh là bytes giả (không cần Pillow).
+"""
+
+import os
+import zipfile
+
+import ooxml
+import van
+
+MAIN = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+REL = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+PKG_REL = 'http://schemas.openxmlformats.org/package/2006/relationships'
+RICH = 'http://schemas.microsoft.com/office/spreadsheetml/2017/richdata'
+
+# Ảnh của từng rich value (theo thứ tự quan hệ trong richValueRel.xml)
+MEDIA = [('image1.png', b'\x89PNG\r\n\x1a\nanh-do'), ('image2.jpeg', b'\xff\xd8\xffanh-xanh'),
+         ('image3.png', b'\x89PNG\r\n\x1a\nanh-luc')]
+
+
+def _relationships(items):
+    return (f'<Relationships xmlns="{PKG_REL}">'
+            + ''.join(f'<Relationship Id="{rel_id}" Type="{rel_type}" Target="{target}"/>'
+                      for rel_id, rel_type, target in items)
+            + '</Relationships>')
+
+
+def _build(path, rows=4):
+    """
+    Sheet 'DS': mã NV 500 + i ở cột A, ảnh trong ô C dùng vm = i % 3 + 1; hàng 3 không có ảnh
+    """
+    sheet_rows = ['<row r="1"><c r="A1" t="inlineStr"><is><t>Mã NV</t></is></c>'
+                  '<c r="B1" t="inlineStr"><is><t>Họ tên</t></is></c>'
+                  '<c r="C1" t="inlineStr"><is><t>Ảnh</t></is></c></row>']
+    for i in range(rows):
+        row = i + 2
+        cell = '' if row == 3 else f'<c r="C{row}" t="e" vm="{i % 3 + 1}"><v>#VALUE!</v></c>'
+        sheet_rows.append(f'<row r="{row}"><c r="A{row}"><v>{500 + i}</v></c>'
+                          f'<c r="B{row}" t="inlineStr"><is><t>Trần {i}</t></is></c>{cell}</row>')
+
+    with zipfile.ZipFile(path, 'w') as zf:
+        zf.writestr('[Content_Types].xml',
+                    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types"/>')
+        zf.writestr('xl/workbook.xml', f'<workbook xmlns="{MAIN}" xmlns:r="{REL}"><sheets>'
+                                       '<sheet name="DS" sheetId="1" r:id="rId1"/></sheets></workbook>')
+        zf.writestr('xl/_rels/workbook.xml.rels', _relationships([
+            ('rId1', f'{REL}/worksheet', 'worksheets/sheet1.xml'),
+            ('rId5', f'{REL}/sheetMetadata', 'metadata.xml'),
+            ('rId6', 'http://schemas.microsoft.com/office/2022/10/relationships/richValueRel',
+             'richData/richValueRel.xml'),
+            ('rId7', 'http://schemas.microsoft.com/office/2017/06/relationships/rdRichValue',
+             'richData/rdrichvalue.xml'),
+            ('rId8', 'http://schemas.microsoft.com/office/2017/06/relationships/rdRichValueStructure',
+             'richData/rdrichvaluestructure.xml')]))
+        zf.writestr('xl/worksheets/sheet1.xml', f'<worksheet xmlns="{MAIN}"><dimension ref="A1:C{rows + 1}"/>'
+                                                f'<sheetData>{"".join(sheet_rows)}</sheetData></worksheet>')
+        zf.writestr('xl/metadata.xml', (
+            f'<metadata xmlns="{MAIN}" xmlns:xlrd="{RICH}">'
+            '<metadataTypes count="1"><metadataType name="XLRICHVALUE" minSupportedVersion="120000"/>'
+            '</metadataTypes><futureMetadata name="XLRICHVALUE" count="3">'
+            + ''.join('<bk><extLst><ext uri="{3e2802c4-a4d2-4d8b-9148-e3be6c30e623}">'
+                      f'<xlrd:rvb i="{i}"/></ext></extLst></bk>' for i in range(3))
+            + '</futureMetadata><valueMetadata count="3">'
+            + ''.join(f'<bk><rc t="1" v="{i}"/></bk>' for i in range(3))
+            + '</valueMetadata></metadata>'))
+        # Hai cấu trúc _localImage với thứ tự khóa khác nhau
+        zf.writestr('xl/richData/rdrichvaluestructure.xml', (
+            f'<rvStructures xmlns="{RICH}" count="2">'
+            '<s t="_localImage"><k n="_rvRel:LocalImageIdentifier" t="i"/><k n="CalcOrigin" t="i"/></s>'
+            '<s t="_localImage"><k n="CalcOrigin" t="i"/><k n="Text" t="s"/>'
+            '<k n="_rvRel:LocalImageIdentifier" t="i"/></s></rvStructures>'))
+        zf.writestr('xl/richData/rdrichvalue.xml', (
+            f'<rvData xmlns="{RICH}" count="3">'
+            '<rv s="0"><v>0</v><v>5</v></rv><rv s="1"><v>5</v><v>Chân dung</v><v>1</v></rv>'
+            '<rv s="0"><v>2</v><v>5</v></rv></rvData>'))
+        zf.writestr('xl/richData/richValueRel.xml', (
+            f'<richValueRels xmlns="http://schemas.microsoft.com/office/spreadsheetml/2022/richvaluerel" '
+            f'xmlns:r="{REL}"><rel r:id="rId1"/><rel r:id="rId2"/><rel r:id="rId3"/></richValueRels>'))
+        zf.writestr('xl/richData/_rels/richValueRel.xml.rels', _relationships(
+            [(f'rId{i + 1}', f'{REL}/image', f'../media/{name}') for i, (name, _) in enumerate(MEDIA)]))
+        for name, data in MEDIA:
+            zf.writestr(f'xl/media/{name}', data)
+    return path
+
+
+def test_read_cell_pictures(tmp_path):
+    path = _build(str(tmp_path / 'trong_o.xlsx'))
+    with ooxml.open_package(path) as zf:
+        _, sheet_part = ooxml.resolve_sheet(zf)
+        pictures = ooxml.read_pictures(zf, sheet_part)
+    assert [(p['from'][0], p['media']) for p in pictures] == [
+        (2, 'xl/media/image1.png'), (4, 'xl/media/image3.png'), (5, 'xl/media/image1.png')]
+
+
+def test_export_cell_pictures(tmp_path):
+    path = _build(str(tmp_path / 'trong_o.xlsx'))
+    output_folder = str(tmp_path / 'out')
+    messages = []
+    assert van.export_images(path, output_folder, backend='ooxml', incremental=False,
+                             log_callback=messages.append), "\n".join(messages)
+    media = dict(MEDIA)
+    expected = {'500_.png': media['image1.png'], '502_.png': media['image3.png'],
+                '503_.png': media['image1.png']}
+    assert sorted(os.listdir(output_folder)) == sorted(expected)
+    for filename, data in expected.items():
+        with open(os.path.join(output_folder, filename), 'rb') as f:
+            assert f.read() == data, filename
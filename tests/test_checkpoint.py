@@ -0,0 +1,104 @@
+"""
+Kiểm tra điểm khôi phục: ghi trạng thái hàng từ sự kiện, tiếp tục lần xuất dở
+(làm lại hàng lỗi) và bỏ qua checkpoint không khớp
+"""
+
+import json
+
+import pytest
+
+import checkpoint
+
+
+def _signature(tmp_path, **options):
+    workbook = tmp_path / 'anh_the.xlsx'
+    if not workbook.exists():
+        workbook.write_bytes(b'PK')
+    return checkpoint.make_signature(str(workbook), sheet='DS', output_format='original', **options)
+
+
+def _interrupted_run(tmp_path, signature):
+    """Lần chạy bị dừng sau hàng 6: hàng 4 lỗi, hàng 5 không có ảnh"""
+    first = checkpoint.Checkpoint(str(tmp_path), signature, interval=3600)
+    for event in ({'type': 'row_processed', 'row': 2}, {'type': 'row_skipped', 'row': 3, 'reason': 'unchanged'},
+                  {'type': 'row_skipped', 'row': 4, 'reason': 'error'},
+                  {'type': 'row_skipped', 'row': 5, 'reason': 'missing'}, {'type': 'row_processed', 'row': 6},
+                  # Sự kiện không liên quan tới trạng thái hàng
+                  {'type': 'mapping', 'row': 7}):
+        first.emit(event)
+    first.close()
+    return first
+
+
+def test_resume_retries_errors(tmp_path):
+    signature = _signature(tmp_path)
+    _interrupted_run(tmp_path, signature)
+
+    resumed = checkpoint.Checkpoint(str(tmp_path), signature)
+    assert resumed.load() is None
+    assert 'error' in checkpoint.RETRY_STATUSES
+    assert [row for row in range(2, 9) if resumed.is_done(row)] == [2, 3, 5, 6]
+    assert resumed.last_row() == 3
+
+    # Hàng đã xong ở lần trước được báo 'resumed': không ghi đè trạng thái cũ
+    resumed.emit({'type': 'row_skipped', 'row': 2, 'reason': 'resumed'})
+    resumed.emit({'type': 'row_processed', 'row': 4})
+    resumed.emit({'type': 'row_processed', 'row': 7})
+    assert resumed.rows == {2: 'processed', 3: 'unchanged', 4: 'processed', 5: 'missing', 6: 'processed',
+                            7: 'processed'}
+    assert resumed.last_row() == 7
+
+
+def test_checkpoint_file(tmp_path):
+    signature = _signature(tmp_path)
+    first = _interrupted_run(tmp_path, signature)
+    with open(first.path, encoding='utf-8') as f:
+        data = json.load(f)
+    assert data['version'] == checkpoint.CHECKPOINT_VERSION and data['last_row'] == 6
+    assert data['rows'] == {'2': 'processed', '3': 'unchanged', '4': 'error', '5': 'missing', '6': 'processed'}
+    first.remove()
+    first.remove()
+    assert not (tmp_path / checkpoint.CHECKPOINT_NAME).exists()
+
+
+def test_save_is_throttled(tmp_path):
+    saved = checkpoint.Checkpoint(str(tmp_path), _signature(tmp_path), interval=3600)
+    saved.emit({'type': 'row_processed', 'row': 2})
+    assert not (tmp_path / checkpoint.CHECKPOINT_NAME).exists()
+    every_event = checkpoint.Checkpoint(str(tmp_path), _signature(tmp_path), interval=0)
+    every_event.emit({'type': 'row_processed', 'row': 2})
+    assert (tmp_path / checkpoint.CHECKPOINT_NAME).exists()
+
+
+@pytest.mark.parametrize('change', ['options', 'workbook', 'version'])
+def test_mismatched_checkpoint_is_ignored(tmp_path, change):
+    signature = _signature(tmp_path)
+    first = _interrupted_run(tmp_path, signature)
+    if change == 'options':
+        signature = _signature(tmp_path, filename_template='{ma_nv}_{ho_ten_slug}.{ext}')
+    elif change == 'workbook':
+        (tmp_path / 'anh_the.xlsx').write_bytes(b'PK workbook da sua')
+        signature = _signature(tmp_path)
+    else:
+        with open(first.path, encoding='utf-8') as f:
+            data = json.load(f)
+        data['version'] = checkpoint.CHECKPOINT_VERSION + 1
+        with open(first.path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+
+    resumed = checkpoint.Checkpoint(str(tmp_path), signature)
+    assert resumed.load() == 'mismatch'
+    assert not resumed.is_done(2) and resumed.last_row() is None
+
+
+def test_missing_or_broken_checkpoint(tmp_path):
+    resumed = checkpoint.Checkpoint(str(tmp_path), _signature(tmp_path))
+    assert resumed.load() == 'missing'
+    (tmp_path / checkpoint.CHECKPOINT_NAME).write_text('{hỏng', encoding='utf-8')
+    assert resumed.load() == 'missing'
+
+
+def test_signature_survives_json_round_trip(tmp_path):
+    signature = _signature(tmp_path, resize=(600, 800))
+    assert signature['resize'] == [600, 800] and signature['source'] == 'anh_the.xlsx'
+    assert json.loads(json.dumps(signature)) == signature
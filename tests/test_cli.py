@@ -0,0 +1,34 @@
+"""
+Kiểm tra chế độ dòng lệnh: thư mục đầu ra riêng cho từng workbook
+"""
+
+import os
+
+import cli
+
+
+def _names(folders):
+    return {path: os.path.basename(folder) for path, folder in folders.items()}
+
+
+def test_distinct_stems_use_stem():
+    workbooks = [os.path.join('hr', 'a.xlsx'), os.path.join('hr', 'b.xlsx')]
+    assert _names(cli._workbook_folders('out', workbooks)) == {workbooks[0]: 'a', workbooks[1]: 'b'}
+
+
+def test_same_stem_in_different_folders_adds_parent():
+    workbooks = [os.path.join('hn', 'a.xlsx'), os.path.join('hcm', 'a.xlsx')]
+    assert _names(cli._workbook_folders('out', workbooks)) == {workbooks[0]: 'hn_a', workbooks[1]: 'hcm_a'}
+
+
+def test_same_stem_in_same_folder_adds_extension():
+    workbooks = [os.path.join('dir', 'a.xls'), os.path.join('dir', 'a.xlsx'), os.path.join('dir', 'b.xlsx')]
+    names = _names(cli._workbook_folders('out', workbooks))
+    assert names == {workbooks[0]: 'dir_a_xls', workbooks[1]: 'dir_a_xlsx', workbooks[2]: 'b'}
+
+
+def test_folders_are_unique_ignoring_case():
+    workbooks = [os.path.join('x', 'dir', 'A.xlsx'), os.path.join('y', 'dir', 'a.xlsx'), os.path.join('dir', 'a.XLSX')]
+    folders = cli._workbook_folders('out', workbooks)
+    assert len({folder.lower() for folder in folders.values()}) == len(workbooks)
+    assert all(os.path.dirname(folder) == 'out' for folder in folders.values())
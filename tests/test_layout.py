@@ -0,0 +1,80 @@
+"""
+Kiểm tra bố cục sheet: nhận diện hàng tiêu đề tiếng Việt (có / không dấu), cấu hình
+cột và bố cục mặc định
+"""
+
+import unicodedata
+
+import pytest
+
+import layout
+
+
+def test_fold_text():
+    assert layout.strip_diacritics('Nguyễn Văn Đức') == 'Nguyen Van Duc'
+    assert layout.fold_text('  HỌ   và\tTÊN ') == 'ho va ten'
+    # Chữ tổ hợp (NFD) như khi dán từ Word / macOS
+    assert layout.fold_text(unicodedata.normalize('NFD', 'Mã Nhân Viên')) == 'ma nhan vien'
+
+
+@pytest.mark.parametrize('column, number', [(5, 5), ('5', 5), ('E', 5), ('e', 5), ('AA', 27), ('', None),
+                                            (None, None)])
+def test_column_number(column, number):
+    assert layout.column_number(column) == number
+    if number:
+        assert layout.column_number(layout.column_letter(number)) == number
+
+
+@pytest.mark.parametrize('column', [0, 'A1', 'ABCD', '-1'])
+def test_column_number_rejects_invalid(column):
+    with pytest.raises(ValueError):
+        layout.column_number(column)
+
+
+def test_detect_headers_with_diacritics_and_extra_columns():
+    rows = [
+        (1, {1: 'DANH SÁCH ẢNH THẺ NHÂN VIÊN CÔNG TY TNHH MỘT THÀNH VIÊN'}),
+        (2, {}),
+        (3, {1: 'STT', 2: 'Mã nhân viên (*)', 3: 'Phòng ban', 4: 'HỌ VÀ TÊN', 5: 'Ảnh thẻ'}),
+        (4, {1: 1, 2: 1001, 4: 'Nguyễn Văn An'}),
+    ]
+    assert layout.detect_headers(rows) == ({'ma_nv': 2, 'ho_ten': 4, 'photo': 5}, 3)
+
+
+def test_detect_headers_without_diacritics():
+    rows = [(1, {1: 'ma nv', 2: 'Ho Ten', 3: 'Hinh anh'})]
+    assert layout.detect_headers(rows) == ({'ma_nv': 1, 'ho_ten': 2, 'photo': 3}, 1)
+
+
+def test_detect_headers_over_two_rows():
+    # Tiêu đề gộp ô: "Ảnh" ở hàng trên, "Mã NV" / "Họ tên" ở hàng dưới
+    rows = [(1, {6: 'Ảnh'}), (2, {1: 'Mã NV', 2: 'Họ tên'}), (3, {1: 1001, 2: 'Anh'})]
+    assert layout.detect_headers(rows) == ({'photo': 6, 'ma_nv': 1, 'ho_ten': 2}, 2)
+
+
+def test_detect_headers_stops_before_data_rows():
+    # Không có hàng tiêu đề: tên nhân viên "Ảnh" không được coi là tiêu đề
+    rows = [(row, {1: 1000 + row, 2: 'Ảnh', 3: 'Photo'}) for row in range(1, 20)]
+    assert layout.detect_headers(rows) == ({}, None)
+
+
+def test_resolve_detected_layout():
+    rows = [(1, {}), (2, {2: 'Mã NV', 3: 'Họ tên', 5: 'Ảnh'})]
+    resolved = layout.resolve(layout.make_layout(), rows)
+    assert (resolved['ma_nv'], resolved['ho_ten'], resolved['photo']) == (2, 3, 5)
+    assert (resolved['header_row'], resolved['first_row'], resolved['detected']) == (2, 3, True)
+    assert layout.describe(resolved) == 'Mã NV: B, Họ tên: C, Ảnh: E (tiêu đề hàng 2, dữ liệu từ hàng 3)'
+
+
+def test_resolve_config_overrides_headers():
+    rows = [(1, {1: 'Mã NV', 2: 'Họ tên', 3: 'Ảnh'})]
+    resolved = layout.resolve(layout.make_layout(photo='F', first_row=5), rows)
+    assert (resolved['ma_nv'], resolved['photo'], resolved['first_row']) == (1, 6, 5)
+    assert resolved['sources'] == {'ma_nv': 'header', 'ho_ten': 'header', 'photo': 'config'}
+
+
+def test_resolve_default_layout():
+    resolved = layout.resolve(layout.make_layout(auto_detect=False), [(1, {1: 'Mã NV', 5: 'Ảnh'})])
+    assert (resolved['ma_nv'], resolved['ho_ten'], resolved['photo']) == (1, 2, 3)
+    assert (resolved['header_row'], resolved['first_row'], resolved['detected']) == (None, 2, False)
+    assert set(resolved['sources'].values()) == {'default'}
@@ -0,0 +1,117 @@
+"""
+Kiểm tra manifest xuất ảnh tăng dần: bỏ qua hàng không đổi, đọc / ghi manifest
+và xóa ảnh của mã NV không còn trong file
+"""
+
+import os
+
+import pytest
+
+import manifest
+
+
+def _exported(tmp_path, data=b'anh'):
+    filepath = tmp_path / '1001_.jpeg'
+    filepath.write_bytes(data)
+    digest = manifest.content_hash(b'nguon')
+    return str(filepath), digest, manifest.make_entry('xl/media/image1.jpeg', digest, 'original:90', str(filepath))
+
+
+def test_is_current_for_unchanged_output(tmp_path):
+    filepath, digest, entry = _exported(tmp_path)
+    assert entry['filename'] == '1001_.jpeg' and entry['size'] == 3
+    assert manifest.is_current(entry, digest, 'original:90', filepath)
+
+
+@pytest.mark.parametrize('change', ['no_entry', 'source', 'options', 'filename', 'missing', 'size', 'mtime'])
+def test_is_current_detects_changes(tmp_path, change):
+    filepath, digest, entry = _exported(tmp_path)
+    options = 'original:90'
+    if change == 'no_entry':
+        entry = None
+    elif change == 'source':
+        digest = manifest.content_hash(b'nguon moi')
+    elif change == 'options':
+        options = 'jpeg:80'
+    elif change == 'filename':
+        # Mẫu tên file đổi: mã NV được ghi ra file khác
+        filepath = str(tmp_path / '1001_Nguyen Van An.jpeg')
+        os.replace(str(tmp_path / '1001_.jpeg'), filepath)
+    elif change == 'missing':
+        os.remove(filepath)
+    elif change == 'size':
+        with open(filepath, 'ab') as f:
+            f.write(b'!')
+        os.utime(filepath, (entry['mtime'], entry['mtime']))
+    elif change == 'mtime':
+        os.utime(filepath, (entry['mtime'] + 10, entry['mtime'] + 10))
+    assert not manifest.is_current(entry, digest, options, filepath)
+
+
+def test_save_and_load(tmp_path):
+    _, _, entry = _exported(tmp_path)
+    manifest.save(str(tmp_path), {'1001': entry}, source='anh_the.xlsx')
+    assert manifest.load(str(tmp_path)) == {'1001': entry}
+    assert not os.path.exists(manifest.manifest_path(str(tmp_path)) + '.tmp')
+
+
+@pytest.mark.parametrize('content', ['', '{hỏng', '{"version": 999, "entries": {"1001": {}}}'])
+def test_load_ignores_broken_or_unknown_manifest(tmp_path, content):
+    assert manifest.load(str(tmp_path)) == {}
+    with open(manifest.manifest_path(str(tmp_path)), 'w', encoding='utf-8') as f:
+        f.write(content)
+    assert manifest.load(str(tmp_path)) == {}
+
+
+@pytest.mark.parametrize('filename', ['1001_.jpeg', 'Nguyen Van An.png', '.manifest.json'])
+def test_safe_filenames(filename):
+    assert manifest.is_safe_filename(filename)
+
+
+@pytest.mark.parametrize('filename', ['', '.', '..', '../x', '../../x', 'a/b', 'a\\b', 'C:x',
+                                      os.path.abspath('x.jpeg'), None, 123])
+def test_unsafe_filenames(filename):
+    assert not manifest.is_safe_filename(filename)
+
+
+def test_remove_stale_deletes_only_files_in_output_folder(tmp_path):
+    output_folder = tmp_path / 'out'
+    output_folder.mkdir()
+    (output_folder / '1001_.jpeg').write_bytes(b'a')
+    (output_folder / '1002_.jpeg').write_bytes(b'b')
+    outside = tmp_path / 'x'
+    outside.write_bytes(b'keep')
+    entries = {
+        '1001': {'filename': '1001_.jpeg'},
+        '1002': {'filename': '1002_.jpeg'},
+        '1003': {'filename': '../x'},
+        '1004': {'filename': str(outside)},
+    }
+
+    stale = manifest.remove_stale(str(output_folder), entries, seen={'1002'}, remove_files=True)
+
+    assert [key for key, _ in stale] == ['1001', '1003', '1004']
+    assert not (output_folder / '1001_.jpeg').exists()
+    assert (output_folder / '1002_.jpeg').exists()
+    assert outside.read_bytes() == b'keep'
+    assert list(entries) == ['1002']
+
+
+def test_remove_stale_without_remove_files_keeps_everything(tmp_path):
+    (tmp_path / '1001_.jpeg').write_bytes(b'a')
+    entries = {'1001': {'filename': '1001_.jpeg'}}
+
+    stale = manifest.remove_stale(str(tmp_path), entries, seen=set())
+
+    assert stale == [('1001', '1001_.jpeg')]
+    assert (tmp_path / '1001_.jpeg').exists()
+    assert '1001' in entries
+
+
+def test_remove_stale_ignores_missing_files(tmp_path):
+    entries = {'1001': {'filename': '1001_.jpeg'}, '1002': {}}
+
+    stale = manifest.remove_stale(str(tmp_path), entries, seen=set(), remove_files=True)
+
+    assert stale == [('1001', '1001_.jpeg'), ('1002', None)]
+    assert entries == {}
@@ -0,0 +1,133 @@
+"""
+Kiểm tra ánh xạ ảnh vào hàng theo vị trí (Pass 1 / Pass 2)
+"""
+
+import mapping
+
+ROW_HEIGHT = 90.0
+
+
+def _cells(rows=5, left=100.0, width=80.0, top=15.0):
+    return {row: {'left': left, 'top': top + (row - 2) * ROW_HEIGHT, 'width': width, 'height': ROW_HEIGHT}
+            for row in range(2, rows + 2)}
+
+
+def _shape(name, left, top, width=70.0, height=80.0):
+    return {'name': name, 'left': left, 'top': top, 'width': width, 'height': height}
+
+
+class _Stream:
+    def __init__(self):
+        self.events = []
+
+    def emit(self, event_type, **fields):
+        self.events.append(dict(fields, type=event_type))
+
+
+def _map(shapes, cells=None, image_mapping=None):
+    stream = _Stream()
+    result, unmatched = mapping.map_shapes(shapes, cells or _cells(), lambda message: None,
+                                           image_mapping, stream=stream)
+    return result, unmatched, stream.events
+
+
+def test_aligned_shapes_map_to_their_rows():
+    cells = _cells()
+    shapes = [_shape(f"p{row}", 105, cells[row]['top'] + 5) for row in cells]
+    result, unmatched, _ = _map(shapes, cells)
+    assert {row: shape['name'] for row, shape in result.items()} == {row: f"p{row}" for row in cells}
+    assert unmatched == []
+
+
+def test_misaligned_shape_maps_to_row_containing_its_center():
+    cells = _cells()
+    # Bắt đầu ở cuối hàng 2, phần lớn ảnh nằm trong hàng 3
+    result, _, events = _map([_shape('p', 105, cells[3]['top'] - 20)], cells)
+    assert list(result) == [3]
+    assert events[0]['status'] == 'mapped' and events[0]['pass_no'] == 1
+
+
+def test_shape_far_from_cell_is_unmatched():
+    cells = _cells()
+    result, unmatched, events = _map([_shape('p', 400, cells[2]['top'])], cells)
+    assert result == {}
+    assert [(shape['name'], row) for shape, row, _ in unmatched] == [('p', 2)]
+    assert events[-1]['status'] == 'unmatched'
+
+
+def test_largest_overlap_wins_regardless_of_drawing_order():
+    cells = _cells()
+    top = cells[3]['top']
+    covering = _shape('covering', 105, top + 5)
+    # Nhỏ, nằm gần tâm ô hơn nhưng phủ ô ít hơn
+    small = _shape('small', 130, top + 35, width=20, height=20)
+    for shapes in ([covering, small], [small, covering]):
+        result, _, events = _map(shapes, cells)
+        assert result[3]['name'] == 'covering'
+        duplicates = [event['picture'] for event in events if event['status'] == 'duplicate']
+        assert duplicates == ['small']
+
+
+def test_equal_overlap_prefers_closer_center():
+    cells = _cells()
+    top = cells[3]['top']
+    # Cả hai ảnh nằm trọn trong ô, ảnh 'shifted' lệch sang phải 5 point
+    centered = _shape('centered', 105, top + 5)
+    shifted = _shape('shifted', 110, top + 5)
+    assert mapping.overlap_area(shifted, cells[3]) == mapping.overlap_area(centered, cells[3])
+    for shapes in ([shifted, centered], [centered, shifted]):
+        result, _, _ = _map(shapes, cells)
+        assert result[3]['name'] == 'centered'
+
+
+def test_row_mapped_by_anchor_keeps_its_picture():
+    cells = _cells()
+    anchored = {'name': 'anchored'}
+    result, _, events = _map([_shape('floating', 105, cells[2]['top'] + 5)], cells, {2: anchored})
+    assert result[2] is anchored
+    assert [event['status'] for event in events] == ['duplicate']
+
+
+def test_closest_row_uses_binary_search_neighbours():
+    cells = _cells(rows=100)
+    row_index = mapping.build_row_index(cells)
+    for row, cell in cells.items():
+        assert mapping.closest_row(row_index, cells, 140, cell['top'] + ROW_HEIGHT / 2)[0] == row
+    assert mapping.closest_row(mapping.build_row_index({}), {}, 0, 0) == (None, float('inf'))
+
+
+def test_anchor_row_single_row():
+    heights = lambda row: 90.0
+    # Ảnh nằm trọn trong hàng 5, điểm neo dưới ở đầu hàng 6
+    assert not mapping.anchor_spans_rows(5, 6, 0.0)
+    assert mapping.anchor_row(5, 5.0, 6, 0.0, heights) == 5
+
+
+def test_anchor_row_picks_row_with_most_of_the_picture():
+    heights = lambda row: 90.0
+    # Bắt đầu 8 point trước cuối hàng 4, kết thúc 78 point trong hàng 5
+    assert mapping.anchor_spans_rows(4, 5, 78.0)
+    assert mapping.anchor_row(4, 82.0, 5, 78.0, heights) == 5
+    # Phần lớn nằm ở hàng trên
+    assert mapping.anchor_row(4, 10.0, 5, 20.0, heights) == 4
+    # Bằng nhau: hàng trên
+    assert mapping.anchor_row(4, 45.0, 5, 45.0, heights) == 4
+
+
+def test_anchor_row_uses_row_heights():
+    heights = {4: 15.0, 5: 90.0}
+    # 10 point trong hàng 4 (cao 15), 20 point trong hàng 5: hàng 5
+    assert mapping.anchor_row(4, 5.0, 5, 20.0, heights.get) == 5
+
+
+def test_anchor_row_one_cell_overflow():
+    heights = lambda row: 20.0
+    # Ảnh oneCell cao 60 point bắt đầu ở đầu hàng 3: phủ trọn hàng 3, 4, 5
+    assert mapping.anchor_row(3, 0.0, 3, 60.0, heights) == 3
+    # Bắt đầu ở cuối hàng 3: phần lớn nằm ở hàng 4
+    assert mapping.anchor_row(3, 18.0, 3, 40.0, heights) == 4
+
+
+def test_anchor_row_skips_hidden_rows():
+    heights = {2: 90.0, 3: 0.0, 4: 90.0}
+    assert mapping.anchor_row(2, 80.0, 4, 60.0, heights.get) == 4
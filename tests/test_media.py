@@ -0,0 +1,83 @@
+"""
+Kiểm tra dùng lại ảnh đã xuất: liên kết cứng hoặc sao chép, đường dẫn bộ nhớ đệm
+và giữ nguyên bytes gốc khi không cần chuyển đổi
+"""
+
+import os
+
+import pytest
+
+import media
+
+
+def _source(tmp_path, data=b'\xff\xd8jpeg'):
+    src = tmp_path / '1001_.jpeg'
+    src.write_bytes(data)
+    return str(src)
+
+
+def test_hardlink(tmp_path):
+    src = _source(tmp_path)
+    dst = str(tmp_path / '1002_.jpeg')
+    media.link_or_copy(src, dst)
+    assert os.path.samefile(src, dst)
+    assert sorted(os.listdir(str(tmp_path))) == ['1001_.jpeg', '1002_.jpeg']
+
+
+def test_hardlink_falls_back_to_copy(tmp_path, monkeypatch):
+    src = _source(tmp_path)
+    dst = str(tmp_path / '1002_.jpeg')
+
+    def fail_link(src, dst):
+        # vd: thư mục đầu ra trên FAT32 / ổ mạng không hỗ trợ liên kết cứng
+        raise OSError('không hỗ trợ liên kết cứng')
+    monkeypatch.setattr(os, 'link', fail_link)
+
+    media.link_or_copy(src, dst)
+
+    assert not os.path.samefile(src, dst)
+    with open(dst, 'rb') as f:
+        assert f.read() == b'\xff\xd8jpeg'
+    assert sorted(os.listdir(str(tmp_path))) == ['1001_.jpeg', '1002_.jpeg']
+
+
+def test_copy_mode(tmp_path):
+    src = _source(tmp_path)
+    dst = str(tmp_path / '1002_.jpeg')
+    media.link_or_copy(src, dst, link_mode='copy')
+    assert not os.path.samefile(src, dst)
+    with open(dst, 'rb') as f:
+        assert f.read() == b'\xff\xd8jpeg'
+
+
+@pytest.mark.parametrize('link_mode', ['hardlink', 'copy'])
+def test_existing_destination_is_replaced(tmp_path, link_mode):
+    src = _source(tmp_path)
+    dst = tmp_path / '1002_.jpeg'
+    dst.write_bytes(b'anh cu')
+    media.link_or_copy(src, str(dst), link_mode)
+    assert dst.read_bytes() == b'\xff\xd8jpeg'
+    # Lần chạy lại với cùng liên kết: không làm gì
+    media.link_or_copy(src, str(dst), link_mode)
+    assert dst.read_bytes() == b'\xff\xd8jpeg'
+    assert sorted(os.listdir(str(tmp_path))) == ['1001_.jpeg', '1002_.jpeg']
+
+
+def test_failed_copy_leaves_no_temporary_file(tmp_path):
+    with pytest.raises(OSError):
+        media.link_or_copy(str(tmp_path / 'khong_co.jpeg'), str(tmp_path / '1002_.jpeg'))
+    assert os.listdir(str(tmp_path)) == []
+
+
+def test_cache_path():
+    path = media.cache_path('cache', 'ab' + '0' * 38, 'jpeg:90:resize', '.jpg')
+    assert path == os.path.join('cache', 'ab', 'ab' + '0' * 38 + '_jpeg_90_resize.jpg')
+
+
+def test_original_bytes_are_kept():
+    data = b'\xff\xd8 khong giai ma'
+    assert media.encode_media(data, '.JPEG') == (data, False)
+    assert media.encode_media(data, '.jpg', 'jpeg') == (data, False)
+    assert media.output_extension('.JPEG') == '.jpeg'
+    assert media.output_extension('.png', 'jpeg') == '.jpg'
+    assert media.needs_transcode('.png', 'jpeg')
@@ -0,0 +1,70 @@
+"""
+Kiểm tra đặt tên file theo mẫu: bỏ dấu, kiểm tra mẫu và xử lý tên trùng
+(không phân biệt hoa thường, khóa manifest '~n' cho mã NV lặp lại)
+"""
+
+import pytest
+
+import naming
+
+
+def test_render():
+    assert naming.render(naming.DEFAULT_TEMPLATE, 1001, 'Nguyễn Văn An', 2, '.jpeg') == '1001_.jpeg'
+    assert naming.render('{ma_nv}_{ho_ten_slug}.{ext}', '1001', 'Nguyễn Văn  Đức (KT)', 2, 'png') == \
+        '1001_Nguyen_Van_Duc_KT.png'
+    assert naming.render('{row}-{ho_ten}.{ext}', 'A/1', 'Lê: Thị "Bé"?', 7, '.jpg') == '7-Lê Thị Bé.jpg'
+    assert naming.slugify('***') == 'Unknown'
+
+
+@pytest.mark.parametrize('template', ['', '{ma_nv}', '{ma_nv}_{chuc_vu}.{ext}', 'a/{ma_nv}.{ext}',
+                                      'a\\{ma_nv}.{ext}', '{ma_nv.{ext}'])
+def test_validate_template_rejects(template):
+    with pytest.raises(ValueError):
+        naming.validate_template(template)
+
+
+def test_plan_without_collisions():
+    planned, collisions = naming.plan_filenames([(2, '1001', 'An', '.jpeg'), (3, '1002', 'Bình', '.png')])
+    assert planned == {2: ('1001', '1001_.jpeg'), 3: ('1002', '1002_.png')}
+    assert collisions == []
+
+
+def test_plan_suffixes_case_folded_collisions():
+    rows = [(2, '1001', 'An', '.jpeg'), (3, '1001', 'An', '.jpeg'),
+            # Khác hoa thường: trùng trên Windows / SMB
+            (4, 'nv01', 'Bình', '.jpeg'), (5, 'NV01', 'Bình', '.JPEG'),
+            # Tên hậu tố đã có sẵn: chọn số tiếp theo
+            (6, '1001-2', 'Châu', '.jpeg'), (7, '1001', 'An', '.jpeg')]
+
+    planned, collisions = naming.plan_filenames(rows)
+
+    assert planned == {
+        2: ('1001', '1001_.jpeg'),
+        3: ('1001~2', '1001_-2.jpeg'),
+        4: ('nv01', 'nv01_.jpeg'),
+        5: ('NV01', 'NV01_-2.JPEG'),
+        6: ('1001-2', '1001-2_.jpeg'),
+        7: ('1001~3', '1001_-3.jpeg'),
+    }
+    assert collisions == [('1001_.jpeg', [2, 3, 7]), ('nv01_.jpeg', [4, 5])]
+    assert len({filename.casefold() for _, filename in planned.values()}) == len(rows)
+
+
+def test_plan_suffix_skips_existing_names():
+    rows = [(2, '1', 'A', '.jpg'), (3, '1', 'A', '.jpg'), (4, 'x', 'B', '.jpg')]
+    planned, _ = naming.plan_filenames(rows, '{ma_nv}.{ext}')
+    assert planned[3] == ('1~2', '1-2.jpg')
+    # Tên đã dùng bởi hàng khác (không phân biệt hoa thường) không được dùng làm hậu tố
+    rows = [(2, '1', 'A', '.jpg'), (3, '1', 'A', '.jpg'), (4, '1-2', 'B', '.JPG')]
+    planned, _ = naming.plan_filenames(rows, '{ma_nv}.{ext}')
+    assert planned[3] == ('1~2', '1-3.jpg') and planned[4] == ('1-2', '1-2.JPG')
+
+
+def test_plan_skip_policy():
+    rows = [(2, '1001', 'An', '.jpeg'), (3, '1001', 'Bình', '.jpeg'), (4, '1002', 'Bình', '.jpeg')]
+    planned, collisions = naming.plan_filenames(rows, on_collision='skip')
+    assert planned == {2: ('1001', '1001_.jpeg'), 3: ('1001~2', None), 4: ('1002', '1002_.jpeg')}
+    assert collisions == [('1001_.jpeg', [2, 3])]
+    # Mẫu có họ tên: cùng mã NV nhưng tên file khác nhau thì không trùng
+    planned, collisions = naming.plan_filenames(rows, '{ma_nv}_{ho_ten_slug}.{ext}', on_collision='skip')
+    assert planned[3] == ('1001~2', '1001_Binh.jpeg') and collisions == []
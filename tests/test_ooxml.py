@@ -0,0 +1,139 @@
+"""
+Kiểm tra backend ooxml: đọc gói .xlsx và ánh xạ ảnh vào hàng theo anchor / vị trí
+
+Dữ liệu: file giả lập của bench/generate_workbook.py, ảnh của hàng r là
+xl/media/image{r-1}.jpeg, mã NV của hàng r là 100000 + r - 1
+"""
+
+import os
+import re
+import zipfile
+
+import pytest
+
+import ooxml
+import van
+
+pytest.importorskip('PIL')
+import generate_workbook  # noqa: E402
+
+
+def _build(tmp_path, rows=40, **ratios):
+    path = str(tmp_path / 'anh_the.xlsx')
+    stats = generate_workbook.build_workbook(path, rows, image_size=(60, 80), seed=1, **ratios)
+    return path, stats
+
+
+def _export(path, output_folder, **options):
+    messages = []
+    ok = van.export_images(path, output_folder, backend='ooxml', incremental=False,
+                           log_callback=messages.append, **options)
+    assert ok, "\n".join(messages)
+    return messages
+
+
+def _assert_rows_match_images(path, output_folder, rows):
+    with ooxml.open_package(path) as zf:
+        for row in range(2, rows + 2):
+            exported = os.path.join(output_folder, f"{100000 + row - 1}_.jpeg")
+            with open(exported, 'rb') as f:
+                assert f.read() == zf.read(f'xl/media/image{row - 1}.jpeg'), f"Hàng {row}"
+    assert len(os.listdir(output_folder)) == rows
+
+
+def test_workbook_structure(tmp_path):
+    path, _ = _build(tmp_path, rows=5)
+    with ooxml.open_package(path) as zf:
+        assert ooxml.sheet_names(zf) == ['Sheet1']
+        sheet_name, sheet_part = ooxml.resolve_sheet(zf)
+        assert (sheet_name, sheet_part) == ('Sheet1', 'xl/worksheets/sheet1.xml')
+        assert ooxml.read_dimension(zf, sheet_part) == 6
+        header = dict(ooxml.read_header_rows(zf, sheet_part, 1, 3))
+        assert header[1] == {1: 'Mã NV', 2: 'Họ tên', 3: 'Ảnh'}
+        with pytest.raises(ValueError):
+            ooxml.resolve_sheet(zf, 'Không có')
+
+
+def test_aligned_anchors(tmp_path):
+    path, stats = _build(tmp_path)
+    with ooxml.open_package(path) as zf:
+        pictures = ooxml.read_pictures(zf, 'xl/worksheets/sheet1.xml')
+    assert stats['misaligned'] == stats['floating'] == 0
+    assert {picture['from'][0]: picture['media'] for picture in pictures} == \
+        {row: f'xl/media/image{row - 1}.jpeg' for row in range(2, 42)}
+    _export(path, str(tmp_path / 'out'))
+    _assert_rows_match_images(path, str(tmp_path / 'out'), 40)
+
+
+def test_misaligned_and_floating_anchors(tmp_path):
+    path, stats = _build(tmp_path, misaligned_ratio=0.3, floating_ratio=0.3)
+    assert stats['misaligned'] and stats['floating']
+    with ooxml.open_package(path) as zf:
+        pictures = ooxml.read_pictures(zf, 'xl/worksheets/sheet1.xml')
+    floating = [picture for picture in pictures if picture['from'] is None]
+    assert len(floating) == stats['floating']
+    assert all(picture['width'] > 0 and picture['height'] > 0 for picture in floating)
+    _export(path, str(tmp_path / 'out'))
+    _assert_rows_match_images(path, str(tmp_path / 'out'), 40)
+
+
+def test_floating_anchors_without_dimension(tmp_path):
+    # Sheet không có <dimension>, các hàng từ 6 dùng chiều cao mặc định (không có ht)
+    source, stats = _build(tmp_path, rows=10, floating_ratio=1.0)
+    assert stats['floating'] == 10
+    path = str(tmp_path / 'khong_dimension.xlsx')
+    with zipfile.ZipFile(source) as src, zipfile.ZipFile(path, 'w') as dst:
+        for info in src.infolist():
+            data = src.read(info)
+            if info.filename == 'xl/worksheets/sheet1.xml':
+                sheet = data.decode('utf-8')
+                sheet = re.sub(r'<dimension [^>]*/>', '', sheet)
+                sheet = sheet.replace(f'defaultRowHeight="{generate_workbook.HEADER_HEIGHT}"',
+                                      f'defaultRowHeight="{generate_workbook.ROW_HEIGHT}"')
+                sheet = sheet.replace('<row r="1">', f'<row r="1" ht="{generate_workbook.HEADER_HEIGHT}" '
+                                                     'customHeight="1">')
+                sheet = re.sub(r'(<row r="(?:[6-9]|1\d)") ht="[^"]*" customHeight="1"', r'\1', sheet)
+                data = sheet.encode('utf-8')
+            dst.writestr(info, data)
+    with ooxml.open_package(path) as zf:
+        assert ooxml.read_dimension(zf, 'xl/worksheets/sheet1.xml') is None
+    _export(path, str(tmp_path / 'out'))
+    _assert_rows_match_images(path, str(tmp_path / 'out'), 10)
+
+
+def test_duplicate_images_are_written_once(tmp_path):
+    path, stats = _build(tmp_path, duplicate_ratio=0.3)
+    assert stats['unique_images'] < 40
+    messages = _export(path, str(tmp_path / 'out'))
+    _assert_rows_match_images(path, str(tmp_path / 'out'), 40)
+    saved = [m for m in messages if "Số lần mã hóa tiết kiệm nhờ ảnh trùng" in m]
+    assert saved and saved[0].endswith(f": {40 - stats['unique_images']}")
+
+
+def test_sheet_geometry(tmp_path):
+    path, _ = _build(tmp_path, rows=3)
+    with ooxml.open_package(path) as zf:
+        positions = ooxml.read_sheet_geometry(zf, 'xl/worksheets/sheet1.xml', 2, 4, 3)
+    tops = [positions[row]['top'] for row in (2, 3, 4)]
+    assert tops == [generate_workbook.HEADER_HEIGHT + i * generate_workbook.ROW_HEIGHT for i in range(3)]
+    assert all(position['height'] == generate_workbook.ROW_HEIGHT for position in positions.values())
+    expected_left = sum(generate_workbook._col_points(generate_workbook.COL_WIDTHS[c]) for c in (1, 2))
+    assert positions[2]['left'] == pytest.approx(expected_left)
+
+
+def test_anchor_offsets():
+    import xml.etree.ElementTree as ET
+
+    xdr = ooxml.NS['xdr']
+    emu = ooxml.EMU_PER_POINT
+    two_cell = ET.fromstring(
+        f'<xdr:twoCellAnchor xmlns:xdr="{xdr}">'
+        f'<xdr:from><xdr:col>2</xdr:col><xdr:colOff>0</xdr:colOff><xdr:row>3</xdr:row><xdr:rowOff>{82 * emu}</xdr:rowOff></xdr:from>'
+        f'<xdr:to><xdr:col>3</xdr:col><xdr:colOff>0</xdr:colOff><xdr:row>4</xdr:row><xdr:rowOff>{78 * emu}</xdr:rowOff></xdr:to>'
+        '</xdr:twoCellAnchor>')
+    one_cell = ET.fromstring(
+        f'<xdr:oneCellAnchor xmlns:xdr="{xdr}">'
+        f'<xdr:from><xdr:col>2</xdr:col><xdr:colOff>0</xdr:colOff><xdr:row>3</xdr:row><xdr:rowOff>{10 * emu}</xdr:rowOff></xdr:from>'
+        f'<xdr:ext cx="{60 * emu}" cy="{80 * emu}"/></xdr:oneCellAnchor>')
+    assert ooxml._anchor_offsets(two_cell, 'twoCell') == (82.0, 78.0)
+    assert ooxml._anchor_offsets(one_cell, 'oneCell') == (10.0, 90.0)
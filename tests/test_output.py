@@ -0,0 +1,44 @@
+"""
+Kiểm tra nơi ghi ảnh đầu ra dạng file nén (.zip / .tar)
+"""
+
+import os
+import tarfile
+import zipfile
+
+import pytest
+
+import output
+
+
+def _write(kind, folder, keep=True):
+    out = output.open_output(kind, folder)
+    out.open()
+    out.add('1001_.jpeg', b'\xff\xd8jpeg')
+    out.add(output.INDEX_NAME, b'ma_nv\n1001\n')
+    out.copy('1001_.jpeg', '1002_.jpeg')
+    out.close(keep)
+    return out.location
+
+
+def test_zip_output(tmp_path):
+    location = _write('zip', str(tmp_path / 'ANHTHE'))
+    assert location == str(tmp_path / 'ANHTHE.zip')
+    with zipfile.ZipFile(location) as zf:
+        assert zf.read('1002_.jpeg') == b'\xff\xd8jpeg'
+        assert zf.getinfo('1001_.jpeg').compress_type == zipfile.ZIP_STORED
+        assert zf.getinfo(output.INDEX_NAME).compress_type == zipfile.ZIP_DEFLATED
+    assert os.listdir(str(tmp_path)) == ['ANHTHE.zip']
+
+
+def test_tar_output_links_duplicates(tmp_path):
+    location = _write('tar', str(tmp_path / 'ANHTHE'))
+    with tarfile.open(location) as tf:
+        assert tf.getmember('1002_.jpeg').islnk()
+        assert tf.extractfile('1002_.jpeg').read() == b'\xff\xd8jpeg'
+
+
+@pytest.mark.parametrize('kind', ['zip', 'tar'])
+def test_discarded_archive_leaves_nothing(tmp_path, kind):
+    _write(kind, str(tmp_path / 'ANHTHE'), keep=False)
+    assert os.listdir(str(tmp_path)) == []
@@ -0,0 +1,88 @@
+"""
+Kiểm tra đường ống xuất ảnh: kết quả khớp đúng công việc, lỗi từng ảnh / cả lô
+được báo về luồng chính và hàng đợi có giới hạn
+"""
+
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import pytest
+
+import pipeline
+
+
+def _job(row, filepath=None):
+    return {'row': row, 'ma_nv': str(1000 + row), 'filename': f'{1000 + row}_.jpeg', 'filepath': filepath,
+            'media_ext': '.jpeg', 'data': f'anh {row}'.encode('utf-8'), 'output_format': 'original',
+            'jpeg_quality': 90}
+
+
+class _FailingExecutor:
+    """Nhóm tiến trình giả: mọi lô đều lỗi (như khi tiến trình con bị dừng)"""
+
+    def submit(self, fn, *args):
+        future = Future()
+        future.set_exception(RuntimeError('tiến trình con bị dừng'))
+        return future
+
+
+def _collect():
+    handled = []
+
+    def handle_result(job, result, error):
+        handled.append((job, result, error))
+    return handled, handle_result
+
+
+def test_sequential_run_keeps_job_order(tmp_path):
+    jobs = [_job(2, str(tmp_path / '1002_.jpeg')), _job(3, str(tmp_path / 'khong_co' / '1003_.jpeg')),
+            _job(4, str(tmp_path / '1004_.jpeg'))]
+    handled, handle_result = _collect()
+
+    pipeline.run(iter(jobs), handle_result, workers=1)
+
+    assert [job['row'] for job, _, _ in handled] == [2, 3, 4]
+    assert all('data' not in job for job, _, _ in handled)
+    (_, first, first_error), (_, failed, error), (_, last, _) = handled
+    assert first_error is None and first['size'] == len(b'anh 2') and not first['transcoded']
+    assert failed is None and isinstance(error, OSError)
+    assert last['size'] == len(b'anh 4')
+    assert (tmp_path / '1002_.jpeg').read_bytes() == b'anh 2'
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['1002_.jpeg', '1004_.jpeg']
+
+
+def test_pool_matches_results_to_jobs(tmp_path):
+    rows = range(2, 27)
+    failing_row = 11
+    consumed = []
+    handled, handle_result = _collect()
+
+    def jobs():
+        for row in rows:
+            consumed.append(row)
+            # Hàng đợi có giới hạn: số công việc đã đọc mà chưa xử lý không vượt quá
+            # (max_batches + 1) lô
+            assert len(consumed) - len(handled) <= 3 * 3
+            yield _job(row, str(tmp_path / 'khong_co' / 'x.jpeg') if row == failing_row else None)
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        pipeline.run(jobs(), handle_result, workers=2, queue_size=6, executor=executor, batch_size=3)
+
+    assert sorted(job['row'] for job, _, _ in handled) == list(rows)
+    for job, result, error in handled:
+        assert 'data' not in job
+        if job['row'] == failing_row:
+            assert result is None and isinstance(error, OSError)
+        else:
+            assert error is None
+            assert result['data'] == f"anh {job['row']}".encode('utf-8')
+
+
+@pytest.mark.parametrize('count', [1, 4, 7])
+def test_batch_failure_is_reported_for_every_job(count):
+    handled, handle_result = _collect()
+
+    pipeline.run((_job(row) for row in range(count)), handle_result, workers=2, executor=_FailingExecutor(),
+                 batch_size=3)
+
+    assert sorted(job['row'] for job, _, _ in handled) == list(range(count))
+    assert all(result is None and isinstance(error, RuntimeError) for _, result, error in handled)
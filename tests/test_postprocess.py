@@ -0,0 +1,103 @@
+"""
+Kiểm tra hậu xử lý ảnh thẻ: đọc tùy chọn, đổi cỡ theo các chế độ crop / fit / pad,
+DPI, hệ màu và EXIF
+"""
+
+import io
+
+import pytest
+
+import media
+import postprocess
+
+
+@pytest.fixture
+def Image():
+    return pytest.importorskip('PIL.Image')
+
+
+def _jpeg(Image, size=(300, 400), color='red', exif=None):
+    with io.BytesIO() as dst:
+        image = Image.new('RGB', size, color)
+        image.save(dst, 'JPEG', quality=95, **({'exif': exif} if exif else {}))
+        return dst.getvalue()
+
+
+def _open(Image, data):
+    image = Image.open(io.BytesIO(data))
+    image.load()
+    return image
+
+
+@pytest.mark.parametrize('text, size', [('600x800', (600, 800)), ('600X800', (600, 800)),
+                                        ('600×800', (600, 800)), ('', None), ('  ', None), (None, None)])
+def test_parse_size(text, size):
+    assert postprocess.parse_size(text) == size
+
+
+@pytest.mark.parametrize('text', ['600', '0x800', '-1x2', 'ax b', '1x2x3'])
+def test_parse_size_rejects_invalid(text):
+    with pytest.raises(ValueError):
+        postprocess.parse_size(text)
+
+
+def test_make_options_and_describe():
+    assert postprocess.make_options() is None
+    assert postprocess.describe(None) == ''
+    options = postprocess.make_options((600, 800), 'crop', dpi=300, color_mode='RGB', strip_exif=True)
+    assert postprocess.describe(options) == '600x800-crop-300dpi-RGB-noexif'
+    assert postprocess.describe(postprocess.make_options((600, 800), crop_center=(0.5, 0.5))) == \
+        '600x800-crop-c0.5_0.5'
+    assert postprocess.describe(postprocess.make_options(dpi=96)) == '96dpi'
+    with pytest.raises(ValueError):
+        postprocess.make_options((600, 800), 'stretch')
+    with pytest.raises(ValueError):
+        postprocess.make_options(color_mode='RGBA')
+
+
+@pytest.mark.parametrize('fit_mode, size', [('crop', (60, 60)), ('fit', (45, 60)), ('pad', (60, 60))])
+def test_resize_modes(Image, fit_mode, size):
+    options = postprocess.make_options((60, 60), fit_mode)
+    data, transcoded = media.encode_media(_jpeg(Image), '.jpeg', 'png', processing=options)
+    assert transcoded
+    image = _open(Image, data)
+    assert image.format == 'PNG' and image.size == size
+    if fit_mode == 'pad':
+        # Ảnh 3:4 thu vào khung vuông: viền trắng hai bên
+        assert image.getpixel((2, 30))[:3] == (255, 255, 255)
+        assert image.getpixel((30, 30))[0] > 200 and image.getpixel((30, 30))[1] < 60
+
+
+def test_crop_keeps_upper_part(Image):
+    # Nửa trên đỏ, nửa dưới xanh; cắt vuông lệch lên trên (tâm 0.4) giữ nhiều phần đỏ hơn
+    source = Image.new('RGB', (100, 200), 'blue')
+    source.paste(Image.new('RGB', (100, 100), 'red'), (0, 0))
+    image = postprocess.apply(source, postprocess.make_options((100, 100), 'crop'))
+    red_rows = sum(1 for y in range(100) if image.getpixel((50, y))[0] > 128)
+    assert red_rows == 60
+
+
+def test_dpi_color_mode_and_original_format(Image):
+    options = postprocess.make_options(dpi=300, color_mode='L')
+    data, transcoded = media.encode_media(_jpeg(Image), '.jpeg', 'original', processing=options)
+    image = _open(Image, data)
+    assert transcoded and image.format == 'JPEG' and image.mode == 'L'
+    assert tuple(round(value) for value in image.info['dpi']) == (300, 300)
+    assert media.output_extension('.jpeg', 'original', options) == '.jpeg'
+    assert media.output_extension('.bmp', 'original', options) == '.png'
+
+
+@pytest.mark.parametrize('strip_exif', [False, True])
+def test_exif_orientation_and_strip(Image, strip_exif):
+    exif = Image.Exif()
+    # Orientation 6: ảnh chụp dọc lưu ngang, phải xoay 90 độ khi hiển thị
+    exif[postprocess.EXIF_ORIENTATION] = 6
+    exif[0x010F] = 'May anh'
+    options = postprocess.make_options((40, 60), 'fit', strip_exif=strip_exif)
+    data, _ = media.encode_media(_jpeg(Image, size=(400, 300), exif=exif.tobytes()), '.jpeg', 'jpeg',
+                                 processing=options)
+    image = _open(Image, data)
+    assert image.size == (40, 53)
+    kept = image.getexif()
+    assert (0x010F in kept) != strip_exif
+    assert kept.get(postprocess.EXIF_ORIENTATION, 1) == 1
@@ -0,0 +1,121 @@
+"""
+Kiểm tra báo cáo kiểm tra trước khi xuất (dry-run): gom sự kiện thành dòng báo cáo,
+tóm tắt vấn đề và ghi file CSV / JSON
+"""
+
+import csv
+import json
+
+import pytest
+
+import preflight
+import van
+
+
+def _events():
+    """Hai sheet của cùng workbook: sheet đầu có đủ các loại vấn đề, sheet sau không có vấn đề"""
+    return [
+        {'type': 'mapping', 'row': 2, 'picture': 'Picture 1', 'method': 'anchor', 'status': 'mapped'},
+        {'type': 'mapping', 'row': 4, 'picture': 'Picture 3', 'method': 'position', 'pass_no': 2,
+         'condition': 'center', 'distance': 3.14159, 'status': 'mapped'},
+        {'type': 'mapping', 'row': 2, 'picture': 'Picture 2', 'method': 'anchor', 'status': 'duplicate',
+         'source': 'a.xlsx'},
+        {'type': 'mapping', 'row': None, 'picture': 'Logo', 'method': 'position', 'status': 'unmatched',
+         'distance': 120.0, 'source': 'a.xlsx'},
+        {'type': 'mapping', 'row': 1, 'picture': 'Chữ ký', 'method': 'anchor', 'status': 'outside_column',
+         'source': 'a.xlsx'},
+        {'type': 'row_checked', 'row': 4, 'ma_nv': '1003', 'ho_ten': 'Lê Văn C', 'filename': '1003_.jpeg',
+         'source': 'a.xlsx'},
+        {'type': 'row_checked', 'row': 2, 'ma_nv': '1001', 'ho_ten': 'Nguyễn Văn A', 'filename': '1001_.jpeg',
+         'source': 'a.xlsx'},
+        {'type': 'row_skipped', 'row': 3, 'ma_nv': '1002', 'ho_ten': 'Trần Thị B', 'reason': 'no_image',
+         'source': 'a.xlsx'},
+        {'type': 'row_skipped', 'row': 5, 'ma_nv': None, 'ho_ten': 'Phạm D', 'reason': 'missing_info',
+         'source': 'a.xlsx'},
+        {'type': 'run_end', 'source': 'a.xlsx'},
+        {'type': 'mapping', 'row': 2, 'picture': 'Picture 1', 'method': 'cell', 'status': 'mapped'},
+        {'type': 'row_checked', 'row': 2, 'ma_nv': '2001', 'ho_ten': 'Đỗ E', 'filename': '2001_.png',
+         'source': 'a.xlsx'},
+        {'type': 'run_end', 'source': 'a.xlsx'},
+    ]
+
+
+def _report():
+    report = preflight.PreflightReport()
+    for event in _events():
+        report.emit(event)
+    report.close()
+    return report
+
+
+def test_summary_and_log_lines():
+    report = _report()
+    summary = report.summary()
+    assert summary == {'rows': {'ok': 3, 'no_image': 1, 'missing_info': 1},
+                       'shapes': {'duplicate': 1, 'unmatched': 1, 'outside_column': 1}, 'problems': 4}
+    lines = report.report()
+    assert "- Hàng không có ảnh: 1" in lines and "- Ảnh nằm ngoài cột ảnh: 1" in lines
+    assert lines[-1] == "⚠️ Có 4 vấn đề cần kiểm tra trước khi xuất"
+
+
+def test_entries_keep_runs_apart_and_merge_mapping():
+    rows, shapes = _report().entries()
+    assert [(row['row'], row['ma_nv'], row['status']) for row in rows] == [
+        (2, '1001', 'ok'), (3, '1002', 'no_image'), (4, '1003', 'ok'), (5, None, 'missing_info'), (2, '2001', 'ok')]
+    assert (rows[0]['picture'], rows[0]['method']) == ('Picture 1', 'anchor')
+    assert (rows[2]['method'], rows[2]['pass_no'], rows[2]['condition'], rows[2]['distance']) == \
+        ('position', 2, 'center', 3.14)
+    assert rows[1].get('picture') is None
+    assert rows[4]['method'] == 'cell'
+    # Ảnh không ánh xạ được (không có hàng) đứng đầu danh sách ảnh
+    assert [(shape['row'], shape['picture'], shape['status']) for shape in shapes] == [
+        (None, 'Logo', 'unmatched'), (1, 'Chữ ký', 'outside_column'), (2, 'Picture 2', 'duplicate')]
+
+
+def test_write_csv(tmp_path):
+    path = tmp_path / 'kiem_tra.csv'
+    _report().write(str(path))
+    assert path.read_bytes().startswith(b'\xef\xbb\xbf')
+    with open(path, encoding='utf-8-sig', newline='') as f:
+        lines = list(csv.DictReader(f))
+    assert list(lines[0]) == list(preflight.REPORT_FIELDS)
+    assert [(line['kind'], line['row'], line['status']) for line in lines] == [
+        ('row', '2', 'ok'), ('row', '3', 'no_image'), ('row', '4', 'ok'), ('row', '5', 'missing_info'),
+        ('row', '2', 'ok'), ('shape', '', 'unmatched'), ('shape', '1', 'outside_column'), ('shape', '2', 'duplicate')]
+    assert lines[1]['ho_ten'] == 'Trần Thị B' and lines[5]['distance'] == '120.0'
+
+
+def test_write_json(tmp_path):
+    path = tmp_path / 'kiem_tra.JSON'
+    report = _report()
+    report.write(str(path))
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    assert data['summary'] == report.summary()
+    assert [row['ma_nv'] for row in data['rows']] == ['1001', '1002', '1003', None, '2001']
+    assert [shape['status'] for shape in data['shapes']] == ['unmatched', 'outside_column', 'duplicate']
+    assert 'Nguyễn Văn A' in path.read_text(encoding='utf-8')
+
+
+def test_report_format():
+    assert preflight.report_format('a.CSV') == 'csv'
+    with pytest.raises(ValueError):
+        preflight.report_format('a.txt')
+
+
+def test_dry_run_report(tmp_path):
+    pytest.importorskip('PIL')
+    import generate_workbook
+
+    path = str(tmp_path / 'anh_the.xlsx')
+    generate_workbook.build_workbook(path, 8, image_size=(60, 80), seed=1, misaligned_ratio=0.3,
+                                     floating_ratio=0.3)
+    report = preflight.PreflightReport()
+    output_folder = tmp_path / 'out'
+    assert van.export_images(path, str(output_folder), backend='ooxml', dry_run=True, log_callback=lambda _: None,
+                             event_sinks=[report])
+    assert report.summary() == {'rows': {'ok': 8}, 'shapes': {}, 'problems': 0}
+    rows, _ = report.entries()
+    assert [row['ma_nv'] for row in rows] == [100000 + row for row in range(1, 9)]
+    assert {row['method'] for row in rows} == {'anchor', 'position'}
+    assert not output_folder.exists() or not any(output_folder.iterdir())
@@ -0,0 +1,68 @@
+"""
+Kiểm tra dịch vụ xuất ảnh: kiểm tra tham số công việc và thư mục được phép
+"""
+
+import os
+
+import pytest
+
+import server
+
+
+def _job(root, **extra):
+    return dict({'excel_file_path': os.path.join(root, 'hr', 'a.xlsx'),
+                 'output_folder': os.path.join(root, 'hr', 'ANHTHE')}, **extra)
+
+
+def test_job_inside_allowed_root(tmp_path):
+    params = server.validate_job(_job(str(tmp_path), report_path=os.path.join(str(tmp_path), 'r.csv')),
+                                 allowed_roots=(str(tmp_path),))
+    assert params['output_folder'] == os.path.join(str(tmp_path), 'hr', 'ANHTHE')
+
+
+@pytest.mark.parametrize('key', ['output_folder', 'cache_dir', 'report_path', 'excel_file_path'])
+def test_path_outside_allowed_root_is_rejected(tmp_path, key):
+    root = tmp_path / 'hr'
+    root.mkdir()
+    outside = os.path.join(str(tmp_path), 'other', 'r.csv' if key == 'report_path' else 'x')
+    with pytest.raises(ValueError, match="ngoài"):
+        server.validate_job(_job(str(root), **{key: outside}), allowed_roots=(str(root),))
+
+
+def test_parent_references_are_resolved(tmp_path):
+    root = tmp_path / 'hr'
+    root.mkdir()
+    escape = os.path.join(str(root), '..', 'other')
+    with pytest.raises(ValueError):
+        server.validate_job(_job(str(root), output_folder=escape), allowed_roots=(str(root),))
+
+
+def test_symlink_out_of_allowed_root_is_rejected(tmp_path):
+    root = tmp_path / 'hr'
+    root.mkdir()
+    (tmp_path / 'other').mkdir()
+    try:
+        os.symlink(str(tmp_path / 'other'), str(root / 'link'))
+    except (OSError, NotImplementedError):
+        pytest.skip("Không tạo được symlink")
+    with pytest.raises(ValueError):
+        server.validate_job(_job(str(root), output_folder=str(root / 'link' / 'out')), allowed_roots=(str(root),))
+
+
+def test_archive_next_to_allowed_root_is_rejected(tmp_path):
+    # output_folder là chính thư mục gốc: file nén root.zip nằm ngoài thư mục gốc
+    root = tmp_path / 'hr'
+    root.mkdir()
+    params = _job(str(root), output_folder=str(root), output_kind='zip')
+    with pytest.raises(ValueError):
+        server.validate_job(params, allowed_roots=(str(root),))
+
+
+def test_relative_path_is_rejected(tmp_path):
+    with pytest.raises(ValueError, match="tuyệt đối"):
+        server.validate_job(_job(str(tmp_path), output_folder='ANHTHE'), allowed_roots=(str(tmp_path),))
+
+
+def test_unknown_field_is_rejected(tmp_path):
+    with pytest.raises(ValueError, match="không được hỗ trợ"):
+        server.validate_job(_job(str(tmp_path), workers=4), allowed_roots=(str(tmp_path),))
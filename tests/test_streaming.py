@@ -0,0 +1,153 @@
+"""
+Kiểm tra đọc sheet theo luồng (ooxml.iter_rows / iter_data_rows): giá trị ô,
+hàng trống, hàng cuối theo cột mã NV và bộ nhớ không tăng theo số hàng;
+đọc drawing theo luồng (ooxml.iter_pictures) với anchor bọc trong mc:AlternateContent
+"""
+
+import tracemalloc
+import zipfile
+
+import ooxml
+
+NS_MAIN = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+SHEET_PART = 'xl/worksheets/sheet1.xml'
+NS_XDR = 'http://schemas.openxmlformats.org/drawingml/2006/spreadsheetDrawing'
+NS_A = 'http://schemas.openxmlformats.org/drawingml/2006/main'
+NS_R = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+NS_MC = 'http://schemas.openxmlformats.org/markup-compatibility/2006'
+NS_A14 = 'http://schemas.microsoft.com/office/drawing/2010/main'
+NS_PKG_REL = 'http://schemas.openxmlformats.org/package/2006/relationships'
+
+
+def _write_package(path, rows_xml, shared_strings=None, dimension='A1:C10'):
+    """Gói tối thiểu: sheet1.xml (các thẻ <row> cho sẵn hoặc sinh theo luồng) và sharedStrings.xml"""
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as zf:
+        with zf.open(SHEET_PART, 'w') as sheet:
+            dimension_xml = f'<dimension ref="{dimension}"/>' if dimension else ''
+            sheet.write(f'<worksheet xmlns="{NS_MAIN}">{dimension_xml}<sheetData>'.encode('utf-8'))
+            for row_xml in ([rows_xml] if isinstance(rows_xml, str) else rows_xml):
+                sheet.write(row_xml.encode('utf-8'))
+            sheet.write(b'</sheetData></worksheet>')
+        if shared_strings is not None:
+            zf.writestr('xl/sharedStrings.xml', f'<sst xmlns="{NS_MAIN}">' + ''.join(shared_strings) + '</sst>')
+    return path
+
+
+def test_cell_values(tmp_path):
+    path = _write_package(str(tmp_path / 'a.xlsx'), (
+        '<row r="1"><c r="A1" t="s"><v>0</v></c><c r="B1" t="s"><v>1</v></c>'
+        '<c r="C1" t="inlineStr"><is><t>Ảnh</t></is></c></row>'
+        '<row r="2"><c r="A2"><v>1001</v></c><c r="B2" t="str"><v>Công thức</v></c>'
+        '<c r="C2" t="b"><v>1</v></c><c r="D2" t="e"><v>#N/A</v></c></row>'
+        # Ô và hàng không có thuộc tính r: nối tiếp ô / hàng trước
+        '<row><c><v>7</v></c><c t="s"><v>0</v></c></row>'
+    ), shared_strings=['<si><t>Mã NV</t></si>', '<si><r><t>Họ </t></r><r><t>tên</t></r></si>'])
+    with zipfile.ZipFile(path) as zf:
+        assert ooxml.read_shared_strings(zf) == ['Mã NV', 'Họ tên']
+        rows = [(row, values) for row, values, _ in ooxml.iter_rows(zf, SHEET_PART, {1, 2, 3, 4})]
+    assert rows == [
+        (1, {1: 'Mã NV', 2: 'Họ tên', 3: 'Ảnh'}),
+        (2, {1: 1001.0, 2: 'Công thức', 3: True, 4: '#N/A'}),
+        (3, {1: 7.0, 2: 'Mã NV'}),
+    ]
+
+
+def test_data_rows_fill_gaps_and_stop_at_last_key(tmp_path):
+    path = _write_package(str(tmp_path / 'a.xlsx'), (
+        '<row r="1"><c r="A1" t="inlineStr"><is><t>Mã NV</t></is></c></row>'
+        '<row r="2"><c r="A2"><v>1</v></c><c r="B2" t="inlineStr"><is><t>An</t></is></c></row>'
+        # Hàng 3 không có trong XML, hàng 4 có họ tên nhưng không có mã NV
+        '<row r="4"><c r="B4" t="inlineStr"><is><t>Bình</t></is></c></row>'
+        '<row r="5"><c r="A5"><v>5</v></c></row>'
+        # Sau hàng cuối có mã NV: chỉ có định dạng / ghi chú
+        '<row r="6" ht="30" customHeight="1"/>'
+        '<row r="7"><c r="B7" t="inlineStr"><is><t>Ghi chú</t></is></c></row>'
+    ), shared_strings=None)
+    with zipfile.ZipFile(path) as zf:
+        rows = list(ooxml.iter_data_rows(zf, SHEET_PART, columns=(1, 2), first_row=2, key_column=1))
+    assert rows == [(2, {1: 1.0, 2: 'An'}), (3, {}), (4, {}), (5, {1: 5.0})]
+
+
+def test_dimension(tmp_path):
+    with zipfile.ZipFile(_write_package(str(tmp_path / 'a.xlsx'), '', dimension='A1:C250')) as zf:
+        assert ooxml.read_dimension(zf, SHEET_PART) == 250
+    with zipfile.ZipFile(_write_package(str(tmp_path / 'b.xlsx'), '', dimension=None)) as zf:
+        assert ooxml.read_dimension(zf, SHEET_PART) is None
+
+
+def test_memory_does_not_grow_with_rows(tmp_path):
+    rows = 20000
+
+    def rows_xml():
+        for row in range(1, rows + 1):
+            yield (f'<row r="{row}" ht="90" customHeight="1"><c r="A{row}"><v>{100000 + row}</v></c>'
+                   f'<c r="B{row}" t="inlineStr"><is><t>Nhân viên {row}</t></is></c>'
+                   f'<c r="C{row}" s="1"/><c r="D{row}" t="inlineStr"><is><t>Phòng ban {row % 7}</t></is></c></row>')
+
+    path = _write_package(str(tmp_path / 'big.xlsx'), rows_xml(), dimension=f'A1:D{rows}')
+    with zipfile.ZipFile(path) as zf:
+        sheet_size = zf.getinfo(SHEET_PART).file_size
+        tracemalloc.start()
+        try:
+            count = 0
+            for row, values in ooxml.iter_data_rows(zf, SHEET_PART, columns=(1, 2), first_row=1):
+                assert values[1] == 100000 + row
+                count += 1
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    assert count == rows
+    # Sheet ~4 MB: bộ nhớ đỉnh chỉ vài trăm KB (bộ đệm của iterparse và zlib)
+    assert peak < sheet_size / 10, (peak, sheet_size)
+
+
+def _picture(name, rid):
+    return (f'<xdr:pic><xdr:nvPicPr><xdr:cNvPr id="1" name="{name}"/></xdr:nvPicPr>'
+            f'<xdr:blipFill><a:blip r:embed="{rid}"/></xdr:blipFill></xdr:pic>')
+
+
+def _two_cell(row, content):
+    return (f'<xdr:twoCellAnchor><xdr:from><xdr:col>2</xdr:col><xdr:row>{row - 1}</xdr:row></xdr:from>'
+            f'<xdr:to><xdr:col>3</xdr:col><xdr:row>{row}</xdr:row></xdr:to>{content}<xdr:clientData/>'
+            '</xdr:twoCellAnchor>')
+
+
+def _alternate(choice, fallback, requires='a14'):
+    return (f'<mc:AlternateContent><mc:Choice Requires="{requires}">{choice}</mc:Choice>'
+            f'<mc:Fallback>{fallback}</mc:Fallback></mc:AlternateContent>')
+
+
+def test_pictures_in_alternate_content(tmp_path):
+    drawing = (
+        f'<xdr:wsDr xmlns:xdr="{NS_XDR}" xmlns:a="{NS_A}" xmlns:r="{NS_R}" xmlns:mc="{NS_MC}" '
+        f'xmlns:a14="{NS_A14}">'
+        # Nhánh Choice cần a14 (không hỗ trợ): dùng Fallback
+        + _alternate(_two_cell(2, _picture('Choice 2', 'rId1')), _two_cell(2, _picture('Fallback 2', 'rId2')))
+        # Nhánh Choice chỉ cần namespace đã biết: dùng Choice
+        + _alternate(_two_cell(3, _picture('Choice 3', 'rId3')), _two_cell(3, _picture('Fallback 3', 'rId1')),
+                     requires='a')
+        # AlternateContent bên trong anchor (trong nhóm)
+        + _two_cell(4, '<xdr:grpSp>' + _alternate(_picture('Choice 4', 'rId1'), _picture('Fallback 4', 'rId4'))
+                    + '</xdr:grpSp>')
+        + _two_cell(5, _picture('Ảnh 5', 'rId5'))
+        + '</xdr:wsDr>')
+    path = str(tmp_path / 'a.xlsx')
+    with zipfile.ZipFile(path, 'w') as zf:
+        zf.writestr(SHEET_PART, f'<worksheet xmlns="{NS_MAIN}"><sheetData/></worksheet>')
+        zf.writestr('xl/worksheets/_rels/sheet1.xml.rels', (
+            f'<Relationships xmlns="{NS_PKG_REL}"><Relationship Id="rId1" Type="{ooxml.REL_DRAWING}" '
+            'Target="../drawings/drawing1.xml"/></Relationships>'))
+        zf.writestr('xl/drawings/drawing1.xml', drawing)
+        zf.writestr('xl/drawings/_rels/drawing1.xml.rels', (
+            f'<Relationships xmlns="{NS_PKG_REL}">'
+            + ''.join(f'<Relationship Id="rId{i}" Type="{NS_R}/image" Target="../media/image{i}.png"/>'
+                      for i in range(1, 6))
+            + '</Relationships>'))
+    with zipfile.ZipFile(path) as zf:
+        pictures = list(ooxml.iter_pictures(zf, SHEET_PART))
+    assert [(p['name'], p['from'][0], p['media']) for p in pictures] == [
+        ('Fallback 2', 2, 'xl/media/image2.png'),
+        ('Choice 3', 3, 'xl/media/image3.png'),
+        ('Fallback 4', 4, 'xl/media/image4.png'),
+        ('Ảnh 5', 5, 'xl/media/image5.png'),
+    ]
@@ -0,0 +1,314 @@
+"""
+Kiểm tra đọc trực tiếp file .xls (BIFF8): compound file OLE2, giá trị ô, kho ảnh BStore
+và anchor ô trong MsoDrawing
+
+File kiểm thử được tạo trong bộ nhớ bằng các hàm _ole_file / _workbook_stream bên dưới
+(chỉ gồm các bản ghi mà xls.py đọc), không cần Excel hay Pillow.
+"""
+
+import os
+import struct
+
+import pytest
+
+import van
+import xls
+
+SECTOR_SIZE = 512
+MINI_CUTOFF = 4096
+
+# Ảnh giả: xls.py chỉ sao chép bytes, riêng DIB được thêm BITMAPFILEHEADER
+JPEG = b'\xff\xd8\xff\xe0' + b'jpeg' * 8 + b'\xff\xd9'
+PNG = b'\x89PNG\r\n\x1a\n' + b'png' * 8
+DIB = struct.pack('<IiiHHIIiiII', 40, 2, 2, 1, 24, 0, 16, 2835, 2835, 0, 0) + bytes(range(16))
+
+# Loại ảnh OfficeArt: (loại bản ghi blip, instance, loại trong FBSE)
+BLIP_TYPES = {'jpeg': (0xF01D, 0x46A, 5), 'png': (0xF01E, 0x6E0, 6), 'dib': (0xF01F, 0x7A8, 7)}
+
+
+def _record(record_type, data):
+    return struct.pack('<HH', record_type, len(data)) + data
+
+
+def _art(ver, instance, record_type, body):
+    return struct.pack('<HHI', ver | (instance << 4), record_type, len(body)) + body
+
+
+def _unicode(text, length_size=2):
+    """XLUnicodeString (chuỗi UTF-16, cờ fHighByte = 1)"""
+    return struct.pack('<B' if length_size == 1 else '<H', len(text)) + b'\x01' + text.encode('utf-16-le')
+
+
+def _anchor(row, col, dy_top=0, row_bottom=None, dy_bottom=0):
+    """OfficeArtClientAnchorSheet (hàng / cột đánh số từ 1, độ lệch dọc theo 1/256 chiều cao hàng)"""
+    row_bottom = row if row_bottom is None else row_bottom
+    return _art(0, 0, 0xF010, struct.pack('<9H', 2, col - 1, 0, row - 1, dy_top, col - 1, 500, row_bottom - 1,
+                                          dy_bottom))
+
+
+def _shape(shape_id, pib, anchor=b'', name=None):
+    """SpContainer của một ảnh"""
+    props = [(0x4104, pib)]
+    complex_data = b''
+    if name:
+        complex_data = (name + '\x00').encode('utf-16-le')
+        props.append((0x8380, len(complex_data)))
+    fopt = b''.join(struct.pack('<HI', prop_id, value) for prop_id, value in props) + complex_data
+    body = (_art(2, 75, 0xF00A, struct.pack('<II', shape_id, 0xA00)) + _art(3, len(props), 0xF00B, fopt)
+            + anchor + _art(0, 0, 0xF011, b''))
+    return _art(0xF, 0, 0xF004, body)
+
+
+def _group(shape_id, anchor, shapes):
+    """SpgrContainer: SpContainer đầu tiên mô tả nhóm (kèm anchor), ảnh con không có anchor riêng"""
+    group_shape = _art(0xF, 0, 0xF004, _art(1, 0, 0xF009, bytes(16))
+                       + _art(2, 0, 0xF00A, struct.pack('<II', shape_id, 0x201)) + anchor)
+    return _art(0xF, 0, 0xF003, group_shape + b''.join(shapes))
+
+
+def _workbook_stream(sheet_name, cells, blips=(), shapes=(), split_drawing=False):
+    """
+    Luồng Workbook BIFF8 với một sheet
+
+    Args:
+        cells (list): (row, col, value) đánh số từ 1; chuỗi được ghi vào SST, số nguyên dạng RK
+        blips (list): Loại ảnh ('jpeg', 'png', 'dib') và bytes, pib đánh số từ 1 theo thứ tự
+        shapes (list): Các SpContainer / SpgrContainer của sheet
+        split_drawing (bool): Tách mỗi bản ghi MsoDrawing thành MsoDrawing + hai CONTINUE
+    """
+    strings = []
+    cell_records = b''
+    for row, col, value in cells:
+        if isinstance(value, str):
+            if value not in strings:
+                strings.append(value)
+            cell_records += _record(0x00FD, struct.pack('<HHHI', row - 1, col - 1, 0, strings.index(value)))
+        elif isinstance(value, int):
+            cell_records += _record(0x027E, struct.pack('<HHHI', row - 1, col - 1, 0, (value << 2) | 2))
+        else:
+            cell_records += _record(0x0203, struct.pack('<HHHd', row - 1, col - 1, 0, value))
+
+    # SST tách sang CONTINUE ở giữa chuỗi thứ hai (CONTINUE bắt đầu bằng cờ fHighByte)
+    sst = struct.pack('<II', len(strings), len(strings)) + b''.join(_unicode(text) for text in strings)
+    split = 8 + len(_unicode(strings[0])) + 3 + 4 if len(strings) > 1 else len(sst)
+    sst_records = _record(0x00FC, sst[:split])
+    if split < len(sst):
+        sst_records += _record(0x003C, b'\x01' + sst[split:])
+
+    # MsoDrawingGroup: kho ảnh BStore, tách sang CONTINUE ở giữa
+    fbse_records = b''
+    for kind, data in blips:
+        blip_type, instance, fbse_type = BLIP_TYPES[kind]
+        blip = _art(0, instance, blip_type, bytes(16) + b'\xff' + data)
+        fbse = bytes([fbse_type, fbse_type]) + bytes(16) + struct.pack('<HIIIBBBB', 0, len(blip), 1, 0, 0, 0, 0, 0)
+        fbse_records += _art(2, fbse_type, 0xF007, fbse + blip)
+    drawing_group = _art(0xF, 0, 0xF000, _art(0, 0, 0xF006, bytes(16))
+                         + _art(0xF, len(blips), 0xF001, fbse_records))
+    half = len(drawing_group) // 2
+    drawing_group_records = _record(0x00EB, drawing_group[:half]) + _record(0x003C, drawing_group[half:])
+
+    # MsoDrawing của sheet: phần đầu kèm patriarch, sau đó mỗi ảnh một bản ghi, xen bản ghi OBJ
+    patriarch = _art(0xF, 0, 0xF004, _art(1, 0, 0xF009, bytes(16)) + _art(2, 0, 0xF00A, struct.pack('<II', 1024, 5)))
+    shapes_data = b''.join(shapes)
+    container = _art(0xF, 0, 0xF002, _art(0, 0, 0xF008, struct.pack('<II', len(shapes) + 1, 1024))
+                     + _art(0xF, 0, 0xF003, patriarch + shapes_data))
+    chunks = [container[:len(container) - len(shapes_data)]] + list(shapes)
+    obj = _record(0x005D, b'\x15\x00\x12\x00\x08\x00' + bytes(16))
+    drawing_records = b''
+    for chunk in chunks:
+        if split_drawing:
+            third = len(chunk) // 3
+            drawing_records += (_record(0x00EC, chunk[:third]) + _record(0x003C, chunk[third:2 * third])
+                                + _record(0x003C, chunk[2 * third:]))
+        else:
+            drawing_records += _record(0x00EC, chunk)
+        drawing_records += obj
+
+    last_row = max(row for row, _, _ in cells)
+    sheet = (_record(0x0809, struct.pack('<HHHHII', 0x0600, 0x0010, 0, 0, 0, 0))
+             + _record(0x0200, struct.pack('<IIHHH', 0, last_row, 0, 3, 0))
+             + cell_records + drawing_records + _record(0x000A, b''))
+
+    def globals_part(sheet_offset):
+        return (_record(0x0809, struct.pack('<HHHHII', 0x0600, 0x0005, 0, 0, 0, 0))
+                + _record(0x003D, struct.pack('<9H', 0, 0, 0, 0, 0, 0, 0, 1, 600))
+                + _record(0x0085, struct.pack('<IBB', sheet_offset, 0, 0) + _unicode(sheet_name, 1))
+                + drawing_group_records + sst_records + _record(0x000A, b''))
+
+    return globals_part(len(globals_part(0))) + sheet
+
+
+def _ole_file(entries, streams):
+    """
+    Compound file OLE2 phiên bản 3
+
+    Args:
+        entries (list): Mục thư mục sau mục gốc: (tên, loại (1: storage, 2: stream),
+            chỉ số luồng trong streams hoặc None, con, trái, phải); mục gốc có con là mục 1
+        streams (list): Nội dung các luồng (được đệm đủ MINI_CUTOFF byte để nằm ngoài mini stream)
+    """
+    sectors = []
+    fat = []
+    starts = []
+    for data in streams:
+        data = data.ljust(max(len(data), MINI_CUTOFF), b'\x00')
+        count = -(-len(data) // SECTOR_SIZE)
+        start = len(sectors)
+        starts.append((start, len(data)))
+        for index in range(count):
+            sectors.append(data[index * SECTOR_SIZE:(index + 1) * SECTOR_SIZE].ljust(SECTOR_SIZE, b'\x00'))
+            fat.append(start + index + 1 if index < count - 1 else xls.END_OF_CHAIN)
+
+    def entry(name, entry_type, start, size, child, left, right):
+        encoded = (name + '\x00').encode('utf-16-le')
+        return (encoded.ljust(64, b'\x00') + struct.pack('<HBB', len(encoded), entry_type, 1)
+                + struct.pack('<III', left, right, child) + bytes(36) + struct.pack('<IQ', start, size))
+
+    none = xls.NO_STREAM
+    directory = entry('Root Entry', 5, xls.END_OF_CHAIN, 0, 1, none, none)
+    for name, entry_type, stream, child, left, right in entries:
+        start, size = starts[stream] if stream is not None else (xls.END_OF_CHAIN, 0)
+        directory += entry(name, entry_type, start, size, child, left, right)
+    directory = directory.ljust(-(-len(directory) // SECTOR_SIZE) * SECTOR_SIZE, b'\x00')
+    dir_start = len(sectors)
+    for index in range(len(directory) // SECTOR_SIZE):
+        sectors.append(directory[index * SECTOR_SIZE:(index + 1) * SECTOR_SIZE])
+        fat.append(dir_start + index + 1 if (index + 1) * SECTOR_SIZE < len(directory) else xls.END_OF_CHAIN)
+
+    fat_count = 1
+    while len(fat) + fat_count > fat_count * (SECTOR_SIZE // 4):
+        fat_count += 1
+    fat_start = len(sectors)
+    fat += [0xFFFFFFFD] * fat_count
+    fat += [xls.FREE_SECTOR] * (fat_count * (SECTOR_SIZE // 4) - len(fat))
+    fat_data = struct.pack(f'<{len(fat)}I', *fat)
+
+    header = (xls.OLE_SIGNATURE + bytes(16) + struct.pack('<HHHHH', 0x3E, 3, 0xFFFE, 9, 6) + bytes(6)
+              + struct.pack('<9I', 0, fat_count, dir_start, 0, MINI_CUTOFF, xls.END_OF_CHAIN, 0, xls.END_OF_CHAIN, 0)
+              + struct.pack('<109I', *([fat_start + index for index in range(fat_count)]
+                                       + [xls.FREE_SECTOR] * (109 - fat_count))))
+    return header + b''.join(sectors) + fat_data
+
+
+def _employee_cells(rows):
+    cells = [(1, 1, 'Mã NV'), (1, 2, 'Họ và tên'), (1, 3, 'Ảnh')]
+    for row in range(2, rows + 2):
+        # Mã NV xen kẽ RK và NUMBER như Excel
+        cells.append((row, 1, 1000 + row if row % 2 else float(1000 + row)))
+        cells.append((row, 2, f'Nguyễn Văn {row}'))
+    return cells
+
+
+def _simple_book(path, shapes, blips, rows=4, sheet_name='Sheet1', split_drawing=False):
+    stream = _workbook_stream(sheet_name, _employee_cells(rows), blips, shapes, split_drawing)
+    none = xls.NO_STREAM
+    with open(path, 'wb') as f:
+        f.write(_ole_file([('Workbook', 2, 0, none, none, none)], [stream]))
+    return path
+
+
+def test_cells_and_shared_strings(tmp_path):
+    path = _simple_book(str(tmp_path / 'a.xls'), [], [])
+    assert xls.is_workbook(path)
+    with xls.open_package(path) as book:
+        assert xls.sheet_names(book) == ['Sheet1']
+        sheet_name, index = xls.resolve_sheet(book)
+        assert sheet_name == 'Sheet1'
+        assert xls.read_dimension(book, index) == 5
+        header = dict(xls.read_header_rows(book, index, 1, 3))
+        assert header[1] == {1: 'Mã NV', 2: 'Họ và tên', 3: 'Ảnh'}
+        rows = list(xls.iter_data_rows(book, index, columns=(1, 2)))
+    assert rows == [(row, {1: float(1000 + row), 2: f'Nguyễn Văn {row}'}) for row in range(2, 6)]
+
+
+def test_pictures_and_media(tmp_path):
+    shapes = [_shape(1025, 1, _anchor(2, 3), name='Ảnh 1'), _shape(1026, 2, _anchor(3, 3)),
+              _shape(1027, 3, _anchor(4, 3))]
+    path = _simple_book(str(tmp_path / 'a.xls'), shapes, [('jpeg', JPEG), ('png', PNG), ('dib', DIB)])
+    with xls.open_package(path) as book:
+        pictures = xls.read_pictures(book, 0)
+        assert [(p['name'], p['from'][0], p['media']) for p in pictures] == [
+            ('Ảnh 1', 2, 'media/image1.jpeg'), ('Picture 1026', 3, 'media/image2.png'),
+            ('Picture 1027', 4, 'media/image3.bmp')]
+        assert book.read('media/image1.jpeg') == JPEG
+        assert book.read('media/image2.png') == PNG
+        bmp = book.read('media/image3.bmp')
+        with pytest.raises(KeyError):
+            book.read('media/image9.png')
+    assert bmp[:2] == b'BM' and bmp[14:] == DIB
+    assert struct.unpack_from('<I', bmp, 2)[0] == len(bmp)
+    assert struct.unpack_from('<I', bmp, 10)[0] == 14 + 40
+
+
+def test_split_sheet_drawing(tmp_path):
+    # MsoDrawing của sheet dài hơn một bản ghi: phần còn lại nằm trong các bản ghi CONTINUE
+    shapes = [_shape(1025, 1, _anchor(2, 3), name='Ảnh 1'), _shape(1026, 2, _anchor(3, 3))]
+    path = _simple_book(str(tmp_path / 'a.xls'), shapes, [('jpeg', JPEG), ('png', PNG)], split_drawing=True)
+    with xls.open_package(path) as book:
+        assert [(p['name'], p['from'][0], p['media']) for p in xls.read_pictures(book, 0)] == [
+            ('Ảnh 1', 2, 'media/image1.jpeg'), ('Picture 1026', 3, 'media/image2.png')]
+
+
+def test_group_picture_uses_group_anchor(tmp_path):
+    shapes = [_shape(1025, 1, _anchor(2, 3)), _group(2000, _anchor(4, 3), [_shape(2001, 2)])]
+    path = _simple_book(str(tmp_path / 'a.xls'), shapes, [('jpeg', JPEG), ('png', PNG)])
+    with xls.open_package(path) as book:
+        assert [(p['from'][0], p['media']) for p in xls.read_pictures(book, 0)] == [
+            (2, 'media/image1.jpeg'), (4, 'media/image2.png')]
+
+
+def test_export_maps_aligned_and_misaligned_anchors(tmp_path):
+    # Hàng 3: ảnh bắt đầu ở 1/8 cuối hàng 2, phần lớn nằm trong hàng 3
+    # Hàng 4: ảnh bắt đầu ở đầu hàng 4, chỉ lấn 1/8 sang hàng 5
+    shapes = [_shape(1025, 1, _anchor(2, 3)),
+              _shape(1026, 2, _anchor(2, 3, dy_top=224, row_bottom=3, dy_bottom=200)),
+              _shape(1027, 3, _anchor(4, 3, dy_top=10, row_bottom=5, dy_bottom=32))]
+    blips = [('jpeg', JPEG), ('png', PNG), ('dib', DIB)]
+    path = _simple_book(str(tmp_path / 'a.xls'), shapes, blips)
+    output_folder = str(tmp_path / 'out')
+    messages = []
+    assert van.export_images(path, output_folder, backend='ooxml', incremental=False,
+                             log_callback=messages.append), "\n".join(messages)
+    with open(os.path.join(output_folder, '1002_.jpeg'), 'rb') as f:
+        assert f.read() == JPEG
+    with open(os.path.join(output_folder, '1003_.png'), 'rb') as f:
+        assert f.read() == PNG
+    with open(os.path.join(output_folder, '1004_.bmp'), 'rb') as f:
+        assert f.read()[14:] == DIB
+    assert sorted(os.listdir(output_folder)) == ['1002_.jpeg', '1003_.png', '1004_.bmp']
+
+
+def test_workbook_stream_is_read_from_root_storage(tmp_path):
+    # Đối tượng OLE nhúng (storage MBD...) có luồng 'Workbook' riêng, đứng trước luồng thật
+    # trong thư mục: mục 1 = storage nhúng (con: mục 2, phải: mục 3), mục 2 = Workbook nhúng,
+    # mục 3 = Workbook của file
+    embedded = _workbook_stream('Nhúng', [(1, 1, 'Khác')])
+    real = _workbook_stream('Sheet1', _employee_cells(2))
+    none = xls.NO_STREAM
+    entries = [('MBD0001A2B3', 1, None, 2, none, 3),
+               ('Workbook', 2, 0, none, none, none),
+               ('Workbook', 2, 1, none, none, none)]
+    path = str(tmp_path / 'a.xls')
+    with open(path, 'wb') as f:
+        f.write(_ole_file(entries, [embedded, real]))
+    with xls.open_package(path) as book:
+        assert xls.sheet_names(book) == ['Sheet1']
+
+
+def test_missing_workbook_stream(tmp_path):
+    none = xls.NO_STREAM
+    path = str(tmp_path / 'a.xls')
+    with open(path, 'wb') as f:
+        # Chỉ có luồng 'Workbook' trong storage con: file không phải workbook Excel
+        f.write(_ole_file([('MBD0001', 1, None, 2, none, none), ('Workbook', 2, 0, none, none, none)],
+                          [_workbook_stream('Sheet1', _employee_cells(1))]))
+    with pytest.raises(ValueError, match="không có luồng"):
+        xls.open_package(path)
+
+
+def test_not_an_ole_file(tmp_path):
+    path = tmp_path / 'a.xls'
+    path.write_bytes(b'PK\x03\x04 not ole')
+    assert not xls.is_workbook(str(path))
+    with pytest.raises(ValueError):
+        xls.read_ole_stream(path.read_bytes(), xls.WORKBOOK_STREAM)
@@ -1,11 +1,37 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, scrolledtext
 import threading
-import van  # Import module chính
+import queue
+import tempfile
 import os
+import multiprocessing
+
+# Chỉ nạp các module nhẹ (hằng số, kiểm tra tùy chọn) khi mở ứng dụng; module xuất ảnh
+# chính (van) và các backend được nạp khi bắt đầu xuất để cửa sổ hiện ra nhanh hơn
+import events
+import layout
+import media
+import naming
+import output
+import pipeline
+import postprocess
+import preflight
+
+# Số lần cập nhật nhật ký mỗi giây
+LOG_FPS = 20
+# Số dòng tối đa giữ trong ô nhật ký (các dòng cũ hơn chỉ còn trong file log)
+MAX_LOG_LINES = 5000
+# File ghi toàn bộ nhật ký
+LOG_FILE = os.path.join(tempfile.gettempdir(), 'xuat_anh_the.log')
+# Giá trị hiển thị khi không đổi hệ màu
+KEEP_COLOR_MODE = 'giữ nguyên'
+# Biến môi trường dùng khi đo thời gian khởi động (xem bench/import_time.py)
+STARTUP_PROBE_ENV = 'ANHTHE_STARTUP_PROBE'
+# Khoảng thời gian hỏi trạng thái công việc gửi tới dịch vụ xuất (giây, xem server.py)
+SERVICE_POLL_INTERVAL = 0.5
 
 class ImageExportApp:
-    def __init__(self, root):
+    def __init__(self, root, max_log_lines=MAX_LOG_LINES, log_file=LOG_FILE, log_fps=LOG_FPS):
         self.root = root
         self.root.title("Xuất Ảnh Thẻ từ Excel")
         self.root.geometry("800x600")
@@ -16,6 +42,43 @@ class ImageExportApp:
         self.output_folder = tk.StringVar()
         self.scale_factor = tk.DoubleVar(value=3.0)
         self.wait_time = tk.DoubleVar(value=0.5)
+        self.backend = tk.StringVar(value='auto')
+        self.output_format = tk.StringVar(value='original')
+        self.jpeg_quality = tk.IntVar(value=90)
+        self.workers = tk.IntVar(value=os.cpu_count() or 1)
+        self.queue_size = tk.IntVar(value=pipeline.DEFAULT_QUEUE_SIZE)
+        self.incremental = tk.BooleanVar(value=True)
+        self.remove_stale = tk.BooleanVar(value=False)
+        self.use_cache = tk.BooleanVar(value=False)
+        self.resize = tk.StringVar(value='')
+        self.fit_mode = tk.StringVar(value='crop')
+        self.dpi = tk.IntVar(value=0)
+        self.color_mode = tk.StringVar(value=KEEP_COLOR_MODE)
+        self.strip_exif = tk.BooleanVar(value=False)
+        self.ma_nv_column = tk.StringVar(value='')
+        self.ho_ten_column = tk.StringVar(value='')
+        self.photo_column = tk.StringVar(value='')
+        self.filename_template = tk.StringVar(value=naming.DEFAULT_TEMPLATE)
+        self.resume = tk.BooleanVar(value=False)
+        self.output_kind = tk.StringVar(value='folder')
+        self.dry_run = tk.BooleanVar(value=False)
+        self.use_service = tk.BooleanVar(value=False)
+        
+        # Luồng xuất ảnh đang chạy và cờ yêu cầu dừng (kiểm tra ở ranh giới hàng)
+        self.export_thread = None
+        self.cancel_event = threading.Event()
+        # Công việc đang theo dõi trên dịch vụ xuất (None: xuất trực tiếp)
+        self.service_job_id = None
+        
+        # Hàng đợi nhật ký: luồng xuất ảnh chỉ đưa vào hàng đợi,
+        # vòng lặp Tk lấy ra theo lô bằng after()
+        self.max_log_lines = max_log_lines
+        self.log_file = log_file
+        self.log_interval = max(1, int(1000 / log_fps))
+        self.log_queue = queue.Queue()
+        self.latest_status = None
+        self.progress_total = None
+        self.progress_done = 0
         
         # Tạo giao diện
         self.create_widgets()
@@ -23,6 +86,12 @@ class ImageExportApp:
         # Thiết lập giá trị mặc định
         self.output_folder.set("ANHTHE")
         
+        # Bắt đầu vòng lấy nhật ký
+        self.root.after(self.log_interval, self.drain_log_queue)
+        
+        # Đóng cửa sổ khi đang xuất: dừng ở ranh giới hàng rồi mới thoát
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        
     def create_widgets(self):
         # Tạo notebook (tab)
         notebook = ttk.Notebook(self.root)
@@ -69,12 +138,101 @@ class ImageExportApp:
         wait_spin = ttk.Spinbox(control_frame, textvariable=self.wait_time, from_=0.1, to=5.0, increment=0.1, width=10)
         wait_spin.grid(row=3, column=1, padx=5, pady=5, sticky='w')
         
+        # Phương thức trích xuất: auto / ooxml (đọc gói .xlsx) / com (Excel)
+        ttk.Label(control_frame, text="Phương thức:").grid(row=4, column=0, sticky='w', padx=5, pady=5)
+        backend_combo = ttk.Combobox(control_frame, textvariable=self.backend, values=('auto', 'ooxml', 'com'),
+                                     state='readonly', width=10)
+        backend_combo.grid(row=4, column=1, padx=5, pady=5, sticky='w')
+        
+        # Định dạng ảnh đầu ra: giữ nguyên / ép PNG / ép JPEG
+        ttk.Label(control_frame, text="Định dạng Ảnh:").grid(row=5, column=0, sticky='w', padx=5, pady=5)
+        format_combo = ttk.Combobox(control_frame, textvariable=self.output_format, values=media.OUTPUT_FORMATS,
+                                    state='readonly', width=10)
+        format_combo.grid(row=5, column=1, padx=5, pady=5, sticky='w')
+        
+        # Chất lượng JPEG (chỉ dùng khi ép JPEG)
+        ttk.Label(control_frame, text="Chất lượng JPEG:").grid(row=6, column=0, sticky='w', padx=5, pady=5)
+        quality_spin = ttk.Spinbox(control_frame, textvariable=self.jpeg_quality, from_=10, to=95, increment=5, width=10)
+        quality_spin.grid(row=6, column=1, padx=5, pady=5, sticky='w')
+        
+        # Số tiến trình song song và độ sâu hàng đợi
+        ttk.Label(control_frame, text="Số tiến trình:").grid(row=7, column=0, sticky='w', padx=5, pady=5)
+        workers_spin = ttk.Spinbox(control_frame, textvariable=self.workers, from_=1, to=64, increment=1, width=10)
+        workers_spin.grid(row=7, column=1, padx=5, pady=5, sticky='w')
+        
+        ttk.Label(control_frame, text="Hàng đợi (ảnh):").grid(row=8, column=0, sticky='w', padx=5, pady=5)
+        queue_spin = ttk.Spinbox(control_frame, textvariable=self.queue_size, from_=1, to=1024, increment=16, width=10)
+        queue_spin.grid(row=8, column=1, padx=5, pady=5, sticky='w')
+        
+        # Xuất tăng dần theo manifest
+        ttk.Checkbutton(control_frame, text="Chỉ xuất ảnh mới hoặc thay đổi",
+                        variable=self.incremental).grid(row=9, column=1, padx=5, pady=5, sticky='w')
+        ttk.Checkbutton(control_frame, text="Xóa ảnh của nhân viên không còn trong file",
+                        variable=self.remove_stale).grid(row=10, column=1, padx=5, pady=5, sticky='w')
+        ttk.Checkbutton(control_frame, text="Giữ bộ nhớ đệm ảnh đã chuyển đổi giữa các lần chạy",
+                        variable=self.use_cache).grid(row=11, column=1, padx=5, pady=5, sticky='w')
+        
+        # Hậu xử lý ảnh: kích thước cố định, cách đổi cỡ, DPI, hệ màu, EXIF
+        ttk.Label(control_frame, text="Kích thước Ảnh (px):").grid(row=12, column=0, sticky='w', padx=5, pady=5)
+        resize_frame = ttk.Frame(control_frame)
+        resize_frame.grid(row=12, column=1, padx=5, pady=5, sticky='w')
+        ttk.Entry(resize_frame, textvariable=self.resize, width=12).pack(side='left')
+        ttk.Combobox(resize_frame, textvariable=self.fit_mode, values=postprocess.FIT_MODES,
+                     state='readonly', width=8).pack(side='left', padx=5)
+        ttk.Label(resize_frame, text="(vd: 600x800, để trống nếu giữ nguyên)").pack(side='left')
+        
+        ttk.Label(control_frame, text="DPI / Hệ màu:").grid(row=13, column=0, sticky='w', padx=5, pady=5)
+        dpi_frame = ttk.Frame(control_frame)
+        dpi_frame.grid(row=13, column=1, padx=5, pady=5, sticky='w')
+        ttk.Spinbox(dpi_frame, textvariable=self.dpi, from_=0, to=1200, increment=50, width=8).pack(side='left')
+        ttk.Combobox(dpi_frame, textvariable=self.color_mode, values=(KEEP_COLOR_MODE,) + postprocess.COLOR_MODES,
+                     state='readonly', width=10).pack(side='left', padx=5)
+        ttk.Checkbutton(dpi_frame, text="Xóa EXIF", variable=self.strip_exif).pack(side='left', padx=5)
+        
+        # Bố cục sheet: cột mã NV / họ tên / ảnh (để trống để tự nhận diện theo tiêu đề)
+        ttk.Label(control_frame, text="Cột Mã NV / Họ tên / Ảnh:").grid(row=14, column=0, sticky='w', padx=5, pady=5)
+        columns_frame = ttk.Frame(control_frame)
+        columns_frame.grid(row=14, column=1, padx=5, pady=5, sticky='w')
+        for variable in (self.ma_nv_column, self.ho_ten_column, self.photo_column):
+            ttk.Entry(columns_frame, textvariable=variable, width=5).pack(side='left', padx=(0, 5))
+        ttk.Label(columns_frame, text="(vd: A / B / E, để trống để tự nhận diện)").pack(side='left')
+        
+        # Mẫu tên file ảnh đầu ra
+        ttk.Label(control_frame, text="Mẫu tên file:").grid(row=15, column=0, sticky='w', padx=5, pady=5)
+        template_frame = ttk.Frame(control_frame)
+        template_frame.grid(row=15, column=1, padx=5, pady=5, sticky='w')
+        ttk.Entry(template_frame, textvariable=self.filename_template, width=30).pack(side='left')
+        ttk.Label(template_frame, text="(vd: {ma_nv}_{ho_ten_slug}.{ext})").pack(side='left', padx=5)
+        
+        # Nơi ghi ảnh: thư mục hoặc một file nén (.zip / .tar cạnh thư mục đầu ra)
+        ttk.Label(control_frame, text="Đầu ra:").grid(row=16, column=0, sticky='w', padx=5, pady=5)
+        kind_frame = ttk.Frame(control_frame)
+        kind_frame.grid(row=16, column=1, padx=5, pady=5, sticky='w')
+        ttk.Combobox(kind_frame, textvariable=self.output_kind, values=output.OUTPUT_KINDS,
+                     state='readonly', width=10).pack(side='left')
+        ttk.Label(kind_frame, text="(zip / tar: một file nén kèm index.csv)").pack(side='left', padx=5)
+        
         # Nút bắt đầu
         start_frame = ttk.Frame(parent)
         start_frame.pack(fill='x', padx=10, pady=10)
         
-        self.start_button = ttk.Button(start_frame, text="Bắt Đầu Xuất Ảnh", command=self.start_export)
-        self.start_button.pack(pady=10)
+        buttons_frame = ttk.Frame(start_frame)
+        buttons_frame.pack(pady=10)
+        self.start_button = ttk.Button(buttons_frame, text="Bắt Đầu Xuất Ảnh", command=self.start_export)
+        self.start_button.pack(side='left', padx=5)
+        self.cancel_button = ttk.Button(buttons_frame, text="Dừng", command=self.cancel_export, state='disabled')
+        self.cancel_button.pack(side='left', padx=5)
+        ttk.Checkbutton(buttons_frame, text="Tiếp tục lần xuất trước",
+                        variable=self.resume).pack(side='left', padx=5)
+        ttk.Checkbutton(buttons_frame, text="Chỉ kiểm tra (không xuất ảnh)",
+                        variable=self.dry_run).pack(side='left', padx=5)
+        ttk.Checkbutton(buttons_frame, text="Gửi tới dịch vụ xuất",
+                        variable=self.use_service).pack(side='left', padx=5)
+        
+        # Thanh tiến trình (cập nhật từ sự kiện có cấu trúc)
+        self.progress_var = tk.DoubleVar(value=0)
+        self.progress_bar = ttk.Progressbar(start_frame, variable=self.progress_var, maximum=1, mode='determinate')
+        self.progress_bar.pack(fill='x', padx=10)
         
         # Trạng thái
         self.status_var = tk.StringVar(value="Sẵn sàng")
@@ -109,14 +267,73 @@ class ImageExportApp:
         self.log_text.config(state='disabled')
     
     def log_message(self, message):
-        self.log_text.config(state='normal')
-        self.log_text.insert(tk.END, message + "\n")
-        self.log_text.see(tk.END)
-        self.log_text.config(state='disabled')
+        """Đưa một dòng nhật ký vào hàng đợi (an toàn khi gọi từ mọi luồng)"""
+        self.log_queue.put(message)
     
     def update_status(self, message):
-        self.status_var.set(message)
-        self.root.update_idletasks()
+        """Ghi nhận trạng thái mới nhất; thanh trạng thái chỉ hiển thị giá trị cuối cùng"""
+        self.latest_status = message
+    
+    def call_in_ui(self, func):
+        """Yêu cầu vòng lặp Tk gọi func (dùng khi cần thao tác widget từ luồng khác)"""
+        self.log_queue.put(func)
+    
+    def drain_log_queue(self):
+        """Lấy nhật ký từ hàng đợi theo lô và cập nhật giao diện (chạy trên luồng Tk)"""
+        lines = []
+        calls = []
+        try:
+            while True:
+                item = self.log_queue.get_nowait()
+                if callable(item):
+                    calls.append(item)
+                else:
+                    lines.append(item)
+        except queue.Empty:
+            pass
+        
+        if lines:
+            text = "\n".join(lines) + "\n"
+            self.write_log_file(text)
+            self.log_text.config(state='normal')
+            self.log_text.insert(tk.END, text)
+            # Giới hạn số dòng trong ô nhật ký (dòng cuối luôn trống sau "\n")
+            line_count = int(self.log_text.index('end-1c').split('.')[0]) - 1
+            if line_count > self.max_log_lines:
+                self.log_text.delete('1.0', f"{line_count - self.max_log_lines + 1}.0")
+            self.log_text.see(tk.END)
+            self.log_text.config(state='disabled')
+        
+        if self.latest_status is not None:
+            self.status_var.set(self.latest_status)
+            self.latest_status = None
+        
+        if self.progress_total is not None:
+            self.progress_bar.config(maximum=self.progress_total)
+            self.progress_var.set(self.progress_done)
+        
+        for func in calls:
+            func()
+        
+        self.root.after(self.log_interval, self.drain_log_queue)
+    
+    def write_log_file(self, text):
+        """Ghi toàn bộ nhật ký ra file"""
+        if not self.log_file:
+            return
+        try:
+            with open(self.log_file, 'a', encoding='utf-8') as f:
+                f.write(text)
+        except OSError:
+            pass
+    
+    def handle_event(self, event):
+        """Ghi nhận tiến trình từ sự kiện xuất ảnh (hiển thị khi lấy nhật ký)"""
+        if event['type'] == 'phase_start' and event['phase'] == 'export':
+            self.progress_done = 0
+            self.progress_total = max(event.get('total') or 1, 1)
+        elif event['type'] in ('row_processed', 'row_skipped'):
+            self.progress_done += 1
     
     def start_export(self):
         # Kiểm tra file Excel
@@ -124,24 +341,105 @@ class ImageExportApp:
             messagebox.showerror("Lỗi", "Vui lòng chọn file Excel!")
             return
         
+        # Tùy chọn hậu xử lý ảnh
+        try:
+            color_mode = self.color_mode.get()
+            processing = postprocess.make_options(
+                postprocess.parse_size(self.resize.get()),
+                self.fit_mode.get(),
+                self.dpi.get() or None,
+                None if color_mode == KEEP_COLOR_MODE else color_mode,
+                self.strip_exif.get()
+            )
+        except (ValueError, tk.TclError) as e:
+            messagebox.showerror("Lỗi", f"Tùy chọn hậu xử lý không hợp lệ: {str(e)}")
+            return
+        
+        # Bố cục cột
+        try:
+            layout_config = layout.make_layout(
+                self.ma_nv_column.get().strip() or None,
+                self.ho_ten_column.get().strip() or None,
+                self.photo_column.get().strip() or None
+            )
+            naming.validate_template(self.filename_template.get().strip())
+        except ValueError as e:
+            messagebox.showerror("Lỗi", str(e))
+            return
+        
+        # Chế độ kiểm tra: chọn nơi lưu báo cáo ánh xạ (.csv hoặc .json)
+        report_path = None
+        if self.dry_run.get():
+            report_path = filedialog.asksaveasfilename(
+                title="Lưu báo cáo kiểm tra",
+                defaultextension='.csv',
+                filetypes=[("CSV", "*.csv"), ("JSON", "*.json")]
+            )
+            if not report_path:
+                return
+            try:
+                preflight.report_format(report_path)
+            except ValueError as e:
+                messagebox.showerror("Lỗi", str(e))
+                return
+        
         # Tắt nút bắt đầu trong khi xử lý
         self.start_button.config(state='disabled')
+        self.cancel_button.config(state='normal')
+        self.cancel_event.clear()
         self.log_message("=" * 50)
         self.log_message("BẮT ĐẦU QUÁ TRÌNH XUẤT ẢNH")
         self.log_message("=" * 50)
+        if self.log_file:
+            self.log_message(f"📝 Nhật ký đầy đủ: {self.log_file}")
         
         # Lấy tham số
         params = {
             'excel_file_path': self.excel_file.get(),
             'output_folder': self.output_folder.get(),
             'scale_factor': self.scale_factor.get(),
-            'wait_time': self.wait_time.get()
+            'wait_time': self.wait_time.get(),
+            'backend': self.backend.get(),
+            'output_format': self.output_format.get(),
+            'jpeg_quality': self.jpeg_quality.get(),
+            'workers': self.workers.get(),
+            'queue_size': self.queue_size.get(),
+            'incremental': self.incremental.get(),
+            'remove_stale': self.remove_stale.get(),
+            'cache_dir': media.DEFAULT_CACHE_DIR if self.use_cache.get() else None,
+            'processing': processing,
+            'layout_config': layout_config,
+            'filename_template': self.filename_template.get().strip(),
+            'resume': self.resume.get(),
+            'output_kind': self.output_kind.get(),
+            'report_path': report_path
         }
         
         # Chạy trong luồng riêng để không làm đơ giao diện
-        thread = threading.Thread(target=self.run_export, args=(params,))
-        thread.daemon = True
-        thread.start()
+        # (gửi tới dịch vụ xuất: luồng chỉ gửi công việc rồi theo dõi nhật ký)
+        target = self.run_service_job if self.use_service.get() else self.run_export
+        self.export_thread = threading.Thread(target=target, args=(params,))
+        self.export_thread.daemon = True
+        self.export_thread.start()
+    
+    def cancel_export(self):
+        """Yêu cầu dừng xuất ảnh; luồng xuất dừng ở ranh giới hàng kế tiếp"""
+        self.cancel_event.set()
+        self.cancel_button.config(state='disabled')
+        self.update_status("Đang dừng sau hàng hiện tại...")
+    
+    def on_close(self):
+        """Đóng cửa sổ: nếu đang xuất thì dừng ở ranh giới hàng, chờ luồng kết thúc rồi thoát"""
+        if self.service_job_id is not None:
+            # Công việc trên dịch vụ xuất vẫn tiếp tục chạy sau khi đóng cửa sổ
+            self.root.destroy()
+            return
+        if self.export_thread is not None and self.export_thread.is_alive():
+            if not self.cancel_event.is_set():
+                self.cancel_export()
+            self.root.after(100, self.on_close)
+            return
+        self.root.destroy()
     
     def run_export(self, params):
         try:
@@ -150,33 +448,141 @@ class ImageExportApp:
                 self.log_message(message)
                 self.update_status(message)
             
-            # Chạy hàm xuất ảnh từ module van
-            van.export_images(
+            # Nạp module xuất ảnh (lần đầu bắt đầu xuất) rồi chạy hàm xuất ảnh
+            import van
+            
+            report = preflight.PreflightReport() if params['report_path'] else None
+            ok = van.export_images(
                 excel_file_path=params['excel_file_path'],
                 output_folder=params['output_folder'],
                 scale_factor=params['scale_factor'],
                 wait_time=params['wait_time'],
-                log_callback=log_callback
+                log_callback=log_callback,
+                backend=params['backend'],
+                output_format=params['output_format'],
+                jpeg_quality=params['jpeg_quality'],
+                workers=params['workers'],
+                queue_size=params['queue_size'],
+                incremental=params['incremental'],
+                remove_stale=params['remove_stale'],
+                cache_dir=params['cache_dir'],
+                processing=params['processing'],
+                layout_config=params['layout_config'],
+                filename_template=params['filename_template'],
+                resume=params['resume'],
+                output_kind=params['output_kind'],
+                dry_run=report is not None,
+                cancel_event=self.cancel_event,
+                event_sinks=[events.CallbackSink(self.handle_event), report]
             )
             
-            self.log_message("\n" + "=" * 50)
-            self.log_message("HOÀN TẤT XUẤT ẢNH!")
-            self.log_message("=" * 50)
+            if report is not None:
+                # Chế độ kiểm tra: ghi báo cáo, không mở thư mục kết quả
+                self.log_message("")
+                for line in report.report():
+                    self.log_message(line)
+                report.write(params['report_path'])
+                self.log_message(f"📝 Đã ghi báo cáo: {params['report_path']}")
+                return
+            
+            self.show_result(params, ok)
             
-            # Mở thư mục kết quả
-            if os.path.exists(params['output_folder']):
-                os.startfile(params['output_folder'])
+        except Exception as e:
+            self.log_message(f"\n❌ LỖI: {str(e)}")
+        finally:
+            # Kích hoạt lại nút bắt đầu, tắt nút dừng (trên luồng Tk)
+            self.call_in_ui(lambda: self.start_button.config(state='normal'))
+            self.call_in_ui(lambda: self.cancel_button.config(state='disabled'))
+            self.update_status("Hoàn tất - Sẵn sàng cho lần xuất tiếp theo")
+
+    def show_result(self, params, ok):
+        """Thông báo kết quả xuất và mở thư mục kết quả (file nén: thư mục chứa file nén)"""
+        if self.cancel_event.is_set() and not ok:
+            self.log_message("\n⏹️ ĐÃ DỪNG XUẤT ẢNH - chọn \"Tiếp tục lần xuất trước\" để xuất tiếp")
+            return
+        
+        self.log_message("\n" + "=" * 50)
+        self.log_message("HOÀN TẤT XUẤT ẢNH!")
+        self.log_message("=" * 50)
+        
+        result_folder = params['output_folder']
+        if params['output_kind'] != 'folder':
+            result_folder = os.path.dirname(os.path.abspath(result_folder))
+        if os.path.exists(result_folder):
+            os.startfile(result_folder)
+    
+    def run_service_job(self, params):
+        """Gửi công việc tới dịch vụ xuất (server.py) rồi theo dõi nhật ký và tiến trình đến khi xong"""
+        try:
+            import getpass
+            import time
+            import server
+            
+            url = server.service_url()
+            if not server.is_available(url):
+                self.log_message(f"❌ LỖI: Không kết nối được dịch vụ xuất ảnh tại {url} "
+                                 f"(chạy 'python server.py' hoặc bỏ chọn \"Gửi tới dịch vụ xuất\")")
+                return
+            
+            # Dịch vụ tự quyết định số tiến trình mã hóa; chế độ kiểm tra do report_path quyết định
+            job_params = {key: value for key, value in params.items() if value is not None
+                          and (key in server.JOB_OPTIONS or key in server.JOB_EXTRAS)}
+            job_params['user'] = getpass.getuser()
+            job = server.submit_job(job_params, url)
+            self.service_job_id = job['id']
+            self.log_message(f"📨 Đã gửi công việc {job['id']} tới dịch vụ xuất ảnh ({url})")
+            
+            offset = 0
+            cancel_sent = False
+            while True:
+                if self.cancel_event.is_set() and not cancel_sent:
+                    cancel_sent = True
+                    try:
+                        server.cancel_job(job['id'], url)
+                    except ValueError:
+                        pass
+                log = server.read_log(job['id'], offset, url)
+                offset = log['offset']
+                for line in log['lines']:
+                    self.log_message(line)
+                    self.update_status(line)
+                job = server.get_job(job['id'], url)
+                if job['state'] == 'queued':
+                    self.update_status(f"Đang chờ dịch vụ xuất ảnh (vị trí {job.get('position')} trong hàng đợi)")
+                elif job['progress']['total']:
+                    self.progress_total = max(job['progress']['total'], 1)
+                    self.progress_done = job['progress']['done']
+                if job['state'] in server.FINISHED_STATES and not log['lines']:
+                    break
+                time.sleep(SERVICE_POLL_INTERVAL)
+            
+            if job['state'] == 'failed':
+                self.log_message(f"\n❌ LỖI: {job['error']}")
+            elif not params['report_path']:
+                self.show_result(params, job['state'] == 'succeeded')
             
         except Exception as e:
             self.log_message(f"\n❌ LỖI: {str(e)}")
         finally:
-            # Kích hoạt lại nút bắt đầu
-            self.start_button.config(state='normal')
+            self.service_job_id = None
+            self.call_in_ui(lambda: self.start_button.config(state='normal'))
+            self.call_in_ui(lambda: self.cancel_button.config(state='disabled'))
             self.update_status("Hoàn tất - Sẵn sàng cho lần xuất tiếp theo")
 
+def _report_startup(root, probe_path):
+    """Đo thời gian khởi động (bench/import_time.py): ghi file báo hiệu khi cửa sổ đã hiện ra rồi thoát"""
+    with open(probe_path, 'w', encoding='utf-8') as f:
+        f.write('ok')
+    root.destroy()
+
 def main():
+    # Cần cho ProcessPoolExecutor khi đóng gói bằng PyInstaller trên Windows
+    multiprocessing.freeze_support()
     root = tk.Tk()
     app = ImageExportApp(root)
+    probe_path = os.environ.get(STARTUP_PROBE_ENV)
+    if probe_path:
+        root.after_idle(_report_startup, root, probe_path)
     root.mainloop()
 
 if __name__ == "__main__":
@@ -0,0 +1,59 @@
+# -*- mode: python ; coding: utf-8 -*-
+# Bản đóng gói khởi động nhanh: pyinstaller ui_fast.spec -> dist/ui/ui.exe
+#   - one-dir: không phải giải nén toàn bộ ứng dụng vào thư mục tạm mỗi lần mở
+#   - không có cửa sổ console, không nén UPX (giải nén UPX và quét virus làm chậm lúc mở)
+#   - bỏ các module không dùng đến
+# Đo thời gian mở cửa sổ: python bench/import_time.py --exe dist/ui/ui.exe
+
+
+a = Analysis(
+    ['ui.py'],
+    pathex=[],
+    binaries=[],
+    datas=[],
+    hiddenimports=[],
+    hookspath=[],
+    hooksconfig={},
+    runtime_hooks=[],
+    excludes=[
+        # Thư viện lớn có thể được cài cùng môi trường nhưng ứng dụng không dùng
+        'numpy', 'pandas', 'scipy', 'matplotlib', 'IPython', 'jedi',
+        'PyQt5', 'PyQt6', 'PySide2', 'PySide6',
+        'PIL.ImageQt', 'PIL.ImageTk', 'PIL.ImageShow',
+        # Thư viện chuẩn chỉ dùng khi phát triển
+        'test', 'unittest', 'doctest', 'pydoc', 'pdb', 'lib2to3', 'idlelib',
+        'setuptools', 'pkg_resources', 'distutils',
+        # (giữ http.server: ui.py nạp server.py khi gửi công việc tới dịch vụ xuất)
+        'sqlite3', 'xmlrpc', 'curses',
+    ],
+    noarchive=False,
+    optimize=1,
+)
+pyz = PYZ(a.pure)
+
+exe = EXE(
+    pyz,
+    a.scripts,
+    [],
+    exclude_binaries=True,
+    name='ui',
+    debug=False,
+    bootloader_ignore_signals=False,
+    strip=False,
+    upx=False,
+    console=False,
+    disable_windowed_traceback=False,
+    argv_emulation=False,
+    target_arch=None,
+    codesign_identity=None,
+    entitlements_file=None,
+)
+coll = COLLECT(
+    exe,
+    a.binaries,
+    a.datas,
+    strip=False,
+    upx=False,
+    upx_exclude=[],
+    name='ui',
+)
@@ -7,6 +7,8 @@ Mục đích:
     - Tạm thời phóng to ảnh để lấy chất lượng gốc
     - Xuất ảnh ra thư mục với tên file theo mã nhân viên
     - Giữ nguyên định dạng và bố cục file Excel gốc
+    - Hoặc đọc trực tiếp gói .xlsx / file .xls BIFF8 (backend 'ooxml') để lấy
+      bytes ảnh gốc mà không cần Excel, COM hay clipboard, kể cả ảnh đặt trong ô
 
 Các chức năng chính:
     1. Tạo thư mục lưu ảnh đầu ra
@@ -16,43 +18,187 @@ Các chức năng chính:
     5. Khôi phục trạng thái ban đầu của Excel
 """
 
+import io
 import os
-import re
 import sys
 import time
-import win32com.client as win32
-import pythoncom
-from PIL import ImageGrab
+import posixpath
 import warnings
 import traceback
 
+import checkpoint
+import events
+import layout
+import manifest
+import mapping
+import media
+import naming
+import ooxml
+import output
+import pipeline
+import postprocess
+import xls
+
 # Tắt cảnh báo không cần thiết
 warnings.filterwarnings("ignore")
 
-def clean_filename(name):
+# Làm sạch chuỗi để tạo tên file an toàn (giữ tên cũ cho cli.py và các script bên ngoài)
+clean_filename = naming.clean_filename
+
+# Số hàng đọc thêm phía dưới ảnh neo theo ô khi tính hàng chứa phần lớn ảnh (ảnh oneCell không có hàng cuối)
+ANCHOR_LOOKAHEAD_ROWS = 50
+
+# Số hàng tối đa của một sheet Excel (giới hạn khi tìm hàng chứa ảnh anchor tuyệt đối)
+EXCEL_MAX_ROWS = 1048576
+
+def _com_modules():
     """
-    Làm sạch chuỗi để tạo tên file an toàn
+    Nạp pywin32 và ImageGrab cho backend COM
+    
+    Chỉ nạp khi thực sự xuất bằng COM: các module này nặng và làm chậm lúc
+    mở ứng dụng; backend 'ooxml' không cần đến chúng.
+    
+    Returns:
+        tuple: (win32com.client, pythoncom, PIL.ImageGrab)
+    
+    Raises:
+        ImportError: Không có pywin32 (vd: Linux)
+    """
+    import win32com.client as win32
+    import pythoncom
+    from PIL import ImageGrab
+    return win32, pythoncom, ImageGrab
+
+def com_available():
+    """True nếu dùng được backend COM (đã cài pywin32)"""
+    try:
+        _com_modules()
+    except ImportError:
+        return False
+    return True
+
+def _package_reader(excel_file_path):
+    """
+    Module đọc trực tiếp file cho backend 'ooxml' (cùng giao diện hàm)
+    
+    Returns:
+        module: xls (file .xls BIFF8), ooxml (gói .xlsx) hoặc None nếu không đọc trực tiếp được
+    """
+    if not os.path.isfile(excel_file_path):
+        return None
+    if ooxml.is_package(excel_file_path):
+        return ooxml
+    if xls.is_workbook(excel_file_path):
+        return xls
+    return None
+
+def resolve_backend(excel_file_path, backend='auto'):
+    """
+    Backend thực sự dùng cho một file
     
     Args:
-        name (str/int): Giá trị đầu vào có thể là chuỗi hoặc số
+        excel_file_path (str): Đường dẫn đến file Excel
+        backend (str): 'ooxml', 'com' hoặc 'auto'
         
     Returns:
-        str: Tên file đã được làm sạch
+        str: backend đã cho, hoặc với 'auto': 'ooxml' nếu đọc trực tiếp được file, ngược lại 'com'
+    """
+    if backend != 'auto':
+        return backend
+    return 'ooxml' if _package_reader(excel_file_path) is not None else 'com'
+
+def normalize_ma_nv(ma_nv):
+    """Mã NV dạng số thực nguyên (vd: 1001.0 từ Excel) được chuyển về số nguyên"""
+    if isinstance(ma_nv, float) and ma_nv.is_integer():
+        return int(ma_nv)
+    return ma_nv
+
+def _log_collisions(log, stream, collisions, planned, on_collision):
+    """
+    Ghi nhật ký và phát sự kiện cho các tên file trùng phát hiện trước khi xuất
+    
+    Args:
+        collisions (list): (filename, [các hàng]) từ naming.plan_filenames
+        planned (dict): {row: (key, filename)} sau khi xử lý trùng
+        on_collision (str): 'suffix' hoặc 'skip'
     """
-    # Loại bỏ các ký tự đặc biệt không hợp lệ trong tên file
-    cleaned = re.sub(r'[\\/*?:"<>|]', '', str(name)).strip()
-    return cleaned if cleaned else "Unknown"
+    if not collisions:
+        return
+    log(f"⚠️ Phát hiện {len(collisions)} tên file trùng nhau:")
+    for filename, rows in collisions:
+        listed = ", ".join(str(row) for row in rows)
+        if on_collision == 'skip':
+            log(f"  ⚠️ {filename} (hàng {listed}): giữ hàng {rows[0]}, bỏ qua các hàng còn lại")
+        else:
+            renamed = ", ".join(f"hàng {row} → {planned[row][1]}" for row in rows[1:])
+            log(f"  ⚠️ {filename} (hàng {listed}): {renamed}")
+        stream.emit('collision', filename=filename, rows=rows, policy=on_collision)
 
-def export_images(excel_file_path, output_folder, scale_factor, wait_time, log_callback=None):
+def list_sheets(excel_file_path, backend='auto', session=None):
+    """
+    Liệt kê tên các sheet của workbook
+    
+    Args:
+        excel_file_path (str): Đường dẫn đến file Excel
+        backend (str): 'ooxml', 'com' hoặc 'auto'
+        session (ExportSession): Phiên cung cấp Excel dùng chung (bắt buộc với backend COM)
+        
+    Returns:
+        list: Danh sách tên sheet
+    """
+    if resolve_backend(excel_file_path, backend) == 'ooxml':
+        reader = _package_reader(excel_file_path) or ooxml
+        with reader.open_package(excel_file_path) as package:
+            return reader.sheet_names(package)
+    wb = session.excel().Workbooks.Open(os.path.abspath(excel_file_path))
+    try:
+        return [wb.Worksheets(i).Name for i in range(1, wb.Worksheets.Count + 1)]
+    finally:
+        wb.Close(False)
+
+def export_images(excel_file_path, output_folder, scale_factor=3.0, wait_time=0.5, log_callback=None,
+                  backend='auto', output_format='original', jpeg_quality=90,
+                  workers=1, queue_size=pipeline.DEFAULT_QUEUE_SIZE, incremental=True, remove_stale=False,
+                  link_mode='hardlink', cache_dir=None, sheet_name=None, session=None, event_sinks=None,
+                  processing=None, batch_size=pipeline.DEFAULT_BATCH_SIZE, layout_config=None,
+                  filename_template=naming.DEFAULT_TEMPLATE, on_collision='suffix', resume=False,
+                  cancel_event=None, output_kind='folder', dry_run=False):
     """
     Hàm chính thực hiện xuất ảnh từ Excel
     
     Args:
         excel_file_path (str): Đường dẫn đến file Excel
         output_folder (str): Thư mục lưu ảnh đầu ra
-        scale_factor (float): Hệ số phóng to ảnh để lấy chất lượng gốc
-        wait_time (float): Thời gian chờ giữa các thao tác (giây)
+        scale_factor (float): Hệ số phóng to ảnh để lấy chất lượng gốc (chỉ dùng cho backend COM)
+        wait_time (float): Thời gian chờ giữa các thao tác (giây, chỉ dùng cho backend COM)
         log_callback (function): Hàm callback để ghi log ra giao diện
+        backend (str): 'ooxml' (đọc trực tiếp gói .xlsx hoặc file .xls BIFF8), 'com' (điều khiển Excel)
+            hoặc 'auto' (dùng 'ooxml' nếu file là gói zip hoặc file .xls)
+        output_format (str): 'original' (giữ nguyên bytes ảnh gốc), 'png' hoặc 'jpeg'
+        jpeg_quality (int): Chất lượng JPEG khi output_format='jpeg'
+        workers (int): Số tiến trình mã hóa/ghi ảnh song song (backend 'ooxml')
+        queue_size (int): Số ảnh tối đa đang chờ trong hàng đợi giữa bước đọc và bước ghi
+        incremental (bool): Dùng manifest để bỏ qua các hàng có ảnh không đổi (backend 'ooxml')
+        remove_stale (bool): Xóa file của mã NV không còn trong workbook (False: chỉ cảnh báo)
+        link_mode (str): Cách tạo file cho ảnh trùng nội dung: 'hardlink' hoặc 'copy'
+        cache_dir (str): Thư mục lưu ảnh đã chuyển đổi để dùng lại giữa các lần chạy (None: không dùng)
+        sheet_name (str): Tên sheet cần xuất (None: sheet đang hoạt động)
+        session (ExportSession): Phiên dùng chung Excel / nhóm tiến trình giữa nhiều workbook
+        event_sinks (list): Các sink nhận sự kiện có cấu trúc (xem events.py)
+        processing (dict): Hậu xử lý ảnh: kích thước, chế độ cắt, DPI, hệ màu, EXIF
+            (xem postprocess.make_options; None: giữ nguyên ảnh)
+        batch_size (int): Số ảnh gửi sang tiến trình con trong một lô (backend 'ooxml')
+        layout_config (dict): Cột mã NV / họ tên / ảnh và hàng tiêu đề (xem layout.make_layout;
+            None: tự nhận diện tiêu đề, không thấy thì dùng bố cục mặc định A/B/C)
+        filename_template (str): Mẫu tên file, vd: '{ma_nv}_{ho_ten_slug}.{ext}' (xem naming.py)
+        on_collision (str): Khi tên file trùng: 'suffix' (thêm -2, -3...) hoặc 'skip' (giữ hàng đầu)
+        resume (bool): Tiếp tục từ checkpoint của lần chạy bị lỗi/dừng trước, bỏ qua các hàng đã xong
+        cancel_event (threading.Event): Khi được đặt, dừng xuất ở ranh giới hàng kế tiếp
+            (checkpoint được giữ lại để tiếp tục)
+        output_kind (str): 'folder' (từng file trong thư mục), 'zip' hoặc 'tar' (một file nén
+            <output_folder>.zip / .tar kèm index.csv; không dùng manifest và checkpoint)
+        dry_run (bool): Chế độ kiểm tra: chỉ đọc bảng dữ liệu và ánh xạ ảnh, báo cáo kết quả
+            từng hàng qua sự kiện (xem preflight.py) mà không ghi ảnh nào
         
     Returns:
         bool: True nếu thành công, False nếu có lỗi
@@ -63,29 +209,824 @@ def export_images(excel_file_path, output_folder, scale_factor, wait_time, log_c
         if log_callback:
             log_callback(message)
     
+    backend = resolve_backend(excel_file_path, backend)
+    
+    if output_format not in media.OUTPUT_FORMATS:
+        log(f"❌ LỖI TỔNG THỂ: Định dạng đầu ra không hợp lệ: {output_format}")
+        return False
+    
+    if backend not in ('ooxml', 'com'):
+        log(f"❌ LỖI TỔNG THỂ: Backend không hợp lệ: {backend}")
+        return False
+    
     try:
-        # Tạo thư mục lưu ảnh nếu chưa tồn tại
-        os.makedirs(output_folder, exist_ok=True)
+        naming.validate_template(filename_template)
+    except ValueError as e:
+        log(f"❌ LỖI TỔNG THỂ: {str(e)}")
+        return False
+    if on_collision not in naming.COLLISION_POLICIES:
+        log(f"❌ LỖI TỔNG THỂ: Chính sách tên file trùng không hợp lệ: {on_collision}")
+        return False
+    if output_kind not in output.OUTPUT_KINDS:
+        log(f"❌ LỖI TỔNG THỂ: Loại đầu ra không hợp lệ: {output_kind}")
+        return False
+    if backend == 'com' and not com_available():
+        log("❌ LỖI TỔNG THỂ: Backend COM cần pywin32 và Microsoft Excel (chỉ chạy trên Windows)")
+        return False
+    
+    # File nén được ghi lại toàn bộ mỗi lần: không dùng manifest (bỏ qua ảnh không đổi) và checkpoint
+    progress = None
+    if dry_run:
+        incremental = False
+        log("🧪 Chế độ kiểm tra: chỉ đọc bảng dữ liệu và ánh xạ ảnh, không xuất ảnh")
+    elif output_kind != 'folder':
+        incremental = False
+        if resume:
+            log("ℹ️ Đầu ra file nén không hỗ trợ tiếp tục, xuất lại từ đầu")
+    else:
+        # Checkpoint: trạng thái từng hàng, ghi định kỳ để tiếp tục sau khi lỗi hoặc dừng
+        progress = checkpoint.Checkpoint(output_folder, checkpoint.make_signature(
+            excel_file_path, sheet=sheet_name, backend=backend, output_format=output_format,
+            jpeg_quality=jpeg_quality, processing=processing, layout=layout_config,
+            filename_template=filename_template, on_collision=on_collision))
+    if progress is not None and resume:
+        reason = progress.load()
+        if reason is None:
+            log(f"⏯️ Tiếp tục từ checkpoint: {len(progress.resumed)} hàng đã xong ở lần chạy trước")
+        elif reason == 'mismatch':
+            log("⚠️ Checkpoint không khớp với file Excel hoặc tùy chọn hiện tại, xuất lại từ đầu")
+        else:
+            log("ℹ️ Chưa có checkpoint, xuất từ đầu")
+    
+    sinks = list(event_sinks or []) + ([progress] if progress is not None else [])
+    stream = events.EventStream(sinks, source=os.path.basename(excel_file_path))
+    ok = False
+    try:
+        if backend == 'ooxml':
+            ok = _export_images_package(excel_file_path, output_folder, log,
+                                        output_format=output_format, jpeg_quality=jpeg_quality,
+                                        workers=workers, queue_size=queue_size,
+                                        incremental=incremental, remove_stale=remove_stale,
+                                        link_mode=link_mode, cache_dir=cache_dir,
+                                        sheet_name=sheet_name, session=session, stream=stream,
+                                        processing=processing, batch_size=batch_size,
+                                        layout_config=layout_config, filename_template=filename_template,
+                                        on_collision=on_collision, progress=progress, cancel_event=cancel_event,
+                                        output_kind=output_kind, dry_run=dry_run)
+        else:
+            ok = _export_images_com(excel_file_path, output_folder, scale_factor, wait_time, log,
+                                    output_format, jpeg_quality, sheet_name=sheet_name, session=session,
+                                    stream=stream, processing=processing, layout_config=layout_config,
+                                    filename_template=filename_template, on_collision=on_collision,
+                                    progress=progress, cancel_event=cancel_event, output_kind=output_kind,
+                                    dry_run=dry_run)
+    finally:
+        # Hoàn tất: xóa checkpoint; lỗi hoặc dừng giữa chừng: ghi lại để tiếp tục
+        if progress is not None and ok:
+            progress.remove()
+        elif progress is not None:
+            progress.save()
+    stream.finish(ok)
+    return ok
+
+
+def _open_output(output_kind, output_folder, link_mode, log):
+    """Mở nơi ghi ảnh đầu ra (thư mục hoặc file nén, xem output.py)"""
+    out = output.open_output(output_kind, output_folder, link_mode)
+    out.open()
+    if out.archive:
+        log(f"🗜️ Ghi ảnh vào file nén: {os.path.abspath(out.location)}")
+    else:
         log(f"📁 Đã tạo thư mục lưu ảnh: {os.path.abspath(output_folder)}")
+    return out
+
+
+def _resolve_anchor_rows(reader, zf, sheet_part, pictures, column):
+    """
+    Gán hàng cho các ảnh neo theo ô ('row'): hàng chứa phần lớn chiều cao ảnh (xem mapping.anchor_row)
+    
+    Chiều cao hàng chỉ được đọc (thêm một lượt đọc sheet theo luồng) khi có ảnh phủ
+    nhiều hàng với độ lệch tính theo point; ảnh .xls có độ lệch theo tỷ lệ chiều cao hàng.
+    
+    Args:
+        pictures (list): Ảnh có 'from' (ảnh anchor tuyệt đối được bỏ qua)
+        column (int): Cột ảnh (để đọc vị trí các ô)
+    """
+    spanning = []
+    for picture in pictures:
+        if picture['from'] is None:
+            continue
+        picture['row'] = picture['from'][0]
+        if 'offsets' not in picture:
+            continue
+        to_row = picture['to'][0] if picture['to'] else picture['from'][0]
+        top, bottom = picture['offsets']
+        if picture['offset_unit'] == 'row':
+            picture['row'] = mapping.anchor_row(picture['from'][0], top, to_row, bottom, lambda row: 1.0)
+        elif picture['to'] is None or mapping.anchor_spans_rows(picture['from'][0], to_row, bottom):
+            spanning.append((picture, to_row))
+    if not spanning:
+        return
+    
+    # Ảnh oneCell có thể kéo dài qua hàng cuối đã biết: đọc thêm một số hàng phía dưới
+    first_row = min(picture['from'][0] for picture, _ in spanning)
+    last_row = max(to_row for _, to_row in spanning) + ANCHOR_LOOKAHEAD_ROWS
+    positions = reader.read_sheet_geometry(zf, sheet_part, first_row, last_row, column)
+    default_height = positions[last_row]['height']
+    
+    def row_height(row):
+        return positions[row]['height'] if row in positions else default_height
+    
+    for picture, to_row in spanning:
+        top, bottom = picture['offsets']
+        picture['row'] = mapping.anchor_row(picture['from'][0], top, to_row, bottom, row_height)
+
+
+def _floating_positions(reader, zf, sheet_part, first_row, last_row, floating, column):
+    """
+    Đọc vị trí các ô của cột ảnh cho ảnh dùng anchor tuyệt đối
+    
+    Vị trí được tính ít nhất tới hàng chứa cạnh dưới của ảnh thấp nhất: sheet không có
+    <dimension> (hoặc <dimension> sai) vẫn ánh xạ được ảnh nằm dưới hàng cuối có
+    khai báo chiều cao riêng.
+    
+    Args:
+        last_row (int): Hàng cuối đã biết (None: chưa biết)
+        floating (list): Ảnh có 'top' / 'height' (point)
+        column (int): Cột ảnh
+    
+    Returns:
+        dict: {row: {'top', 'left', 'height', 'width'}} như read_sheet_geometry
+    """
+    bottom = max(picture['top'] + picture['height'] for picture in floating)
+    last_row = max(last_row or first_row, first_row)
+    while True:
+        positions = reader.read_sheet_geometry(zf, sheet_part, first_row, last_row, column)
+        end = positions[last_row]
+        covered = end['top'] + end['height']
+        if covered >= bottom or last_row >= EXCEL_MAX_ROWS:
+            return positions
+        # Ước tính số hàng còn thiếu theo chiều cao hàng cuối
+        missing = int((bottom - covered) / max(end['height'], 1.0)) + 1
+        last_row = min(last_row + max(missing, ANCHOR_LOOKAHEAD_ROWS), EXCEL_MAX_ROWS)
+
+
+def _check_rows(log, stream, rows, image_mapping, planned):
+    """
+    Chế độ kiểm tra (dry-run): báo cáo kết quả ánh xạ từng hàng mà không xuất ảnh
+    
+    Args:
+        rows (iterable): (row, ma_nv, ho_ten) của các hàng dữ liệu
+        image_mapping (dict): {row: ảnh đã ánh xạ}
+        planned (dict): {row: (key, filename)} từ naming.plan_filenames
+    """
+    counts = {'ok': 0, 'no_image': 0, 'missing_info': 0, 'collision': 0}
+    log("\n🧪 Kiểm tra từng hàng (không xuất ảnh)...")
+    for row, ma_nv, ho_ten in rows:
+        ma_nv = normalize_ma_nv(ma_nv)
+        if not ma_nv or not ho_ten:
+            reason = 'missing_info'
+            log(f"  ⏩ Hàng {row}: Thiếu mã NV hoặc họ tên")
+        elif row not in image_mapping:
+            reason = 'no_image'
+            log(f"  ❌ Hàng {row}: Không có ảnh được ánh xạ")
+        elif planned[row][1] is None:
+            reason = 'collision'
+            log(f"  ⏩ Hàng {row}: Trùng tên file với hàng trước, sẽ bị bỏ qua")
+        else:
+            counts['ok'] += 1
+            stream.emit('row_checked', row=row, ma_nv=ma_nv, ho_ten=ho_ten, filename=planned[row][1])
+            continue
+        counts[reason] += 1
+        stream.emit('row_skipped', row=row, ma_nv=ma_nv, ho_ten=ho_ten, reason=reason)
+    
+    log("\n📋 KẾT QUẢ KIỂM TRA (chưa xuất ảnh):")
+    log(f"- Số hàng có ảnh, sẽ được xuất: {counts['ok']}")
+    log(f"- Số hàng không có ảnh: {counts['no_image']}")
+    log(f"- Số hàng thiếu mã NV hoặc họ tên: {counts['missing_info']}")
+    log(f"- Số hàng trùng tên file (sẽ bỏ qua): {counts['collision']}")
+    return counts
+
+
+def _log_cancelled(log, row, resumable=True):
+    """Thông báo đã dừng theo yêu cầu và cách tiếp tục"""
+    if not resumable:
+        log(f"\n⏹️ Đã dừng theo yêu cầu trước hàng {row}. File nén dở dang đã được xóa")
+        return
+    log(f"\n⏹️ Đã dừng theo yêu cầu trước hàng {row}. "
+        f"Chọn \"Tiếp tục\" (hoặc --resume) để xuất tiếp từ checkpoint")
+
+
+def _naming_details(filename_template, collisions, on_collision, skipped_count):
+    """Các dòng báo cáo về mẫu tên file và tên file trùng"""
+    details = [("Mẫu tên file", filename_template), ("Số tên file trùng", len(collisions))]
+    if collisions and on_collision == 'skip':
+        details.append(("Số hàng bỏ qua vì trùng tên file", skipped_count))
+    elif collisions:
+        details.append(("Số file được thêm hậu tố", sum(len(rows) - 1 for _, rows in collisions)))
+    return details
+
+
+def _log_summary(log, total_rows, processed_count, missing_images, details=None, skipped_count=0):
+    """
+    Ghi báo cáo hoàn thành chung cho các backend
+    
+    Args:
+        details (list): Các dòng bổ sung dạng (nhãn, giá trị)
+        skipped_count (int): Số hàng bỏ qua vì ảnh không thay đổi
+    """
+    log("\n📊 BÁO CÁO HOÀN THÀNH:")
+    log(f"- Tổng số hàng đã xử lý: {total_rows}")
+    log(f"- Số ảnh đã lưu thành công: {processed_count}")
+    log(f"- Số hàng không có ảnh: {missing_images}")
+    for label, value in details or []:
+        log(f"- {label}: {value}")
+    
+    if processed_count == 0 and skipped_count == 0:
+        log("\n⚠️ CẢNH BÁO: Không có ảnh nào được lưu! Nguyên nhân có thể:")
+        log("   1. Không thể xác định vị trí ảnh")
+        log("   2. Lỗi trong quá trình sao chép ảnh")
+        log("   3. Định dạng ảnh không hỗ trợ")
+        log("   4. Cấu trúc file Excel không như mong đợi")
+
+
+def _export_images_package(excel_file_path, output_folder, log, output_format='original', jpeg_quality=90,
+                           workers=1, queue_size=pipeline.DEFAULT_QUEUE_SIZE, incremental=True, remove_stale=False,
+                           link_mode='hardlink', cache_dir=None, sheet_name=None, session=None, stream=None,
+                           processing=None, batch_size=pipeline.DEFAULT_BATCH_SIZE, layout_config=None,
+                           filename_template=naming.DEFAULT_TEMPLATE, on_collision='suffix', progress=None,
+                           cancel_event=None, output_kind='folder', dry_run=False):
+    """
+    Xuất ảnh bằng cách đọc trực tiếp gói .xlsx hoặc file .xls BIFF8 (không cần Excel/COM)
+    
+    Ảnh được ánh xạ vào hàng theo anchor trong drawing (ảnh đặt trong ô: theo ô
+    chứa ảnh). Với chính sách 'original', bytes nén của ảnh gốc được sao chép
+    thẳng ra file; chỉ khi ép định dạng khác mới giải mã qua Pillow.
+    
+    Args:
+        excel_file_path (str): Đường dẫn đến file Excel
+        output_folder (str): Thư mục lưu ảnh đầu ra
+        log (function): Hàm ghi log
+        output_format (str): Chính sách định dạng đầu ra
+        jpeg_quality (int): Chất lượng JPEG khi ép định dạng JPEG
+        workers (int): Số tiến trình mã hóa/ghi ảnh song song
+        queue_size (int): Số ảnh tối đa đang chờ trong hàng đợi
+        incremental (bool): Bỏ qua các hàng có ảnh nguồn và file đầu ra không đổi
+        remove_stale (bool): Xóa file của mã NV không còn trong workbook
+        link_mode (str): Cách tạo file cho ảnh trùng nội dung: 'hardlink' hoặc 'copy'
+        cache_dir (str): Thư mục bộ nhớ đệm ảnh đã chuyển đổi giữa các lần chạy
+        sheet_name (str): Tên sheet cần xuất (None: sheet đang hoạt động)
+        session (ExportSession): Phiên cung cấp nhóm tiến trình dùng chung
+        stream (EventStream): Luồng sự kiện có cấu trúc
+        processing (dict): Tùy chọn hậu xử lý ảnh (None: giữ nguyên ảnh)
+        batch_size (int): Số ảnh trong một lô gửi sang tiến trình con
+        layout_config (dict): Cấu hình bố cục cột (None: tự nhận diện)
+        filename_template (str): Mẫu tên file
+        on_collision (str): Chính sách khi tên file trùng: 'suffix' hoặc 'skip'
+        progress (Checkpoint): Checkpoint đã nạp khi tiếp tục (bỏ qua các hàng đã xong)
+        cancel_event (threading.Event): Yêu cầu dừng ở ranh giới hàng
+        output_kind (str): 'folder', 'zip' hoặc 'tar' (xem output.py)
+        dry_run (bool): Chỉ đọc bảng dữ liệu và ánh xạ ảnh, không đọc bytes ảnh và không ghi file
+        
+    Returns:
+        bool: True nếu thành công, False nếu có lỗi hoặc bị dừng
+    """
+    if stream is None:
+        stream = events.EventStream()
+    out = None
+    try:
+        stream.enter('open')
+        if not dry_run:
+            out = _open_output(output_kind, output_folder, link_mode, log)
         log(f"📊 Đang mở file Excel: {os.path.basename(excel_file_path)}")
         
-        # Khởi tạo môi trường COM
-        pythoncom.CoInitialize()
+        # Cùng giao diện hàm cho gói .xlsx (ooxml.py) và file .xls (xls.py)
+        reader = _package_reader(excel_file_path) or ooxml
+        with reader.open_package(excel_file_path) as zf:
+            sheet_name, sheet_part = reader.resolve_sheet(zf, sheet_name)
+            log(f"🔓 Đã mở gói Excel thành công (sheet: {sheet_name})")
+            
+            # Bố cục sheet: cột mã NV / họ tên / ảnh theo cấu hình hoặc tiêu đề
+            shared_strings = reader.read_shared_strings(zf)
+            header_rows = reader.read_header_rows(zf, sheet_part, layout.HEADER_SCAN_ROWS,
+                                                 layout.HEADER_SCAN_COLUMNS, shared_strings)
+            sheet_layout = layout.resolve(layout_config, header_rows)
+            ma_nv_col, ho_ten_col, photo_col = sheet_layout['ma_nv'], sheet_layout['ho_ten'], sheet_layout['photo']
+            first_row = sheet_layout['first_row']
+            log(f"🧭 Bố cục sheet: {layout.describe(sheet_layout)}")
+            
+            # Số hàng ước tính theo <dimension>; mã NV/họ tên được đọc dần khi xuất
+            dimension_row = reader.read_dimension(zf, sheet_part)
+            if dimension_row and dimension_row >= first_row:
+                log(f"🔢 Số hàng dữ liệu ước tính: {dimension_row - first_row + 1} "
+                    f"(từ hàng {first_row} đến {dimension_row})")
+            
+            stream.enter('geometry')
+            pictures = reader.read_pictures(zf, sheet_part)
+            log(f"🖼️ Tìm thấy {len(pictures)} hình ảnh trong sheet")
+            in_cell = sum(1 for picture in pictures if picture['anchor'] == 'cell')
+            if in_cell:
+                log(f"ℹ️ Trong đó có {in_cell} ảnh đặt trong ô (Place in Cell), ánh xạ theo ô chứa ảnh")
+            
+            if not pictures:
+                log("⚠️ Cảnh báo: Không tìm thấy hình ảnh nào trong sheet!")
+                return False
+            
+            # Ánh xạ ảnh vào hàng theo anchor: hàng chứa phần lớn chiều cao ảnh
+            stream.enter('mapping')
+            _resolve_anchor_rows(reader, zf, sheet_part, pictures, photo_col)
+            image_mapping = {}
+            floating = []
+            log("\n🔍 Bắt đầu ánh xạ ảnh vào các ô (theo anchor)...")
+            for picture in pictures:
+                if picture['from'] is None:
+                    floating.append(picture)
+                    continue
+                method = 'cell' if picture['anchor'] == 'cell' else 'anchor'
+                # Cột ảnh đã xác định: bỏ qua ảnh không phủ cột ảnh (logo, chữ ký...)
+                from_col = picture['from'][1]
+                to_col = picture['to'][1] if picture['to'] else from_col
+                if sheet_layout['detected'] and not from_col <= photo_col <= to_col:
+                    log(f"  ℹ️ Bỏ qua ảnh nằm ngoài cột ảnh: {picture['name']}")
+                    stream.emit('mapping', row=picture['row'], picture=picture['name'], method=method,
+                                status='outside_column')
+                    continue
+                row = picture['row']
+                if row in image_mapping:
+                    # Anchor không có kích thước ảnh: giữ ảnh xuất hiện trước trong drawing
+                    log(f"  ⚠️ Hàng {row} đã có ảnh {image_mapping[row]['name']}, bỏ qua ảnh {picture['name']}")
+                    stream.emit('mapping', row=row, picture=picture['name'], method=method, status='duplicate')
+                    continue
+                image_mapping[row] = picture
+                log(f"  ✅ Ánh xạ ảnh vào hàng {row} (anchor: {picture['anchor']})")
+                stream.emit('mapping', row=row, picture=picture['name'], method=method, status='mapped')
+            
+            # Ảnh dùng anchor tuyệt đối: ánh xạ theo vị trí trên cột ảnh
+            if floating:
+                log(f"ℹ️ Có {len(floating)} ảnh dùng anchor tuyệt đối, ánh xạ theo vị trí")
+                cell_positions = _floating_positions(reader, zf, sheet_part, first_row, dimension_row,
+                                                     floating, photo_col)
+                mapping.map_shapes(floating, cell_positions, log, image_mapping, stream=stream,
+                                   restrict_to_column=sheet_layout['detected'])
+            
+            log(f"📊 Tổng số ảnh đã ánh xạ: {len(image_mapping)}/{len(pictures)}")
+            
+            def data_rows():
+                """Duyệt bảng mã NV / họ tên theo luồng (chỉ đọc hai cột cần thiết)"""
+                return reader.iter_data_rows(zf, sheet_part, columns=(ma_nv_col, ho_ten_col),
+                                            first_row=first_row, key_column=ma_nv_col,
+                                            shared_strings=shared_strings)
+            
+            def media_extension(row):
+                """Phần mở rộng của ảnh gốc đã ánh xạ vào hàng"""
+                return posixpath.splitext(image_mapping[row]['media'])[1].lower()
+            
+            # Đặt tên file cho mọi hàng có ảnh trước khi xuất để phát hiện tên trùng
+            planned, collisions = naming.plan_filenames(
+                ((row, normalize_ma_nv(cells[ma_nv_col]), cells[ho_ten_col],
+                  media.output_extension(media_extension(row), output_format, processing))
+                 for row, cells in data_rows()
+                 if cells.get(ma_nv_col) and cells.get(ho_ten_col) and row in image_mapping),
+                filename_template, on_collision)
+            log(f"🏷️ Mẫu tên file: {filename_template}")
+            _log_collisions(log, stream, collisions, planned, on_collision)
+            
+            if dry_run:
+                _check_rows(log, stream, ((row, cells.get(ma_nv_col), cells.get(ho_ten_col))
+                                          for row, cells in data_rows()), image_mapping, planned)
+                return True
+            
+            # Manifest của lần chạy trước
+            entries = manifest.load(output_folder) if incremental else {}
+            options = f"{output_format}:{jpeg_quality}"
+            if processing:
+                options += f":{postprocess.describe(processing)}"
+                log(f"🎨 Hậu xử lý ảnh: {postprocess.describe(processing)}")
+            seen = set()
+            if entries:
+                log(f"📒 Đã đọc manifest: {len(entries)} mã NV từ lần chạy trước")
+            
+            # Xuất ảnh
+            counts = {'rows': 0, 'processed': 0, 'missing': 0, 'skipped': 0, 'new': 0, 'updated': 0,
+                      'deduplicated': 0, 'cache_hits': 0, 'collisions_skipped': 0, 'resumed': 0}
+            cancelled_at = []
+            
+            # Bộ nhớ đệm theo mã băm: mỗi ảnh gốc chỉ mã hóa/ghi một lần
+            first_outputs = {}
+            duplicates = []
+            # Thông tin ảnh đầu ra theo mã băm và các dòng của index.csv (đầu ra file nén)
+            output_info = {}
+            index_rows = []
+            digest_owners = {}
+            # Mã băm theo phần media: phần media dùng lại không phải đọc/băm lại
+            part_digests = {}
+            stream.enter('export', total=max(dimension_row - first_row + 1, 0) if dimension_row else None)
+            log("\n🚀 Bắt đầu xuất ảnh gốc...")
+            if workers > 1:
+                log(f"⚙️ Xuất song song: {workers} tiến trình, hàng đợi {queue_size} ảnh")
+            
+            def read_jobs():
+                """Bước đọc: duyệt sheet theo luồng, lấy thông tin hàng và bytes ảnh gốc từ zip"""
+                for row, cells in data_rows():
+                    # Dừng theo yêu cầu ở ranh giới hàng (các ảnh đang ghi vẫn được hoàn tất)
+                    if cancel_event is not None and cancel_event.is_set():
+                        cancelled_at.append(row)
+                        break
+                    counts['rows'] += 1
+                    try:
+                        ma_nv = cells.get(ma_nv_col)
+                        ho_ten = cells.get(ho_ten_col)
+                        
+                        # Hàng đã xong ở lần chạy trước (tiếp tục từ checkpoint)
+                        if progress is not None and progress.is_done(row):
+                            counts['resumed'] += 1
+                            if row in planned:
+                                seen.add(planned[row][0])
+                            elif ma_nv and ho_ten:
+                                seen.add(str(normalize_ma_nv(ma_nv)))
+                            stream.emit('row_skipped', row=row, ma_nv=ma_nv, reason='resumed')
+                            continue
+                        
+                        if not ma_nv or not ho_ten:
+                            log(f"  ⏩ Hàng {row}: Bỏ qua vì thiếu mã NV hoặc họ tên")
+                            stream.emit('row_skipped', row=row, ma_nv=ma_nv, reason='missing_info')
+                            continue
+                        
+                        ma_nv = normalize_ma_nv(ma_nv)
+                        
+                        if row not in image_mapping:
+                            seen.add(str(ma_nv))
+                            counts['missing'] += 1
+                            log(f"  ❌ Hàng {row}: Không có ảnh được ánh xạ")
+                            stream.emit('row_skipped', row=row, ma_nv=ma_nv, reason='no_image')
+                            continue
+                        
+                        key, filename = planned[row]
+                        seen.add(key)
+                        if filename is None:
+                            counts['collisions_skipped'] += 1
+                            log(f"  ⏩ Hàng {row}: Bỏ qua vì trùng tên file với hàng trước")
+                            stream.emit('row_skipped', row=row, ma_nv=ma_nv, reason='collision')
+                            continue
+                        
+                        media_part = image_mapping[row]['media']
+                        media_ext = media_extension(row)
+                        filepath = out.path(filename)
+                        data = None
+                        digest = part_digests.get(media_part)
+                        if digest is None:
+                            data = zf.read(media_part)
+                            digest = manifest.content_hash(data)
+                            part_digests[media_part] = digest
+                        
+                        owners = digest_owners.setdefault(digest, [])
+                        if key not in owners:
+                            owners.append(key)
+                        
+                        # Bỏ qua nếu ảnh nguồn và file đầu ra không đổi
+                        if incremental and manifest.is_current(entries.get(key), digest, options, filepath):
+                            counts['skipped'] += 1
+                            log(f"  ⏭️ Hàng {row}: Ảnh không thay đổi, bỏ qua ({filename})")
+                            stream.emit('row_skipped', row=row, ma_nv=ma_nv, reason='unchanged')
+                            continue
+                        
+                        job = {
+                            'row': row,
+                            'ma_nv': ma_nv,
+                            'ho_ten': ho_ten,
+                            'key': key,
+                            'filename': filename,
+                            'filepath': filepath,
+                            'media_part': media_part,
+                            'media_ext': media_ext,
+                            'digest': digest,
+                            'output_format': output_format,
+                            'jpeg_quality': jpeg_quality,
+                            'processing': processing,
+                        }
+                        
+                        # Ảnh trùng nội dung với hàng trước: tạo liên kết sau khi xuất xong
+                        if digest in first_outputs:
+                            duplicates.append((pipeline.without_data(job), first_outputs[digest]))
+                            continue
+                        first_outputs[digest] = pipeline.without_data(job)
+                        transcode = media.needs_transcode(media_ext, output_format, processing)
+                        
+                        # File nén, giữ ảnh gốc: ghi thẳng bytes vào file nén, không qua tiến trình con
+                        if out.archive and not transcode:
+                            data = data if data is not None else zf.read(media_part)
+                            try:
+                                out.add(filename, data)
+                            except Exception:
+                                first_outputs.pop(digest, None)
+                                raise
+                            record_output(job, 'copy', media.describe_bytes(data))
+                            log(f"  ✅ Đã lưu ảnh gốc: {filename} ({len(data)} bytes)")
+                            continue
+                        
+                        # Ảnh đã chuyển đổi ở lần chạy trước (bộ nhớ đệm trên đĩa)
+                        cached = None
+                        if cache_dir and transcode:
+                            cached = media.cache_path(cache_dir, digest, options, posixpath.splitext(filename)[1])
+                            if os.path.exists(cached):
+                                info = None
+                                try:
+                                    if out.archive:
+                                        with open(cached, 'rb') as f:
+                                            data = f.read()
+                                        out.add(filename, data)
+                                        info = media.describe_bytes(data)
+                                    else:
+                                        out.add_file(filename, cached)
+                                except Exception:
+                                    first_outputs.pop(digest, None)
+                                    raise
+                                counts['cache_hits'] += 1
+                                record_output(job, 'cache', info)
+                                log(f"  ♻️ Đã lấy ảnh từ bộ nhớ đệm: {filename}")
+                                continue
+                        job['cache_path'] = cached
+                        job['data'] = data if data is not None else zf.read(media_part)
+                        yield job
+                    
+                    except Exception as e:
+                        log(f"  ⚠️ Lỗi tại hàng {row}: {str(e)}")
+                        stream.emit('row_skipped', row=row, ma_nv=None, reason='error', error=str(e))
+            
+            def record_output(job, method, result=None):
+                """Cập nhật bộ đếm, manifest, chỉ mục và phát sự kiện cho một file đã xuất"""
+                counts['processed'] += 1
+                key = job['key']
+                counts['updated' if key in entries else 'new'] += 1
+                if incremental:
+                    entries[key] = manifest.make_entry(job['media_part'], job['digest'], options, job['filepath'])
+                if out.archive:
+                    # Ảnh trùng nội dung dùng lại thông tin của ảnh đầu tiên
+                    if result is None:
+                        result = output_info[job['digest']]
+                    output_info.setdefault(job['digest'], result)
+                    index_rows.append(dict(result, ma_nv=job['ma_nv'], ho_ten=job['ho_ten'],
+                                           filename=job['filename']))
+                stream.emit('row_processed', row=job['row'], ma_nv=job['ma_nv'], filename=job['filename'],
+                            bytes=result['size'] if result else os.path.getsize(job['filepath']),
+                            method=method, duration=result.get('duration') if result else None)
+            
+            def handle_result(job, result, error):
+                """Bước ghi nhận kết quả (chạy ở luồng chính)"""
+                if error is None and 'data' in result:
+                    # File nén: tiến trình con trả bytes về, ghi tuần tự tại luồng chính
+                    data = result.pop('data')
+                    try:
+                        out.add(job['filename'], data)
+                        if job.get('cache_path'):
+                            os.makedirs(os.path.dirname(job['cache_path']), exist_ok=True)
+                            media.write_bytes(data, job['cache_path'])
+                    except Exception as e:
+                        error = e
+                if error is not None:
+                    first_outputs.pop(job['digest'], None)
+                    log(f"  ❌ Lỗi khi xử lý ảnh hàng {job['row']}: {str(error)}")
+                    stream.emit('row_skipped', row=job['row'], ma_nv=job['ma_nv'], reason='error', error=str(error))
+                    return
+                record_output(job, 'transcode' if result['transcoded'] else 'copy', result)
+                if result['transcoded'] and job.get('cache_path') and not out.archive:
+                    os.makedirs(os.path.dirname(job['cache_path']), exist_ok=True)
+                    media.link_or_copy(job['filepath'], job['cache_path'], link_mode)
+                if result['transcoded'] and processing:
+                    log(f"  ✅ Đã hậu xử lý ảnh: {job['filename']} ({result['size']} bytes)")
+                elif result['transcoded']:
+                    log(f"  ✅ Đã chuyển đổi ảnh sang {output_format.upper()}: {job['filename']} ({result['size']} bytes)")
+                else:
+                    log(f"  ✅ Đã lưu ảnh gốc: {job['filename']} ({result['size']} bytes)")
+            
+            executor = session.executor() if session is not None else None
+            pipeline.run(read_jobs(), handle_result, workers, queue_size, executor=executor,
+                         batch_size=batch_size)
+            
+            # Tạo file cho các hàng có ảnh trùng nội dung
+            for job, first_job in duplicates:
+                if first_job['digest'] not in first_outputs:
+                    log(f"  ❌ Hàng {job['row']}: Ảnh gốc trùng nội dung bị lỗi, không tạo được {job['filename']}")
+                    stream.emit('row_skipped', row=job['row'], ma_nv=job['ma_nv'], reason='error')
+                    continue
+                try:
+                    out.copy(first_job['filename'], job['filename'])
+                    counts['deduplicated'] += 1
+                    record_output(job, 'link')
+                    log(f"  🔗 Hàng {job['row']}: Ảnh trùng với {first_job['filename']}, đã tạo {job['filename']}")
+                except Exception as e:
+                    log(f"  ❌ Lỗi khi xử lý ảnh hàng {job['row']}: {str(e)}")
+                    stream.emit('row_skipped', row=job['row'], ma_nv=job['ma_nv'], reason='error', error=str(e))
+            
+            # Cảnh báo ảnh dùng chung giữa các mã NV khác nhau
+            shared = [keys for keys in digest_owners.values() if len(keys) > 1]
+            for keys in shared:
+                listed = ", ".join(keys[:10]) + (", ..." if len(keys) > 10 else "")
+                log(f"  ⚠️ Cùng một ảnh được dùng cho {len(keys)} mã NV khác nhau: {listed}")
+        
+        # File nén: thêm index.csv rồi đổi tên file tạm thành file chính thức (bị dừng thì xóa)
+        if out.archive and not cancelled_at:
+            out.add(output.INDEX_NAME, output.build_index(index_rows))
+            log(f"🗂️ Đã ghi chỉ mục {output.INDEX_NAME}: {len(index_rows)} ảnh")
+        out.close(keep=not cancelled_at)
+        if out.archive and not cancelled_at:
+            log(f"🗜️ Đã ghi file nén: {os.path.abspath(out.location)} ({os.path.getsize(out.location)} bytes)")
         
-        # Khởi động Excel ở chế độ ẩn
-        excel = win32.Dispatch('Excel.Application')
-        excel.Visible = False
-        excel.DisplayAlerts = False
-        log("🟢 Đã khởi động Excel ở chế độ ẩn")
+        # Mã NV không còn trong workbook
+        stream.enter('teardown')
+        stale = []
+        if incremental:
+            # Khi bị dừng giữa chừng, các mã NV chưa duyệt tới không phải là mã đã bị xóa
+            if not cancelled_at:
+                stale = manifest.remove_stale(output_folder, entries, seen, remove_files=remove_stale)
+            for key, filename in stale:
+                if remove_stale:
+                    log(f"  🗑️ Đã xóa ảnh của mã NV không còn trong file: {filename}")
+                else:
+                    log(f"  ⚠️ Mã NV {key} không còn trong file, ảnh cũ vẫn giữ: {filename}")
+            manifest.save(output_folder, entries, source=os.path.basename(excel_file_path))
+        
+        details = [
+            ("Số lần mã hóa tiết kiệm nhờ ảnh trùng", counts['deduplicated'] + counts['cache_hits']),
+            ("Số ảnh dùng chung giữa nhiều mã NV", len(shared)),
+        ] + _naming_details(filename_template, collisions, on_collision, counts['collisions_skipped'])
+        if incremental:
+            details += [
+                ("Số ảnh mới", counts['new']),
+                ("Số ảnh cập nhật", counts['updated']),
+                ("Số hàng bỏ qua (không đổi)", counts['skipped']),
+                ("Số ảnh đã xóa" if remove_stale else "Số ảnh không còn trong file", len(stale)),
+            ]
+        if counts['resumed']:
+            details.append(("Số hàng đã xong từ lần chạy trước", counts['resumed']))
+        _log_summary(log, counts['rows'], counts['processed'], counts['missing'],
+                     details=details, skipped_count=counts['skipped'] + counts['resumed'])
+        if cancelled_at:
+            _log_cancelled(log, cancelled_at[0], resumable=not out.archive)
+            return False
+        return True
+    
+    except Exception as e:
+        log(f"❌ LỖI TỔNG THỂ: {str(e)}")
+        log(traceback.format_exc())
+        return False
+    
+    finally:
+        # Lỗi giữa chừng: xóa file nén dở dang (không làm gì nếu đã đóng)
+        if out is not None:
+            out.close(keep=False)
+
+
+def _read_row_table_com(sheet, first_row, last_row, columns=(1, 2)):
+    """
+    Đọc giá trị các cột cần thiết (mặc định mã NV ở cột A, họ tên ở cột B)
+    bằng một lần gọi Range(...).Value
+    
+    Args:
+        sheet: Worksheet COM
+        first_row (int): Hàng dữ liệu đầu tiên
+        last_row (int): Hàng dữ liệu cuối cùng
+        columns (tuple): Các cột cần đọc (đánh số từ 1)
+        
+    Returns:
+        dict: {row: {col: value}}
+    """
+    if last_row < first_row:
+        return {}
+    first_col, last_col = min(columns), max(columns)
+    data = sheet.Range(f"{layout.column_letter(first_col)}{first_row}:"
+                       f"{layout.column_letter(last_col)}{last_row}").Value
+    # Range một ô trả về giá trị đơn thay vì bảng
+    if not isinstance(data, tuple):
+        data = ((data,),)
+    return {
+        first_row + i: {first_col + j: value for j, value in enumerate(cells)
+                        if value is not None and first_col + j in columns}
+        for i, cells in enumerate(data)
+    }
+
+
+def _read_row_heights_com(sheet, first_row, last_row, heights):
+    """
+    Đọc chiều cao các hàng theo từng khối
+    
+    Range.RowHeight trả về None khi các hàng trong vùng cao khác nhau; khi đó
+    chia đôi vùng. Sheet ảnh thẻ thường có các hàng cao bằng nhau nên chỉ cần
+    vài lần gọi COM thay vì một lần mỗi hàng.
+    """
+    height = sheet.Range(f"A{first_row}:A{last_row}").RowHeight
+    if height is not None or first_row == last_row:
+        for row in range(first_row, last_row + 1):
+            heights[row] = height or 0.0
+        return
+    middle = (first_row + last_row) // 2
+    _read_row_heights_com(sheet, first_row, middle, heights)
+    _read_row_heights_com(sheet, middle + 1, last_row, heights)
+
+
+def _read_cell_positions_com(sheet, first_row, last_row, column):
+    """
+    Tính vị trí các ô của một cột từ vài lần gọi COM
+    
+    Chỉ đọc Top của ô đầu, Left/Width của cột và chiều cao hàng theo khối,
+    sau đó cộng dồn để có Top của từng hàng.
+    
+    Returns:
+        dict: {row: {'top', 'left', 'height', 'width'}}
+    """
+    if last_row < first_row:
+        return {}
+    first_cell = sheet.Cells(first_row, column)
+    top = first_cell.Top
+    left = first_cell.Left
+    width = first_cell.Width
+    
+    heights = {}
+    _read_row_heights_com(sheet, first_row, last_row, heights)
+    
+    cell_positions = {}
+    for row in range(first_row, last_row + 1):
+        cell_positions[row] = {'top': top, 'left': left, 'height': heights[row], 'width': width}
+        top += heights[row]
+    return cell_positions
+
+
+def _export_images_com(excel_file_path, output_folder, scale_factor, wait_time, log,
+                       output_format='original', jpeg_quality=90, sheet_name=None, session=None, stream=None,
+                       processing=None, layout_config=None, filename_template=naming.DEFAULT_TEMPLATE,
+                       on_collision='suffix', progress=None, cancel_event=None, output_kind='folder',
+                       dry_run=False):
+    """
+    Xuất ảnh bằng Excel COM: phóng to ảnh, sao chép qua clipboard rồi lưu PNG
+    
+    Args:
+        excel_file_path (str): Đường dẫn đến file Excel
+        output_folder (str): Thư mục lưu ảnh đầu ra
+        scale_factor (float): Hệ số phóng to ảnh để lấy chất lượng gốc
+        wait_time (float): Thời gian chờ giữa các thao tác (giây)
+        log (function): Hàm ghi log
+        output_format (str): 'jpeg' để lưu JPEG, các giá trị khác lưu PNG
+        jpeg_quality (int): Chất lượng JPEG
+        sheet_name (str): Tên sheet cần xuất (None: sheet đang hoạt động)
+        session (ExportSession): Phiên cung cấp Excel dùng chung (None: tự khởi động và đóng Excel)
+        stream (EventStream): Luồng sự kiện có cấu trúc
+        processing (dict): Tùy chọn hậu xử lý ảnh (None: giữ nguyên ảnh)
+        layout_config (dict): Cấu hình bố cục cột (None: tự nhận diện)
+        filename_template (str): Mẫu tên file
+        on_collision (str): Chính sách khi tên file trùng: 'suffix' hoặc 'skip'
+        progress (Checkpoint): Checkpoint đã nạp khi tiếp tục (bỏ qua các hàng đã xong)
+        cancel_event (threading.Event): Yêu cầu dừng ở ranh giới hàng
+        output_kind (str): 'folder', 'zip' hoặc 'tar' (xem output.py)
+        dry_run (bool): Chỉ đọc bảng dữ liệu và ánh xạ ảnh, không sao chép ảnh qua clipboard
+        
+    Returns:
+        bool: True nếu thành công, False nếu có lỗi hoặc bị dừng
+    """
+    if stream is None:
+        stream = events.EventStream()
+    out = None
+    try:
+        stream.enter('open')
+        win32, pythoncom, ImageGrab = _com_modules()
+        # Tạo thư mục lưu ảnh (hoặc file nén) nếu chưa tồn tại
+        if not dry_run:
+            out = _open_output(output_kind, output_folder, 'copy', log)
+        log(f"📊 Đang mở file Excel: {os.path.basename(excel_file_path)}")
+        
+        if session is not None:
+            # Dùng Excel đã khởi động của phiên
+            excel = session.excel()
+            log("🟢 Dùng Excel của phiên hiện tại")
+        else:
+            # Khởi tạo môi trường COM
+            pythoncom.CoInitialize()
+            
+            # Khởi động Excel ở chế độ ẩn
+            excel = win32.Dispatch('Excel.Application')
+            excel.Visible = False
+            excel.DisplayAlerts = False
+            log("🟢 Đã khởi động Excel ở chế độ ẩn")
         
         # Mở file Excel
         wb = excel.Workbooks.Open(os.path.abspath(excel_file_path))
-        sheet = wb.ActiveSheet
+        sheet = wb.Worksheets(sheet_name) if sheet_name else wb.ActiveSheet
         log("🔓 Đã mở file Excel thành công")
         
+        # Bố cục sheet: đọc các hàng đầu trong một lần gọi COM để tìm tiêu đề
+        header_values = _read_row_table_com(sheet, 1, layout.HEADER_SCAN_ROWS,
+                                            columns=range(1, layout.HEADER_SCAN_COLUMNS + 1))
+        sheet_layout = layout.resolve(layout_config, sorted(header_values.items()))
+        ma_nv_col, ho_ten_col, photo_col = sheet_layout['ma_nv'], sheet_layout['ho_ten'], sheet_layout['photo']
+        first_row = sheet_layout['first_row']
+        log(f"🧭 Bố cục sheet: {layout.describe(sheet_layout)}")
+        
         # Xác định hàng cuối cùng có dữ liệu
-        last_row = sheet.Cells(sheet.Rows.Count, 1).End(-4162).Row  # xlUp = -4162, last_row = sheet.Cells(sheet.Rows.Count, 1).End(win32.constants.xlUp).Row
-        log(f"🔢 Tổng số hàng dữ liệu: {last_row - 1} (từ hàng 2 đến {last_row})")
+        last_row = sheet.Cells(sheet.Rows.Count, ma_nv_col).End(-4162).Row  # xlUp = -4162, last_row = sheet.Cells(sheet.Rows.Count, 1).End(win32.constants.xlUp).Row
+        log(f"🔢 Tổng số hàng dữ liệu: {max(last_row - first_row + 1, 0)} (từ hàng {first_row} đến {last_row})")
+        
+        # Đọc toàn bộ mã NV / họ tên trong một lần gọi COM
+        stream.enter('geometry')
+        values = _read_row_table_com(sheet, first_row, last_row, columns=(ma_nv_col, ho_ten_col))
         
         # Lấy tất cả hình ảnh trong sheet
         all_shapes = sheet.Shapes
@@ -94,8 +1035,7 @@ def export_images(excel_file_path, output_folder, scale_factor, wait_time, log_c
         # Kiểm tra nếu không có ảnh nào
         if all_shapes.Count == 0:
             log("⚠️ Cảnh báo: Không tìm thấy hình ảnh nào trong sheet!")
-            wb.Close(False)
-            excel.Quit()
+            log("ℹ️ Ảnh đặt trong ô (Place in Cell) không phải Shape: dùng backend 'ooxml' để đọc các ảnh này")
             return False
         
         # Lưu trữ thông tin hình ảnh
@@ -106,152 +1046,97 @@ def export_images(excel_file_path, output_folder, scale_factor, wait_time, log_c
                 # Lưu trạng thái hiện tại của ảnh
                 shapes_info.append({
                     'shape': shape,
-                    'original_top': shape.Top,
-                    'original_left': shape.Left,
-                    'original_width': shape.Width,
-                    'original_height': shape.Height
+                    'name': shape.Name,
+                    'top': shape.Top,
+                    'left': shape.Left,
+                    'width': shape.Width,
+                    'height': shape.Height
                 })
             except Exception as e:
                 log(f"  ⚠️ Lỗi khi lấy thông tin hình ảnh: {str(e)}")
         
         log(f"ℹ️ Đã thu thập thông tin cho {len(shapes_info)} hình ảnh")
         
-        # Lấy vị trí các ô trong cột C (cột 3)
+        # Lấy vị trí các ô trong cột ảnh
         log("🔍 Đang thu thập thông tin vị trí các ô...")
-        cell_positions = {}
-        for row in range(2, last_row + 1):
-            try:
-                cell = sheet.Cells(row, 3)
-                cell_positions[row] = {
-                    'top': cell.Top,
-                    'left': cell.Left,
-                    'height': cell.Height,
-                    'width': cell.Width
-                }
-            except Exception as e:
-                log(f"⚠️ Lỗi tại hàng {row}: {str(e)}")
+        cell_positions = _read_cell_positions_com(sheet, first_row, last_row, photo_col)
         
-        # Ánh xạ hình ảnh vào các ô tương ứng
-        image_mapping = {}
-        unmatched_shapes = []
+        # Ánh xạ hình ảnh vào các ô tương ứng (Pass 1 / Pass 2)
+        stream.enter('mapping')
+        image_mapping, _ = mapping.map_shapes(shapes_info, cell_positions, log, stream=stream,
+                                              restrict_to_column=sheet_layout['detected'])
         
-        # Bước 1: Ánh xạ dựa trên trung tâm
-        log("\n🔍 Bắt đầu ánh xạ ảnh vào các ô (Pass 1: Dựa trên trung tâm)...")
-        for shape_info in shapes_info:
-            shape = shape_info['shape']
-            closest_row = None
-            min_distance = float('inf')
-            
-            # Tính tọa độ trung tâm hình ảnh
-            center_x = shape.Left + shape.Width / 2
-            center_y = shape.Top + shape.Height / 2
-            
-            # Tìm ô gần nhất với ảnh
-            for row, cell_info in cell_positions.items():
-                cell_center_x = cell_info['left'] + cell_info['width'] / 2
-                cell_center_y = cell_info['top'] + cell_info['height'] / 2
-                
-                # Tính khoảng cách Euclid
-                distance = ((center_x - cell_center_x) ** 2 + 
-                            (center_y - cell_center_y) ** 2) ** 0.5
-                
-                if distance < min_distance:
-                    min_distance = distance
-                    closest_row = row
-            
-            if closest_row:
-                cell_info = cell_positions[closest_row]
-                cell_center_x = cell_info['left'] + cell_info['width'] / 2
-                cell_center_y = cell_info['top'] + cell_info['height'] / 2
-                
-                # Kiểm tra các điều kiện ánh xạ
-                center_in_cell = (
-                    cell_info['left'] <= center_x <= cell_info['left'] + cell_info['width'] and
-                    cell_info['top'] <= center_y <= cell_info['top'] + cell_info['height']
-                )
-                
-                tolerance = 20
-                near_center = (
-                    abs(center_x - cell_center_x) < tolerance and
-                    abs(center_y - cell_center_y) < tolerance
-                )
-                
-                within_boundary = (
-                    shape.Left >= cell_info['left'] - tolerance and
-                    shape.Top >= cell_info['top'] - tolerance and
-                    shape.Left + shape.Width <= cell_info['left'] + cell_info['width'] + tolerance and
-                    shape.Top + shape.Height <= cell_info['top'] + cell_info['height'] + tolerance
-                )
-                
-                # Nếu thỏa mãn điều kiện, thêm vào ánh xạ
-                if center_in_cell or near_center or within_boundary:
-                    image_mapping[closest_row] = shape_info
-                    condition = "trong ô" if center_in_cell else "gần trung tâm ô" if near_center else "trong ranh giới ô"
-                    log(f"  ✅ Ánh xạ ảnh vào hàng {closest_row} (khoảng cách: {min_distance:.2f}, điều kiện: {condition})")
-                else:
-                    unmatched_shapes.append((shape_info, closest_row, min_distance))
-                    log(f"  ⚠️ Ảnh gần hàng {closest_row} nhưng không đủ điều kiện (khoảng cách: {min_distance:.2f})")
+        log(f"📊 Tổng số ảnh đã ánh xạ: {len(image_mapping)}/{len(shapes_info)}")
         
-        # Bước 2: Ánh xạ cho các ảnh chưa được xử lý (dùng dung sai lớn hơn)
-        log("\n🔍 Bắt đầu ánh xạ bổ sung (Pass 2: Dùng dung sai rộng hơn)...")
-        for shape_info, closest_row, min_distance in unmatched_shapes:
-            shape = shape_info['shape']
-            cell_info = cell_positions[closest_row]
-            tolerance = 30
-            
-            within_boundary = (
-                shape.Left >= cell_info['left'] - tolerance and
-                shape.Top >= cell_info['top'] - tolerance and
-                shape.Left + shape.Width <= cell_info['left'] + cell_info['width'] + tolerance and
-                shape.Top + shape.Height <= cell_info['top'] + cell_info['height'] + tolerance
-            )
-            
-            if within_boundary:
-                if closest_row not in image_mapping:
-                    image_mapping[closest_row] = shape_info
-                    log(f"  ✅ [Pass 2] Ánh xạ ảnh vào hàng {closest_row} (điều kiện: trong ranh giới ô mở rộng)")
-                else:
-                    log(f"  ⚠️ [Pass 2] Hàng {closest_row} đã có ảnh, bỏ qua ảnh thứ hai")
-            else:
-                log(f"  ❌ [Pass 2] Không ánh xạ được ảnh cho hàng {closest_row}")
+        # Đặt tên file cho mọi hàng có ảnh trước khi xuất để phát hiện tên trùng
+        extension = media.output_extension('.png', output_format)
+        planned, collisions = naming.plan_filenames(
+            ((row, normalize_ma_nv(cells[ma_nv_col]), cells[ho_ten_col], extension)
+             for row, cells in sorted(values.items())
+             if cells.get(ma_nv_col) and cells.get(ho_ten_col) and row in image_mapping),
+            filename_template, on_collision)
+        log(f"🏷️ Mẫu tên file: {filename_template}")
+        _log_collisions(log, stream, collisions, planned, on_collision)
         
-        log(f"📊 Tổng số ảnh đã ánh xạ: {len(image_mapping)}/{len(shapes_info)}")
+        if dry_run:
+            _check_rows(log, stream, ((row, values.get(row, {}).get(ma_nv_col), values.get(row, {}).get(ho_ten_col))
+                                      for row in range(first_row, last_row + 1)), image_mapping, planned)
+            return True
         
         # Xuất ảnh
         processed_count = 0
         missing_images = 0
+        collisions_skipped = 0
+        resumed_count = 0
+        cancelled_at = None
+        index_rows = []
+        stream.enter('export', total=max(last_row - first_row + 1, 0))
         log("\n🚀 Bắt đầu xuất ảnh chất lượng cao...")
         
-        for row in range(2, last_row + 1):
+        for row in range(first_row, last_row + 1):
+            # Dừng theo yêu cầu ở ranh giới hàng (ảnh đã được khôi phục kích thước/vị trí)
+            if cancel_event is not None and cancel_event.is_set():
+                cancelled_at = row
+                break
             try:
-                # Đọc thông tin nhân viên
-                ma_nv = sheet.Cells(row, 1).Value
-                ho_ten = sheet.Cells(row, 2).Value
+                # Đọc thông tin nhân viên từ bảng đã nạp sẵn
+                ma_nv = values.get(row, {}).get(ma_nv_col)
+                ho_ten = values.get(row, {}).get(ho_ten_col)
+                
+                # Hàng đã xong ở lần chạy trước (tiếp tục từ checkpoint)
+                if progress is not None and progress.is_done(row):
+                    resumed_count += 1
+                    stream.emit('row_skipped', row=row, ma_nv=ma_nv, reason='resumed')
+                    continue
                 
                 # Bỏ qua nếu thiếu thông tin
                 if not ma_nv or not ho_ten:
                     log(f"  ⏩ Hàng {row}: Bỏ qua vì thiếu mã NV hoặc họ tên")
+                    stream.emit('row_skipped', row=row, ma_nv=ma_nv, reason='missing_info')
                     continue
                 
                 # Chuẩn hóa mã nhân viên
-                if isinstance(ma_nv, float) and ma_nv.is_integer():
-                    ma_nv = int(ma_nv)
-                
-                # Tạo tên file
-                filename = f"{clean_filename(ma_nv)}_.png"
-                filepath = os.path.join(output_folder, filename)
+                ma_nv = normalize_ma_nv(ma_nv)
                 
                 # Xử lý nếu có ảnh ánh xạ
                 if row in image_mapping:
+                    # Tên file đã đặt trước theo mẫu
+                    filename = planned[row][1]
+                    if filename is None:
+                        collisions_skipped += 1
+                        log(f"  ⏩ Hàng {row}: Bỏ qua vì trùng tên file với hàng trước")
+                        stream.emit('row_skipped', row=row, ma_nv=ma_nv, reason='collision')
+                        continue
+                    
                     shape_info = image_mapping[row]
                     shape = shape_info['shape']
                     
                     try:
-                        # LƯU TRẠNG THÁI HIỆN TẠI
-                        current_top = shape.Top
-                        current_left = shape.Left
-                        current_width = shape.Width
-                        current_height = shape.Height
+                        # LƯU TRẠNG THÁI HIỆN TẠI (đã đọc khi thu thập thông tin ảnh)
+                        current_top = shape_info['top']
+                        current_left = shape_info['left']
+                        current_width = shape_info['width']
+                        current_height = shape_info['height']
                         
                         # TẠM THỜI PHÓNG TO ẢNH ĐỂ LẤY CHẤT LƯỢNG GỐC
                         shape.Width = current_width * scale_factor
@@ -262,6 +1147,7 @@ def export_images(excel_file_path, output_folder, scale_factor, wait_time, log_c
                         shape.Left = -1000
                         
                         # SAO CHÉP ẢNH Ở CHẤT LƯỢNG CAO
+                        row_start = time.perf_counter()
                         shape.Copy()
                         time.sleep(wait_time)
                         
@@ -269,11 +1155,22 @@ def export_images(excel_file_path, output_folder, scale_factor, wait_time, log_c
                         image = ImageGrab.grabclipboard()
                         
                         if image:
-                            image.save(filepath, format='PNG')
+                            image = postprocess.apply(image, processing)
+                            with io.BytesIO() as buffer:
+                                media.save_image(image, buffer, output_format, jpeg_quality, processing)
+                                data = buffer.getvalue()
+                            out.add(filename, data)
                             processed_count += 1
+                            if out.archive:
+                                index_rows.append(dict(media.describe_bytes(data), ma_nv=ma_nv, ho_ten=ho_ten,
+                                                       filename=filename))
                             log(f"  ✅ Đã lưu ảnh chất lượng cao: {filename} ({image.width}x{image.height} px)")
+                            stream.emit('row_processed', row=row, ma_nv=ma_nv, filename=filename,
+                                        bytes=len(data), method='clipboard',
+                                        duration=time.perf_counter() - row_start)
                         else:
                             log(f"  ❌ Không có ảnh trong clipboard tại hàng {row}")
+                            stream.emit('row_skipped', row=row, ma_nv=ma_nv, reason='error', error='clipboard')
                         
                         # KHÔI PHỤC TRẠNG THÁI BAN ĐẦU
                         shape.Top = current_top
@@ -283,6 +1180,7 @@ def export_images(excel_file_path, output_folder, scale_factor, wait_time, log_c
                         
                     except Exception as e:
                         log(f"  ❌ Lỗi khi xử lý ảnh hàng {row}: {str(e)}")
+                        stream.emit('row_skipped', row=row, ma_nv=ma_nv, reason='error', error=str(e))
                         # Cố gắng khôi phục trạng thái nếu có lỗi
                         try:
                             shape.Top = current_top
@@ -294,22 +1192,27 @@ def export_images(excel_file_path, output_folder, scale_factor, wait_time, log_c
                 else:
                     missing_images += 1
                     log(f"  ❌ Hàng {row}: Không có ảnh được ánh xạ")
+                    stream.emit('row_skipped', row=row, ma_nv=ma_nv, reason='no_image')
                     
             except Exception as e:
                 log(f"  ⚠️ Lỗi tại hàng {row}: {str(e)}")
+                stream.emit('row_skipped', row=row, ma_nv=None, reason='error', error=str(e))
         
-        # Báo cáo kết quả
-        log("\n📊 BÁO CÁO HOÀN THÀNH:")
-        log(f"- Tổng số hàng đã xử lý: {last_row - 1}")
-        log(f"- Số ảnh đã lưu thành công: {processed_count}")
-        log(f"- Số hàng không có ảnh: {missing_images}")
+        # File nén: thêm index.csv rồi đổi tên file tạm thành file chính thức (bị dừng thì xóa)
+        if out.archive and cancelled_at is None:
+            out.add(output.INDEX_NAME, output.build_index(index_rows))
+            log(f"🗂️ Đã ghi chỉ mục {output.INDEX_NAME}: {len(index_rows)} ảnh")
+        out.close(keep=cancelled_at is None)
         
-        if processed_count == 0:
-            log("\n⚠️ CẢNH BÁO: Không có ảnh nào được lưu! Nguyên nhân có thể:")
-            log("   1. Không thể xác định vị trí ảnh")
-            log("   2. Lỗi trong quá trình sao chép ảnh")
-            log("   3. Định dạng ảnh không hỗ trợ")
-            log("   4. Cấu trúc file Excel không như mong đợi")
+        # Báo cáo kết quả
+        details = _naming_details(filename_template, collisions, on_collision, collisions_skipped)
+        if resumed_count:
+            details.append(("Số hàng đã xong từ lần chạy trước", resumed_count))
+        _log_summary(log, max(last_row - first_row + 1, 0), processed_count, missing_images,
+                     details=details, skipped_count=resumed_count)
+        if cancelled_at is not None:
+            _log_cancelled(log, cancelled_at, resumable=not out.archive)
+            return False
         
         return True
     
@@ -320,39 +1223,23 @@ def export_images(excel_file_path, output_folder, scale_factor, wait_time, log_c
     
     finally:
         # Đảm bảo giải phóng tài nguyên
+        stream.enter('teardown')
+        if out is not None:
+            out.close(keep=False)
         try:
             if 'wb' in locals():
                 wb.Close(False)
-            if 'excel' in locals():
-                excel.Quit()
-            pythoncom.CoUninitialize()
-            log("✅ Đã đóng ứng dụng Excel và giải phóng tài nguyên")
+            if session is None:
+                if 'excel' in locals():
+                    excel.Quit()
+                pythoncom.CoUninitialize()
+                log("✅ Đã đóng ứng dụng Excel và giải phóng tài nguyên")
+            else:
+                log("✅ Đã đóng file Excel")
         except:
             pass
 
 if __name__ == "__main__":
-    # Hàm log mặc định cho chế độ dòng lệnh
-    def log(message):
-        print(message)
-    
-    # Thông số mặc định khi chạy trực tiếp
-    print("=" * 50)
-    print("BẮT ĐẦU QUÁ TRÌNH XUẤT ẢNH TỪ EXCEL")
-    print("=" * 50)
-    
-    # Chạy chương trình chính
-    start_time = time.time()
-    export_images(
-        excel_file_path="B23N OKE.xlsx",
-        output_folder="ANHTHE",
-        scale_factor=3.0,
-        wait_time=0.5,
-        log_callback=log
-    )
-    
-    # Tính thời gian thực thi
-    elapsed_time = time.time() - start_time
-    print("\n" + "=" * 50)
-    print(f"HOÀN TẤT SAU {elapsed_time:.2f} GIÂY")
-
-    print("=" * 50)
+    # Chế độ dòng lệnh: xem cli.py
+    from cli import main
+    sys.exit(main())
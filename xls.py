@@ -0,0 +1,694 @@
+"""
+Module đọc trực tiếp file Excel 97-2003 (.xls, BIFF8) để trích xuất ảnh thẻ
+
+Mục đích:
+    - Mở file .xls (compound file OLE2) không cần Excel hay COM, chỉ dùng thư viện chuẩn
+    - Đọc giá trị các ô mã nhân viên / họ tên từ các bản ghi BIFF8 của sheet
+    - Đọc ảnh từ bản ghi MsoDrawingGroup (kho ảnh BStore) và vị trí ảnh từ bản ghi
+      MsoDrawing của sheet (OfficeArtClientAnchor: ô đầu / ô cuối)
+
+Các hàm có cùng giao diện với ooxml.py (open_package, resolve_sheet, read_shared_strings,
+read_header_rows, read_dimension, iter_data_rows, iter_pictures, read_pictures) để
+backend đọc trực tiếp dùng chung một luồng xử lý cho cả .xlsx và .xls. "Phần" của
+sheet là số thứ tự sheet; "phần media" là tên ảo của ảnh trong kho BStore
+(vd: 'media/image3.jpeg'), đọc bằng read() như phần media trong gói .xlsx.
+
+Giới hạn:
+    - Chỉ hỗ trợ BIFF8 (Excel 97 trở lên), không hỗ trợ file có mật khẩu
+    - Chỉ lấy ảnh bitmap (JPEG, PNG, TIFF, DIB -> BMP); ảnh vector (EMF, WMF, PICT) bị bỏ qua
+    - Mọi ảnh trong .xls đều neo theo ô nên không có ảnh dùng anchor tuyệt đối
+"""
+
+import struct
+
+# Chữ ký của compound file OLE2
+OLE_SIGNATURE = b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1'
+
+# Giá trị đặc biệt trong bảng FAT
+END_OF_CHAIN = 0xFFFFFFFE
+FREE_SECTOR = 0xFFFFFFFF
+# Mục thư mục không tồn tại (liên kết trái / phải / con trong cây thư mục)
+NO_STREAM = 0xFFFFFFFF
+
+# Tên luồng dữ liệu workbook trong compound file (BIFF5 dùng 'Book', không hỗ trợ)
+WORKBOOK_STREAM = 'Workbook'
+
+# Mã các bản ghi BIFF8 cần đọc
+BOF = 0x0809
+EOF = 0x000A
+CONTINUE = 0x003C
+FILEPASS = 0x002F
+BOUNDSHEET = 0x0085
+WINDOW1 = 0x003D
+SST = 0x00FC
+MSODRAWINGGROUP = 0x00EB
+MSODRAWING = 0x00EC
+DIMENSIONS = 0x0200
+LABELSST = 0x00FD
+LABEL = 0x0204
+NUMBER = 0x0203
+RK = 0x027E
+MULRK = 0x00BD
+BOOLERR = 0x0205
+FORMULA = 0x0006
+STRING = 0x0207
+
+BIFF8_VERSION = 0x0600
+
+# Mã các bản ghi OfficeArt (Escher) trong MsoDrawingGroup / MsoDrawing
+ART_CONTAINER = 0xF
+ART_DGG_CONTAINER = 0xF000
+ART_BSTORE_CONTAINER = 0xF001
+ART_SPGR_CONTAINER = 0xF003
+ART_SP_CONTAINER = 0xF004
+ART_FBSE = 0xF007
+ART_FSP = 0xF00A
+ART_FOPT = 0xF00B
+ART_CLIENT_ANCHOR = 0xF010
+
+# Thuộc tính của hình trong FOPT: chỉ số ảnh trong BStore (pib) và tên hình
+PROP_PIB = 0x0104
+PROP_NAME = 0x0380
+
+# Loại ảnh bitmap trong BStore: phần mở rộng của ảnh
+BLIP_EXTENSIONS = {
+    0xF01D: '.jpeg',
+    0xF02A: '.jpeg',  # JPEG hệ màu CMYK
+    0xF01E: '.png',
+    0xF01F: '.bmp',  # DIB: thêm BITMAPFILEHEADER khi đọc
+    0xF029: '.tiff',
+}
+
+# Kích thước các phần cố định
+BLIP_UID_SIZE = 16
+FBSE_HEADER_SIZE = 36
+BITMAP_FILE_HEADER_SIZE = 14
+
+
+def is_workbook(file_path):
+    """
+    Kiểm tra file có phải compound file OLE2 (.xls) hay không
+
+    Args:
+        file_path (str): Đường dẫn file Excel
+
+    Returns:
+        bool: True nếu file bắt đầu bằng chữ ký OLE2
+    """
+    try:
+        with open(file_path, 'rb') as f:
+            return f.read(len(OLE_SIGNATURE)) == OLE_SIGNATURE
+    except OSError:
+        return False
+
+
+def open_package(file_path):
+    """Mở file .xls để đọc (dùng với with, đối tượng trả về có read(part))"""
+    return XlsWorkbook(file_path)
+
+
+def _sector_chain(fat, start):
+    """Danh sách sector của một chuỗi trong bảng FAT (chặn vòng lặp do file hỏng)"""
+    chain = []
+    sector = start
+    while sector not in (END_OF_CHAIN, FREE_SECTOR) and sector < len(fat) and len(chain) <= len(fat):
+        chain.append(sector)
+        sector = fat[sector]
+    return chain
+
+
+def _root_children(entries):
+    """
+    Các mục con trực tiếp của mục gốc
+
+    Con của một storage là một cây đỏ-đen: mục con đầu tiên nối tới các mục cùng cấp
+    qua liên kết trái / phải; liên kết con dẫn xuống storage bên trong (vd: đối tượng OLE
+    nhúng có luồng 'Workbook' riêng) nên không được duyệt
+    """
+    children = []
+    pending = [entries[0][4]]
+    visited = set()
+    while pending:
+        index = pending.pop()
+        if index == NO_STREAM or index in visited or index >= len(entries):
+            continue
+        visited.add(index)
+        children.append(entries[index])
+        pending.extend(entries[index][5:7])
+    return children
+
+
+def read_ole_stream(data, stream_name):
+    """
+    Đọc một luồng dữ liệu ở cấp gốc của compound file OLE2
+
+    Args:
+        data (bytes): Toàn bộ nội dung file
+        stream_name (str): Tên luồng (vd: 'Workbook')
+
+    Returns:
+        bytes: Nội dung luồng
+
+    Raises:
+        ValueError: Không phải compound file hoặc không có luồng cần đọc
+    """
+    if data[:len(OLE_SIGNATURE)] != OLE_SIGNATURE:
+        raise ValueError("File không phải định dạng Excel 97-2003 (.xls)")
+    sector_shift, mini_shift = struct.unpack_from('<HH', data, 30)
+    sector_size = 1 << sector_shift
+    mini_size = 1 << mini_shift
+    (fat_count, dir_start, _, mini_cutoff, minifat_start, _,
+     difat_start, difat_count) = struct.unpack_from('<8I', data, 44)
+
+    def sector(index):
+        offset = (index + 1) * sector_size
+        return data[offset:offset + sector_size]
+
+    # DIFAT: 109 mục trong header, phần còn lại nằm trong chuỗi sector DIFAT
+    per_sector = sector_size // 4
+    difat = list(struct.unpack_from('<109I', data, 76))
+    next_difat = difat_start
+    for _ in range(difat_count):
+        if next_difat in (END_OF_CHAIN, FREE_SECTOR):
+            break
+        entries = struct.unpack(f'<{per_sector}I', sector(next_difat))
+        difat.extend(entries[:-1])
+        next_difat = entries[-1]
+    fat = []
+    for fat_sector in difat[:fat_count]:
+        fat.extend(struct.unpack(f'<{per_sector}I', sector(fat_sector)))
+
+    def read_chain(start, size=None):
+        stream = b''.join(sector(index) for index in _sector_chain(fat, start))
+        return stream if size is None else stream[:size]
+
+    # Thư mục: mỗi mục 128 byte (tên UTF-16, loại, liên kết trái / phải / con, sector đầu, kích thước)
+    directory = read_chain(dir_start)
+    entries = []
+    for offset in range(0, len(directory) - 127, 128):
+        name_length = struct.unpack_from('<H', directory, offset + 64)[0]
+        name = directory[offset:offset + max(name_length - 2, 0)].decode('utf-16-le', 'replace')
+        entry_type = directory[offset + 66]
+        left, right, child = struct.unpack_from('<3I', directory, offset + 68)
+        start, size = struct.unpack_from('<IQ', directory, offset + 116)
+        if sector_size == 512:
+            # Phiên bản 3: chỉ 4 byte thấp của kích thước có nghĩa
+            size &= 0xFFFFFFFF
+        entries.append((name, entry_type, start, size, child, left, right))
+    if not entries:
+        raise ValueError("File .xls bị hỏng: không đọc được thư mục")
+
+    # Tên mục trong compound file không phân biệt hoa thường
+    for name, entry_type, start, size, _, _, _ in _root_children(entries):
+        if entry_type != 2 or name.upper() != stream_name.upper():
+            continue
+        if size >= mini_cutoff:
+            return read_chain(start, size)
+        # Luồng nhỏ nằm trong mini stream (luồng của mục gốc), tra theo bảng mini FAT
+        minifat_data = read_chain(minifat_start)
+        minifat = struct.unpack(f'<{len(minifat_data) // 4}I', minifat_data)
+        mini_stream = read_chain(entries[0][2], entries[0][3])
+        return b''.join(mini_stream[index * mini_size:(index + 1) * mini_size]
+                        for index in _sector_chain(minifat, start))[:size]
+    raise ValueError(f"File .xls không có luồng '{stream_name}' (chỉ hỗ trợ Excel 97-2003 trở lên)")
+
+
+def _iter_records(stream, offset=0):
+    """Duyệt các bản ghi BIFF từ vị trí offset: (mã bản ghi, dữ liệu)"""
+    end = len(stream)
+    while offset + 4 <= end:
+        record_type, length = struct.unpack_from('<HH', stream, offset)
+        yield record_type, stream[offset + 4:offset + 4 + length]
+        offset += 4 + length
+
+
+def _decode_chars(data, offset, count, high_byte):
+    """Đọc count ký tự (UTF-16 hoặc 8 bit nén) từ offset, trả về (chuỗi, vị trí kế tiếp)"""
+    size = count * 2 if high_byte else count
+    raw = data[offset:offset + size]
+    return raw.decode('utf-16-le' if high_byte else 'latin-1', 'replace'), offset + size
+
+
+def _short_string(data, offset):
+    """Đọc ShortXLUnicodeString (độ dài 1 byte), dùng cho tên sheet"""
+    count, flags = data[offset], data[offset + 1]
+    return _decode_chars(data, offset + 2, count, flags & 1)[0]
+
+
+def _unicode_string(data, offset):
+    """Đọc XLUnicodeString (độ dài 2 byte), dùng cho bản ghi LABEL / STRING"""
+    count, flags = struct.unpack_from('<HB', data, offset)
+    return _decode_chars(data, offset + 3, count, flags & 1)[0]
+
+
+def _read_sst(segments):
+    """
+    Đọc bảng chuỗi dùng chung từ bản ghi SST và các bản ghi CONTINUE theo sau
+
+    Chuỗi có thể bị cắt sang bản ghi CONTINUE kế tiếp; khi đó phần còn lại bắt đầu
+    bằng một byte cờ mới cho biết ký tự 8 bit hay 16 bit.
+
+    Args:
+        segments (list): Dữ liệu của bản ghi SST và các bản ghi CONTINUE
+
+    Returns:
+        list: Danh sách chuỗi theo chỉ số
+    """
+    strings = []
+    segment = 0
+    data = segments[0]
+    unique_count = struct.unpack_from('<I', data, 4)[0]
+    pos = 8
+
+    def skip(pos, segment, data, size):
+        """Bỏ qua size byte (định dạng rich text / phần mở rộng), có thể vắt sang CONTINUE"""
+        while size > 0:
+            step = min(size, len(data) - pos)
+            pos += step
+            size -= step
+            if size > 0:
+                segment += 1
+                data = segments[segment]
+                pos = 0
+        return pos, segment, data
+
+    for _ in range(unique_count):
+        if pos >= len(data):
+            segment += 1
+            if segment >= len(segments):
+                break
+            data = segments[segment]
+            pos = 0
+        count, flags = struct.unpack_from('<HB', data, pos)
+        pos += 3
+        runs = ext_size = 0
+        if flags & 0x08:
+            runs = struct.unpack_from('<H', data, pos)[0]
+            pos += 2
+        if flags & 0x04:
+            ext_size = struct.unpack_from('<I', data, pos)[0]
+            pos += 4
+        high_byte = flags & 1
+        parts = []
+        remaining = count
+        while True:
+            available = (len(data) - pos) // (2 if high_byte else 1)
+            text, pos = _decode_chars(data, pos, min(remaining, available), high_byte)
+            parts.append(text)
+            remaining -= min(remaining, available)
+            if remaining == 0 or segment + 1 >= len(segments):
+                break
+            segment += 1
+            data = segments[segment]
+            high_byte = data[0] & 1
+            pos = 1
+        strings.append(''.join(parts))
+        pos, segment, data = skip(pos, segment, data, runs * 4 + ext_size)
+    return strings
+
+
+def _rk_value(rk):
+    """Giải mã số dạng RK (số nguyên 30 bit hoặc 30 bit cao của số thực, có thể chia 100)"""
+    if rk & 0x02:
+        value = float(rk >> 2 if rk < 0x80000000 else (rk >> 2) - (1 << 30))
+    else:
+        value = struct.unpack('<d', struct.pack('<Q', (rk & 0xFFFFFFFC) << 32))[0]
+    return value / 100 if rk & 0x01 else value
+
+
+def _iter_art(data, start, end):
+    """Duyệt các bản ghi OfficeArt trong đoạn [start, end): (ver, instance, loại, đầu dữ liệu, cuối dữ liệu)"""
+    pos = start
+    while pos + 8 <= end:
+        ver_instance, record_type, length = struct.unpack_from('<HHI', data, pos)
+        yield ver_instance & 0xF, ver_instance >> 4, record_type, pos + 8, min(pos + 8 + length, end)
+        pos += 8 + length
+
+
+def _read_bstore(data):
+    """
+    Đọc kho ảnh BStore trong MsoDrawingGroup
+
+    Returns:
+        dict: {pib (đánh số từ 1): (loại ảnh, đầu dữ liệu, cuối dữ liệu)}, chỉ gồm ảnh bitmap
+    """
+    blips = {}
+    for ver, _, record_type, body, body_end in _iter_art(data, 0, len(data)):
+        if record_type != ART_DGG_CONTAINER:
+            continue
+        for _, _, child_type, child, child_end in _iter_art(data, body, body_end):
+            if child_type != ART_BSTORE_CONTAINER:
+                continue
+            for pib, (_, _, entry_type, entry, entry_end) in enumerate(
+                    _iter_art(data, child, child_end), start=1):
+                if entry_type != ART_FBSE or entry_end - entry < FBSE_HEADER_SIZE:
+                    continue
+                name_size = data[entry + 33]
+                blip = entry + FBSE_HEADER_SIZE + name_size
+                # Ảnh nằm trong luồng khác (foDelay) hoặc không còn được dùng: bỏ qua
+                if blip + 8 > entry_end:
+                    continue
+                _, blip_instance, blip_type, blip_body, blip_end = next(_iter_art(data, blip, entry_end))
+                if blip_type not in BLIP_EXTENSIONS:
+                    continue
+                # Phần đầu: 1 hoặc 2 mã UID (instance lẻ: 2 mã) và 1 byte tag
+                header = BLIP_UID_SIZE * (2 if blip_instance & 1 else 1) + 1
+                blips[pib] = (blip_type, blip_body + header, blip_end)
+    return blips
+
+
+def _bitmap_file(dib):
+    """Thêm BITMAPFILEHEADER vào ảnh DIB để thành file .bmp hoàn chỉnh"""
+    header_size, = struct.unpack_from('<I', dib, 0)
+    bit_count, compression = struct.unpack_from('<HI', dib, 14)
+    colors_used, = struct.unpack_from('<I', dib, 32) if header_size >= 36 else (0,)
+    palette = colors_used or (1 << bit_count if bit_count <= 8 else 0)
+    # BI_BITFIELDS với header 40 byte: 3 mặt nạ màu nằm ngay sau header
+    masks = 12 if compression == 3 and header_size == 40 else 0
+    offset = BITMAP_FILE_HEADER_SIZE + header_size + masks + palette * 4
+    return struct.pack('<2sIHHI', b'BM', BITMAP_FILE_HEADER_SIZE + len(dib), 0, 0, offset) + dib
+
+
+def _shape_properties(data, body, body_end):
+    """Đọc pib, tên hình và anchor ô của một SpContainer"""
+    pib = name = anchor = shape_id = None
+    for _, instance, record_type, child, child_end in _iter_art(data, body, body_end):
+        if record_type == ART_FSP and child_end - child >= 4:
+            shape_id = struct.unpack_from('<I', data, child)[0]
+        elif record_type == ART_FOPT:
+            # instance = số thuộc tính; dữ liệu phức (tên...) nằm sau bảng thuộc tính theo thứ tự
+            complex_pos = child + instance * 6
+            for index in range(instance):
+                prop_id, value = struct.unpack_from('<HI', data, child + index * 6)
+                is_complex = prop_id & 0x8000
+                prop_id &= 0x3FFF
+                if prop_id == PROP_PIB:
+                    pib = value
+                elif prop_id == PROP_NAME and is_complex:
+                    raw = data[complex_pos:min(complex_pos + value, child_end)]
+                    name = raw.decode('utf-16-le', 'replace').rstrip('\x00') or None
+                if is_complex:
+                    complex_pos += value
+        elif record_type == ART_CLIENT_ANCHOR and child_end - child >= 18:
+            col_left, _, row_top, dy_top, col_right, _, row_bottom, dy_bottom = struct.unpack_from(
+                '<8H', data, child + 2)
+            # Độ lệch dọc tính theo 1/256 chiều cao hàng
+            anchor = ((row_top + 1, col_left + 1), (row_bottom + 1, col_right + 1),
+                      (dy_top / 256, dy_bottom / 256))
+    return pib, name, anchor, shape_id
+
+
+def _sheet_pictures(data, blips):
+    """
+    Liệt kê ảnh trong luồng MsoDrawing của sheet
+
+    Ảnh trong nhóm không có anchor riêng (chỉ có anchor con): dùng anchor của nhóm,
+    giống ảnh trong grpSp của .xlsx.
+
+    Returns:
+        list: Danh sách dict 'name', 'media', 'anchor', 'from', 'to', 'offsets'
+            (độ lệch dọc theo tỷ lệ chiều cao hàng, 'offset_unit' = 'row')
+    """
+    pictures = []
+
+    def walk(start, end, group_anchor):
+        for ver, _, record_type, body, body_end in _iter_art(data, start, end):
+            if record_type == ART_SP_CONTAINER:
+                pib, name, anchor, shape_id = _shape_properties(data, body, body_end)
+                anchor = anchor or group_anchor
+                if pib in blips and anchor is not None:
+                    pictures.append({
+                        'name': name or f"Picture {shape_id}",
+                        'media': f"media/image{pib}{BLIP_EXTENSIONS[blips[pib][0]]}",
+                        'anchor': 'twoCell',
+                        'from': anchor[0],
+                        'to': anchor[1],
+                        'offsets': anchor[2],
+                        'offset_unit': 'row',
+                    })
+            elif record_type == ART_SPGR_CONTAINER:
+                # SpContainer đầu tiên của nhóm mô tả chính nhóm (chứa anchor của nhóm)
+                first = next(_iter_art(data, body, body_end), None)
+                anchor = group_anchor
+                if first is not None and first[2] == ART_SP_CONTAINER:
+                    anchor = _shape_properties(data, first[3], first[4])[2] or group_anchor
+                walk(body, body_end, anchor)
+            elif ver == ART_CONTAINER:
+                walk(body, body_end, group_anchor)
+
+    walk(0, len(data), None)
+    return pictures
+
+
+class XlsWorkbook:
+    """File .xls đã mở: danh sách sheet, bảng chuỗi dùng chung và kho ảnh"""
+
+    def __init__(self, file_path):
+        with open(file_path, 'rb') as f:
+            self._stream = read_ole_stream(f.read(), WORKBOOK_STREAM)
+        self.sheets = []
+        self.active_sheet = 0
+        self.shared_strings = []
+        self._drawing_group = b''
+        self.blips = {}
+        self._sheet_data = {}
+        self._read_globals()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self._stream = None
+        self._sheet_data = {}
+
+    def _read_globals(self):
+        """Đọc phần globals: danh sách sheet, sheet đang hoạt động, SST, kho ảnh"""
+        sst_segments = []
+        last_type = None
+        for index, (record_type, data) in enumerate(_iter_records(self._stream)):
+            if index == 0:
+                if record_type != BOF or struct.unpack_from('<H', data, 0)[0] != BIFF8_VERSION:
+                    raise ValueError("Chỉ hỗ trợ file .xls định dạng BIFF8 (Excel 97-2003)")
+                continue
+            if record_type == FILEPASS:
+                raise ValueError("File .xls có mật khẩu, không đọc trực tiếp được")
+            if record_type == BOUNDSHEET:
+                offset = struct.unpack_from('<I', data, 0)[0]
+                self.sheets.append((_short_string(data, 6), offset))
+            elif record_type == WINDOW1 and len(data) >= 12:
+                self.active_sheet = struct.unpack_from('<H', data, 10)[0]
+            elif record_type == SST:
+                sst_segments = [data]
+            elif record_type == MSODRAWINGGROUP:
+                self._drawing_group += data
+            elif record_type == CONTINUE and last_type == SST:
+                sst_segments.append(data)
+                continue
+            elif record_type == CONTINUE and last_type == MSODRAWINGGROUP:
+                self._drawing_group += data
+                continue
+            elif record_type == EOF:
+                break
+            last_type = record_type
+        if sst_segments:
+            self.shared_strings = _read_sst(sst_segments)
+        if self._drawing_group:
+            self.blips = _read_bstore(self._drawing_group)
+
+    def sheet_data(self, sheet_index):
+        """
+        Đọc các bản ghi của một sheet (đọc một lần, dùng lại cho các lần gọi sau)
+
+        Returns:
+            dict: {'cells': {row: {col: value}}, 'last_row': hàng cuối theo DIMENSIONS,
+                'drawing': dữ liệu MsoDrawing đã ghép}
+        """
+        if sheet_index in self._sheet_data:
+            return self._sheet_data[sheet_index]
+        cells = {}
+        drawing = []
+        last_row = None
+        last_type = None
+        pending_formula = None
+
+        def put(row, col, value):
+            if value is not None and value != '':
+                cells.setdefault(row + 1, {})[col + 1] = value
+
+        for index, (record_type, data) in enumerate(_iter_records(self._stream, self.sheets[sheet_index][1])):
+            if index == 0:
+                if record_type != BOF:
+                    raise ValueError("File .xls bị hỏng: vị trí sheet không hợp lệ")
+                continue
+            if record_type == EOF:
+                break
+            if record_type == LABELSST:
+                row, col, _, sst_index = struct.unpack_from('<HHHI', data, 0)
+                if sst_index < len(self.shared_strings):
+                    put(row, col, self.shared_strings[sst_index])
+            elif record_type == NUMBER:
+                row, col, _, value = struct.unpack_from('<HHHd', data, 0)
+                put(row, col, value)
+            elif record_type == RK:
+                row, col, _, rk = struct.unpack_from('<HHHI', data, 0)
+                put(row, col, _rk_value(rk))
+            elif record_type == MULRK:
+                row, first_col = struct.unpack_from('<HH', data, 0)
+                for offset in range((len(data) - 6) // 6):
+                    rk = struct.unpack_from('<I', data, 4 + offset * 6 + 2)[0]
+                    put(row, first_col + offset, _rk_value(rk))
+            elif record_type == LABEL:
+                row, col = struct.unpack_from('<HH', data, 0)
+                put(row, col, _unicode_string(data, 6))
+            elif record_type == BOOLERR:
+                row, col, _, value, is_error = struct.unpack_from('<HHHBB', data, 0)
+                if not is_error:
+                    put(row, col, bool(value))
+            elif record_type == FORMULA:
+                row, col = struct.unpack_from('<HH', data, 0)
+                result = data[6:14]
+                if result[6:8] != b'\xff\xff':
+                    put(row, col, struct.unpack('<d', result)[0])
+                elif result[0] == 0:
+                    # Kết quả là chuỗi: nằm trong bản ghi STRING ngay sau
+                    pending_formula = (row, col)
+                elif result[0] == 1:
+                    put(row, col, bool(result[2]))
+            elif record_type == STRING and pending_formula is not None:
+                put(*pending_formula, _unicode_string(data, 0))
+                pending_formula = None
+            elif record_type == DIMENSIONS:
+                last_row = struct.unpack_from('<I', data, 4)[0] or None
+            elif record_type == MSODRAWING:
+                drawing.append(data)
+            elif record_type == CONTINUE and last_type == MSODRAWING:
+                # Phần tiếp của MsoDrawing dài hơn một bản ghi
+                drawing.append(data)
+                continue
+            last_type = record_type
+
+        result = {'cells': cells, 'last_row': last_row, 'drawing': b''.join(drawing)}
+        self._sheet_data[sheet_index] = result
+        return result
+
+    def read(self, part):
+        """
+        Đọc bytes ảnh theo tên ảo (vd: 'media/image3.jpeg'), giống ZipFile.read
+
+        Raises:
+            KeyError: Không có ảnh với tên này
+        """
+        try:
+            pib = int(part.rsplit('image', 1)[1].split('.')[0])
+            blip_type, start, end = self.blips[pib]
+        except (IndexError, ValueError, KeyError):
+            raise KeyError(part) from None
+        data = self._drawing_group[start:end]
+        return _bitmap_file(data) if blip_type == 0xF01F else data
+
+
+def sheet_names(book):
+    """
+    Liệt kê tên các sheet theo thứ tự trong workbook
+
+    Args:
+        book (XlsWorkbook): File .xls đã mở
+
+    Returns:
+        list: Danh sách tên sheet
+    """
+    return [name for name, _ in book.sheets]
+
+
+def resolve_sheet(book, sheet_name=None):
+    """
+    Xác định sheet cần xử lý
+
+    Args:
+        book (XlsWorkbook): File .xls đã mở
+        sheet_name (str): Tên sheet, None để lấy sheet đang hoạt động
+
+    Returns:
+        tuple: (tên sheet, số thứ tự sheet)
+    """
+    if not book.sheets:
+        raise ValueError("Workbook không có sheet nào")
+    if sheet_name is None:
+        index = min(book.active_sheet, len(book.sheets) - 1)
+        return book.sheets[index][0], index
+    for index, (name, _) in enumerate(book.sheets):
+        if name == sheet_name:
+            return name, index
+    raise ValueError(f"Không tìm thấy sheet '{sheet_name}'")
+
+
+def read_shared_strings(book):
+    """Bảng chuỗi dùng chung (đã đọc khi mở file)"""
+    return book.shared_strings
+
+
+def read_dimension(book, sheet_index):
+    """
+    Hàng cuối theo bản ghi DIMENSIONS của sheet
+
+    Returns:
+        int: Hàng cuối, None nếu sheet trống
+    """
+    return book.sheet_data(sheet_index)['last_row']
+
+
+def read_header_rows(book, sheet_index, last_row, last_column, shared_strings=None):
+    """
+    Đọc giá trị các hàng đầu sheet (dùng để tự nhận diện tiêu đề)
+
+    Returns:
+        list: (row, {col: value}) của các hàng có dữ liệu từ 1 đến last_row
+    """
+    cells = book.sheet_data(sheet_index)['cells']
+    return [(row, {col: value for col, value in cells[row].items() if col <= last_column})
+            for row in sorted(cells) if row <= last_row]
+
+
+def iter_data_rows(book, sheet_index, columns=(1, 2), first_row=2, key_column=1, shared_strings=None):
+    """
+    Duyệt các hàng dữ liệu từ first_row đến hàng cuối có giá trị ở key_column
+    (cùng cách xử lý hàng trống như ooxml.iter_data_rows)
+
+    Yields:
+        tuple: (row, {col: value})
+    """
+    cells = book.sheet_data(sheet_index)['cells']
+    next_row = first_row
+    for row in sorted(cells):
+        values = {col: cells[row][col] for col in columns if col in cells[row]}
+        if row < first_row or key_column not in values:
+            continue
+        for gap in range(next_row, row):
+            yield gap, {}
+        yield row, values
+        next_row = row + 1
+
+
+def iter_pictures(book, sheet_index):
+    """
+    Duyệt các ảnh trong MsoDrawing của sheet
+
+    Yields:
+        dict: 'name', 'media', 'anchor' ('twoCell'), 'from', 'to', 'offsets', 'offset_unit' ('row')
+    """
+    drawing = book.sheet_data(sheet_index)['drawing']
+    if drawing and book.blips:
+        yield from _sheet_pictures(drawing, book.blips)
+
+
+def read_pictures(book, sheet_index):
+    """
+    Liệt kê các ảnh trong sheet
+
+    Returns:
+        list: Danh sách dict như iter_pictures
+    """
+    return list(iter_pictures(book, sheet_index))